@@ -0,0 +1,110 @@
+"""
+This module provides the typo-tolerant comparison of answers used in the VocabVoyage application.
+
+# app/domain/matching.py
+
+Answers are compared in two forms. The normalized form (see
+``app.domain.vocabulary.normalize_answer``) must match exactly for an answer to be
+exact. The folded form additionally drops diacritics, so ``paiva`` and ``päivä`` fold to
+the same text, and is compared by edit distance for an answer to be close.
+
+The edit distance is computed with the bit-parallel algorithm of Myers (1999) in the
+formulation of Hyyrö (2001): every character of the answer updates all cells of a DP
+column at once with a few integer operations, so a comparison costs O(n) big-integer
+steps instead of O(m * n) cell updates. Python integers have arbitrary width, so the
+expected answer may be of any length.
+
+Functions:
+    fold_answer(text: str) -> str:
+        Returns the diacritic-insensitive form of an answer.
+
+    edit_distance(expected: str, answer: str, limit: Optional[int] = None) -> int:
+        Returns the Levenshtein distance between two strings.
+
+    allowed_typos(expected: str, max_typos: int) -> int:
+        Returns how many edits an answer to the expected text may contain.
+"""
+
+import unicodedata
+from typing import Dict, Optional
+
+# One typo is allowed per this many characters of the expected answer
+CHARACTERS_PER_TYPO = 4
+
+
+def fold_answer(text: str) -> str:
+    """
+    Returns the diacritic-insensitive form of an answer.
+
+    The text is stripped, case folded and decomposed, and the combining marks are
+    dropped, so accented letters compare equal to their base letters.
+
+    Args:
+        text (str): The answer or the foreign term.
+
+    Returns:
+        str: The folded answer.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.strip().casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def edit_distance(expected: str, answer: str, limit: Optional[int] = None) -> int:
+    """
+    Returns the Levenshtein distance between two strings.
+
+    Args:
+        expected (str): The text encoded as bit vectors, usually the expected answer.
+        answer (str): The text scanned character by character.
+        limit (Optional[int]): If given, any distance above the limit may be reported
+            as ``limit + 1``, which lets clearly different strings return early.
+
+    Returns:
+        int: The minimum number of insertions, deletions and substitutions.
+    """
+    length = len(expected)
+    if limit is not None and abs(length - len(answer)) > limit:
+        return limit + 1
+    if length == 0:
+        return len(answer)
+
+    matches: Dict[str, int] = {}
+    for position, char in enumerate(expected):
+        matches[char] = matches.get(char, 0) | (1 << position)
+    mask = (1 << length) - 1
+    last = 1 << (length - 1)
+    positive = mask  # Vertical deltas of +1
+    negative = 0  # Vertical deltas of -1
+    distance = length
+    for char in answer:
+        match = matches.get(char, 0)
+        vertical = match | negative
+        horizontal = (((match & positive) + positive) ^ positive) | match
+        horizontal_positive = negative | ~(horizontal | positive)
+        horizontal_negative = positive & horizontal
+        if horizontal_positive & last:
+            distance += 1
+        elif horizontal_negative & last:
+            distance -= 1
+        horizontal_positive = (horizontal_positive << 1) | 1
+        horizontal_negative <<= 1
+        positive = (horizontal_negative | ~(vertical | horizontal_positive)) & mask
+        negative = horizontal_positive & vertical & mask
+    return distance
+
+
+def allowed_typos(expected: str, max_typos: int) -> int:
+    """
+    Returns how many edits an answer to the expected text may contain.
+
+    Short words allow fewer edits than ``max_typos``, one per ``CHARACTERS_PER_TYPO``
+    characters, so that ``car`` is not accepted for ``cat``.
+
+    Args:
+        expected (str): The folded expected answer.
+        max_typos (int): The configured maximum number of edits.
+
+    Returns:
+        int: The number of edits allowed.
+    """
+    return min(max_typos, len(expected) // CHARACTERS_PER_TYPO)
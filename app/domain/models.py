@@ -7,11 +7,13 @@ Classes:
     QuizMode (Enum): An enumeration representing the different modes of a quiz.
         - NORMAL: Standard quiz mode.
         - INFINITE: Endless quiz mode.
+        - SPACED: Spaced repetition with Leitner boxes.
 
     Word (BaseModel): A Pydantic model representing a word with its foreign term and native translation.
         Attributes:
             foreign_term (str): The word in the foreign language.
             native_translation (str): The translation of the word in the native language.
+            id (Optional[str]): The stable identifier assigned when the word is loaded.
 
     QuizResult (BaseModel): A Pydantic model representing the result of a quiz attempt.
         Attributes:
@@ -21,11 +23,21 @@ Classes:
             incorrect_words (List[str]): A list of words that were answered incorrectly.
             start_time (datetime): The start time of the quiz.
             end_time (datetime): The end time of the quiz.
+            deck (Optional[str]): The id of the deck of the quiz.
+
+    AnswerEvent (BaseModel): A Pydantic model representing one graded answer of the
+        answer log.
+
+    IngestReport (BaseModel): A Pydantic model summarizing a bulk load of word files,
+        with the skipped and the duplicate rows as SkippedRow and DuplicateRow models.
+
+    QuizState (BaseModel): A Pydantic model holding the progress of one learner's quiz.
+        It is plain data, so a state backend can keep it in memory or store it as JSON.
 """
 
 from datetime import datetime
 from enum import Enum
-from typing import List
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -38,10 +50,28 @@ class QuizMode(str, Enum):
     Attributes:
         NORMAL (str): Represents the normal quiz mode.
         INFINITE (str): Represents the infinite quiz mode.
+        SPACED (str): Represents the spaced repetition mode, where missed words come
+            back after a few other words and are asked until they are learned.
     """
 
     NORMAL = "normal"
     INFINITE = "infinite"
+    SPACED = "spaced"
+
+
+class AnswerMatch(str, Enum):
+    """
+    Enum representing how well an answer matches the foreign term.
+    Attributes:
+        EXACT (str): The normalized answer equals the normalized foreign term.
+        CLOSE (str): The answer differs only in diacritics or by a few typos. Counted
+            as correct when typo tolerance is enabled.
+        WRONG (str): The answer is wrong.
+    """
+
+    EXACT = "exact"
+    CLOSE = "close"
+    WRONG = "wrong"
 
 
 class Word(BaseModel):
@@ -51,11 +81,15 @@ class Word(BaseModel):
     Attributes:
         foreign_term (str): The word in the foreign language.
         native_translation (str): The translation of the foreign term in the native language.
+        id (Optional[str]): The stable identifier assigned when the word is loaded. It is
+            derived from the foreign term and the native translation, so the same word
+            keeps its id across reloads. Answers are checked against the word with this id.
 
     """
 
     foreign_term: str
     native_translation: str
+    id: Optional[str] = None
 
 
 class QuizResult(BaseModel):
@@ -69,6 +103,8 @@ class QuizResult(BaseModel):
         incorrect_words (List[str]): A list of words that were answered incorrectly.
         start_time (datetime): The timestamp when the quiz attempt started.
         end_time (datetime): The timestamp when the quiz attempt ended.
+        deck (Optional[str]): The id of the deck the quiz was on, or None for the word
+            list of all word files.
 
     """
 
@@ -78,3 +114,159 @@ class QuizResult(BaseModel):
     incorrect_words: List[str]
     start_time: datetime
     end_time: datetime
+    deck: Optional[str] = None
+
+
+class AnswerEvent(BaseModel):
+    """
+    Represents one graded answer, as written to the answer log.
+
+    Attributes:
+        session_id (Optional[str]): The learner session; set when the event is logged.
+        deck (Optional[str]): The id of the deck of the quiz, or None for the word list
+            of all word files.
+        mode (QuizMode): The quiz mode.
+        quiz_start (datetime): The start time of the quiz, which identifies the quiz
+            within the session.
+        word_id (str): The id of the asked word.
+        foreign_term (str): The expected answer.
+        answer (str): The user's input.
+        match (AnswerMatch): How well the answer matched.
+        answered_at (datetime): When the answer was graded.
+        response_time (Optional[float]): Seconds since the word was served or, for
+            prefetched words, since the previous answer.
+    """
+
+    session_id: Optional[str] = None
+    deck: Optional[str] = None
+    mode: QuizMode = QuizMode.NORMAL
+    quiz_start: datetime
+    word_id: str
+    foreign_term: str
+    answer: str
+    match: AnswerMatch
+    answered_at: datetime
+    response_time: Optional[float] = None
+
+
+class SkippedRow(BaseModel):
+    """
+    A row of a word file that was not loaded.
+
+    Attributes:
+        file (str): The name of the word file.
+        line (int): The line the row starts on, counting from 1.
+        reason (str): Why the row was skipped.
+    """
+
+    file: str
+    line: int
+    reason: str
+
+
+class DuplicateRow(BaseModel):
+    """
+    A row holding the same word as an earlier row.
+
+    Attributes:
+        file (str): The name of the word file.
+        line (int): The line the row starts on, counting from 1.
+        foreign_term (str): The word in the foreign language.
+        native_translation (str): The translation of the word.
+        first_file (str): The word file of the first row with the word.
+        first_line (int): The line of the first row with the word.
+    """
+
+    file: str
+    line: int
+    foreign_term: str
+    native_translation: str
+    first_file: str
+    first_line: int
+
+
+class IngestReport(BaseModel):
+    """
+    Summarizes a bulk load of word files.
+
+    The counts cover every row; only the first rows of each kind are listed.
+
+    Attributes:
+        files (int): The number of word files read.
+        rows (int): The number of rows, without blank lines.
+        words (int): The number of loaded words, duplicates included.
+        skipped (int): The number of rows that were not loaded.
+        duplicates (int): The number of loaded words that repeat an earlier word.
+        skipped_rows (List[SkippedRow]): The first skipped rows.
+        duplicate_rows (List[DuplicateRow]): The first duplicate rows.
+    """
+
+    files: int = 0
+    rows: int = 0
+    words: int = 0
+    skipped: int = 0
+    duplicates: int = 0
+    skipped_rows: List[SkippedRow] = []
+    duplicate_rows: List[DuplicateRow] = []
+
+
+class QuizState(BaseModel):
+    """
+    Represents the progress of one learner's quiz.
+
+    The word order of a fresh quiz is not stored as a list; it is the permutation of the
+    vocabulary indices selected by ``queue_key``. Only the repeated words of infinite
+    mode are stored as an explicit ``queue``.
+
+    Attributes:
+        vocabulary (str): The fingerprint of the vocabulary the indices refer to.
+        deck (Optional[str]): The id of the deck the words are drawn from, or None for
+            the word list of all word files.
+        mode (QuizMode): The quiz mode.
+        correct (int): The number of correct answers.
+        incorrect (int): The number of incorrect answers.
+        correct_words (List[str]): The correctly answered foreign terms.
+        incorrect_words (List[str]): The incorrectly answered foreign terms.
+        start_time (datetime): The timestamp when the quiz started.
+        queue_key (int): The key of the permutation giving the word order.
+        queue (Optional[List[int]]): The vocabulary indices to ask, replacing the
+            permutation while words are repeated.
+        current_word_index (int): The position of the current word in the queue.
+        retry_queue (List[int]): The vocabulary indices answered incorrectly in this pass.
+        repeat_incorrect_count (Dict[str, int]): How often each incorrectly answered
+            term was repeated.
+        retry_gap (int): How many other words are asked before a missed word comes back
+            in spaced mode.
+        max_typos (int): How many typos a close answer may contain; 0 accepts exact
+            answers only.
+        step (int): The number of words asked in spaced mode, used as the clock of the
+            schedule.
+        schedule (List[List[int]]): A binary heap of ``[due step, vocabulary index]``
+            pairs of the words waiting for a review in spaced mode.
+        boxes (Dict[int, int]): The Leitner box of every scheduled word.
+        pending (List[int]): The vocabulary indices of the words asked by the last
+            request in spaced mode and not answered yet.
+        asked_at (Optional[datetime]): When words were last served or an answer was
+            last graded, used for the response time of the next answer.
+    """
+
+    vocabulary: str
+    deck: Optional[str] = None
+    mode: QuizMode = QuizMode.NORMAL
+    correct: int = 0
+    incorrect: int = 0
+    correct_words: List[str] = []
+    incorrect_words: List[str] = []
+    start_time: datetime
+    queue_key: int = 0
+    queue: Optional[List[int]] = None
+    current_word_index: int = -1
+    retry_queue: List[int] = []
+    repeat_incorrect_count: Dict[str, int] = {}
+    retry_gap: int = 3
+    max_typos: int = 0
+    step: int = 0
+    schedule: List[List[int]] = []
+    boxes: Dict[int, int] = {}
+    pending: List[int] = []
+    asked_at: Optional[datetime] = None
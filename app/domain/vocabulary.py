@@ -0,0 +1,370 @@
+"""
+This module defines the compact vocabulary store and the quiz word order used in the VocabVoyage application.
+
+# app/domain/vocabulary.py
+
+Classes:
+    Vocabulary: An immutable, column-oriented store of words.
+        Words are addressed by their integer index. The foreign terms and the native
+        translations are kept in two tuples of interned strings, so a repeated string
+        is stored once and a word costs two references instead of a pydantic model.
+        Every word gets a stable id and precomputed normalized and folded answers at
+        load time, and a hash index maps ids to indices, so checking an answer is one
+        dict lookup plus one normalization of the user input.
+
+    FeistelPermutation: A keyed pseudo-random permutation of ``range(size)``.
+        The permutation is evaluated on demand with a small Feistel network and cycle
+        walking, so creating one is O(1) in time and memory regardless of the size of
+        the vocabulary, and every position can be looked up in O(1).
+
+Functions:
+    make_word_id(foreign_term: str, native_translation: str) -> str:
+        Returns the stable id of a word.
+
+    normalize_answer(text: str) -> str:
+        Returns the form of an answer that is used for comparison.
+
+    encode_word(foreign_term: str, native_translation: str, word_id: str) -> bytes:
+        Returns the JSON of a word as served by the API.
+"""
+
+import hashlib
+import json
+import sys
+import unicodedata
+from array import array
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+from app.domain.matching import allowed_typos, edit_distance, fold_answer
+from app.domain.models import AnswerMatch, Word
+
+_MASK_64 = (1 << 64) - 1
+_encode_string = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def make_word_id(foreign_term: str, native_translation: str) -> str:
+    """
+    Returns the stable id of a word.
+
+    The id is a short hash of the foreign term and the native translation, so a word
+    keeps its id across reloads and deck files.
+
+    Args:
+        foreign_term (str): The word in the foreign language.
+        native_translation (str): The translation of the word.
+
+    Returns:
+        str: The id as 16 hexadecimal characters.
+    """
+    key = f"{foreign_term}\x1f{native_translation}".encode("utf-8")
+    return hashlib.blake2b(key, digest_size=8).hexdigest()
+
+
+def encode_word(foreign_term: str, native_translation: str, word_id: str) -> bytes:
+    """
+    Returns the JSON of a word as served by the API.
+
+    The JSON equals the compact ``model_dump_json`` of the Word, so it can be sent
+    without creating and serializing a model.
+
+    Args:
+        foreign_term (str): The word in the foreign language.
+        native_translation (str): The translation of the word.
+        word_id (str): The id of the word.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON object.
+    """
+    return (
+        f'{{"foreign_term":{_encode_string(foreign_term)},'
+        f'"native_translation":{_encode_string(native_translation)},'
+        f'"id":"{word_id}"}}'
+    ).encode("utf-8")
+
+
+def normalize_answer(text: str) -> str:
+    """
+    Returns the form of an answer that is used for comparison.
+
+    Surrounding whitespace is removed, the text is case folded and brought to Unicode
+    NFC, so that differently composed accented letters compare equal.
+
+    Args:
+        text (str): The answer or the foreign term.
+
+    Returns:
+        str: The normalized answer.
+    """
+    return unicodedata.normalize("NFC", text.strip().casefold())
+
+
+def _mix(value: int) -> int:
+    """Scrambles a 64-bit integer (the splitmix64 finalizer)."""
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK_64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK_64
+    return value ^ (value >> 31)
+
+
+def _id_bytes(ids: Iterable[str]) -> bytes:
+    """Packs hexadecimal word ids into little-endian 64-bit integers."""
+    column = array("Q", (int(word_id, 16) for word_id in ids))
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+
+class FeistelPermutation(Sequence[int]):
+    """
+    A keyed pseudo-random permutation of ``range(size)``.
+
+    Attributes:
+        size (int): The number of permuted positions.
+        key (int): The key selecting the permutation. Equal keys give equal orders.
+    """
+
+    ROUNDS = 4
+
+    __slots__ = ("size", "key", "_half_bits", "_mask", "_round_keys")
+
+    def __init__(self, size: int, key: int):
+        self.size = size
+        self.key = key
+        bits = max(2, (size - 1).bit_length())
+        bits += bits & 1  # Both halves of the network need the same width
+        self._half_bits = bits // 2
+        self._mask = (1 << self._half_bits) - 1
+        self._round_keys = tuple(
+            _mix((key + round_number * 0x9E3779B97F4A7C15) & _MASK_64)
+            for round_number in range(self.ROUNDS)
+        )
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: int) -> int:  # type: ignore[override]
+        if not 0 <= index < self.size:
+            raise IndexError("permutation index out of range")
+        value = index
+        while True:
+            # Cycle walking: the network permutes a power-of-two domain of at most
+            # 4 * size values, so on average fewer than four steps land in range.
+            value = self._encrypt(value)
+            if value < self.size:
+                return value
+
+    def _encrypt(self, value: int) -> int:
+        left = value >> self._half_bits
+        right = value & self._mask
+        for round_key in self._round_keys:
+            left, right = right, left ^ (_mix(right ^ round_key) & self._mask)
+        return (left << self._half_bits) | right
+
+
+class Vocabulary:
+    """
+    An immutable, column-oriented store of words.
+
+    Attributes:
+        foreign_terms (Tuple[str, ...]): The words in the foreign language.
+        native_translations (Tuple[str, ...]): The translations in the native language.
+        ids (Tuple[str, ...]): The stable ids of the words.
+        answers (Tuple[str, ...]): The normalized foreign terms the answers are compared to.
+        folded_answers (Tuple[str, ...]): The foreign terms without diacritics, which
+            close answers are compared to.
+        json_words (Sequence[bytes]): The JSON of every word as served by the API,
+            encoded on first use.
+    """
+
+    __slots__ = (
+        "foreign_terms",
+        "native_translations",
+        "ids",
+        "answers",
+        "folded_answers",
+        "_positions",
+        "_fingerprint",
+        "_json",
+    )
+
+    def __init__(
+        self, foreign_terms: Iterable[str], native_translations: Iterable[str]
+    ):
+        """
+        Initializes the Vocabulary from two columns of equal length.
+
+        Args:
+            foreign_terms (Iterable[str]): The words in the foreign language.
+            native_translations (Iterable[str]): The translations of the words.
+
+        Raises:
+            ValueError: If the columns have a different length.
+        """
+        self.foreign_terms: Tuple[str, ...] = tuple(map(sys.intern, foreign_terms))
+        self.native_translations: Tuple[str, ...] = tuple(
+            map(sys.intern, native_translations)
+        )
+        if len(self.foreign_terms) != len(self.native_translations):
+            raise ValueError("Vocabulary columns must have the same length")
+        self.ids: Tuple[str, ...] = tuple(
+            map(make_word_id, self.foreign_terms, self.native_translations)
+        )
+        self.answers: Tuple[str, ...] = tuple(
+            sys.intern(normalize_answer(term)) for term in self.foreign_terms
+        )
+        self.folded_answers: Tuple[str, ...] = tuple(
+            sys.intern(fold_answer(term)) for term in self.foreign_terms
+        )
+        positions: Dict[str, int] = {}
+        for index, word_id in enumerate(self.ids):
+            positions.setdefault(word_id, index)
+        self._positions = positions
+        self._fingerprint: Optional[str] = None
+        self._json: Optional[Sequence[bytes]] = None
+
+    @classmethod
+    def from_words(cls, words: Iterable[Word]) -> "Vocabulary":
+        """
+        Builds a Vocabulary from Word objects.
+
+        Args:
+            words (Iterable[Word]): The words to store.
+
+        Returns:
+            Vocabulary: The vocabulary holding the words in the given order.
+        """
+        words = list(words)
+        return cls(
+            (word.foreign_term for word in words),
+            (word.native_translation for word in words),
+        )
+
+    @classmethod
+    def of(cls, words: Union["Vocabulary", Iterable[Word]]) -> "Vocabulary":
+        """
+        Returns the words as a Vocabulary.
+
+        Args:
+            words (Union[Vocabulary, Iterable[Word]]): A vocabulary, which is returned
+                unchanged, or Word objects to build a new vocabulary from.
+
+        Returns:
+            Vocabulary: The vocabulary holding the words.
+        """
+        if isinstance(words, Vocabulary):
+            return words
+        return cls.from_words(words)
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        A hash of the word ids in order, computed on first use.
+
+        Equal words in equal order give equal fingerprints in every process, so quiz
+        states stored outside the process can tell which vocabulary they belong to.
+        """
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.blake2b(
+                _id_bytes(self.ids), digest_size=16
+            ).hexdigest()
+        return self._fingerprint
+
+    @property
+    def json_words(self) -> Sequence[bytes]:
+        """The JSON of every word as served by the API, encoded on first use."""
+        if self._json is None:
+            self._json = tuple(
+                map(encode_word, self.foreign_terms, self.native_translations, self.ids)
+            )
+        return self._json
+
+    def warm(self):
+        """
+        Computes the values that are otherwise computed on first use, so the first
+        requests served with the vocabulary do not wait for them.
+        """
+        self.fingerprint
+        self.json_words
+
+    def __len__(self) -> int:
+        return len(self.foreign_terms)
+
+    def __iter__(self) -> Iterator[Word]:
+        return (self.word(index) for index in range(len(self)))
+
+    def word(self, index: int) -> Word:
+        """
+        Returns the word at the given index as a Word object.
+
+        Args:
+            index (int): The index of the word.
+
+        Returns:
+            Word: A new Word object for the stored word.
+        """
+        return Word.model_construct(
+            foreign_term=self.foreign_terms[index],
+            native_translation=self.native_translations[index],
+            id=self.ids[index],
+        )
+
+    def word_json(self, index: int) -> bytes:
+        """
+        Returns the JSON of the word at the given index, as served by the API.
+
+        Args:
+            index (int): The index of the word.
+
+        Returns:
+            bytes: The JSON encoded when the vocabulary was loaded.
+        """
+        return self.json_words[index]
+
+    def index_of(self, word_id: str) -> Optional[int]:
+        """
+        Returns the index of the word with the given id.
+
+        Args:
+            word_id (str): The id of the word.
+
+        Returns:
+            Optional[int]: The index of the word, or None if the id is unknown.
+        """
+        return self._positions.get(word_id)
+
+    def is_correct(self, index: int, user_input: str) -> bool:
+        """
+        Checks an answer against the word at the given index.
+
+        Args:
+            index (int): The index of the word.
+            user_input (str): The answer given by the user.
+
+        Returns:
+            bool: True if the normalized answer equals the normalized foreign term.
+        """
+        return self.answers[index] == normalize_answer(user_input)
+
+    def match(self, index: int, user_input: str, max_typos: int = 0) -> AnswerMatch:
+        """
+        Grades an answer against the word at the given index.
+
+        Args:
+            index (int): The index of the word.
+            user_input (str): The answer given by the user.
+            max_typos (int): How many typos a close answer may contain. With 0 only
+                exact answers are accepted.
+
+        Returns:
+            AnswerMatch: EXACT if the normalized answer equals the normalized foreign
+            term; CLOSE if typos are allowed and the folded answer is within the
+            allowed edit distance of the folded foreign term; WRONG otherwise.
+        """
+        if self.answers[index] == normalize_answer(user_input):
+            return AnswerMatch.EXACT
+        if max_typos <= 0:
+            return AnswerMatch.WRONG
+        expected = self.folded_answers[index]
+        allowed = allowed_typos(expected, max_typos)
+        if edit_distance(expected, fold_answer(user_input), allowed) <= allowed:
+            return AnswerMatch.CLOSE
+        return AnswerMatch.WRONG
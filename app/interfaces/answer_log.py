@@ -0,0 +1,483 @@
+"""
+app/interfaces/answer_log.py
+This module provides the append-only log of every graded answer.
+
+Answers are appended as JSON lines to segment files in the log folder. ``append`` only
+puts the event on a bounded queue, so grading an answer never waits for the disk. A
+writer thread wakes for the first queued event, lets more events gather for
+``commit_interval`` seconds and makes all of them durable with a single ``fsync`` (group
+commit), so the number of syncs and thread wake-ups does not grow with the request rate.
+Events are acknowledged before they are synced; a crash loses at most the events of the
+last ``commit_interval`` and the group being written.
+
+Every process writes its own segment, named after its creation time and process id, so
+the workers of one node can share the folder. The events of a segment are in answer time
+order: the writer sorts every group, and an event answered before the last event of the
+open segment, such as one put on the queue late by another thread, starts a new
+segment. A segment is written under the suffix
+``.jsonl.open`` and holds an exclusive ``flock`` while it is written. It is sealed, by
+renaming it to ``.jsonl``, once it reaches ``segment_bytes`` or the log is stopped.
+Segments left open by a crashed process are sealed by the next compaction, which finds
+their lock released.
+
+Compaction deletes the events before a retention cutoff and merges the small sealed
+segments into segments of up to ``segment_bytes``. The merged segments are synced under
+a temporary name before a journal commits the compaction; the sources are deleted only
+after that, and readers use the merged segments while the journal exists, so an
+interrupted compaction neither loses nor repeats events.
+
+Replaying merges the sorted segments in answer time order, so quiz results and sessions
+can be rebuilt from the log. A torn last line of a crashed writer is skipped.
+
+Classes:
+    - AnswerLog: Appends answer events to segment files and replays them.
+
+Functions:
+    - quiz_results: Folds answer events into the results of their quizzes.
+
+Dependencies:
+    - fcntl: Used for the locks of the open segments and of compaction.
+    - queue, threading: Used for handing events to the writer thread.
+    - app.domain.models: AnswerEvent, AnswerMatch, QuizResult.
+    - app.interfaces.metrics: The events per commit and the dropped events.
+"""
+
+import fcntl
+import heapq
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.domain.models import AnswerEvent, AnswerMatch, QuizResult
+from app.interfaces.metrics import ANSWER_LOG_COMMIT_SIZE, ANSWER_LOG_DROPPED
+
+SEGMENT_PREFIX = "answers-"
+SEALED_SUFFIX = ".jsonl"
+OPEN_SUFFIX = ".jsonl.open"
+JOURNAL_NAME = "compaction.json"
+LOCK_NAME = ".compaction.lock"
+
+_STOP = None
+
+log = logging.getLogger(__name__)
+
+
+class AnswerLog:
+    """
+    Appends answer events to segment files and replays them.
+
+    Attributes:
+    ----------
+    folder : str
+        The folder of the segment files.
+    segment_bytes : int
+        The size at which a segment is sealed and a new one is started.
+    max_queue_size : int
+        The number of events that may wait for the writer.
+    batch_size : int
+        The maximum number of events made durable by one sync.
+    commit_interval : float
+        How long the writer lets events gather before a sync, in seconds.
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        segment_bytes: int = 64 << 20,
+        max_queue_size: int = 10000,
+        batch_size: int = 1000,
+        commit_interval: float = 0.01,
+    ):
+        """
+        Initializes the AnswerLog. The writer thread is started by ``start`` or by the
+        first appended event.
+
+        Args:
+            folder (str): The folder of the segment files, created if needed.
+            segment_bytes (int): The size at which a segment is sealed.
+            max_queue_size (int): The number of events that may wait for the writer.
+            batch_size (int): The maximum number of events made durable by one sync.
+            commit_interval (float): How long events gather before a sync, in seconds.
+        """
+        self.folder = folder
+        self.segment_bytes = segment_bytes
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        os.makedirs(folder, exist_ok=True)
+        self._queue: "queue.Queue[Optional[AnswerEvent]]" = queue.Queue(
+            maxsize=max_queue_size
+        )
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._file: Optional[BinaryIO] = None
+        self._path: Optional[str] = None
+        self._size = 0
+        self._last: Optional[datetime] = None  # The last answer time in the segment
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of events waiting to be written."""
+        return self._queue.qsize()
+
+    def start(self):
+        """Starts the writer thread if it is not running."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="answer-log", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Writes every queued event, seals the open segment and stops the writer thread.
+
+        Args:
+            timeout (Optional[float]): The maximum time to wait for the writer in seconds.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def append(self, event: AnswerEvent) -> bool:
+        """
+        Queues an event for the writer thread without waiting.
+
+        Answers are graded on the event loop, so a full queue never blocks the caller:
+        when the writer falls that far behind, the event is dropped and counted in
+        ``dropped`` and ``vocabvoyage_answer_log_dropped_total``.
+
+        Args:
+            event (AnswerEvent): The graded answer.
+
+        Returns:
+            bool: False if the event was dropped.
+        """
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            ANSWER_LOG_DROPPED.inc()
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                log.warning(
+                    "The answer log queue is full; %d events dropped", self.dropped
+                )
+            return False
+        return True
+
+    def flush(self):
+        """Waits until every event appended so far is written and synced."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _run(self):
+        while True:
+            batch: List[Optional[AnswerEvent]] = [self._queue.get()]
+            if batch[0] is not _STOP and self.commit_interval > 0:
+                time.sleep(self.commit_interval)
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = _STOP in batch
+            events = [event for event in batch if event is not _STOP]
+            try:
+                if events:
+                    self._commit(events)
+                if stopping:
+                    self._seal()
+            except Exception:
+                # The writer keeps running, so flush() and stop() still return
+                log.exception("Could not write the answer events")
+            for _ in batch:
+                self._queue.task_done()
+            if stopping:
+                return
+
+    def _commit(self, events: List[AnswerEvent]):
+        """
+        Appends events to the open segment and syncs them to disk once. The events are
+        sorted by answer time; a new segment is started if the first of them was
+        answered before the last event of the open segment, so every segment is sorted.
+        """
+        events = sorted(events, key=_answered_at)
+        data = b"".join(event.model_dump_json().encode() + b"\n" for event in events)
+        if self._file is not None and (
+            self._size >= self.segment_bytes or events[0].answered_at < self._last
+        ):
+            self._seal()
+        if self._file is None:
+            self._open_segment()
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._size += len(data)
+        self._last = events[-1].answered_at
+        ANSWER_LOG_COMMIT_SIZE.observe(len(events))
+
+    def _open_segment(self):
+        name = f"{SEGMENT_PREFIX}{time.time_ns():020d}-{os.getpid()}{OPEN_SUFFIX}"
+        self._path = os.path.join(self.folder, name)
+        self._file = open(self._path, "xb")
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        self._size = 0
+        self._sync_folder()
+
+    def _seal(self):
+        if self._file is None:
+            return
+        # Renamed while the lock is held, so compaction does not take it as abandoned
+        os.replace(self._path, self._path[: -len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+        self._file.close()
+        self._sync_folder()
+        self._file = None
+        self._path = None
+        self._last = None
+
+    def _sync_folder(self):
+        descriptor = os.open(self.folder, os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
+    def segments(self) -> List[str]:
+        """
+        Returns the paths of the segments to read, sealed and open.
+
+        While a compaction is being completed, its merged segments are returned in
+        place of its sources.
+
+        Returns:
+            List[str]: The segment paths in name order.
+        """
+        paths = self._segment_paths(SEALED_SUFFIX, OPEN_SUFFIX)
+        journal = self._read_journal()
+        if journal is None:
+            return paths
+        merged = [
+            path if os.path.exists(path) else path + ".tmp"
+            for path in journal["outputs"]
+        ]
+        superseded = set(journal["sources"]) | set(journal["outputs"])
+        return sorted([path for path in paths if path not in superseded] + merged)
+
+    def _segment_paths(self, *suffixes: str) -> List[str]:
+        return [
+            os.path.join(self.folder, name)
+            for name in sorted(os.listdir(self.folder))
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(suffixes)
+        ]
+
+    def replay(self, since: Optional[datetime] = None) -> Iterator[AnswerEvent]:
+        """
+        Yields the logged events in answer time order.
+
+        Events still queued in this process are not included; call ``flush`` first to
+        include them.
+
+        Args:
+            since (Optional[datetime]): Only yield events answered at or after this
+                time. Segments last written before it are not read.
+
+        Yields:
+            AnswerEvent: The logged events.
+        """
+        paths = self.segments()
+        if since is not None:
+            cutoff = since.timestamp()
+            paths = [path for path in paths if _modified(path) >= cutoff]
+        events = heapq.merge(*(self._read(path) for path in paths), key=_answered_at)
+        for event in events:
+            if since is None or event.answered_at >= since:
+                yield event
+
+    def _read(self, path: str) -> Iterator[AnswerEvent]:
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            return  # Compacted in the meantime
+        with file:
+            for number, line in enumerate(file, 1):
+                try:
+                    yield AnswerEvent.model_validate_json(line)
+                except ValidationError:
+                    log.warning("Skipping unreadable event at %s:%d", path, number)
+
+    def compact(self, before: Optional[datetime] = None) -> int:
+        """
+        Seals abandoned segments, drops old events and merges small sealed segments.
+
+        Compaction is skipped if another process is compacting the folder.
+
+        Args:
+            before (Optional[datetime]): Drop the events answered before this time;
+                keep every event if None.
+
+        Returns:
+            int: The number of segments merged or deleted.
+        """
+        with open(os.path.join(self.folder, LOCK_NAME), "ab") as lock:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+            self._finish_compaction()
+            self._seal_abandoned()
+            sealed = self._segment_paths(SEALED_SUFFIX)
+            removed = 0
+            if before is not None:
+                cutoff = before.timestamp()
+                for path in [path for path in sealed if _modified(path) < cutoff]:
+                    os.remove(path)
+                    sealed.remove(path)
+                    removed += 1
+            small = [
+                path for path in sealed if os.path.getsize(path) < self.segment_bytes
+            ]
+            if len(small) > 1 or (small and before is not None):
+                self._merge(small, before)
+                removed += len(small)
+            if removed:
+                self._sync_folder()
+            return removed
+
+    def _seal_abandoned(self):
+        """Seals the open segments whose writer no longer holds their lock."""
+        for path in self._segment_paths(OPEN_SUFFIX):
+            with open(path, "rb") as file:
+                try:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # Still written by a running process
+                os.replace(path, path[: -len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+
+    def _merge(self, sources: List[str], before: Optional[datetime]):
+        """
+        Merges segments into new ones. The merged segments are written and synced
+        under a temporary name first; the journal then commits the compaction, which is
+        completed by publishing them and deleting the sources.
+        """
+        events = heapq.merge(*(self._read(path) for path in sources), key=_answered_at)
+        outputs: List[str] = []
+        output: Optional[BinaryIO] = None
+        size = 0
+        for event in events:
+            if before is not None and event.answered_at < before:
+                continue
+            line = event.model_dump_json().encode() + b"\n"
+            if output is None or size >= self.segment_bytes:
+                if output is not None:
+                    _close_synced(output)
+                name = f"{SEGMENT_PREFIX}{time.time_ns():020d}-{os.getpid()}"
+                outputs.append(os.path.join(self.folder, name + SEALED_SUFFIX))
+                output = open(outputs[-1] + ".tmp", "xb")
+                size = 0
+            output.write(line)
+            size += len(line)
+        if output is not None:
+            _close_synced(output)
+        self._write_journal({"sources": sources, "outputs": outputs})
+        self._finish_compaction()
+
+    def _finish_compaction(self):
+        """
+        Completes a committed compaction and removes the files of an uncommitted one.
+        """
+        journal = self._read_journal()
+        if journal is not None:
+            for path in journal["outputs"]:
+                if os.path.exists(path + ".tmp"):
+                    os.replace(path + ".tmp", path)
+            for path in journal["sources"]:
+                if os.path.exists(path):
+                    os.remove(path)
+            self._sync_folder()
+            os.remove(os.path.join(self.folder, JOURNAL_NAME))
+        for path in self._segment_paths(".tmp"):
+            os.remove(path)  # Written by a compaction that did not commit
+
+    def _read_journal(self) -> Optional[dict]:
+        try:
+            with open(
+                os.path.join(self.folder, JOURNAL_NAME), encoding="utf-8"
+            ) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def _write_journal(self, journal: dict):
+        path = os.path.join(self.folder, JOURNAL_NAME)
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(journal, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
+        self._sync_folder()
+
+
+def _answered_at(event: AnswerEvent) -> datetime:
+    return event.answered_at
+
+
+def _modified(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0.0
+
+
+def _close_synced(file: BinaryIO):
+    file.flush()
+    os.fsync(file.fileno())
+    file.close()
+
+
+def quiz_results(events: Iterable[AnswerEvent]) -> List[QuizResult]:
+    """
+    Folds answer events into the results of their quizzes.
+
+    A quiz is identified by its session and start time and ends with its last answer,
+    so quizzes that were never ended are included. Like ``WordService.end_quiz``, every
+    answered term is listed once.
+
+    Args:
+        events (Iterable[AnswerEvent]): The events, for example from ``replay``.
+
+    Returns:
+        List[QuizResult]: One result per quiz, in the order the quizzes ended.
+    """
+    quizzes: Dict[Tuple[Optional[str], datetime], List[AnswerEvent]] = {}
+    for event in events:
+        quizzes.setdefault((event.session_id, event.quiz_start), []).append(event)
+    results = []
+    for (_, start_time), answers in quizzes.items():
+        correct = [event for event in answers if event.match is not AnswerMatch.WRONG]
+        incorrect = [event for event in answers if event.match is AnswerMatch.WRONG]
+        results.append(
+            QuizResult(
+                correct=len(correct),
+                incorrect=len(incorrect),
+                correct_words=list(dict.fromkeys(e.foreign_term for e in correct)),
+                incorrect_words=list(dict.fromkeys(e.foreign_term for e in incorrect)),
+                start_time=start_time,
+                end_time=max(event.answered_at for event in answers),
+                deck=answers[0].deck,
+            )
+        )
+    results.sort(key=lambda result: result.end_time)
+    return results
@@ -0,0 +1,278 @@
+"""
+app/interfaces/deck_format.py
+This module provides the compiled binary deck format and its memory-mapped reader.
+
+A compiled deck holds the same columns as a Vocabulary: the foreign terms, the native
+translations, the normalized and the folded answers, the word ids and the JSON of every
+word as served by the API, so words are sent without being serialized per request. It
+is written once, when the words
+are loaded from CSV, and opened with ``mmap`` afterwards. Opening a deck reads only the
+header; strings are decoded straight from the mapped pages when a word is accessed, so
+neither the start-up time nor the resident memory of the process grows with the size of
+the deck.
+
+File layout (little-endian, every section starts at a multiple of 8 bytes):
+
+    header          magic ``VVDECK`` + version (8 bytes), word count (u64)
+    offsets         5 * (count + 1) u64: start offsets of the foreign terms, the native
+                    translations, the answers, the folded answers and the word JSON in
+                    the string table, each followed by the end offset of its last string
+    ids             count u64: the word ids in word order
+    id index        count u64 ids in ascending order, then count u64 word positions
+    string table    the UTF-8 encoded strings
+
+Classes:
+    - MappedVocabulary: A Vocabulary backed by a memory-mapped compiled deck.
+
+Functions:
+    - compile_deck(path, foreign_terms, native_translations): Writes a compiled deck.
+
+Dependencies:
+    - mmap: Used for mapping the deck file into memory.
+    - array, struct: Used for writing and reading the fixed-width sections.
+    - app.domain.vocabulary: The Vocabulary interface and the id and answer functions.
+"""
+
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Iterable, Optional, Sequence
+
+from app.domain.matching import fold_answer
+from app.domain.vocabulary import (
+    Vocabulary,
+    encode_word,
+    make_word_id,
+    normalize_answer,
+)
+
+MAGIC = b"VVDECK\x00\x03"
+_HEADER = struct.Struct("<8sQ")
+
+
+def _u64_array(values: Iterable[int]) -> bytes:
+    column = array("Q", values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column.tobytes()
+
+
+def compile_deck(
+    path: str,
+    foreign_terms: Sequence[str],
+    native_translations: Sequence[str],
+    word_ids: Optional[Sequence[str]] = None,
+) -> None:
+    """
+    Writes the words to a compiled deck file.
+
+    The file is written next to its destination and renamed into place, so readers
+    never see a partially written deck.
+
+    Args:
+        path (str): The path of the deck file.
+        foreign_terms (Sequence[str]): The words in the foreign language.
+        native_translations (Sequence[str]): The translations of the words.
+        word_ids (Optional[Sequence[str]]): The ids of the words if they were already
+            computed with ``make_word_id``.
+
+    Raises:
+        ValueError: If the columns have a different length.
+    """
+    if len(foreign_terms) != len(native_translations):
+        raise ValueError("Deck columns must have the same length")
+    count = len(foreign_terms)
+    if word_ids is None:
+        word_ids = list(map(make_word_id, foreign_terms, native_translations))
+    strings = bytearray()
+    offsets = []
+    for column in (
+        (term.encode("utf-8") for term in foreign_terms),
+        (translation.encode("utf-8") for translation in native_translations),
+        (normalize_answer(term).encode("utf-8") for term in foreign_terms),
+        (fold_answer(term).encode("utf-8") for term in foreign_terms),
+        map(encode_word, foreign_terms, native_translations, word_ids),
+    ):
+        for data in column:
+            offsets.append(len(strings))
+            strings += data
+        offsets.append(len(strings))
+    ids = [int(word_id, 16) for word_id in word_ids]
+    index = sorted(range(count), key=ids.__getitem__)
+
+    temporary_path = f"{path}.tmp-{os.getpid()}"
+    with open(temporary_path, "wb") as deck:
+        deck.write(_HEADER.pack(MAGIC, count))
+        deck.write(_u64_array(offsets))
+        deck.write(_u64_array(ids))
+        deck.write(_u64_array(ids[position] for position in index))
+        deck.write(_u64_array(index))
+        deck.write(strings)
+    os.replace(temporary_path, path)
+
+
+class _StringColumn(Sequence[str]):
+    """A column of strings decoded on access from the mapped string table."""
+
+    __slots__ = ("_offsets", "_strings")
+
+    def __init__(self, offsets: memoryview, strings: memoryview):
+        self._offsets = offsets
+        self._strings = strings
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:  # type: ignore[override]
+        if not 0 <= index < len(self):
+            raise IndexError("word index out of range")
+        return str(
+            self._strings[self._offsets[index] : self._offsets[index + 1]], "utf-8"
+        )
+
+
+class _BytesColumn(Sequence[bytes]):
+    """A column of byte strings copied on access from the mapped string table."""
+
+    __slots__ = ("_offsets", "_strings")
+
+    def __init__(self, offsets: memoryview, strings: memoryview):
+        self._offsets = offsets
+        self._strings = strings
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> bytes:  # type: ignore[override]
+        if not 0 <= index < len(self):
+            raise IndexError("word index out of range")
+        return self._strings[self._offsets[index] : self._offsets[index + 1]].tobytes()
+
+
+class _IdColumn(Sequence[str]):
+    """A column of word ids formatted on access from the mapped id array."""
+
+    __slots__ = ("_ids",)
+
+    def __init__(self, ids: memoryview):
+        self._ids = ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, index: int) -> str:  # type: ignore[override]
+        return f"{self._ids[index]:016x}"
+
+
+class MappedVocabulary(Vocabulary):
+    """
+    A Vocabulary backed by a memory-mapped compiled deck.
+
+    Attributes:
+        path (str): The path of the deck file.
+        foreign_terms (Sequence[str]): The words in the foreign language.
+        native_translations (Sequence[str]): The translations in the native language.
+        ids (Sequence[str]): The stable ids of the words.
+        answers (Sequence[str]): The normalized foreign terms the answers are compared to.
+        folded_answers (Sequence[str]): The foreign terms without diacritics.
+        json_words (Sequence[bytes]): The JSON of every word as served by the API.
+        nbytes (int): The size of the mapped deck file in bytes.
+    """
+
+    __slots__ = ("path", "_map", "_views", "_index_ids", "_index_positions")
+
+    def __init__(self, path: str):
+        """
+        Opens a compiled deck.
+
+        Args:
+            path (str): The path of the deck file.
+
+        Raises:
+            ValueError: If the file is not a compiled deck of a supported version.
+        """
+        self.path = path
+        with open(path, "rb") as deck:
+            size = os.fstat(deck.fileno()).st_size
+            if size < _HEADER.size:
+                raise ValueError(f"{path} is not a compiled deck")
+            self._map = mmap.mmap(deck.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or sys.byteorder == "big":
+            self._map.close()
+            raise ValueError(f"{path} is not a supported compiled deck")
+
+        view = memoryview(self._map)
+        position = _HEADER.size
+        sections = []
+        for length in (5 * (count + 1), count, count, count):
+            end = position + 8 * length
+            sections.append(view[position:end].cast("Q"))
+            position = end
+        offsets, ids, self._index_ids, self._index_positions = sections
+        strings = view[position:]
+        step = count + 1
+        columns = [offsets[start : start + step] for start in range(0, 5 * step, step)]
+        self._views = [view, strings, *sections, *columns]
+
+        self.foreign_terms = _StringColumn(columns[0], strings)
+        self.native_translations = _StringColumn(columns[1], strings)
+        self.answers = _StringColumn(columns[2], strings)
+        self.folded_answers = _StringColumn(columns[3], strings)
+        self.ids = _IdColumn(ids)
+        self._json = _BytesColumn(columns[4], strings)
+        self._fingerprint = None
+
+    @property
+    def nbytes(self) -> int:
+        """The size of the mapped deck file in bytes."""
+        return len(self._map)
+
+    @property
+    def fingerprint(self) -> str:
+        """A hash of the word ids in order, equal to the one of a Vocabulary."""
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.blake2b(
+                self.ids._ids, digest_size=16
+            ).hexdigest()
+        return self._fingerprint
+
+    def warm(self):
+        """
+        Asks the kernel to read the whole deck ahead and hashes the ids, so the first
+        requests served with the deck do not wait for page faults.
+        """
+        if hasattr(mmap, "MADV_WILLNEED"):
+            self._map.madvise(mmap.MADV_WILLNEED)
+        super().warm()
+
+    def index_of(self, word_id: str) -> Optional[int]:
+        """
+        Returns the index of the word with the given id.
+
+        The id is looked up with a binary search in the sorted id index of the deck.
+
+        Args:
+            word_id (str): The id of the word.
+
+        Returns:
+            Optional[int]: The index of the word, or None if the id is unknown.
+        """
+        try:
+            key = int(word_id, 16)
+        except ValueError:
+            return None
+        found = bisect.bisect_left(self._index_ids, key)
+        if found < len(self._index_ids) and self._index_ids[found] == key:
+            return self._index_positions[found]
+        return None
+
+    def close(self):
+        """Releases the mapping. The vocabulary must not be used afterwards."""
+        for view in reversed(self._views):
+            view.release()
+        self._map.close()
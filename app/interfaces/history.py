@@ -0,0 +1,236 @@
+"""
+app/interfaces/history.py
+This module provides the indexed store of quiz results and their aggregates.
+
+Every finished quiz is stored in a SQLite database together with its answered words.
+Aggregates per word and day and per day are updated in the same transaction as the
+result is stored, so statistics such as the most missed words of a month are read from
+the aggregate tables and never rescan the history. The database runs in WAL mode, so the
+worker processes of one node can write results and read statistics at the same time.
+
+A word counts once per quiz: as missed if it was answered incorrectly at least once in
+the quiz, and as correct otherwise.
+
+Classes:
+    - QuizHistoryStore: Stores quiz results and answers statistics from aggregates.
+
+Dependencies:
+    - sqlite3: Used for the database.
+    - threading: Used for the per-thread connections.
+    - app.domain.models.QuizResult: The stored quiz result.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+from app.domain.models import QuizResult
+
+
+class QuizHistoryStore:
+    """
+    Stores quiz results and answers statistics from aggregates.
+
+    Attributes:
+    ----------
+    path : str
+        The path of the database file.
+    """
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS quiz_result ("
+        " id INTEGER PRIMARY KEY,"
+        " deck TEXT,"
+        " start_time TEXT NOT NULL,"
+        " end_time TEXT NOT NULL,"
+        " correct INTEGER NOT NULL,"
+        " incorrect INTEGER NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS quiz_result_end_time ON quiz_result (end_time)",
+        "CREATE TABLE IF NOT EXISTS quiz_result_word ("
+        " result_id INTEGER NOT NULL REFERENCES quiz_result (id),"
+        " word TEXT NOT NULL,"
+        " correct INTEGER NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS quiz_result_word_result"
+        " ON quiz_result_word (result_id)",
+        "CREATE TABLE IF NOT EXISTS daily_stats ("
+        " day TEXT PRIMARY KEY,"
+        " quizzes INTEGER NOT NULL,"
+        " correct INTEGER NOT NULL,"
+        " incorrect INTEGER NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS word_daily_stats ("
+        " day TEXT NOT NULL,"
+        " word TEXT NOT NULL,"
+        " correct INTEGER NOT NULL,"
+        " incorrect INTEGER NOT NULL,"
+        " PRIMARY KEY (day, word))",
+    )
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        """
+        Opens the database and creates its tables if needed.
+
+        Args:
+            path (str): The path of the database file.
+            busy_timeout (float): How long a statement waits for a lock in seconds.
+        """
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        for statement in self._SCHEMA:
+            connection.execute(statement)
+
+    def record(self, results: Iterable[QuizResult]):
+        """
+        Stores quiz results and adds them to the aggregates in one transaction.
+
+        Args:
+            results (Iterable[QuizResult]): The finished quizzes.
+        """
+        connection = self._connection()
+        # The connection is in autocommit mode, so the transaction is explicit
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for result in results:
+                self._record(connection, result)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _record(self, connection: sqlite3.Connection, result: QuizResult):
+        day = result.end_time.date().isoformat()
+        missed = set(result.incorrect_words)
+        words = [(word, 0) for word in sorted(missed)] + [
+            (word, 1) for word in sorted(set(result.correct_words) - missed)
+        ]
+        result_id = connection.execute(
+            "INSERT INTO quiz_result (deck, start_time, end_time, correct, incorrect)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (
+                result.deck,
+                result.start_time.isoformat(),
+                result.end_time.isoformat(),
+                result.correct,
+                result.incorrect,
+            ),
+        ).lastrowid
+        connection.executemany(
+            "INSERT INTO quiz_result_word (result_id, word, correct) VALUES (?, ?, ?)",
+            [(result_id, word, correct) for word, correct in words],
+        )
+        connection.execute(
+            "INSERT INTO daily_stats (day, quizzes, correct, incorrect)"
+            " VALUES (?, 1, ?, ?) ON CONFLICT (day) DO UPDATE SET"
+            " quizzes = quizzes + 1,"
+            " correct = correct + excluded.correct,"
+            " incorrect = incorrect + excluded.incorrect",
+            (day, result.correct, result.incorrect),
+        )
+        connection.executemany(
+            "INSERT INTO word_daily_stats (day, word, correct, incorrect)"
+            " VALUES (?, ?, ?, ?) ON CONFLICT (day, word) DO UPDATE SET"
+            " correct = correct + excluded.correct,"
+            " incorrect = incorrect + excluded.incorrect",
+            [(day, word, correct, 1 - correct) for word, correct in words],
+        )
+
+    def word_stats(
+        self,
+        since: Optional[date] = None,
+        until: Optional[date] = None,
+        limit: int = 20,
+    ) -> List[Dict[str, object]]:
+        """
+        Returns the most missed words of a period.
+
+        Args:
+            since (Optional[date]): The first day of the period; unbounded if None.
+            until (Optional[date]): The last day of the period; unbounded if None.
+            limit (int): The number of words returned.
+
+        Returns:
+            List[Dict[str, object]]: The words with the number of quizzes in which they
+            were missed and answered correctly, most missed first.
+        """
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT word, SUM(incorrect) AS missed, SUM(correct)"
+                " FROM word_daily_stats WHERE day >= ? AND day <= ?"
+                " GROUP BY word HAVING missed > 0"
+                " ORDER BY missed DESC, word LIMIT ?",
+                (*self._period(since, until), limit),
+            )
+            .fetchall()
+        )
+        return [
+            {"word": word, "incorrect": incorrect, "correct": correct}
+            for word, incorrect, correct in rows
+        ]
+
+    def daily_stats(
+        self, since: Optional[date] = None, until: Optional[date] = None
+    ) -> List[Dict[str, object]]:
+        """
+        Returns the number of quizzes and answers of every day in a period.
+
+        Args:
+            since (Optional[date]): The first day of the period; unbounded if None.
+            until (Optional[date]): The last day of the period; unbounded if None.
+
+        Returns:
+            List[Dict[str, object]]: One entry per day with quizzes, in day order.
+        """
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT day, quizzes, correct, incorrect FROM daily_stats"
+                " WHERE day >= ? AND day <= ? ORDER BY day",
+                self._period(since, until),
+            )
+            .fetchall()
+        )
+        return [
+            {"day": day, "quizzes": quizzes, "correct": correct, "incorrect": incorrect}
+            for day, quizzes, correct, incorrect in rows
+        ]
+
+    @staticmethod
+    def _period(since: Optional[date], until: Optional[date]):
+        # ISO dates sort like the days they name
+        return (
+            since.isoformat() if since is not None else "",
+            until.isoformat() if until is not None else "9999-12-31",
+        )
+
+    def close(self):
+        """Closes the connections of all threads."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
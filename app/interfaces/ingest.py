@@ -0,0 +1,442 @@
+"""
+app/interfaces/ingest.py
+This module provides the streaming ingest pipeline for uploaded word files.
+
+Uploaded files are handed over in chunks while the upload is still being read. A worker
+thread per upload writes the chunks to a staging folder and parses CSV rows as the bytes
+arrive, so the event loop never blocks on disk or parsing and the memory held for the
+upload is bounded by the chunk queue. When all files are parsed, the staged files are
+published as the new version of the word files of the data folder, or of the folder of a
+named deck bundle, and the parsed words are handed to a callback, without parsing the
+files a second time. Publishing moves the staging folder into the ``.versions`` of the
+folder and swaps its ``.current`` link to it with one rename, so a reader never sees a
+mix of old and new files. Each upload is tracked by an IngestJob that can be polled for
+progress.
+
+The MultipartReader splits a ``multipart/form-data`` request body into its files and
+fields while the body is being received, so an upload is handed to its job without
+buffering the body first.
+
+Classes:
+    - MultipartReader: Splits a multipart/form-data body into parts as it arrives.
+    - IngestJob: Tracks a single upload and feeds its chunks to the worker thread.
+    - IngestPipeline: Starts ingest jobs and keeps the most recent ones for polling.
+
+Dependencies:
+    - python_multipart: Used for parsing the multipart request body incrementally.
+    - threading, queue: Used for running the worker threads and passing chunks to them.
+    - app.domain.vocabulary.Vocabulary: The vocabulary built from the parsed rows.
+    - app.domain.models.IngestReport: The report of the rows of an upload.
+    - app.interfaces.parallel_csv.RowParser: Parses the rows of a file as they arrive.
+    - app.interfaces.repositories: The links and folders of the published versions, and
+      the words built from the parsed rows like a load builds them.
+"""
+
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Tuple
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from app.domain.models import IngestReport
+from app.domain.vocabulary import Vocabulary
+from app.interfaces.parallel_csv import RowParser
+from app.interfaces.repositories import CURRENT_LINK, VERSIONS_FOLDER, bulk_vocabulary
+
+_END_OF_UPLOAD = None
+
+log = logging.getLogger(__name__)
+
+
+class IngestStatus(str, Enum):
+    """
+    Enum representing the states of an ingest job.
+    Attributes:
+        PENDING (str): Chunks are being received.
+        DONE (str): All files were parsed and the word list was updated.
+        FAILED (str): The upload could not be processed; the data folder is unchanged.
+    """
+
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class MultipartReader:
+    """
+    Splits a multipart/form-data body into its parts while the body arrives.
+
+    ``feed`` returns the pieces of the parts found in a chunk as ``(part, name,
+    filename, data)`` tuples: the number of the part counted from 0, the form field
+    name, the file name or None for a plain field, and the bytes. A part may be split
+    into several pieces, which follow each other; every part starts with a piece,
+    possibly empty, so empty files are seen too.
+    """
+
+    def __init__(self, boundary: bytes):
+        self.parts = 0
+        self._pieces: List[Tuple[int, str, Optional[str], bytes]] = []
+        self._header_name = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._name = ""
+        self._filename: Optional[str] = None
+        self._complete = False
+        self._parser = MultipartParser(
+            boundary,
+            {
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_end": self._on_end,
+            },
+        )
+
+    def feed(self, chunk: bytes) -> List[Tuple[int, str, Optional[str], bytes]]:
+        """
+        Parses the next chunk of the body.
+
+        Args:
+            chunk (bytes): The next bytes of the body.
+
+        Raises:
+            ValueError: If the body is not valid multipart data.
+
+        Returns:
+            List[Tuple[int, str, Optional[str], bytes]]: The pieces of the parts in
+            the chunk.
+        """
+        self._parser.write(chunk)
+        pieces, self._pieces = self._pieces, []
+        return pieces
+
+    def close(self):
+        """
+        Checks that the body ended with the closing boundary.
+
+        Raises:
+            ValueError: If the body ended early.
+        """
+        if not self._complete:
+            raise ValueError("The multipart body ended early")
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition"))
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        self._filename = (
+            None if filename is None else filename.decode("utf-8", "replace")
+        )
+        self._pieces.append((self.parts, self._name, self._filename, b""))
+        self.parts += 1
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        self._pieces.append(
+            (self.parts - 1, self._name, self._filename, data[start:end])
+        )
+
+    def _on_end(self):
+        self._complete = True
+
+
+class IngestJob:
+    """
+    Tracks a single upload and feeds its chunks to the worker thread.
+
+    Attributes:
+    ----------
+    id : str
+        The identifier used to poll the job.
+    filenames : List[str]
+        The names of the uploaded files.
+    deck_id : Optional[str]
+        The deck bundle the files are uploaded to, or None for the data folder itself.
+    status : IngestStatus
+        The current state of the job.
+    bytes_received : int
+        The number of bytes handed to the job so far.
+    rows_parsed : int
+        The number of CSV rows parsed so far, without blank lines.
+    words_loaded : int
+        The number of rows with at least two columns, which become words.
+    report : Optional[IngestReport]
+        The skipped and duplicate rows of the files, once all of them are parsed.
+    error : Optional[str]
+        The reason of a failure.
+    """
+
+    def __init__(
+        self,
+        filenames: List[str],
+        max_pending_chunks: int,
+        deck_id: Optional[str] = None,
+    ):
+        self.id = uuid.uuid4().hex
+        self.filenames = filenames
+        self.deck_id = deck_id
+        self.status = IngestStatus.PENDING
+        self.bytes_received = 0
+        self.rows_parsed = 0
+        self.words_loaded = 0
+        self.report: Optional[IngestReport] = None
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._finished = threading.Event()
+        self._chunks: "queue.Queue[Optional[Tuple[str, bytes]]]" = queue.Queue(
+            maxsize=max_pending_chunks
+        )
+
+    def put(self, filename: str, chunk: bytes):
+        """
+        Hands the next chunk of a file to the worker thread. A file that is not among
+        the ``filenames`` of the job is added to them.
+
+        Blocks while the chunk queue is full, so call it from a worker thread (for
+        example through ``run_in_threadpool``) and not on the event loop.
+
+        Args:
+            filename (str): The name of the file the chunk belongs to.
+            chunk (bytes): The bytes of the chunk.
+        """
+        if filename not in self.filenames:
+            self.filenames.append(filename)
+        self.bytes_received += len(chunk)
+        self._chunks.put((filename, chunk))
+
+    def finish(self):
+        """Signals that all chunks have been handed over. Blocks like ``put``."""
+        self._chunks.put(_END_OF_UPLOAD)
+
+    def abort(self, reason: str):
+        """Fails the job, for example when the upload was interrupted. Blocks like ``put``."""
+        self.error = reason
+        self.finish()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until the job is done or failed.
+
+        Args:
+            timeout (Optional[float]): The maximum time to wait in seconds.
+
+        Returns:
+            bool: True if the job has finished.
+        """
+        return self._finished.wait(timeout)
+
+    def _take(self) -> Optional[Tuple[str, bytes]]:
+        return self._chunks.get()
+
+    def progress(self) -> Dict[str, object]:
+        """
+        Returns the progress of the job.
+
+        Returns:
+            Dict[str, object]: The job id, status, counters, the report of a parsed
+            upload and the error, if any.
+        """
+        return {
+            "job_id": self.id,
+            "status": self.status.value,
+            "files": self.filenames,
+            "deck_id": self.deck_id,
+            "bytes_received": self.bytes_received,
+            "rows_parsed": self.rows_parsed,
+            "words_loaded": self.words_loaded,
+            "report": None if self.report is None else self.report.model_dump(),
+            "error": self.error,
+        }
+
+
+class IngestPipeline:
+    """
+    Starts ingest jobs and keeps the most recent ones for polling.
+
+    Attributes:
+    ----------
+    data_folder : str
+        The folder whose CSV files are replaced by the uploaded files.
+    on_complete : Callable[[Vocabulary], None]
+        Called from the worker thread with the words of a successful upload.
+    on_deck_complete : Optional[Callable[[str, Vocabulary], None]]
+        Called from the worker thread with the deck id and the words of a successful
+        upload to a deck bundle.
+    max_pending_chunks : int
+        How many chunks an upload may queue before ``IngestJob.put`` blocks.
+    max_jobs : int
+        How many jobs are kept for polling.
+    """
+
+    def __init__(
+        self,
+        data_folder: str,
+        on_complete: Callable[[Vocabulary], None],
+        max_pending_chunks: int = 16,
+        max_jobs: int = 100,
+        on_deck_complete: Optional[Callable[[str, Vocabulary], None]] = None,
+    ):
+        self.data_folder = data_folder
+        self.on_complete = on_complete
+        self.on_deck_complete = on_deck_complete
+        self.max_pending_chunks = max_pending_chunks
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+
+    def start(self, filenames: List[str], deck_id: Optional[str] = None) -> IngestJob:
+        """
+        Starts a job for an upload of the given files.
+
+        Args:
+            filenames (List[str]): The names of the uploaded files, in upload order.
+            deck_id (Optional[str]): The deck bundle whose files are replaced, or None
+                to replace the files of the data folder. The id must be a valid folder
+                name; the bundle is created if needed.
+
+        Returns:
+            IngestJob: The job to feed the chunks of the files to.
+        """
+        job = IngestJob(filenames, self.max_pending_chunks, deck_id)
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        worker = threading.Thread(
+            target=self._run, args=(job,), name=f"ingest-{job.id}", daemon=True
+        )
+        worker.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        """
+        Returns a job by its id.
+
+        Args:
+            job_id (str): The id of the job.
+
+        Returns:
+            Optional[IngestJob]: The job, or None if it is unknown or was dropped.
+        """
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: IngestJob):
+        staging_folder = os.path.join(self.data_folder, f".ingest-{job.id}")
+        os.makedirs(staging_folder, exist_ok=True)
+        parsers: Dict[str, RowParser] = {}
+        outputs = {}
+        try:
+            while True:
+                message = job._take()
+                if message is _END_OF_UPLOAD:
+                    break
+                if job.error is not None:
+                    continue  # Drain the queue so the uploader is not blocked
+                filename, chunk = message
+                try:
+                    if filename not in parsers:
+                        parsers[filename] = RowParser()
+                        outputs[filename] = open(
+                            os.path.join(staging_folder, filename), "wb"
+                        )
+                    outputs[filename].write(chunk)
+                    parsers[filename].feed(chunk)
+                    self._count(job, parsers)
+                except Exception as error:
+                    # Failing the job, the queue is still drained below
+                    job.error = f"{filename}: {error}"
+            if job.error is None:
+                parsed = {}
+                for filename, parser in parsers.items():
+                    outputs[filename].close()
+                    try:
+                        parsed[filename] = parser.close()
+                    except UnicodeDecodeError as error:
+                        raise ValueError(f"{filename}: {error}") from None
+                self._count(job, parsers)
+                # In the order and with the rules of a load of the published files
+                vocabulary, job.report = bulk_vocabulary(staging_folder, parsed)
+                if job.deck_id is None:
+                    self._commit(self.data_folder, staging_folder, job.id)
+                    self.on_complete(vocabulary)
+                else:
+                    deck_folder = os.path.join(self.data_folder, job.deck_id)
+                    self._commit(deck_folder, staging_folder, job.id)
+                    if self.on_deck_complete is not None:
+                        self.on_deck_complete(job.deck_id, vocabulary)
+                job.status = IngestStatus.DONE
+        except Exception as error:
+            # Also a failure of the callbacks, which must not leave the job without error
+            log.exception("Could not ingest the upload %s", job.id)
+            job.error = str(error) or type(error).__name__
+        finally:
+            for output in outputs.values():
+                output.close()
+            shutil.rmtree(staging_folder, ignore_errors=True)
+            if job.status is not IngestStatus.DONE:
+                job.status = IngestStatus.FAILED
+            job.finished_at = time.time()
+            job._finished.set()
+
+    @staticmethod
+    def _count(job: IngestJob, parsers: Dict[str, RowParser]):
+        job.rows_parsed = sum(parser.rows for parser in parsers.values())
+        job.words_loaded = sum(parser.words for parser in parsers.values())
+
+    def _commit(self, folder: str, staging_folder: str, version: str):
+        """
+        Publishes the staged files as the current version of the word files of a folder.
+
+        The staging folder becomes the version folder with one rename, and the
+        ``.current`` link of the folder is swapped to it with another, so readers
+        resolve either the previous version or the new one. A deck folder that does not
+        exist yet is prepared under a temporary name and renamed into place, so it
+        never appears without files. The previous version is kept for readers that
+        resolved it just before the swap; older versions are removed.
+        """
+        with self._commit_lock:
+            target = folder
+            if not os.path.isdir(folder):
+                folder = os.path.join(self.data_folder, f".new-{version}")
+                os.makedirs(folder)
+            versions = os.path.join(folder, VERSIONS_FOLDER)
+            os.makedirs(versions, exist_ok=True)
+            os.rename(staging_folder, os.path.join(versions, version))
+            link = os.path.join(folder, CURRENT_LINK)
+            try:
+                previous = os.path.basename(os.readlink(link))
+            except OSError:
+                previous = None
+            os.symlink(os.path.join(VERSIONS_FOLDER, version), f"{link}-{version}")
+            os.replace(f"{link}-{version}", link)
+            if folder != target:
+                os.rename(folder, target)
+                versions = os.path.join(target, VERSIONS_FOLDER)
+            for name in os.listdir(versions):
+                if name not in (version, previous):
+                    shutil.rmtree(os.path.join(versions, name), ignore_errors=True)
@@ -1,18 +1,35 @@
 """
 app/interfaces/logger.py
 This module provides the `QuizLogger` class, which is responsible for logging quiz results into Markdown files.
+Results are also recorded in a `QuizHistoryStore` when one is given, which keeps the
+aggregates the statistics endpoints are answered from.
 
 Classes:
     - QuizLogger: Logs quiz results into Markdown files in the specified output folder.
+    - BackgroundQuizLogger: A QuizLogger that writes the files on a background thread.
 
 Dependencies:
     - os: Used for creating directories and handling file paths.
+    - queue, threading: Used for handing results to the background writer.
     - app.domain.models.QuizResult: The model representing the quiz result to be logged.
+    - app.interfaces.history.QuizHistoryStore: The indexed store of quiz results.
+    - app.interfaces.metrics: The counter of written results.
 """
 
+import logging
 import os
+import queue
+import sqlite3
+import threading
+from typing import List, Optional
 
 from app.domain.models import QuizResult
+from app.interfaces.history import QuizHistoryStore
+from app.interfaces.metrics import QUIZ_RESULTS_WRITTEN
+
+_STOP = None
+
+log = logging.getLogger(__name__)
 
 
 class QuizLogger:
@@ -23,25 +40,36 @@ class QuizLogger:
     ----------
     output_folder : str
         The directory where the quiz result files will be saved.
+    history : Optional[QuizHistoryStore]
+        The store the results are also recorded in, or None.
 
     Methods:
     -------
-    __init__(output_folder: str = "app/out"):
+    __init__(output_folder: str = "app/out", history: Optional[QuizHistoryStore] = None):
         Initializes the QuizLogger with the specified output folder, creating the folder if it doesn't exist.
 
     log_result(result: QuizResult) -> None:
         Logs the quiz result into a Markdown file with details such as start time, end time, correct and incorrect answers.
+
+    render(result: QuizResult) -> str:
+        Returns the Markdown document for a quiz result.
     """
 
-    def __init__(self, output_folder: str = "app/out"):
+    def __init__(
+        self,
+        output_folder: str = "app/out",
+        history: Optional[QuizHistoryStore] = None,
+    ):
         """
         Initializes the Logger instance.
         Args:
             output_folder (str): The folder where log files will be stored. Defaults to "app/out".
+            history (Optional[QuizHistoryStore]): The store the results are also recorded in.
         Creates the output folder if it does not already exist.
         """
 
         self.output_folder = output_folder
+        self.history = history
         os.makedirs(self.output_folder, exist_ok=True)
 
     def log_result(self, result: QuizResult) -> None:
@@ -64,32 +92,173 @@ class QuizLogger:
             None
 
         """
-        timestamp = result.start_time.strftime("%Y%m%d_%H%M%S")
-        filename = f"quiz_{timestamp}.md"
-        filepath = os.path.join(self.output_folder, filename)
-
-        content = (
-            f"# Quiz Result - {result.start_time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-            f"**Start Time:** {result.start_time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-            f"**End Time:** {result.end_time.strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-            f"**Correct Answers:** {result.correct}\n\n"
-            f"**Incorrect Answers:** {result.incorrect}\n\n"
-            f"## Correctly Answered Terms:\n\n"
-        )
+        self._write(result)
+        self._record([result])
+
+    def render(self, result: QuizResult) -> str:
+        """
+        Returns the Markdown document for a quiz result.
 
+        Args:
+            result (QuizResult): The quiz result to render.
+
+        Returns:
+            str: The Markdown document.
+        """
+        start_time = result.start_time.strftime("%Y-%m-%d %H:%M:%S")
+        parts = [
+            f"# Quiz Result - {start_time}\n\n",
+            f"**Start Time:** {start_time}\n\n",
+            f"**End Time:** {result.end_time.strftime('%Y-%m-%d %H:%M:%S')}\n\n",
+            f"**Correct Answers:** {result.correct}\n\n",
+            f"**Incorrect Answers:** {result.incorrect}\n\n",
+            "## Correctly Answered Terms:\n\n",
+        ]
         if result.correct_words:
-            for word in result.correct_words:
-                content += f"- {word}\n"
+            parts.extend(f"- {word}\n" for word in result.correct_words)
         else:
-            content += "None\n"
+            parts.append("None\n")
 
-        content += "\n## Incorrectly Answered Terms:\n\n"
+        parts.append("\n## Incorrectly Answered Terms:\n\n")
 
         if result.incorrect_words:
-            for word in result.incorrect_words:
-                content += f"- {word}\n"
+            parts.extend(f"- {word}\n" for word in result.incorrect_words)
         else:
-            content += "None\n"
+            parts.append("None\n")
+        return "".join(parts)
+
+    def _write(self, result: QuizResult) -> str:
+        """
+        Writes a quiz result to a new file and returns its path.
+
+        The file is named after the start time with microsecond resolution. The file is
+        created exclusively, and a counter is appended if the name is already taken, so
+        two quizzes never overwrite each other.
+        """
+        content = self.render(result)
+        timestamp = result.start_time.strftime("%Y%m%d_%H%M%S_%f")
+        suffix = ""
+        attempt = 0
+        while True:
+            filepath = os.path.join(self.output_folder, f"quiz_{timestamp}{suffix}.md")
+            try:
+                with open(filepath, "x", encoding="utf-8") as file:
+                    file.write(content)
+                QUIZ_RESULTS_WRITTEN.inc()
+                return filepath
+            except FileExistsError:
+                attempt += 1
+                suffix = f"_{attempt}"
+
+    def _record(self, results: List[QuizResult]):
+        """Records quiz results in the history store, if there is one."""
+        if self.history is not None and results:
+            self.history.record(results)
+
+
+class BackgroundQuizLogger(QuizLogger):
+    """
+    A QuizLogger that writes the files on a background thread.
+
+    ``log_result`` only puts the result on a bounded queue and returns, so ending a quiz
+    does not wait for the disk while the writer keeps up. The writer thread takes the
+    results in batches of up to ``batch_size``, writes one file per result and records
+    each batch in the history store in a single transaction. When the queue is full,
+    ``log_result`` waits for the writer to catch up, which bounds the memory used under
+    sustained overload; callers on the event loop therefore call it from the thread
+    pool.
+    ``stop`` writes every queued result before it returns.
+
+    Attributes:
+    ----------
+    max_queue_size : int
+        The number of results that may wait for the writer.
+    batch_size : int
+        The number of results the writer takes from the queue at once.
+    """
+
+    def __init__(
+        self,
+        output_folder: str = "app/out",
+        max_queue_size: int = 1000,
+        batch_size: int = 50,
+        history: Optional[QuizHistoryStore] = None,
+    ):
+        """
+        Initializes the BackgroundQuizLogger. The writer thread is started by ``start``
+        or by the first logged result.
+        Args:
+            output_folder (str): The folder where log files will be stored. Defaults to "app/out".
+            max_queue_size (int): The number of results that may wait for the writer.
+            batch_size (int): The number of results the writer takes from the queue at once.
+            history (Optional[QuizHistoryStore]): The store the results are also recorded in.
+        """
+        super().__init__(output_folder, history)
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Optional[QuizResult]]" = queue.Queue(
+            maxsize=max_queue_size
+        )
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of results waiting to be written."""
+        return self._queue.qsize()
+
+    def start(self):
+        """Starts the writer thread if it is not running."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="quiz-logger", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Writes every queued result and stops the writer thread.
+        Args:
+            timeout (Optional[float]): The maximum time to wait for the writer in seconds.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def log_result(self, result: QuizResult) -> None:
+        """
+        Queues the quiz result for the writer thread.
+        Args:
+            result (QuizResult): The quiz result to log.
+
+        Returns:
+            None
+        """
+        if self._thread is None:
+            self.start()
+        self._queue.put(result)
 
-        with open(filepath, "w", encoding="utf-8") as file:
-            file.write(content)
+    def _run(self):
+        while True:
+            batch: List[Optional[QuizResult]] = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = _STOP in batch
+            results = [result for result in batch if result is not _STOP]
+            for result in results:
+                try:
+                    self._write(result)
+                except OSError:
+                    log.exception("Could not write the quiz result")
+            try:
+                self._record(results)
+            except sqlite3.Error:
+                log.exception("Could not record the quiz results")
+            if stopping:
+                return
@@ -0,0 +1,450 @@
+"""
+app/interfaces/metrics.py
+This module provides the application metrics in the Prometheus text format.
+
+The metric types are implemented here instead of using a client library, because the
+application needs only counters, gauges and fixed-bucket histograms. Updating a metric
+takes one uncontended lock and a few additions, so the instrumentation stays on in
+production. Labelled values are created on first use; callers on hot paths bind the
+labelled value once and reuse it.
+
+Classes:
+    - MetricsRegistry: Holds metrics and renders them in the Prometheus text format.
+    - Counter: A value that only goes up.
+    - Gauge: A value that goes up and down, or is read from a function when scraped.
+    - Histogram: Counts observations in fixed buckets.
+    - MetricsMiddleware: Records the latency and the number of in-flight HTTP requests.
+
+Attributes:
+    REGISTRY (MetricsRegistry): The registry rendered by the ``/metrics`` endpoint.
+
+Dependencies:
+    - threading: Used for guarding the values against concurrent updates.
+    - time: Used for timing requests and reloads.
+"""
+
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class MetricsRegistry:
+    """
+    Holds metrics and renders them in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric"):
+        """Adds a metric to the registry."""
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """
+        Returns every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition, one line per sample.
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Metric:
+    """A metric family whose values are selected by their label values."""
+
+    kind = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional[MetricsRegistry] = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+        if not self.labelnames:
+            self.labels()  # Metrics without labels are reported from the start
+
+    def labels(self, *values: str):
+        """Returns the value for the given label values, creating it on first use."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        value = self._values.get(values)
+        if value is None:
+            with self._lock:
+                value = self._values.setdefault(values, self._new_value())
+        return value
+
+    def _new_value(self):
+        raise NotImplementedError
+
+    def _items(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+    def samples(self) -> Iterable[str]:
+        for label_values, value in self._items():
+            labels = _format_labels(self.labelnames, label_values)
+            yield f"{self.name}{labels} {_format_value(value.get())}"
+
+
+class _CounterValue:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def get(self) -> float:
+        return self._value
+
+
+class Counter(_Metric):
+    """A value that only goes up."""
+
+    kind = "counter"
+
+    def _new_value(self) -> _CounterValue:
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0):
+        """Increments the counter of a metric without labels."""
+        self.labels().inc(amount)
+
+
+class _GaugeValue:
+    __slots__ = ("_value", "_lock", "_function")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float):
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def get(self) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._value
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, or is read from a function when scraped."""
+
+    kind = "gauge"
+    _samples_function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+
+    def _new_value(self) -> _GaugeValue:
+        return _GaugeValue()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        """Reads the value of a metric without labels from a function when scraped."""
+        self.labels().set_function(function)
+
+    def set_samples_function(
+        self, function: Callable[[], Dict[Tuple[str, ...], float]]
+    ):
+        """
+        Reads the values of every label combination from a function when scraped.
+
+        Args:
+            function (Callable[[], Dict[Tuple[str, ...], float]]): Returns the values by
+                their label values; combinations it leaves out are not reported.
+        """
+        self._samples_function = function
+
+    def _items(self) -> List[Tuple[Tuple[str, ...], object]]:
+        if self._samples_function is None:
+            return super()._items()
+        items = []
+        for label_values, number in sorted(self._samples_function().items()):
+            value = _GaugeValue()
+            value.set(number)
+            items.append((label_values, value))
+        return items
+
+
+class _HistogramValue:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class Histogram(_Metric):
+    """Counts observations in fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        registry: Optional[MetricsRegistry] = REGISTRY,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_value(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        """Records an observation of a metric without labels."""
+        self.labels().observe(value)
+
+    def samples(self) -> Iterable[str]:
+        bucket_labels = self.labelnames + ("le",)
+        for label_values, value in self._items():
+            counts, total = value.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(
+                    bucket_labels, label_values + (_format_value(bound),)
+                )
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "vocabvoyage_http_request_duration_seconds",
+    "Time spent handling HTTP requests, by route template.",
+    ("method", "route"),
+)
+HTTP_REQUESTS = Counter(
+    "vocabvoyage_http_requests_total",
+    "HTTP requests handled, by route template and status code.",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "vocabvoyage_http_requests_in_flight",
+    "HTTP requests being handled right now, by route template.",
+    ("route",),
+)
+ANSWER_CHECKS = Counter(
+    "vocabvoyage_answer_checks_total",
+    "Answers checked, counting every answer of a batch.",
+)
+ANSWERS = Counter(
+    "vocabvoyage_answers_total",
+    "Answers checked, by result.",
+    ("result",),
+)
+DECK_WORDS = Gauge(
+    "vocabvoyage_deck_words",
+    "Words in the vocabulary served to new quizzes.",
+)
+ACTIVE_SESSIONS = Gauge(
+    "vocabvoyage_active_sessions",
+    "Learner sessions held by the quiz state backend.",
+)
+RETIRED_VOCABULARIES = Gauge(
+    "vocabvoyage_retired_vocabularies",
+    "Replaced vocabulary versions kept for quizzes still in progress on them.",
+)
+WORD_RELOAD_DURATION = Histogram(
+    "vocabvoyage_word_reload_duration_seconds",
+    "Time spent loading the word files.",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+WORD_FILES_PARSED = Counter(
+    "vocabvoyage_word_files_parsed_total",
+    "Word files parsed because they were new or changed.",
+)
+LOGGER_QUEUE_DEPTH = Gauge(
+    "vocabvoyage_quiz_logger_queue_depth",
+    "Quiz results waiting for the background writer.",
+)
+QUIZ_RESULTS_WRITTEN = Counter(
+    "vocabvoyage_quiz_results_written_total",
+    "Quiz result files written.",
+)
+QUIZ_CHANNELS = Gauge(
+    "vocabvoyage_quiz_channels",
+    "Open quiz WebSocket connections.",
+)
+QUIZ_CHANNEL_MESSAGE_DURATION = Histogram(
+    "vocabvoyage_quiz_channel_message_duration_seconds",
+    "Time spent handling quiz channel messages, by message type.",
+    ("type",),
+)
+ANSWER_LOG_QUEUE_DEPTH = Gauge(
+    "vocabvoyage_answer_log_queue_depth",
+    "Answer events waiting for the answer log writer.",
+)
+ANSWER_LOG_DROPPED = Counter(
+    "vocabvoyage_answer_log_dropped_total",
+    "Answer events dropped because the answer log queue was full.",
+)
+ANSWER_LOG_COMMIT_SIZE = Histogram(
+    "vocabvoyage_answer_log_commit_events",
+    "Answer events made durable by one fsync of the answer log.",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+
+# The methods used as label values; any other method sent by a client is ``other``
+HTTP_METHODS = frozenset(
+    ["GET", "HEAD", "POST", "PUT", "DELETE", "CONNECT", "OPTIONS", "TRACE", "PATCH"]
+)
+
+# The scopes of the HTTP requests being handled, by id. The route of a request is only
+# known once it was routed, so the requests are counted by route when scraped.
+_REQUESTS_IN_FLIGHT: Dict[int, dict] = {}
+
+
+def _route(scope: dict) -> str:
+    return getattr(scope.get("route"), "path", "unmatched")
+
+
+def _requests_in_flight() -> Dict[Tuple[str, ...], float]:
+    counts: Dict[Tuple[str, ...], float] = {}
+    for scope in list(_REQUESTS_IN_FLIGHT.values()):
+        route = (_route(scope),)
+        counts[route] = counts.get(route, 0) + 1
+    return counts
+
+
+HTTP_REQUESTS_IN_FLIGHT.set_samples_function(_requests_in_flight)
+
+
+class MetricsMiddleware:
+    """
+    Records the latency and the number of in-flight HTTP requests.
+
+    Requests are labelled with the route template, such as ``/upload_words/{job_id}``,
+    so the number of label values stays bounded. Requests that match no route are
+    labelled ``unmatched``, and requests with a method outside ``HTTP_METHODS`` are
+    labelled ``other``. Requests in flight are counted by route when the metrics are
+    scraped, and show as ``unmatched`` until they are routed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        key = id(scope)
+        _REQUESTS_IN_FLIGHT[key] = scope
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            del _REQUESTS_IN_FLIGHT[key]
+            route = _route(scope)
+            method = scope["method"]
+            if method not in HTTP_METHODS:
+                method = "other"
+            HTTP_REQUEST_DURATION.labels(method, route).observe(elapsed)
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
@@ -0,0 +1,336 @@
+"""
+app/interfaces/parallel_csv.py
+This module parses the rows of word files, optionally across a pool of processes.
+
+A file is parsed into two columns of strings, the line of every row and the skipped
+rows. With more than one worker, the files are parsed in separate processes, and a file
+larger than the chunk size is split into byte ranges that are parsed in parallel too.
+Ranges end after a newline outside of a quoted field, found like in the RowParser by
+counting quote characters, so a quoted field spanning lines is never split. A file with
+an odd number of quote characters is never split.
+
+The calling process only scans the files block by block to find the ranges. Workers get
+the path and the byte range of their chunk and read it themselves, so no file is
+pickled to a worker. Ranges are read block by block and fed to a RowParser, in a worker
+or in the calling thread with one worker, so no file is held in memory as a whole.
+
+A pool of workers may be kept across calls with ``start_pool``, so a reload does not
+spawn new processes.
+
+Workers send back plain lists of strings and an array of line numbers, which pickle
+compactly, instead of Word objects. The chunks of a file are joined in file order and
+their line numbers are shifted by the lines of the previous chunks, so the result does
+not depend on the number of workers or on the order in which chunks finish.
+
+The module only imports the standard library, so the worker processes start quickly.
+They are started with ``spawn``, which is safe in a process that runs threads.
+
+Classes:
+    - ParsedRows: The rows of one file or chunk.
+    - RowParser: Parses the rows of CSV content fed in chunks, such as an upload.
+
+Functions:
+    - parse_rows(content): Parses the rows of CSV content.
+    - split_rows(file, chunk_bytes, block_bytes): Splits a CSV file into ranges of whole
+      rows.
+    - start_pool(workers): Starts a pool of worker processes for parse_files.
+    - parse_files(paths, workers, chunk_bytes, pool): Parses files, in parallel if
+      asked.
+
+Dependencies:
+    - csv, codecs: Used for parsing the rows and decoding them incrementally.
+    - array: Used for the compact line numbers of the rows.
+    - concurrent.futures, multiprocessing: Used for the pool of worker processes.
+"""
+
+import codecs
+import csv
+import io
+import multiprocessing
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from typing import BinaryIO, List, NamedTuple, Optional, Sequence, Tuple
+
+# Files larger than this are split into chunks of about this size for parallel parsing
+CHUNK_BYTES = 16 << 20
+# The size of the blocks read when looking for the ends of the chunks
+READ_BLOCK_BYTES = 1 << 20
+# The row after the lines parsed by a RowParser, telling whether a record is still open
+_BOUNDARY = "\x1e"
+
+
+class ParsedRows(NamedTuple):
+    """
+    The rows of one file or chunk.
+
+    Attributes:
+        foreign_terms (List[str]): The first column of the rows with two columns.
+        native_translations (List[str]): The second column of the same rows.
+        lines (array): The line of every row, starting at 1.
+        skipped (List[Tuple[int, str]]): The line of every skipped row and the reason.
+        line_count (int): The number of lines read.
+    """
+
+    foreign_terms: List[str]
+    native_translations: List[str]
+    lines: array
+    skipped: List[Tuple[int, str]]
+    line_count: int
+
+
+class RowParser:
+    """
+    Parses the rows of CSV content fed in chunks, as ``parse_rows`` parses it at once.
+
+    Bytes are decoded incrementally, so a chunk may end in the middle of a character.
+    Complete lines are buffered until the number of quote characters in them is even,
+    like the ranges of ``split_rows`` end, and are then parsed. The parsed lines are
+    followed by a boundary line: a record still open at the end of them takes the
+    boundary into its quoted field instead of returning it as a row of its own, and its
+    lines are parsed again with the next chunk. So the rows and lines never depend on
+    how the content was split into chunks.
+
+    Attributes:
+        rows (int): The number of rows parsed so far, without blank lines.
+        words (int): The number of those rows with at least two columns.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._pending: List[str] = []
+        self._quotes = 0
+        self._tail = ""
+        self._line_count = 0
+        self._parsed = ParsedRows([], [], array("L"), [], 0)
+
+    @property
+    def rows(self) -> int:
+        return len(self._parsed.foreign_terms) + len(self._parsed.skipped)
+
+    @property
+    def words(self) -> int:
+        return len(self._parsed.foreign_terms)
+
+    def feed(self, chunk: bytes):
+        """
+        Parses the complete rows of the next chunk.
+
+        Args:
+            chunk (bytes): The next bytes of UTF-8 encoded CSV rows.
+
+        Raises:
+            UnicodeDecodeError: If the chunk is not valid UTF-8.
+        """
+        text = self._tail + self._decoder.decode(chunk)
+        end = text.rfind("\n") + 1
+        self._tail = text[end:]
+        if end:
+            self._pending.append(text[:end])
+            self._quotes += text.count('"', 0, end)
+            if self._quotes % 2 == 0:
+                self._parse(final=False)
+
+    def close(self) -> ParsedRows:
+        """
+        Parses the rows left at the end of the content.
+
+        Raises:
+            UnicodeDecodeError: If the content ends in the middle of a character.
+
+        Returns:
+            ParsedRows: The rows of the whole content.
+        """
+        self._pending.append(self._tail + self._decoder.decode(b"", final=True))
+        self._tail = ""
+        self._parse(final=True)
+        return self._parsed._replace(line_count=self._line_count)
+
+    def _parse(self, final: bool):
+        text = "".join(self._pending)
+        self._pending.clear()
+        self._quotes = 0
+        lines = io.StringIO(text, newline="")
+        reader = csv.reader(lines if final else chain(lines, [_BOUNDARY + "\n"]))
+        foreign_terms, native_translations, numbers, skipped, _ = self._parsed
+        row: List[str] = []
+        start = end = 0  # The lines read before the last row, and with it
+        for row in reader:
+            start, end = end, reader.line_num
+            if len(row) >= 2:
+                foreign_terms.append(row[0])
+                native_translations.append(row[1])
+                numbers.append(self._line_count + start + 1)
+            elif row:
+                skipped.append((self._line_count + start + 1, "fewer than two columns"))
+        if final:
+            self._line_count += end
+            return
+        # The last row is the boundary, or a record still open at the end of the lines
+        if len(row) >= 2:
+            foreign_terms.pop()
+            native_translations.pop()
+            numbers.pop()
+        else:
+            skipped.pop()
+        self._line_count += start
+        if row != [_BOUNDARY]:
+            # Parsed again with the next chunk
+            rest = "".join(islice(io.StringIO(text, newline=""), start, None))
+            self._pending.append(rest)
+            self._quotes = rest.count('"')
+
+
+def parse_rows(content: bytes) -> ParsedRows:
+    """
+    Parses the rows of CSV content.
+
+    Rows with fewer than two columns are skipped; blank lines are ignored.
+
+    Args:
+        content (bytes): UTF-8 encoded CSV rows.
+
+    Returns:
+        ParsedRows: The parsed rows, with lines counted from the start of the content.
+    """
+    parser = RowParser()
+    parser.feed(content)
+    return parser.close()
+
+
+def split_rows(
+    file: BinaryIO, chunk_bytes: int, block_bytes: int = READ_BLOCK_BYTES
+) -> List[Tuple[int, int]]:
+    """
+    Splits a CSV file into byte ranges of whole rows, reading it block by block.
+
+    Args:
+        file (BinaryIO): A seekable file of UTF-8 encoded CSV rows, read from the start.
+        chunk_bytes (int): The smallest size of a range but the last.
+        block_bytes (int): The size of the blocks read.
+
+    Returns:
+        List[Tuple[int, int]]: The start and end of every range, covering the file.
+    """
+    size = file.seek(0, os.SEEK_END)
+    file.seek(0)
+    if size <= chunk_bytes:
+        return [(0, size)]
+    ranges = []
+    start = 0
+    target = chunk_bytes  # Ranges end after the first newline from here
+    quotes = 0
+    position = 0
+    while True:
+        block = file.read(block_bytes)
+        if not block:
+            break
+        offset = 0
+        while position + len(block) > target:
+            search = max(offset, target - position)
+            newline = block.find(b"\n", search)
+            if newline < 0:
+                break
+            quotes += block.count(b'"', offset, newline)
+            offset = newline + 1
+            if quotes % 2 == 0 and position + offset < size:
+                ranges.append((start, position + offset))
+                start = position + offset
+                target = start + chunk_bytes
+        quotes += block.count(b'"', offset)
+        position += len(block)
+    if quotes % 2:
+        return [(0, size)]
+    ranges.append((start, size))
+    return ranges
+
+
+def _parse_range(path: str, start: int, end: int) -> ParsedRows:
+    parser = RowParser()
+    with open(path, "rb") as file:
+        file.seek(start)
+        while start < end:
+            block = file.read(min(READ_BLOCK_BYTES, end - start))
+            if not block:
+                break
+            parser.feed(block)
+            start += len(block)
+    return parser.close()
+
+
+def start_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Starts a pool of worker processes for ``parse_files``.
+
+    The processes are started with ``spawn`` when the pool first gets work, and are kept
+    until the pool is shut down.
+
+    Args:
+        workers (int): The largest number of worker processes.
+
+    Returns:
+        ProcessPoolExecutor: The pool.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def _join(chunks: Sequence[ParsedRows]) -> ParsedRows:
+    if len(chunks) == 1:
+        return chunks[0]
+    joined = ParsedRows([], [], array("L"), [], 0)
+    offset = 0
+    for chunk in chunks:
+        joined.foreign_terms.extend(chunk.foreign_terms)
+        joined.native_translations.extend(chunk.native_translations)
+        joined.lines.extend(line + offset for line in chunk.lines)
+        joined.skipped.extend((line + offset, reason) for line, reason in chunk.skipped)
+        offset += chunk.line_count
+    return joined._replace(line_count=offset)
+
+
+def parse_files(
+    paths: Sequence[str],
+    workers: int = 1,
+    chunk_bytes: int = CHUNK_BYTES,
+    pool: Optional[ProcessPoolExecutor] = None,
+) -> List[ParsedRows]:
+    """
+    Parses the rows of files, in parallel if more than one worker is asked for.
+
+    Files are read block by block in the calling thread, so only the rows of a file
+    are held in memory, not its content.
+
+    Args:
+        paths (Sequence[str]): The path of every file.
+        workers (int): The largest number of worker processes; 1 parses the files in
+            the calling thread.
+        chunk_bytes (int): The size above which a file is split into chunks.
+        pool (Optional[ProcessPoolExecutor]): A pool from ``start_pool`` to parse in,
+            such as one kept for every reload. Without one, a pool is started for this
+            call and shut down afterwards.
+
+    Returns:
+        List[ParsedRows]: The rows of every file, in the order of ``paths``.
+    """
+    if workers <= 1 or not paths:
+        return [_parse_range(path, 0, os.path.getsize(path)) for path in paths]
+    ranges = []
+    for path in paths:
+        with open(path, "rb") as file:
+            ranges.append(split_rows(file, chunk_bytes))
+    chunks = [
+        (path, start, end)
+        for path, file_ranges in zip(paths, ranges)
+        for start, end in file_ranges
+    ]
+    if len(chunks) == 1:
+        return [_parse_range(*chunks[0])]
+    if pool is None:
+        with start_pool(min(workers, len(chunks))) as own_pool:
+            parsed = iter(list(own_pool.map(_parse_range, *zip(*chunks))))
+    else:
+        parsed = iter(list(pool.map(_parse_range, *zip(*chunks))))
+    return [_join([next(parsed) for _ in file_ranges]) for file_ranges in ranges]
@@ -0,0 +1,338 @@
+"""
+app/interfaces/profiling.py
+This module provides opt-in profiling of single HTTP requests.
+
+The ProfilingMiddleware runs a sampled share of the requests, and every request that
+carries the admin profiling token, under ``cProfile``. The profiles are kept in a
+bounded ring buffer, so the memory used does not grow with uptime, and can be downloaded
+through the admin endpoints as ``pstats`` files or as text.
+
+The middleware is only installed when profiling is enabled, so a disabled profiler costs
+nothing. The profiler only runs while the coroutine of the profiled request is running,
+so other requests served by the event loop in the meantime are not included. Work the
+request passes to the thread pool through ``run_in_threadpool`` of this module is
+profiled in the worker thread. The sync dependencies and endpoints that FastAPI runs in
+the thread pool itself are not: their time only shows in the duration of the request.
+Only one request is profiled at a time.
+
+Classes:
+    - ProfileRecord: A profile of one request.
+    - ProfileStore: Keeps the most recent profiles in a ring buffer.
+    - ProfilingMiddleware: Profiles sampled requests and requests with the admin token.
+
+Functions:
+    - run_in_threadpool(function, *args, **kwargs): Runs a function in the thread pool,
+      profiled if the calling request is.
+
+Dependencies:
+    - cProfile, pstats, marshal: Used for recording and exporting the profiles.
+    - collections.deque: Used as the ring buffer.
+    - contextvars: Used for finding the profiler of the calling request.
+    - fastapi.concurrency: Used for running functions in the thread pool.
+"""
+
+import cProfile
+import contextvars
+import hmac
+import io
+import marshal
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool as _run_in_threadpool
+
+PROFILE_HEADER = "X-Profile-Token"
+
+
+class _LoadedStats:
+    """Lets ``pstats.Stats`` read statistics that were collected earlier."""
+
+    def __init__(self, stats: dict):
+        self.stats = dict(stats)
+
+    def create_stats(self):
+        pass
+
+
+class _RequestProfiler:
+    """Profiles the work of one request, in whichever thread it runs."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        # The profile is enabled by one thread at a time
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def running(self):
+        """Profiles the enclosed code, unless the profile is already running."""
+        if not self._lock.acquire(blocking=False):
+            yield
+            return
+        try:
+            try:
+                self.profile.enable()
+            except ValueError:  # Another profiler is active
+                enabled = False
+            else:
+                enabled = True
+            try:
+                yield
+            finally:
+                if enabled:
+                    self.profile.disable()
+        finally:
+            self._lock.release()
+
+    def call(self, function, *args, **kwargs):
+        """Calls a function under the profile."""
+        with self.running():
+            return function(*args, **kwargs)
+
+
+class _Profiled:
+    """Awaits a coroutine, profiling only the steps of that coroutine."""
+
+    def __init__(self, coroutine, profiler: _RequestProfiler):
+        self.coroutine = coroutine
+        self.profiler = profiler
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            with self.profiler.running():
+                try:
+                    if error is None:
+                        awaited = self.coroutine.send(value)
+                    else:
+                        awaited = self.coroutine.throw(error)
+                except StopIteration as stop:
+                    return stop.value
+            try:
+                value, error = (yield awaited), None
+            except BaseException as exception:
+                value, error = None, exception
+
+
+_current_profiler: "contextvars.ContextVar[Optional[_RequestProfiler]]" = (
+    contextvars.ContextVar("vocabvoyage_profiler", default=None)
+)
+
+
+async def run_in_threadpool(function, *args, **kwargs):
+    """
+    Runs a function in the thread pool like ``fastapi.concurrency.run_in_threadpool``,
+    and profiles it in the worker thread if the calling request is profiled.
+
+    Args:
+        function: The function to call.
+        *args: The positional arguments of the call.
+        **kwargs: The keyword arguments of the call.
+
+    Returns:
+        The result of the function.
+    """
+    profiler = _current_profiler.get()
+    if profiler is None:
+        return await _run_in_threadpool(function, *args, **kwargs)
+    return await _run_in_threadpool(profiler.call, function, *args, **kwargs)
+
+
+class ProfileRecord:
+    """
+    A profile of one request.
+
+    Attributes:
+    ----------
+    id : str
+        The identifier used to download the profile.
+    method : str
+        The HTTP method of the request.
+    path : str
+        The path of the request.
+    status : int
+        The status code of the response.
+    started_at : float
+        The time the request started, in seconds since the epoch.
+    duration : float
+        The time spent handling the request in seconds.
+    """
+
+    def __init__(
+        self,
+        method: str,
+        path: str,
+        status: int,
+        started_at: float,
+        duration: float,
+        stats: dict,
+    ):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.status = status
+        self.started_at = started_at
+        self.duration = duration
+        self._stats = stats
+
+    def summary(self) -> Dict[str, object]:
+        """
+        Returns the request details of the profile.
+
+        Returns:
+            Dict[str, object]: The id, method, path, status, start time and duration.
+        """
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+        }
+
+    def to_pstats(self) -> bytes:
+        """
+        Returns the profile in the file format of ``pstats.Stats.dump_stats``.
+
+        Returns:
+            bytes: The profile, readable with ``pstats.Stats(path)`` or snakeviz.
+        """
+        return marshal.dumps(self._stats)
+
+    def to_text(self, limit: int = 50) -> str:
+        """
+        Returns the functions with the highest cumulative time as text.
+
+        Args:
+            limit (int): The number of functions to list.
+
+        Returns:
+            str: The report of ``pstats.Stats.print_stats``.
+        """
+        stream = io.StringIO()
+        stats = pstats.Stats(_LoadedStats(self._stats), stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return stream.getvalue()
+
+
+class ProfileStore:
+    """
+    Keeps the most recent profiles in a ring buffer.
+
+    Attributes:
+    ----------
+    capacity : int
+        The number of profiles kept. The oldest profile is dropped when a new one is
+        added to a full store.
+    """
+
+    def __init__(self, capacity: int = 20):
+        self.capacity = capacity
+        self._profiles: "deque[ProfileRecord]" = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def add(self, record: ProfileRecord):
+        """Adds a profile, dropping the oldest one if the store is full."""
+        with self._lock:
+            self._profiles.append(record)
+
+    def list(self) -> List[ProfileRecord]:
+        """Returns the kept profiles, newest first."""
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id: str) -> Optional[ProfileRecord]:
+        """Returns a profile by its id, or None if it is unknown or was dropped."""
+        with self._lock:
+            for record in self._profiles:
+                if record.id == profile_id:
+                    return record
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    Profiles sampled requests and requests with the admin token.
+
+    Attributes:
+    ----------
+    store : ProfileStore
+        The store receiving the profiles.
+    sample_rate : float
+        The share of requests that is profiled, between 0 and 1.
+    token : Optional[str]
+        Requests whose ``X-Profile-Token`` header equals this token are always profiled.
+    """
+
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        sample_rate: float = 0.0,
+        token: Optional[str] = None,
+        excluded_prefixes: tuple = ("/admin/",),
+    ):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.token = token
+        self.excluded_prefixes = excluded_prefixes
+        self._busy = threading.Lock()
+
+    def requested(self, scope) -> bool:
+        """Returns True if the request carries the admin profiling token."""
+        if not self.token:
+            return False
+        header = PROFILE_HEADER.lower().encode()
+        for name, value in scope.get("headers", ()):
+            if name == header:
+                return hmac.compare_digest(value, self.token.encode())
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["path"].startswith(self.excluded_prefixes)
+            or not (random.random() < self.sample_rate or self.requested(scope))
+            or not self._busy.acquire(blocking=False)
+        ):
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profiler = _RequestProfiler()
+        token = _current_profiler.set(profiler)
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            await _Profiled(self.app(scope, receive, send_with_status), profiler)
+        finally:
+            duration = time.perf_counter() - start
+            _current_profiler.reset(token)
+            self._busy.release()
+            profiler.profile.create_stats()
+            self.store.add(
+                ProfileRecord(
+                    scope["method"],
+                    scope["path"],
+                    status,
+                    started_at,
+                    duration,
+                    profiler.profile.stats,
+                )
+            )
@@ -0,0 +1,251 @@
+"""
+app/interfaces/recorder.py
+This module provides opt-in recording of the quiz traffic for replaying it later.
+
+The RecorderMiddleware writes one compact trace line per call of the quiz routes. The
+trace keeps what is needed to replay the load of a learner, not the answers themselves:
+
+- the time of the call in milliseconds since the recording started,
+- the number of the session, counted from 1 in order of appearance, instead of its id.
+  Only the numbers of the most recently seen sessions are kept, so a session that comes
+  back after many others is recorded as a new one,
+- the route, the status and the duration in milliseconds,
+- a detail: the query string of ``/words/next``, the body of ``/start_quiz/`` and
+  ``/set_mode/``, or the ``match`` of a ``/check/`` answer instead of the answer.
+
+Every line is a JSON array ``[time, session, route, detail, status, duration]``. The
+first line of a trace is a JSON object with its format version and start time. Traces
+are written to ``traffic-<time>-<pid>.jsonl`` in the trace folder, so the workers of
+one node can share it. Lines are buffered and flushed once a second and on close.
+
+The middleware is only installed when recording is enabled, so a disabled recorder
+costs nothing. The ``app.loadtest.replay`` tool replays the traces.
+
+Classes:
+    - TrafficRecorder: Writes trace lines to the trace file of the process.
+    - RecorderMiddleware: Records the calls of the quiz routes.
+
+Dependencies:
+    - json: Used for encoding the trace lines.
+    - starlette.requests.cookie_parser: Used for reading the session cookie.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from starlette.requests import cookie_parser
+
+TRACE_VERSION = 1
+# The routes whose calls are recorded
+RECORDED_ROUTES = frozenset(
+    ["/start_quiz/", "/set_mode/", "/words/next", "/check/", "/end_quiz/"]
+)
+# Request and response bodies above this size are not kept in a trace
+MAX_BODY_BYTES = 4096
+FLUSH_INTERVAL = 1.0
+# The number of sessions whose numbers are kept, least recently seen dropped first
+MAX_SESSIONS = 100_000
+
+
+class TrafficRecorder:
+    """
+    Writes trace lines to the trace file of the process.
+
+    Attributes:
+    ----------
+    path : str
+        The trace file.
+    records : int
+        The number of calls written.
+    max_sessions : int
+        The number of sessions whose numbers are kept.
+    """
+
+    def __init__(self, folder: str, max_sessions: int = MAX_SESSIONS):
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(
+            folder, f"traffic-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.jsonl"
+        )
+        self.records = 0
+        self.max_sessions = max_sessions
+        self._start = time.perf_counter()
+        self._sessions: "OrderedDict[str, int]" = OrderedDict()
+        self._session_count = 0
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(
+            json.dumps({"version": TRACE_VERSION, "started_at": time.time()}) + "\n"
+        )
+        self._flushed = self._start
+
+    def elapsed_ms(self) -> float:
+        """Returns the time since the recording started in milliseconds."""
+        return (time.perf_counter() - self._start) * 1000
+
+    def record(
+        self,
+        started_ms: float,
+        session_id: Optional[str],
+        route: str,
+        detail: object,
+        status: int,
+        duration_ms: float,
+    ):
+        """
+        Writes the trace line of one call.
+
+        Args:
+            started_ms (float): The time of the call, from ``elapsed_ms``.
+            session_id (Optional[str]): The session of the call, or None.
+            route (str): The route template.
+            detail (object): The query, body or match of the call, or None.
+            status (int): The status code of the response.
+            duration_ms (float): The time spent handling the call in milliseconds.
+        """
+        with self._lock:
+            if self._file.closed:
+                return
+            session = 0
+            if session_id is not None:
+                session = self._session_number(session_id)
+            self._file.write(
+                json.dumps(
+                    [
+                        round(started_ms, 1),
+                        session,
+                        route,
+                        detail,
+                        status,
+                        round(duration_ms, 3),
+                    ],
+                    separators=(",", ":"),
+                    ensure_ascii=False,
+                )
+                + "\n"
+            )
+            self.records += 1
+            now = time.perf_counter()
+            if now - self._flushed >= FLUSH_INTERVAL:
+                self._file.flush()
+                self._flushed = now
+
+    def _session_number(self, session_id: str) -> int:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            return session
+        self._session_count += 1
+        self._sessions[session_id] = self._session_count
+        if len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return self._session_count
+
+    def close(self):
+        """Flushes the buffered lines and closes the trace file."""
+        with self._lock:
+            self._file.close()
+
+
+class RecorderMiddleware:
+    """
+    Records the calls of the quiz routes.
+
+    The session of a call is read from the session header, then from the session
+    cookie, and for a new learner from the cookie set by the response.
+
+    Attributes:
+    ----------
+    recorder : TrafficRecorder
+        The recorder receiving the trace lines.
+    """
+
+    def __init__(
+        self,
+        app,
+        recorder: TrafficRecorder,
+        session_header: str = "X-Session-Id",
+        session_cookie: str = "vocabvoyage_session",
+    ):
+        self.app = app
+        self.recorder = recorder
+        self.session_header = session_header.lower().encode()
+        self.session_cookie = session_cookie
+
+    def _session_id(self, headers, cookie_header: bytes) -> Optional[str]:
+        cookie = None
+        for name, value in headers:
+            if name == self.session_header:
+                return value.decode("latin-1")
+            if name == cookie_header:
+                cookie = value.decode("latin-1")
+        if cookie is None:
+            return None
+        return cookie_parser(cookie).get(self.session_cookie)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        request_body = bytearray()
+        response_body = bytearray()
+        response_headers = []
+
+        async def receive_with_body():
+            message = await receive()
+            if (
+                message["type"] == "http.request"
+                and len(request_body) <= MAX_BODY_BYTES
+            ):
+                request_body.extend(message.get("body", b""))
+            return message
+
+        async def send_with_body(message):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = message.get("headers", [])
+            elif (
+                message["type"] == "http.response.body"
+                and getattr(scope.get("route"), "path", None) == "/check/"
+                and len(response_body) <= MAX_BODY_BYTES
+            ):
+                response_body.extend(message.get("body", b""))
+            await send(message)
+
+        started_ms = self.recorder.elapsed_ms()
+        try:
+            await self.app(scope, receive_with_body, send_with_body)
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            if route in RECORDED_ROUTES:
+                session_id = self._session_id(scope["headers"], b"cookie")
+                if session_id is None:
+                    session_id = self._session_id(response_headers, b"set-cookie")
+                self.recorder.record(
+                    started_ms,
+                    session_id,
+                    route,
+                    self._detail(scope, route, request_body, response_body, status),
+                    status,
+                    self.recorder.elapsed_ms() - started_ms,
+                )
+
+    @staticmethod
+    def _detail(scope, route, request_body, response_body, status) -> object:
+        if route == "/words/next":
+            return scope.get("query_string", b"").decode("latin-1") or None
+        body = response_body if route == "/check/" else request_body
+        if not body or len(body) > MAX_BODY_BYTES:
+            return None
+        try:
+            content = json.loads(body)
+        except ValueError:
+            return None
+        if route == "/check/":
+            return content.get("match") if status == 200 else None
+        return content
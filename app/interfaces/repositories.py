@@ -9,19 +9,251 @@ Attributes:
 Methods:
     load_words() -> List[Word]:
         Reads CSV files from the data folder and returns a list of Word objects.
+    bulk_load() -> Tuple[Vocabulary, IngestReport]:
+        Reads CSV files from the data folder into a Vocabulary and reports skipped and
+        duplicate rows.
+    load_vocabulary() -> Vocabulary:
+        Returns the words of the CSV files as a memory-mapped compiled deck.
+    store_vocabulary(vocabulary: Vocabulary) -> Vocabulary:
+        Compiles already parsed words of the current CSV files into a deck.
+    close():
+        Shuts down the processes parsing changed files.
+    bulk_vocabulary(folder, parsed) -> Tuple[Vocabulary, IngestReport]:
+        Builds the words of the CSV files of a folder from their already parsed rows.
+
+Files are parsed into two columns of strings, without creating a Word per row, and
+the line of every row is kept for the IngestReport of the load. Rows with fewer than two
+columns are skipped and reported with their line; blank lines are ignored.
+
+The repository keeps the parsed words of every file together with the file's
+fingerprint (size, modification time and content hash). A reload only parses the files
+whose fingerprint changed and drops the files that were removed. Concurrent reloads are
+collapsed into a single load whose result is shared by every caller.
+
+With ``parse_workers`` above 1, the changed files are parsed in a pool of processes,
+and large files are split into chunks parsed in parallel, so reloading many or large
+files scales with the number of cores. The words are the same as with one worker. The
+pool is started on the first load that parses files and kept until ``close``.
+
+Compiled decks are stored in the ``.compiled`` subfolder of the data folder, named after
+a hash of the deck format version and the names, sizes and modification times of the
+CSV files. As long as the CSV
+files are unchanged, a new process opens the compiled deck without parsing any CSV.
+
+Uploads publish the word files of a folder as a version: an immutable folder in
+``.versions`` that the ``.current`` link of the folder points at. The link is swapped with
+one rename, so readers resolve it once with ``current_folder`` and see either all files
+of the previous version or all files of the new one. A folder without the link, such as
+a data folder that never received an upload, holds its word files itself.
+
+The DeckRegistry serves the files of the data folder as separate named decks: every CSV
+file is a deck named after the file, and every subfolder is a deck bundling its CSV
+files. A deck is compiled and mapped on first use, and the least recently used decks
+are dropped when the mapped decks exceed a memory budget.
 
 Dependencies:
-    - csv: Used for reading CSV files.
     - os: Used for file and directory operations.
+    - hashlib: Used for hashing the content of changed files.
+    - threading, concurrent.futures: Used for sharing a reload between concurrent callers
+      and for keeping the pool of parse processes.
+    - collections.OrderedDict: Used for keeping the open decks in least recently used order.
     - typing.List: Used for type hinting the return type of load_words method.
-    - app.domain.models.Word: The Word class used to create word objects from CSV data.
+    - app.domain.models: The Word class and the IngestReport of a load.
+    - app.interfaces.deck_format: The compiled deck format.
+    - app.interfaces.metrics: The reload duration and parsed files metrics.
+    - app.interfaces.parallel_csv: Parses the rows of the files, in parallel if asked.
 """
 
-import csv
+import bisect
+import hashlib
 import os
-from typing import List
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from app.domain.models import DuplicateRow, IngestReport, SkippedRow, Word
+from app.domain.vocabulary import Vocabulary, make_word_id
+from app.interfaces.deck_format import MAGIC, MappedVocabulary, compile_deck
+from app.interfaces.metrics import WORD_FILES_PARSED, WORD_RELOAD_DURATION
+from app.interfaces.parallel_csv import CHUNK_BYTES, ParsedRows, parse_files, start_pool
+
+COMPILED_FOLDER = ".compiled"
+DECKS_FOLDER = "decks"
+# The link to the published version of the word files of a folder, and the versions
+CURRENT_LINK = ".current"
+VERSIONS_FOLDER = ".versions"
+
+# Names accepted for new deck bundles; decks of existing CSV files keep their file name
+DECK_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+
+# How often the files of a deck are resolved again when a new version replaces them
+RESOLVE_ATTEMPTS = 3
+
+# Skipped and duplicate rows listed in an IngestReport; the counts cover every row
+MAX_REPORTED_ROWS = 100
+
+T = TypeVar("T")
+
+
+def current_folder(folder: str) -> str:
+    """
+    Returns the folder holding the current word files of a data or deck folder.
+
+    Args:
+        folder (str): The data folder or the folder of a deck bundle.
+
+    Returns:
+        str: The published version the ``.current`` link points at, or the folder
+        itself if nothing was published to it.
+    """
+    try:
+        return os.path.join(folder, os.readlink(os.path.join(folder, CURRENT_LINK)))
+    except OSError:
+        return folder
+
+
+def _csv_files(folder: str) -> List[str]:
+    """Returns the names of the CSV files of the current version of a folder."""
+    return sorted(
+        filename for filename in os.listdir(folder) if filename.endswith(".csv")
+    )
+
+
+class _ParsedFile:
+    """The words of one CSV file as columns, with the line of every row."""
+
+    __slots__ = ("name", "foreign_terms", "native_translations", "lines", "skipped")
+
+    def __init__(self, name: str, rows: ParsedRows):
+        self.name = name
+        self.foreign_terms = rows.foreign_terms
+        self.native_translations = rows.native_translations
+        self.lines = rows.lines
+        self.skipped = rows.skipped
+
+
+class _CachedFile:
+    """The fingerprint and the parsed words of one CSV file."""
+
+    __slots__ = ("size", "mtime_ns", "digest", "parsed")
+
+    def __init__(
+        self, size: int, mtime_ns: int, digest: bytes, parsed: Optional[_ParsedFile]
+    ):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.digest = digest
+        self.parsed = parsed
+
+
+def _columns(files: Sequence[_ParsedFile]) -> Tuple[List[str], List[str]]:
+    """Returns the foreign terms and native translations of the files in order."""
+    return (
+        list(chain.from_iterable(parsed.foreign_terms for parsed in files)),
+        list(chain.from_iterable(parsed.native_translations for parsed in files)),
+    )
+
+
+def _report(files: Sequence[_ParsedFile], word_ids: Sequence[str]) -> IngestReport:
+    """Counts the rows of parsed files and lists their first skipped and duplicate rows."""
+    report = IngestReport(files=len(files), words=len(word_ids))
+    for parsed in files:
+        report.skipped += len(parsed.skipped)
+        for line, reason in parsed.skipped:
+            if len(report.skipped_rows) < MAX_REPORTED_ROWS:
+                report.skipped_rows.append(
+                    SkippedRow(file=parsed.name, line=line, reason=reason)
+                )
+    report.rows = report.words + report.skipped
+
+    starts = [0]
+    for parsed in files:
+        starts.append(starts[-1] + len(parsed.lines))
 
-from app.domain.models import Word
+    def locate(index: int) -> Tuple[_ParsedFile, int]:
+        number = bisect.bisect_right(starts, index) - 1
+        return files[number], index - starts[number]
+
+    first: Dict[str, int] = {}
+    for index, word_id in enumerate(word_ids):
+        earlier = first.setdefault(word_id, index)
+        if earlier == index:
+            continue
+        report.duplicates += 1
+        if len(report.duplicate_rows) < MAX_REPORTED_ROWS:
+            parsed, row = locate(index)
+            first_parsed, first_row = locate(earlier)
+            report.duplicate_rows.append(
+                DuplicateRow(
+                    file=parsed.name,
+                    line=parsed.lines[row],
+                    foreign_term=parsed.foreign_terms[row],
+                    native_translation=parsed.native_translations[row],
+                    first_file=first_parsed.name,
+                    first_line=first_parsed.lines[first_row],
+                )
+            )
+    return report
+
+
+def _remove_older_decks(path: str, prefix: str):
+    """
+    Removes the compiled decks with the prefix of a deck that were compiled before it.
+
+    Decks compiled later, for example by another process that already read newer files,
+    and the temporary files of decks still being written are kept.
+    """
+    folder = os.path.dirname(path)
+    try:
+        compiled_at = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return  # Removed by another process that opened a later deck
+    for filename in os.listdir(folder):
+        stale_path = os.path.join(folder, filename)
+        if (
+            stale_path == path
+            or not filename.startswith(prefix)
+            or not filename.endswith(".vvdeck")
+        ):
+            continue
+        try:
+            if os.stat(stale_path).st_mtime_ns <= compiled_at:
+                # Vocabularies still in use keep their mapping after the unlink
+                os.remove(stale_path)
+        except FileNotFoundError:
+            pass  # Removed by another process
+
+
+def _bulk(files: Sequence[_ParsedFile]) -> Tuple[Vocabulary, IngestReport]:
+    """Builds the vocabulary of parsed files and the report of their rows."""
+    vocabulary = Vocabulary(*_columns(files))
+    return vocabulary, _report(files, vocabulary.ids)
+
+
+def bulk_vocabulary(
+    folder: str, parsed: Dict[str, ParsedRows]
+) -> Tuple[Vocabulary, IngestReport]:
+    """
+    Builds the words of the CSV files of a folder from their already parsed rows.
+
+    The files are taken in the order a load reads them, so the words and the report are
+    the ones ``WordRepository.bulk_load`` returns for the folder.
+
+    Args:
+        folder (str): The folder holding the CSV files.
+        parsed (Dict[str, ParsedRows]): The rows of every CSV file, by file name.
+
+    Returns:
+        Tuple[Vocabulary, IngestReport]: The words and the report of the files.
+    """
+    return _bulk(
+        [_ParsedFile(filename, parsed[filename]) for filename in _csv_files(folder)]
+    )
 
 
 class WordRepository:
@@ -30,15 +262,25 @@ class WordRepository:
 
     Attributes:
         data_folder (str): The folder where CSV files containing words are stored.
+        files_parsed (int): The number of files parsed by the most recent load.
+        report (Optional[IngestReport]): The report of the most recent load that read
+            the CSV files, or None if the compiled deck was opened without reading them.
+        parse_workers (int): The largest number of processes parsing changed files.
+        chunk_bytes (int): The size above which a file is parsed in parallel chunks.
 
     Methods:
         load_words() -> List[Word]:
             Reads CSV files from the data folder and returns a list of Word objects.
+        close():
+            Shuts down the processes parsing changed files.
 
         Initializes the WordRepository with the specified data folder.
 
         Args:
             data_folder (str): The folder where CSV files containing words are stored. Defaults to "app/data".
+            parse_workers (int): The largest number of processes parsing changed files. Defaults to 1,
+                which parses them in the loading thread.
+            chunk_bytes (int): The size above which a file is split into chunks parsed in parallel.
 
         Reads CSV files from the data folder and returns a list of Word objects.
 
@@ -47,8 +289,32 @@ class WordRepository:
 
     """
 
-    def __init__(self, data_folder: str = "app/data"):
+    def __init__(
+        self,
+        data_folder: str = "app/data",
+        parse_workers: int = 1,
+        chunk_bytes: int = CHUNK_BYTES,
+    ):
         self.data_folder = data_folder
+        self.parse_workers = parse_workers
+        self.chunk_bytes = chunk_bytes
+        self.files_parsed = 0
+        self.report: Optional[IngestReport] = None
+        self._cache: Dict[str, _CachedFile] = {}
+        self._deck: Optional[MappedVocabulary] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def close(self):
+        """
+        Shuts down the processes parsing changed files, if any were started.
+        """
+        with self._load_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
 
     def load_words(self) -> List[Word]:
         """
@@ -56,19 +322,370 @@ class WordRepository:
 
         Each CSV file should contain rows with at least two columns: the first column for the foreign term
         and the second column for the native translation. The method iterates through all CSV files in the
-        data folder, reads their contents, and creates Word objects for each valid row.
+        data folder in name order, reads their contents, and creates Word objects for each valid row.
+
+        Files whose size and modification time are unchanged since the previous load are not read again.
+        Files whose metadata changed are hashed and only parsed if their content changed. When another
+        thread is already loading, the caller waits for that load and gets its result.
 
         Returns:
             List[Word]: A list of Word objects created from the CSV file contents.
         """
-        words = []
-        for filename in os.listdir(self.data_folder):
-            if filename.endswith(".csv"):
-                filepath = os.path.join(self.data_folder, filename)
-                with open(filepath, newline="", encoding="utf-8") as csvfile:
-                    reader = csv.reader(csvfile)
-                    for row in reader:
-                        if len(row) >= 2:
-                            word = Word(foreign_term=row[0], native_translation=row[1])
-                            words.append(word)
-        return words
+        return list(self._shared("words", self._load_words))
+
+    def bulk_load(self) -> Tuple[Vocabulary, IngestReport]:
+        """
+        Reads the CSV files of the data folder into a Vocabulary, with a report of the load.
+
+        The words are built as columns of strings, without validating a Word per row,
+        so loading a million rows costs little more than reading the CSV. Files are
+        cached like in ``load_words``. The report counts the files, rows and words,
+        lists the rows that were skipped with their file and line, and lists the rows
+        repeating an earlier word, which are loaded nonetheless.
+
+        Returns:
+            Tuple[Vocabulary, IngestReport]: The words in file name and row order, and
+            the report of the load.
+        """
+        return self._shared("bulk", self._bulk_load)
+
+    def load_vocabulary(self) -> Vocabulary:
+        """
+        Returns the words of the CSV files in the data folder as a compiled deck.
+
+        The compiled deck of the current CSV files is opened with ``mmap`` if it exists.
+        Otherwise the CSV files are loaded like in ``load_words`` and compiled first.
+        The same deck object is returned while the CSV files are unchanged.
+
+        Returns:
+            Vocabulary: The memory-mapped vocabulary.
+        """
+        return self._shared("vocabulary", self._load_vocabulary)
+
+    def store_vocabulary(self, vocabulary: Vocabulary) -> Vocabulary:
+        """
+        Compiles words that were already parsed from the current CSV files.
+
+        Used after an upload, so the uploaded files are not parsed a second time.
+
+        Args:
+            vocabulary (Vocabulary): The words of the CSV files in the data folder.
+
+        Returns:
+            Vocabulary: The memory-mapped vocabulary.
+        """
+        with self._load_lock:
+            path = self._deck_path()
+            compile_deck(path, vocabulary.foreign_terms, vocabulary.native_translations)
+            return self._open_deck(path)
+
+    def _shared(self, name: str, load: Callable[[], T]) -> T:
+        """Runs a load, or waits for the same load if another thread is running it."""
+        with self._lock:
+            flight = self._inflight.get(name)
+            owner = flight is None
+            if owner:
+                flight = self._inflight[name] = Future()
+        if not owner:
+            return flight.result()
+
+        try:
+            with self._load_lock:
+                start = time.perf_counter()
+                result = load()
+                WORD_RELOAD_DURATION.observe(time.perf_counter() - start)
+            flight.set_result(result)
+            return result
+        except BaseException as error:
+            flight.set_exception(error)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[name]
+
+    def _load_words(self) -> List[Word]:
+        construct = Word.model_construct
+        return [
+            construct(foreign_term=foreign_term, native_translation=native_translation)
+            for foreign_term, native_translation in zip(*_columns(self._load()))
+        ]
+
+    def _bulk_load(self) -> Tuple[Vocabulary, IngestReport]:
+        vocabulary, self.report = _bulk(self._load())
+        return vocabulary, self.report
+
+    def _load_vocabulary(self) -> Vocabulary:
+        self.files_parsed = 0
+        path = self._deck_path()
+        if self._deck is not None and self._deck.path == path:
+            return self._deck
+        if not os.path.exists(path):
+            files = self._load()
+            foreign_terms, native_translations = _columns(files)
+            word_ids = list(map(make_word_id, foreign_terms, native_translations))
+            self.report = _report(files, word_ids)
+            compile_deck(path, foreign_terms, native_translations, word_ids)
+        else:
+            self.report = None
+        return self._open_deck(path)
+
+    def _deck_path(self) -> str:
+        """Returns the path of the compiled deck for the current CSV files."""
+        folder = current_folder(self.data_folder)
+        fingerprint = hashlib.blake2b(MAGIC, digest_size=16)
+        fingerprint.update(os.path.basename(folder).encode() + b"\n")
+        for filename in _csv_files(folder):
+            stat = os.stat(os.path.join(folder, filename))
+            fingerprint.update(
+                f"{filename}\x00{stat.st_size}\x00{stat.st_mtime_ns}\n".encode()
+            )
+        folder = os.path.join(self.data_folder, COMPILED_FOLDER)
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, f"deck-{fingerprint.hexdigest()}.vvdeck")
+
+    def _open_deck(self, path: str) -> MappedVocabulary:
+        """Opens a compiled deck and removes the decks of earlier CSV files."""
+        self._deck = MappedVocabulary(path)
+        _remove_older_decks(path, "deck-")
+        return self._deck
+
+    def _load(self) -> List[_ParsedFile]:
+        folder = current_folder(self.data_folder)
+        # Cached by name, so the unchanged files of a new version are not parsed again
+        cache: Dict[str, _CachedFile] = {}
+        changed: Dict[str, str] = {}
+        for filename in _csv_files(folder):
+            filepath = os.path.join(folder, filename)
+            try:
+                stat = os.stat(filepath)
+            except FileNotFoundError:
+                continue  # Removed while listing
+            cached = self._cache.get(filename)
+            if (
+                cached is None
+                or cached.size != stat.st_size
+                or cached.mtime_ns != stat.st_mtime_ns
+            ):
+                # Hashed block by block; the parser reads the changed files itself
+                with open(filepath, "rb") as csvfile:
+                    digest = hashlib.file_digest(csvfile, "blake2b").digest()
+                if cached is None or cached.digest != digest:
+                    cached = _CachedFile(0, 0, digest, None)
+                    changed[filename] = filepath
+                cached.size = stat.st_size
+                cached.mtime_ns = stat.st_mtime_ns
+            cache[filename] = cached
+        if self.parse_workers > 1 and changed and self._pool is None:
+            self._pool = start_pool(self.parse_workers)
+        try:
+            parsed = parse_files(
+                list(changed.values()),
+                self.parse_workers,
+                self.chunk_bytes,
+                self._pool,
+            )
+        except BrokenProcessPool:
+            # A worker died; the next load starts a new pool
+            self._pool.shutdown(wait=False)
+            self._pool = None
+            raise
+        for filename, rows in zip(changed, parsed):
+            cache[filename].parsed = _ParsedFile(filename, rows)
+        self._cache = cache  # Removed files are dropped
+        self.files_parsed = len(changed)
+        WORD_FILES_PARSED.inc(len(changed))
+        return [cached.parsed for cached in cache.values()]
+
+
+class UnknownDeckError(LookupError):
+    """Raised when no deck has the requested id."""
+
+
+class DeckRegistry:
+    """
+    Serves the CSV files of a data folder as separately loaded, named decks.
+
+    Every CSV file in the data folder is a deck whose id is the file name without the
+    ``.csv`` extension, and every subfolder is a deck of all CSV files in it. A bundle
+    and a file with the same id are served as the bundle. Folders starting with a dot
+    are ignored. The files are read from the current version of the data folder and
+    of every bundle.
+
+    A deck is compiled into ``.compiled/decks`` on first use and opened with ``mmap``.
+    The opened decks are kept in least recently used order; when their total size
+    exceeds ``budget_bytes``, the least recently used decks are dropped. A dropped deck
+    is unmapped once no quiz uses it anymore and is opened again from its compiled file
+    on the next use. A deck whose CSV files changed is compiled again.
+
+    Attributes:
+        data_folder (str): The folder holding the CSV files and bundles.
+        budget_bytes (int): The total size of the decks kept open.
+    """
+
+    def __init__(self, data_folder: str = "app/data", budget_bytes: int = 256 << 20):
+        self.data_folder = data_folder
+        self.budget_bytes = budget_bytes
+        self._decks: "OrderedDict[str, MappedVocabulary]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @staticmethod
+    def is_valid_id(deck_id: str) -> bool:
+        """Returns True if the id may be used for a new deck bundle."""
+        return DECK_ID_PATTERN.fullmatch(deck_id) is not None
+
+    def deck_ids(self) -> List[str]:
+        """
+        Returns the ids of the decks in the data folder.
+
+        Returns:
+            List[str]: The deck ids in name order.
+        """
+        ids = {
+            filename[: -len(".csv")]
+            for filename in _csv_files(current_folder(self.data_folder))
+        }
+        for entry in os.scandir(self.data_folder):
+            if not entry.name.startswith(".") and entry.is_dir():
+                ids.add(entry.name)
+        return sorted(ids)
+
+    @property
+    def loaded_bytes(self) -> int:
+        """The total size of the decks kept open."""
+        with self._lock:
+            return sum(deck.nbytes for deck in self._decks.values())
+
+    def loaded(self) -> Dict[str, int]:
+        """Returns the number of words of every deck kept open, by deck id."""
+        with self._lock:
+            return {deck_id: len(deck) for deck_id, deck in self._decks.items()}
+
+    def get(self, deck_id: str) -> Vocabulary:
+        """
+        Returns the words of a deck, opening or compiling the deck if needed.
+
+        Args:
+            deck_id (str): The id of the deck.
+
+        Raises:
+            UnknownDeckError: If there is no deck with the given id, or its files kept
+                being replaced while they were read.
+
+        Returns:
+            Vocabulary: The memory-mapped words of the deck.
+        """
+        for _ in range(RESOLVE_ATTEMPTS):
+            try:
+                return self._get(deck_id)
+            except FileNotFoundError:
+                continue  # An upload published a new version while it was read
+        raise UnknownDeckError(deck_id)
+
+    def _get(self, deck_id: str) -> Vocabulary:
+        sources = self._sources(deck_id)
+        path = self._deck_path(deck_id, sources)
+        with self._lock:
+            deck = self._decks.get(deck_id)
+            if deck is not None and deck.path == path:
+                self._decks.move_to_end(deck_id)
+                return deck
+        with self._load_lock:
+            with self._lock:
+                deck = self._decks.get(deck_id)
+                if deck is not None and deck.path == path:
+                    return deck  # Opened by the thread holding the lock before
+            if not os.path.exists(path):
+                compile_deck(
+                    path,
+                    *_columns([self._parse_file(source) for source in sources]),
+                )
+            return self._open(deck_id, path)
+
+    def peek(self, deck_id: str) -> Optional[Vocabulary]:
+        """
+        Returns the words of a deck if the deck is open, without opening it.
+
+        Args:
+            deck_id (str): The id of the deck.
+
+        Returns:
+            Optional[Vocabulary]: The open version of the deck, or None.
+        """
+        with self._lock:
+            return self._decks.get(deck_id)
+
+    def store(self, deck_id: str, vocabulary: Vocabulary) -> Vocabulary:
+        """
+        Compiles words that were already parsed from the current files of a deck.
+
+        Used after an upload, so the uploaded files are not parsed a second time.
+
+        Args:
+            deck_id (str): The id of the deck.
+            vocabulary (Vocabulary): The words of the CSV files of the deck.
+
+        Returns:
+            Vocabulary: The memory-mapped words of the deck.
+        """
+        with self._load_lock:
+            path = self._deck_path(deck_id, self._sources(deck_id))
+            compile_deck(path, vocabulary.foreign_terms, vocabulary.native_translations)
+            return self._open(deck_id, path)
+
+    def _sources(self, deck_id: str) -> List[str]:
+        """Returns the CSV files of a deck in name order."""
+        if DECK_ID_PATTERN.fullmatch(deck_id) is None and (
+            # Decks of existing CSV files keep their file name, which may not match
+            not deck_id or deck_id.startswith(".") or deck_id not in self.deck_ids()
+        ):
+            raise UnknownDeckError(deck_id)
+        folder = os.path.join(self.data_folder, deck_id)
+        if os.path.isdir(folder):
+            folder = current_folder(folder)
+            return [os.path.join(folder, filename) for filename in _csv_files(folder)]
+        path = os.path.join(current_folder(self.data_folder), deck_id + ".csv")
+        if os.path.isfile(path):
+            return [path]
+        raise UnknownDeckError(deck_id)
+
+    def _deck_path(self, deck_id: str, sources: List[str]) -> str:
+        """Returns the path of the compiled deck for the current files of a deck."""
+        fingerprint = hashlib.blake2b(MAGIC, digest_size=16)
+        for source in sources:
+            stat = os.stat(source)
+            fingerprint.update(
+                f"{os.path.relpath(source, self.data_folder)}\x00{stat.st_size}"
+                f"\x00{stat.st_mtime_ns}\n".encode()
+            )
+        return os.path.join(
+            self._compiled_folder(),
+            f"{self._key(deck_id)}-{fingerprint.hexdigest()}.vvdeck",
+        )
+
+    def _compiled_folder(self) -> str:
+        folder = os.path.join(self.data_folder, COMPILED_FOLDER, DECKS_FOLDER)
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    @staticmethod
+    def _key(deck_id: str) -> str:
+        """Returns a file name safe key of fixed length for a deck id."""
+        return hashlib.blake2b(deck_id.encode(), digest_size=8).hexdigest()
+
+    def _open(self, deck_id: str, path: str) -> MappedVocabulary:
+        """Opens a compiled deck, removes its earlier versions and applies the budget."""
+        deck = MappedVocabulary(path)
+        _remove_older_decks(path, self._key(deck_id) + "-")
+        with self._lock:
+            self._decks[deck_id] = deck
+            self._decks.move_to_end(deck_id)
+            total = sum(open_deck.nbytes for open_deck in self._decks.values())
+            while total > self.budget_bytes and len(self._decks) > 1:
+                _, evicted = self._decks.popitem(last=False)
+                total -= evicted.nbytes
+        return deck
+
+    @staticmethod
+    def _parse_file(path: str) -> _ParsedFile:
+        return _ParsedFile(os.path.basename(path), parse_files([path])[0])
@@ -0,0 +1,86 @@
+"""
+app/interfaces/responses.py
+This module provides the JSON response used by the quiz endpoints.
+
+FastAPI validates the value returned by an endpoint against its response model and
+converts it with ``jsonable_encoder`` before it is encoded. The quiz endpoints return
+small dicts and words whose JSON was encoded when the vocabulary was loaded, so they
+return a FastJSONResponse instead, which skips both steps: dicts are encoded with
+``json.dumps`` and pre-encoded JSON is copied into the body as it is.
+
+Pre-encoded JSON is passed as ``bytes``, either as the whole content or as a value of a
+top-level key of a dict, for example the next word of an answer result.
+
+Classes:
+    - FastJSONResponse: A JSON response that sends pre-encoded JSON as it is.
+
+Functions:
+    - render_json(content): Encodes content that may contain pre-encoded JSON.
+    - json_array(items): Joins pre-encoded JSON values into a JSON array.
+
+Dependencies:
+    - json: Used for encoding the dicts.
+    - starlette.responses: Provides the Response base class.
+"""
+
+import json
+from typing import Any, Iterable
+
+from starlette.responses import Response
+
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def json_array(items: Iterable[bytes]) -> bytes:
+    """
+    Joins pre-encoded JSON values into a JSON array.
+
+    Args:
+        items (Iterable[bytes]): The encoded values.
+
+    Returns:
+        bytes: The encoded array.
+    """
+    return b"[" + b",".join(items) + b"]"
+
+
+def render_json(content: Any) -> bytes:
+    """
+    Encodes content that may contain pre-encoded JSON.
+
+    Args:
+        content (Any): Pre-encoded JSON as ``bytes``, or a value ``json.dumps`` can
+            encode. ``bytes`` values of a dict are inserted as pre-encoded JSON; the
+            keys holding them come last.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON.
+    """
+    if isinstance(content, bytes):
+        return content
+    if not isinstance(content, dict):
+        return _encode(content).encode("utf-8")
+    encoded = {key: value for key, value in content.items() if isinstance(value, bytes)}
+    if not encoded:
+        return _encode(content).encode("utf-8")
+    plain = {key: value for key, value in content.items() if key not in encoded}
+    parts = [_encode(plain)[:-1].encode("utf-8")]
+    separator = b"," if plain else b""
+    for key, value in encoded.items():
+        parts.append(separator + _encode(key).encode("utf-8") + b":" + value)
+        separator = b","
+    parts.append(b"}")
+    return b"".join(parts)
+
+
+class FastJSONResponse(Response):
+    """
+    A JSON response that sends pre-encoded JSON as it is.
+
+    Returned directly by an endpoint, it is not validated against the response model.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
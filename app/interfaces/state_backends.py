@@ -0,0 +1,521 @@
+"""
+app/interfaces/state_backends.py
+This module provides the backends that store the quiz state of every learner session.
+
+A backend maps session ids to QuizState objects and forgets sessions that have been idle
+for longer than its TTL. The in-memory backend keeps the state objects of one process
+and is the default. The SQLite backend stores the states as JSON in a database file in
+WAL mode, so several worker processes on one node read and write the same sessions and a
+learner can be served by any worker without sticky sessions. The answered words of a
+quiz, the only part of a state that grows with every answer, are stored as rows of their
+own, so saving a state after an answer appends the new words instead of rewriting all of
+them.
+
+Classes:
+    - QuizStateBackend: The interface of a quiz state backend.
+    - TimingWheel: A hashed timing wheel used by the in-memory backend for expiry.
+    - InMemoryStateBackend: Keeps the quiz states in process memory.
+    - SqliteStateBackend: Keeps the quiz states in a shared SQLite database.
+
+Dependencies:
+    - sqlite3: Used for the shared database.
+    - threading: Used for guarding the in-memory sessions and the per-thread connections.
+    - app.domain.models.QuizState: The stored quiz state.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Hashable, List, Optional, Set
+
+from app.domain.models import QuizState
+
+
+class QuizStateBackend(ABC):
+    """
+    The interface of a quiz state backend.
+
+    Attributes:
+    ----------
+    ttl_seconds : float
+        How long an idle session is kept before it is expired.
+    max_sessions : int
+        The maximum number of sessions kept at once.
+    keeps_state_objects : bool
+        True if ``load`` returns the stored state objects themselves, so changes to a
+        loaded state are stored without calling ``save``.
+    """
+
+    ttl_seconds: float
+    max_sessions: int
+    keeps_state_objects = False
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[QuizState]:
+        """
+        Returns the state of a session and marks the session as used.
+
+        Args:
+            session_id (str): The identifier of the learner session.
+
+        Returns:
+            Optional[QuizState]: The state, or None if the session is unknown or expired.
+        """
+
+    @abstractmethod
+    def save(self, session_id: str, state: QuizState):
+        """
+        Stores the state of a session and marks the session as used.
+
+        Args:
+            session_id (str): The identifier of the learner session.
+            state (QuizState): The state to store.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Forgets a session. Unknown session ids are ignored."""
+
+    @abstractmethod
+    def expire(self) -> int:
+        """
+        Expires the sessions that have been idle longer than the TTL.
+
+        Returns:
+            int: The number of expired sessions.
+        """
+
+    @abstractmethod
+    def vocabularies_in_use(self) -> Set[str]:
+        """
+        Returns the fingerprints of the vocabularies the stored sessions refer to.
+
+        Returns:
+            Set[str]: The ``QuizState.vocabulary`` values of the live sessions.
+        """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Returns the number of stored sessions."""
+
+    @abstractmethod
+    def __contains__(self, session_id: str) -> bool:
+        """Returns True if the session is stored."""
+
+    def close(self):
+        """Releases the resources of the backend."""
+
+
+class TimingWheel:
+    """A hashed timing wheel that buckets keys by the tick of their deadline.
+
+    The wheel has a fixed number of slots, each covering ``tick`` seconds. Deadlines
+    further away than one revolution land in a slot that fires early, so callers must
+    re-check the real deadline of every key returned by ``advance`` and reschedule the
+    keys that are not due yet.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512, now: float = 0.0):
+        """Initializes an empty wheel.
+
+        Parameters
+        ----------
+        tick : float
+            Length of one slot in seconds.
+        slots : int
+            Number of slots in the wheel.
+        now : float
+            Current time, used as the starting position of the wheel.
+        """
+        self.tick = tick
+        self._slots: List[Set[Hashable]] = [set() for _ in range(slots)]
+        self._cursor = math.floor(now / tick)
+
+    def schedule(self, key: Hashable, deadline: float):
+        """Schedules a key to be returned once the given deadline has passed."""
+        deadline_tick = max(math.ceil(deadline / self.tick), self._cursor + 1)
+        self._slots[deadline_tick % len(self._slots)].add(key)
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Moves the wheel forward to ``now`` and returns the keys of the passed slots."""
+        target = math.floor(now / self.tick)
+        fired: List[Hashable] = []
+        last = min(target, self._cursor + len(self._slots))
+        for tick in range(self._cursor + 1, last + 1):
+            slot = self._slots[tick % len(self._slots)]
+            if slot:
+                fired.extend(slot)
+                slot.clear()
+        self._cursor = max(self._cursor, target)
+        return fired
+
+
+class _Session:
+    """A single learner session: its quiz state and the time it was last used."""
+
+    __slots__ = ("state", "last_seen")
+
+    def __init__(self, state: QuizState, last_seen: float):
+        self.state = state
+        self.last_seen = last_seen
+
+
+class InMemoryStateBackend(QuizStateBackend):
+    """
+    Keeps the quiz states in process memory.
+
+    The stored state objects are returned as they are, so a service changes the stored
+    state in place and saving it again only marks the session as used.
+
+    Idle sessions are expired with a hashed timing wheel: a session is bucketed by the
+    tick at which it would expire and only the buckets whose tick has passed are
+    inspected. A session that was used after it was bucketed is simply moved to its new
+    bucket, so touching a session is O(1) and expiring sessions is proportional to the
+    number of candidates, not to the number of sessions. On top of the TTL the backend
+    keeps at most ``max_sessions`` sessions and evicts the least recently used one when
+    it is full.
+    """
+
+    keeps_state_objects = True
+
+    def __init__(
+        self,
+        ttl_seconds: float = 1800.0,
+        max_sessions: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initializes an empty backend.
+
+        Args:
+            ttl_seconds (float): How long an idle session is kept before it is expired.
+            max_sessions (int): The maximum number of sessions kept at once.
+            clock (Callable[[], float]): Monotonic time source in seconds.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._clock = clock
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._wheel = TimingWheel(
+            tick=max(ttl_seconds / 256, 0.001), slots=512, now=clock()
+        )
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def load(self, session_id: str) -> Optional[QuizState]:
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            session.last_seen = now
+            self._sessions.move_to_end(session_id)
+            return session.state
+
+    def save(self, session_id: str, state: QuizState):
+        with self._lock:
+            now = self._clock()
+            session = self._sessions.get(session_id)
+            if session is None:
+                self._sessions[session_id] = _Session(state, now)
+                self._wheel.schedule(session_id, now + self.ttl_seconds)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                session.state = state
+                session.last_seen = now
+                self._sessions.move_to_end(session_id)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def expire(self) -> int:
+        with self._lock:
+            return self._expire(self._clock())
+
+    def vocabularies_in_use(self) -> Set[str]:
+        with self._lock:
+            self._expire(self._clock())
+            return {session.state.vocabulary for session in self._sessions.values()}
+
+    def _expire(self, now: float) -> int:
+        expired = 0
+        for session_id in self._wheel.advance(now):
+            session = self._sessions.get(session_id)
+            if session is None:
+                continue  # Already evicted or removed
+            deadline = session.last_seen + self.ttl_seconds
+            if deadline <= now:
+                del self._sessions[session_id]
+                expired += 1
+            else:
+                self._wheel.schedule(session_id, deadline)
+        return expired
+
+
+class SqliteStateBackend(QuizStateBackend):
+    """
+    Keeps the quiz states in a SQLite database shared by the processes of one node.
+
+    The database runs in WAL mode, so readers do not block the writer and every worker
+    process can open it at the same time. Each thread uses its own connection. A state
+    is stored as JSON together with the time the session was last used; loading a
+    session updates that time in the same transaction. The correctly and incorrectly
+    answered words are stored in order in ``quiz_answer``; a save only inserts the
+    words answered since the stored ones, and drops them all when a new quiz started.
+    Expired and surplus sessions are deleted by a sweep that runs at most once per
+    ``ttl_seconds / 256`` per process.
+
+    Two requests of the same session that are served at the same time by different
+    workers are not serialized; the state written last wins.
+    """
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS quiz_state ("
+        " session_id TEXT PRIMARY KEY,"
+        " state TEXT NOT NULL,"
+        " last_seen REAL NOT NULL,"
+        " quiz_start TEXT)",
+        "CREATE INDEX IF NOT EXISTS quiz_state_last_seen ON quiz_state (last_seen)",
+        "CREATE TABLE IF NOT EXISTS quiz_answer ("
+        " session_id TEXT NOT NULL,"
+        " correct INTEGER NOT NULL,"
+        " seq INTEGER NOT NULL,"
+        " term TEXT NOT NULL,"
+        " PRIMARY KEY (session_id, correct, seq)) WITHOUT ROWID",
+    )
+    # The answered words, stored as rows instead of in the state JSON
+    _ANSWERED = {"correct_words": 1, "incorrect_words": 0}
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = 1800.0,
+        max_sessions: int = 10000,
+        clock: Callable[[], float] = time.time,
+        busy_timeout: float = 5.0,
+    ):
+        """
+        Opens the database and creates its table if needed.
+
+        Args:
+            path (str): The path of the database file.
+            ttl_seconds (float): How long an idle session is kept before it is expired.
+            max_sessions (int): The maximum number of sessions kept at once.
+            clock (Callable[[], float]): Wall clock time source in seconds, shared by
+                all processes using the database.
+            busy_timeout (float): How long a statement waits for a lock in seconds.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.busy_timeout = busy_timeout
+        self._clock = clock
+        self._sweep_interval = max(ttl_seconds / 256, 0.001)
+        self._next_sweep = clock() + self._sweep_interval
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        for statement in self._SCHEMA:
+            connection.execute(statement)
+        columns = {
+            row[1] for row in connection.execute("PRAGMA table_info(quiz_state)")
+        }
+        if "quiz_start" not in columns:
+            # Databases of earlier versions keep the answered words in the JSON
+            connection.execute("ALTER TABLE quiz_state ADD COLUMN quiz_start TEXT")
+
+    def __len__(self) -> int:
+        (count,) = (
+            self._connection().execute("SELECT COUNT(*) FROM quiz_state").fetchone()
+        )
+        return count
+
+    def __contains__(self, session_id: str) -> bool:
+        row = (
+            self._connection()
+            .execute(
+                "SELECT 1 FROM quiz_state WHERE session_id = ? AND last_seen > ?",
+                (session_id, self._clock() - self.ttl_seconds),
+            )
+            .fetchone()
+        )
+        return row is not None
+
+    def load(self, session_id: str) -> Optional[QuizState]:
+        now = self._clock()
+        if now >= self._next_sweep:
+            self.expire()
+        connection = self._connection()
+        with _transaction(connection):
+            row = connection.execute(
+                "UPDATE quiz_state SET last_seen = ?"
+                " WHERE session_id = ? AND last_seen > ? RETURNING state",
+                (now, session_id, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                return None
+            answered = connection.execute(
+                "SELECT correct, term FROM quiz_answer WHERE session_id = ?"
+                " ORDER BY correct, seq",
+                (session_id,),
+            ).fetchall()
+        state = QuizState.model_validate_json(row[0])
+        if answered:
+            state.correct_words = [term for correct, term in answered if correct]
+            state.incorrect_words = [term for correct, term in answered if not correct]
+        return state
+
+    def save(self, session_id: str, state: QuizState):
+        quiz_start = state.start_time.isoformat()
+        connection = self._connection()
+        with _transaction(connection):
+            row = connection.execute(
+                "SELECT quiz_start FROM quiz_state WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None or row[0] != quiz_start:
+                # The stored words belong to another quiz
+                connection.execute(
+                    "DELETE FROM quiz_answer WHERE session_id = ?", (session_id,)
+                )
+            connection.execute(
+                "INSERT INTO quiz_state (session_id, state, last_seen, quiz_start)"
+                " VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (session_id) DO UPDATE"
+                " SET state = excluded.state, last_seen = excluded.last_seen,"
+                " quiz_start = excluded.quiz_start",
+                (
+                    session_id,
+                    state.model_dump_json(exclude=set(self._ANSWERED)),
+                    self._clock(),
+                    quiz_start,
+                ),
+            )
+            for field, correct in self._ANSWERED.items():
+                self._append_answered(
+                    connection, session_id, correct, getattr(state, field)
+                )
+
+    @staticmethod
+    def _append_answered(
+        connection: sqlite3.Connection, session_id: str, correct: int, terms: List[str]
+    ):
+        """Stores the answered words beyond the stored ones."""
+        (stored,) = connection.execute(
+            "SELECT COUNT(*) FROM quiz_answer WHERE session_id = ? AND correct = ?",
+            (session_id, correct),
+        ).fetchone()
+        if stored > len(terms):
+            connection.execute(
+                "DELETE FROM quiz_answer WHERE session_id = ? AND correct = ?"
+                " AND seq >= ?",
+                (session_id, correct, len(terms)),
+            )
+        connection.executemany(
+            "INSERT INTO quiz_answer (session_id, correct, seq, term)"
+            " VALUES (?, ?, ?, ?)",
+            (
+                (session_id, correct, seq, terms[seq])
+                for seq in range(stored, len(terms))
+            ),
+        )
+
+    def delete(self, session_id: str):
+        connection = self._connection()
+        with _transaction(connection):
+            connection.execute(
+                "DELETE FROM quiz_state WHERE session_id = ?", (session_id,)
+            )
+            connection.execute(
+                "DELETE FROM quiz_answer WHERE session_id = ?", (session_id,)
+            )
+
+    def expire(self) -> int:
+        now = self._clock()
+        self._next_sweep = now + self._sweep_interval
+        connection = self._connection()
+        with _transaction(connection):
+            expired = connection.execute(
+                "DELETE FROM quiz_state WHERE last_seen <= ? RETURNING session_id",
+                (now - self.ttl_seconds,),
+            ).fetchall()
+            expired += connection.execute(
+                "DELETE FROM quiz_state WHERE session_id IN ("
+                " SELECT session_id FROM quiz_state"
+                " ORDER BY last_seen DESC LIMIT -1 OFFSET ?) RETURNING session_id",
+                (self.max_sessions,),
+            ).fetchall()
+            connection.executemany(
+                "DELETE FROM quiz_answer WHERE session_id = ?", expired
+            )
+        return len(expired)
+
+    def vocabularies_in_use(self) -> Set[str]:
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT DISTINCT json_extract(state, '$.vocabulary') FROM quiz_state"
+                " WHERE last_seen > ?",
+                (self._clock() - self.ttl_seconds,),
+            )
+            .fetchall()
+        )
+        return {fingerprint for (fingerprint,) in rows}
+
+    def close(self):
+        """Closes the connections of all threads."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+
+@contextmanager
+def _transaction(connection: sqlite3.Connection):
+    """
+    Runs the statements of the block in one write transaction.
+
+    The connections are in autocommit mode, so the transaction is begun explicitly. It
+    takes the write lock at once, so it does not fail upgrading a read lock while
+    another worker writes.
+    """
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
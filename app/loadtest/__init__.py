@@ -0,0 +1,3 @@
+# app/loadtest/__init__.py
+
+# This file is intentionally left blank to mark the directory as a Python package.
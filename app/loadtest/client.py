@@ -0,0 +1,340 @@
+"""
+app/loadtest/client.py
+This module provides the client and the latency statistics of the load tools.
+
+The AsgiTransport sends requests to an ASGI application in-process, on the event loop
+of the caller, so concurrent learners compete for the same event loop as they would in
+a server, without any network or HTTP parsing. It also runs the lifespan of the
+application, so the services are created and the words loaded like on a server start.
+
+The HttpTransport sends the same requests over HTTP/1.1 to a running server, such as a
+local uvicorn, on a pool of keep-alive connections. It only implements what the quiz
+endpoints need, so the load tools need no HTTP client library.
+
+Classes:
+    - AsgiTransport: Sends requests to an ASGI application in-process.
+    - HttpTransport: Sends requests to a server over HTTP/1.1 keep-alive connections.
+    - Latencies: Collects the latencies of requests by label.
+
+Functions:
+    - percentile(sorted_values, percent): Returns the nearest-rank percentile.
+
+Dependencies:
+    - asyncio: Used for running the lifespan, awaiting the application and for the
+      connections to a server.
+"""
+
+import asyncio
+import json
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+Headers = Iterable[Tuple[str, str]]
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """Returns the nearest-rank percentile of sorted values, or 0 if there are none."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class AsgiTransport:
+    """
+    Sends requests to an ASGI application in-process.
+
+    Attributes:
+    ----------
+    app : ASGI application
+        The application receiving the requests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lifespan: Optional[asyncio.Task] = None
+        self._lifespan_messages: "asyncio.Queue[dict]" = asyncio.Queue()
+        self._lifespan_replies: "asyncio.Queue[dict]" = asyncio.Queue()
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        headers: Headers = (),
+        body: Optional[object] = None,
+    ) -> Tuple[int, bytes]:
+        """
+        Sends one request.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The path, optionally with a query string.
+            headers (Headers): The request headers as name and value pairs.
+            body (Optional[object]): A JSON body.
+
+        Returns:
+            Tuple[int, bytes]: The status code and the response body.
+        """
+        path, _, query = path.partition("?")
+        payload = b"" if body is None else json.dumps(body).encode()
+        raw_headers = [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers
+        ]
+        if body is not None:
+            raw_headers.append((b"content-type", b"application/json"))
+            raw_headers.append((b"content-length", str(len(payload)).encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("loadtest", 80),
+        }
+        request_sent = False
+        disconnected = asyncio.Event()
+        status = 500
+        chunks = []
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": payload, "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            disconnected.set()
+        return status, b"".join(chunks)
+
+    async def startup(self, ready_path: Optional[str] = "/readyz", timeout=60.0):
+        """
+        Runs the startup of the application lifespan and waits until it is ready.
+
+        Args:
+            ready_path (Optional[str]): A path answering 200 once the application is
+                ready, polled after the startup; None to skip waiting.
+            timeout (float): The seconds to wait for the application to become ready.
+
+        Raises:
+            RuntimeError: If the startup fails or the application is not ready in time.
+        """
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}
+        self._lifespan = asyncio.ensure_future(
+            self.app(scope, self._lifespan_messages.get, self._lifespan_replies.put)
+        )
+        await self._lifespan_messages.put({"type": "lifespan.startup"})
+        reply = await self._lifespan_replies.get()
+        if reply["type"] != "lifespan.startup.complete":
+            raise RuntimeError(reply.get("message") or "The startup failed")
+        if ready_path is None:
+            return
+        deadline = time.monotonic() + timeout
+        while (await self.request("GET", ready_path))[0] != 200:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{ready_path} did not answer 200 in time")
+            await asyncio.sleep(0.05)
+
+    async def shutdown(self):
+        """Runs the shutdown of the application lifespan, if it was started."""
+        if self._lifespan is None:
+            return
+        await self._lifespan_messages.put({"type": "lifespan.shutdown"})
+        await self._lifespan_replies.get()
+        await self._lifespan
+        self._lifespan = None
+
+
+class HttpTransport:
+    """
+    Sends requests to a server over HTTP/1.1 keep-alive connections.
+
+    Attributes:
+    ----------
+    base_url : str
+        The URL of the server, such as ``http://127.0.0.1:8000``; a path is prefixed
+        to every request path.
+    connections : int
+        The largest number of open connections. Requests wait for a free connection.
+    """
+
+    def __init__(self, base_url: str, connections: int = 100):
+        url = urlsplit(base_url)
+        if url.scheme != "http" or not url.hostname:
+            raise ValueError("Only http:// URLs are supported")
+        self.base_url = base_url
+        self.connections = connections
+        self._host = url.hostname
+        self._port = url.port or 80
+        self._prefix = url.path.rstrip("/")
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        headers: Headers = (),
+        body: Optional[object] = None,
+    ) -> Tuple[int, bytes]:
+        """
+        Sends one request.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The path, optionally with a query string.
+            headers (Headers): The request headers as name and value pairs.
+            body (Optional[object]): A JSON body.
+
+        Raises:
+            OSError: If the server cannot be reached or closes the connection.
+
+        Returns:
+            Tuple[int, bytes]: The status code and the response body.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.connections)
+        payload = b"" if body is None else json.dumps(body).encode()
+        lines = [
+            f"{method} {self._prefix}{path} HTTP/1.1",
+            f"Host: {self._host}:{self._port}",
+            f"Content-Length: {len(payload)}",
+        ]
+        if body is not None:
+            lines.append("Content-Type: application/json")
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        message = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload
+        async with self._slots:
+            reader, writer = await self._connection()
+            try:
+                writer.write(message)
+                status, content, keep_alive = await self._read_response(reader)
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+        return status, content
+
+    async def _connection(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return await asyncio.open_connection(self._host, self._port)
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("The server closed the connection")
+        status = int(status_line.split()[1])
+        length = 0
+        chunked = False
+        keep_alive = True
+        while True:
+            line = (await reader.readline()).strip()
+            if not line:
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            value = value.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding":
+                chunked = "chunked" in value
+            elif name == "connection":
+                keep_alive = value != "close"
+        if not chunked:
+            return status, await reader.readexactly(length), keep_alive
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            chunks.append(await reader.readexactly(size + 2))
+            if size == 0:
+                break
+        return status, b"".join(chunk[:-2] for chunk in chunks), keep_alive
+
+    async def close(self):
+        """Closes the idle connections."""
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+class Latencies:
+    """
+    Collects the latencies of requests by label.
+
+    Attributes:
+    ----------
+    timings : Dict[str, List[float]]
+        The latencies of every label in seconds.
+    errors : Dict[str, int]
+        The number of failed requests of every label.
+    """
+
+    def __init__(self):
+        self.timings: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add(self, label: str, seconds: float, failed: bool = False):
+        """Adds the latency of a request, and counts it as an error if it failed."""
+        self.timings.setdefault(label, []).append(seconds)
+        if failed:
+            self.errors[label] = self.errors.get(label, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, object]:
+        """
+        Returns the counts, throughput and latency percentiles.
+
+        Args:
+            elapsed (float): The wall time of the run in seconds.
+
+        Returns:
+            Dict[str, object]: The totals of all requests, and the same values per
+            label under ``routes``.
+        """
+        routes = {
+            label: self._summarize(timings, self.errors.get(label, 0), elapsed)
+            for label, timings in sorted(self.timings.items())
+        }
+        every = [seconds for timings in self.timings.values() for seconds in timings]
+        return {
+            **self._summarize(every, sum(self.errors.values()), elapsed),
+            "elapsed_s": round(elapsed, 3),
+            "routes": routes,
+        }
+
+    @staticmethod
+    def _summarize(timings: List[float], errors: int, elapsed: float) -> dict:
+        timings = sorted(timings)
+        return {
+            "requests": len(timings),
+            "errors": errors,
+            "throughput_rps": round(len(timings) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(timings, 50) * 1000, 3),
+            "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        }
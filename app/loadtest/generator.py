@@ -0,0 +1,534 @@
+"""
+app/loadtest/generator.py
+This module simulates concurrent learners to find where the application saturates.
+
+Every simulated learner runs full quizzes: it starts a quiz, asks for a word, thinks,
+answers and asks for the next word until the quiz ends, then ends the quiz, which logs
+its result, and starts the next one. A share of the learners quizzes in ``infinite``
+mode, where a quiz never runs out of words; their quizzes end after a number of
+answers. Answers are wrong with the error rate, think times are drawn from an
+exponential distribution, and the learners start spread over a ramp-up time.
+
+The load runs against the application in-process, over an AsgiTransport, or against a
+running server such as a local uvicorn, over an HttpTransport. Besides the throughput
+and latency of every route, the report shows what saturates:
+
+- ``event_loop``: how late a timer on the event loop of the load fires and the share
+  of the wall time the process used the CPU. In-process this is the event loop of the
+  application, shared with the learners; a CPU share near 1 or a lag of many
+  milliseconds means requests wait for the loop. Against a server it is the loop of
+  the load generator, and a saturated generator makes the results unreliable.
+- ``word_service``: in-process, the time spent in the WordService methods and its
+  share of the wall time; close to 1 means the quiz logic alone fills the loop.
+- ``server``: the mean time per request from ``/metrics``, from entering the
+  application to the response, including waits for the event loop. Client latencies
+  far above it mean requests queue before they reach the application.
+- ``logger``: the largest depth of the quiz logger and answer log queues, sampled from
+  ``/metrics``. A queue near its capacity means the writers fall behind, and a full
+  queue blocks the requests that end quizzes or grade answers.
+
+Run it with ``python -m app.loadtest.generator [--url URL] [options]``; see ``--help``.
+
+Classes:
+    - LoadProfile: The simulated learners and their behaviour.
+    - LoopMonitor: Measures how late timers on the event loop fire.
+    - WordServiceTimer: Times the WordService methods of an in-process run.
+
+Functions:
+    - run_load(transport, profile, services): Runs a load and returns the report.
+    - format_report(report): Returns a report as text.
+    - main(argv): Runs the command line tool.
+
+Dependencies:
+    - asyncio: Used for running the learners concurrently.
+    - app.loadtest.client: The transports and the latency statistics.
+    - app.use_cases.word_service.WordService: The class timed in-process.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from app.loadtest.client import AsgiTransport, HttpTransport, Latencies, percentile
+from app.use_cases.word_service import WordService
+
+SESSION_HEADER = "X-Session-Id"
+# The WordService methods timed in-process
+TIMED_METHODS = (
+    "reset_quiz",
+    "set_mode",
+    "get_next_indices",
+    "grade_answer",
+    "end_quiz",
+)
+# Timer lag above which the event loop counts as saturated
+LOOP_LAG_LIMIT_MS = 20.0
+# Share of a core above which the event loop counts as saturated
+CPU_LIMIT = 0.9
+# Share of the wall time above which the WordService counts as saturated
+WORD_SERVICE_LIMIT = 0.5
+# Share of a queue's capacity above which a writer counts as saturated
+QUEUE_LIMIT = 0.8
+SAMPLE_INTERVAL = 0.5
+
+
+class LoadProfile(NamedTuple):
+    """
+    The simulated learners and their behaviour.
+
+    Attributes:
+        learners (int): The number of concurrent learners.
+        duration (float): The seconds the load runs after the ramp-up.
+        ramp_up (float): The seconds over which the learners start.
+        infinite_share (float): The share of learners quizzing in infinite mode.
+        error_rate (float): The share of wrong answers.
+        think_ms (float): The mean think time before an answer in milliseconds.
+        answers_per_quiz (int): The answers after which an infinite quiz ends.
+        seed (int): The seed of the random choices of the learners.
+    """
+
+    learners: int = 100
+    duration: float = 10.0
+    ramp_up: float = 1.0
+    infinite_share: float = 0.5
+    error_rate: float = 0.2
+    think_ms: float = 200.0
+    answers_per_quiz: int = 20
+    seed: int = 7
+
+
+class LoopMonitor:
+    """
+    Measures how late timers on the event loop fire.
+
+    Attributes:
+        lags (List[float]): The delay of every timer beyond its interval in seconds.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Starts measuring on the running event loop."""
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """Stops measuring."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+
+class WordServiceTimer:
+    """
+    Times the WordService methods of an in-process run.
+
+    Used as a context manager, it wraps the methods in ``TIMED_METHODS`` for its
+    duration and adds up their calls and time. The methods may run on the event loop
+    and in the thread pool at once, so the sums are updated under a lock.
+
+    Attributes:
+        calls (Dict[str, int]): The number of calls of every method.
+        seconds (Dict[str, float]): The time spent in every method.
+    """
+
+    def __init__(self):
+        self.calls: Dict[str, int] = {name: 0 for name in TIMED_METHODS}
+        self.seconds: Dict[str, float] = {name: 0.0 for name in TIMED_METHODS}
+        self._originals: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _wrap(self, name: str, method):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.seconds[name] += elapsed
+                    self.calls[name] += 1
+
+        return timed
+
+    def __enter__(self):
+        for name in TIMED_METHODS:
+            self._originals[name] = WordService.__dict__[name]
+            setattr(WordService, name, self._wrap(name, getattr(WordService, name)))
+        return self
+
+    def __exit__(self, *exc_info):
+        for name, method in self._originals.items():
+            setattr(WordService, name, method)
+        self._originals.clear()
+
+
+def _parse_metrics(text: str) -> Dict[str, float]:
+    """Returns the samples of a Prometheus exposition by name and labels."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            try:
+                samples[name] = float(value)
+            except ValueError:
+                continue
+    return samples
+
+
+def _server_times(before: Dict[str, float], after: Dict[str, float]) -> dict:
+    """Returns the mean server time per route between two scrapes."""
+    prefix = "vocabvoyage_http_request_duration_seconds_count{"
+    routes = {}
+    for name, count in after.items():
+        if not name.startswith(prefix):
+            continue
+        labels = name[len(prefix) - 1 :]
+        if 'route="/metrics"' in labels or 'route="/readyz"' in labels:
+            continue
+        total = "vocabvoyage_http_request_duration_seconds_sum" + labels
+        calls = count - before.get(name, 0.0)
+        if calls > 0:
+            seconds = after.get(total, 0.0) - before.get(total, 0.0)
+            route = labels.split('route="', 1)[1].split('"', 1)[0]
+            routes[route] = {
+                "requests": int(calls),
+                "mean_ms": round(seconds / calls * 1000, 3),
+            }
+    return routes
+
+
+class _Run:
+    """The shared state of the learners of one run."""
+
+    def __init__(self, transport, profile: LoadProfile, end: float):
+        self.transport = transport
+        self.profile = profile
+        self.end = end
+        self.latencies = Latencies()
+        self.quizzes = {"normal": 0, "infinite": 0}
+        self.answers = {"correct": 0, "wrong": 0}
+        self.failures: Dict[str, int] = {}
+
+    async def call(self, route: str, headers, path: Optional[str] = None, body=None):
+        start = time.perf_counter()
+        try:
+            status, content = await self.transport.request(
+                "GET" if route == "/words/next" else "POST",
+                path or route,
+                headers,
+                body,
+            )
+        except OSError as error:
+            self.latencies.add(route, time.perf_counter() - start, True)
+            kind = type(error).__name__
+            self.failures[kind] = self.failures.get(kind, 0) + 1
+            return None
+        self.latencies.add(route, time.perf_counter() - start, status != 200)
+        if status != 200:
+            self.failures[str(status)] = self.failures.get(str(status), 0) + 1
+            return None
+        return json.loads(content) if content else None
+
+    async def learner(self, number: int, session: str):
+        profile = self.profile
+        rng = random.Random(profile.seed * 1_000_003 + number)
+        await asyncio.sleep(profile.ramp_up * number / max(1, profile.learners))
+        headers = [(SESSION_HEADER, session)]
+        mode = "infinite" if rng.random() < profile.infinite_share else "normal"
+        mode_set = False
+        while time.perf_counter() < self.end:
+            if await self.call("/start_quiz/", headers) is None:
+                await asyncio.sleep(0.1)  # The app is not ready or failing
+                continue
+            if not mode_set:
+                await self.call("/set_mode/", headers, body={"mode": mode})
+                mode_set = True
+            answers = 0
+            while time.perf_counter() < self.end:
+                word = await self.call("/words/next", headers)
+                if word is None:
+                    break
+                if profile.think_ms > 0:
+                    await asyncio.sleep(rng.expovariate(1000 / profile.think_ms))
+                correct = rng.random() >= profile.error_rate
+                self.answers["correct" if correct else "wrong"] += 1
+                await self.call(
+                    "/check/",
+                    headers,
+                    body={
+                        "word_id": word["id"],
+                        "user_input": word["foreign_term"] if correct else "-",
+                    },
+                )
+                answers += 1
+                if mode == "infinite" and answers >= profile.answers_per_quiz:
+                    break
+            await self.call("/end_quiz/", headers)
+            self.quizzes[mode] += 1
+
+
+async def _sample_metrics(transport, samples: List[Dict[str, float]]):
+    while True:
+        status, content = await transport.request("GET", "/metrics")
+        if status == 200:
+            samples.append(_parse_metrics(content.decode("utf-8")))
+        await asyncio.sleep(SAMPLE_INTERVAL)
+
+
+async def run_load(transport, profile: LoadProfile, services=None) -> dict:
+    """
+    Runs a load and returns the report.
+
+    Args:
+        transport: The transport sending the requests, such as an AsgiTransport whose
+            application is started or an HttpTransport.
+        profile (LoadProfile): The simulated learners.
+        services (Optional[Services]): The services of an in-process application,
+            used to time the WordService and to read the capacity of the queues.
+
+    Returns:
+        dict: The requests overall and per route, the quizzes and answers, the
+        ``event_loop``, ``word_service``, ``server`` and ``logger`` measurements and
+        the ``saturated`` parts with the reason.
+    """
+    run = _Run(
+        transport, profile, time.perf_counter() + profile.ramp_up + profile.duration
+    )
+    prefix = f"load-{uuid.uuid4().hex[:8]}"
+    monitor = LoopMonitor()
+    samples: List[Dict[str, float]] = []
+    with contextlib.ExitStack() as stack:
+        timer = (
+            stack.enter_context(WordServiceTimer()) if services is not None else None
+        )
+        monitor.start()
+        sampler = asyncio.ensure_future(_sample_metrics(transport, samples))
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        await asyncio.gather(
+            *(
+                run.learner(number, f"{prefix}-{number}")
+                for number in range(profile.learners)
+            )
+        )
+        elapsed = time.perf_counter() - start
+        cpu_share = (time.process_time() - cpu_start) / elapsed
+        sampler.cancel()
+        try:
+            await sampler
+        except (asyncio.CancelledError, OSError):
+            pass
+        await monitor.stop()
+        status, content = await transport.request("GET", "/metrics")
+        if status == 200:
+            samples.append(_parse_metrics(content.decode("utf-8")))
+
+    report = run.latencies.summary(elapsed)
+    report.update(
+        learners=profile.learners,
+        quizzes=run.quizzes,
+        answers=run.answers,
+        failures=run.failures,
+    )
+    lags = sorted(monitor.lags)
+    report["event_loop"] = {
+        "measured": "application" if services is not None else "load generator",
+        "lag_p99_ms": round(percentile(lags, 99) * 1000, 3),
+        "lag_max_ms": round(lags[-1] * 1000, 3) if lags else 0.0,
+        "cpu_share": round(cpu_share, 3),
+    }
+    if timer is not None:
+        busy = sum(timer.seconds.values())
+        report["word_service"] = {
+            "busy_share": round(busy / elapsed, 3),
+            "methods": {
+                name: {
+                    "calls": calls,
+                    "mean_us": round(timer.seconds[name] / calls * 1e6, 1),
+                }
+                for name, calls in timer.calls.items()
+                if calls
+            },
+        }
+    if samples:
+        report["server"] = _server_times(samples[0], samples[-1])
+    queues = {}
+    for name, gauge in (
+        ("quiz_logger", "vocabvoyage_quiz_logger_queue_depth"),
+        ("answer_log", "vocabvoyage_answer_log_queue_depth"),
+    ):
+        depths = [sample[gauge] for sample in samples if gauge in sample]
+        if depths:
+            queues[name] = {"max_depth": int(max(depths))}
+    if services is not None:
+        writers = {
+            "quiz_logger": services.quiz_logger,
+            "answer_log": services.answer_log,
+        }
+        for name, queue in queues.items():
+            if writers[name] is not None:
+                queue["capacity"] = writers[name].max_queue_size
+    report["logger"] = queues
+    report["saturated"] = _saturated(report)
+    return report
+
+
+def _saturated(report: dict) -> Dict[str, str]:
+    """Returns the parts of the application that saturated, with the reason."""
+    saturated = {}
+    loop = report["event_loop"]
+    if loop["lag_p99_ms"] > LOOP_LAG_LIMIT_MS or loop["cpu_share"] > CPU_LIMIT:
+        part = "event_loop" if loop["measured"] == "application" else "load_generator"
+        saturated[part] = (
+            f"the process used {loop['cpu_share']:.0%} of a core and timers fire "
+            f"{loop['lag_p99_ms']} ms late (p99)"
+        )
+    word_service = report.get("word_service")
+    if word_service is not None and word_service["busy_share"] > WORD_SERVICE_LIMIT:
+        saturated["word_service"] = (
+            f"the quiz logic used {word_service['busy_share']:.0%} of the wall time"
+        )
+    for name, queue in report["logger"].items():
+        capacity = queue.get("capacity")
+        if capacity and queue["max_depth"] >= QUEUE_LIMIT * capacity:
+            saturated[name] = (
+                f"the queue reached {queue['max_depth']} of {capacity} entries; "
+                "the writer falls behind"
+            )
+    server = report.get("server", {})
+    for route, values in report["routes"].items():
+        handled = server.get(route)
+        if handled is not None and values["p50_ms"] > 10 * max(handled["mean_ms"], 0.1):
+            saturated.setdefault(
+                "queueing",
+                f"{route} takes {values['p50_ms']} ms (p50) but is handled in "
+                f"{handled['mean_ms']} ms; requests queue before they are handled",
+            )
+    return saturated
+
+
+def format_report(report: dict) -> str:
+    """Returns a report of ``run_load`` as text."""
+    lines = [
+        f"{'route':<16}{'requests':>10}{'errors':>8}{'rps':>10}"
+        f"{'p50 ms':>10}{'p99 ms':>10}{'server ms':>11}"
+    ]
+    server = report.get("server", {})
+    rows = list(report["routes"].items()) + [("all", report)]
+    for route, values in rows:
+        handled = server.get(route, {}).get("mean_ms", "")
+        lines.append(
+            f"{route:<16}{values['requests']:>10}{values['errors']:>8}"
+            f"{values['throughput_rps']:>10}{values['p50_ms']:>10}"
+            f"{values['p99_ms']:>10}{handled:>11}"
+        )
+    loop = report["event_loop"]
+    lines.append(
+        f"{report['learners']} learners, {report['quizzes']['normal']} normal and "
+        f"{report['quizzes']['infinite']} infinite quizzes in {report['elapsed_s']} s"
+    )
+    lines.append(
+        f"event loop ({loop['measured']}): lag p99 {loop['lag_p99_ms']} ms, "
+        f"max {loop['lag_max_ms']} ms, CPU {loop['cpu_share']:.0%} of a core"
+    )
+    if "word_service" in report:
+        lines.append(
+            f"WordService: {report['word_service']['busy_share']:.1%} of the wall time"
+        )
+    for name, queue in report["logger"].items():
+        capacity = f" of {queue['capacity']}" if "capacity" in queue else ""
+        lines.append(f"{name} queue: max depth {queue['max_depth']}{capacity}")
+    if report["failures"]:
+        lines.append(f"failures: {report['failures']}")
+    for part, reason in report["saturated"].items():
+        lines.append(f"SATURATED {part}: {reason}")
+    if not report["saturated"]:
+        lines.append("nothing saturated")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Runs the command line tool.
+
+    Args:
+        argv (Optional[Sequence[str]]): The arguments; the process arguments if None.
+
+    Returns:
+        int: The exit status.
+    """
+    defaults = LoadProfile()
+    parser = argparse.ArgumentParser(
+        prog="python -m app.loadtest.generator",
+        description="Simulates concurrent learners against the app.",
+    )
+    parser.add_argument(
+        "--url",
+        help="a running server, such as http://127.0.0.1:8000; in-process if unset",
+    )
+    parser.add_argument("--connections", type=int, default=100, help="HTTP connections")
+    parser.add_argument("--learners", type=int, default=defaults.learners)
+    parser.add_argument("--duration", type=float, default=defaults.duration)
+    parser.add_argument("--ramp-up", type=float, default=defaults.ramp_up)
+    parser.add_argument("--infinite-share", type=float, default=defaults.infinite_share)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--think-ms", type=float, default=defaults.think_ms)
+    parser.add_argument(
+        "--answers-per-quiz", type=int, default=defaults.answers_per_quiz
+    )
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+    profile = LoadProfile(
+        args.learners,
+        args.duration,
+        args.ramp_up,
+        args.infinite_share,
+        args.error_rate,
+        args.think_ms,
+        args.answers_per_quiz,
+        args.seed,
+    )
+
+    async def run() -> dict:
+        if args.url:
+            transport = HttpTransport(args.url, args.connections)
+            try:
+                return await run_load(transport, profile)
+            finally:
+                await transport.close()
+        from app.main import app
+
+        transport = AsgiTransport(app)
+        await transport.startup()
+        try:
+            return await run_load(transport, profile, app.state.services)
+        finally:
+            await transport.shutdown()
+
+    report = asyncio.run(run())
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
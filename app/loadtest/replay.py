@@ -0,0 +1,277 @@
+"""
+app/loadtest/replay.py
+This module replays recorded quiz traffic against the application in-process.
+
+Traces written by the RecorderMiddleware are merged on their start times, so the traces
+of several workers replay as one load. Every recorded session is replayed by its own
+task, which sends the calls of the session in order at their recorded time divided by
+the speed factor. A call is sent late if the previous call of its session is still
+running or the event loop is busy; the report shows this lag, as it means the
+application could not keep up with the load.
+
+The words differ between runs, so answers are rebuilt from the words the replay gets:
+a ``/check/`` call answers the oldest word asked and not yet answered in its session,
+correctly, with a typo or wrongly as recorded.
+
+Run it with ``python -m app.loadtest.replay TRACE... [--speed N] [--json]``. The
+application is started with its lifespan and the environment of the command, and the
+report gives the throughput and the p50 and p99 latency of every route.
+
+Classes:
+    - TraceCall: One recorded call.
+
+Functions:
+    - read_traces(paths): Reads and merges trace files.
+    - replay(transport, calls, speed): Replays calls and returns the report.
+    - format_report(report): Returns a report as a table.
+    - main(argv): Runs the command line tool.
+
+Dependencies:
+    - asyncio: Used for running the sessions concurrently.
+    - app.loadtest.client: The in-process transport and the latency statistics.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from app.loadtest.client import AsgiTransport, Latencies, percentile
+
+SESSION_HEADER = "X-Session-Id"
+
+
+class TraceCall(NamedTuple):
+    """
+    One recorded call.
+
+    Attributes:
+        time_ms (float): The time of the call since the start of the replayed traces.
+        session (int): The number of the session, unique across the traces.
+        route (str): The route template.
+        detail (object): The query, body or answer match of the call.
+        status (int): The recorded status code.
+        duration_ms (float): The recorded duration.
+    """
+
+    time_ms: float
+    session: int
+    route: str
+    detail: object
+    status: int
+    duration_ms: float
+
+
+def read_traces(paths: Iterable[str]) -> List[TraceCall]:
+    """
+    Reads and merges trace files.
+
+    Args:
+        paths (Iterable[str]): The trace files.
+
+    Raises:
+        ValueError: If a file is not a trace of a supported version.
+
+    Returns:
+        List[TraceCall]: The calls of all files in time order, with times relative to
+        the first call and sessions numbered across the files.
+    """
+    calls = []
+    sessions: Dict[tuple, int] = {}
+    for number, path in enumerate(paths):
+        with open(path, encoding="utf-8") as file:
+            header = json.loads(file.readline() or "null")
+            if not isinstance(header, dict) or header.get("version") != 1:
+                raise ValueError(f"{path} is not a traffic trace")
+            offset_ms = header["started_at"] * 1000
+            for line in file:
+                try:
+                    time_ms, session, route, detail, status, duration_ms = json.loads(
+                        line
+                    )
+                except ValueError:
+                    continue  # A torn last line of a running recorder
+                session = sessions.setdefault((number, session), len(sessions) + 1)
+                calls.append(
+                    TraceCall(
+                        offset_ms + time_ms, session, route, detail, status, duration_ms
+                    )
+                )
+    calls.sort(key=lambda call: call.time_ms)
+    if calls:
+        first = calls[0].time_ms
+        calls = [call._replace(time_ms=call.time_ms - first) for call in calls]
+    return calls
+
+
+def _answer(word: dict, match: object) -> str:
+    if match == "exact":
+        return word["foreign_term"]
+    if match == "close":
+        return word["foreign_term"][:-1] + "#"
+    return "-"
+
+
+async def _replay_session(
+    transport,
+    session_id: str,
+    calls: Sequence[TraceCall],
+    start: float,
+    speed: float,
+    latencies: Latencies,
+    lags: List[float],
+    counters: Dict[str, int],
+):
+    headers = [(SESSION_HEADER, session_id)]
+    asked: "deque[dict]" = deque(maxlen=1000)
+    for call in calls:
+        due = start + call.time_ms / 1000 / speed if speed > 0 else start
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        body: Optional[object] = None
+        path = call.route
+        if call.route in ("/start_quiz/", "/set_mode/"):
+            body = call.detail
+        elif call.route == "/words/next" and call.detail:
+            path = f"{path}?{call.detail}"
+        elif call.route == "/check/":
+            if not asked:
+                counters["skipped"] += 1
+                continue
+            word = asked.popleft()
+            body = {"word_id": word["id"], "user_input": _answer(word, call.detail)}
+        sent = time.perf_counter()
+        lags.append(max(0.0, sent - due) if speed > 0 else 0.0)
+        status, content = await transport.request(
+            "GET" if call.route == "/words/next" else "POST", path, headers, body
+        )
+        latencies.add(call.route, time.perf_counter() - sent, status >= 500)
+        if status != call.status:
+            counters["status_mismatches"] += 1
+        if call.route == "/words/next" and status == 200:
+            words = json.loads(content)
+            if isinstance(words, list):
+                asked.extend(words)
+            elif words is not None:
+                asked.clear()
+                asked.append(words)
+        elif call.route == "/start_quiz/":
+            asked.clear()
+
+
+async def replay(transport, calls: Sequence[TraceCall], speed: float = 1.0) -> dict:
+    """
+    Replays calls and returns the report.
+
+    Args:
+        transport: The transport sending the requests, such as an AsgiTransport
+            whose application is started.
+        calls (Sequence[TraceCall]): The calls in time order.
+        speed (float): The factor by which the replay is faster than the recording;
+            0 sends every call as soon as the previous call of its session returned.
+
+    Returns:
+        dict: The throughput and latency percentiles overall and per route, with the
+        ``lag`` of calls sent later than scheduled, the ``status_mismatches`` between
+        the recorded and the replayed status and the ``skipped`` answers, which had
+        no word to answer.
+    """
+    sessions: Dict[int, List[TraceCall]] = {}
+    for call in calls:
+        sessions.setdefault(call.session, []).append(call)
+    run = uuid.uuid4().hex[:8]
+    latencies = Latencies()
+    lags: List[float] = []
+    counters = {"status_mismatches": 0, "skipped": 0}
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _replay_session(
+                transport,
+                f"replay-{run}-{session}",
+                session_calls,
+                start,
+                speed,
+                latencies,
+                lags,
+                counters,
+            )
+            for session, session_calls in sessions.items()
+        )
+    )
+    report = latencies.summary(time.perf_counter() - start)
+    lags.sort()
+    report["lag_p99_ms"] = round(percentile(lags, 99) * 1000, 3)
+    report["lag_max_ms"] = round(lags[-1] * 1000, 3) if lags else 0.0
+    report["sessions"] = len(sessions)
+    report.update(counters)
+    return report
+
+
+def format_report(report: dict) -> str:
+    """Returns a report of ``replay`` as a table."""
+    lines = [
+        f"{'route':<16}{'requests':>10}{'errors':>8}{'rps':>10}"
+        f"{'p50 ms':>10}{'p99 ms':>10}"
+    ]
+    rows = list(report["routes"].items()) + [("all", report)]
+    for route, values in rows:
+        lines.append(
+            f"{route:<16}{values['requests']:>10}{values['errors']:>8}"
+            f"{values['throughput_rps']:>10}{values['p50_ms']:>10}{values['p99_ms']:>10}"
+        )
+    lines.append(
+        f"{report['sessions']} sessions in {report['elapsed_s']} s, "
+        f"lag p99 {report['lag_p99_ms']} ms, max {report['lag_max_ms']} ms, "
+        f"{report['status_mismatches']} status mismatches, "
+        f"{report['skipped']} answers skipped"
+    )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Runs the command line tool.
+
+    Args:
+        argv (Optional[Sequence[str]]): The arguments; the process arguments if None.
+
+    Returns:
+        int: The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m app.loadtest.replay",
+        description="Replays recorded quiz traffic against the app in-process.",
+    )
+    parser.add_argument("traces", nargs="+", help="trace files of the recorder")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="replay N times faster than recorded; 0 for as fast as possible",
+    )
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    from app.main import app
+
+    async def run() -> dict:
+        transport = AsgiTransport(app)
+        await transport.startup()
+        try:
+            return await replay(transport, read_traces(args.traces), args.speed)
+        finally:
+            await transport.shutdown()
+
+    report = asyncio.run(run())
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
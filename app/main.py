@@ -8,27 +8,379 @@ various internal modules and services to manage words and log quiz activities.
 
 Internal Imports:
 - app.domain.models: Contains the Word and QuizMode models.
-- app.interfaces.logger: Provides the QuizLogger for logging quiz activities.
-- app.interfaces.repositories: Contains the WordRepository for managing word data.
+- app.interfaces.answer_log: Provides the AnswerLog recording every graded answer.
+- app.interfaces.history: Provides the QuizHistoryStore answering the statistics endpoints.
+- app.interfaces.ingest: Provides the IngestPipeline for processing uploaded word files.
+- app.interfaces.logger: Provides the BackgroundQuizLogger for logging quiz activities.
+- app.interfaces.metrics: Provides the metrics served at ``/metrics``.
+- app.interfaces.profiling: Provides the opt-in profiling of single requests, and runs
+  work in the thread pool so that it is profiled with its request.
+- app.interfaces.repositories: Contains the WordRepository and the DeckRegistry for managing word data.
+- app.interfaces.responses: Provides the FastJSONResponse sending pre-encoded words.
+- app.interfaces.state_backends: Provides the backends storing the quiz state of the sessions.
+- app.use_cases.quiz_channel: Answers the quiz messages of the ``/ws/quiz`` WebSocket.
+- app.use_cases.session_registry: Keeps one quiz state per learner session.
 - app.use_cases.word_service: Provides the WordService for word-related operations.
+
+Every quiz endpoint works on the quiz of the calling learner. The learner session is
+identified by the ``X-Session-Id`` header or, when the header is missing, by the
+``vocabvoyage_session`` cookie, which is issued on the first request.
+
+The quiz states are kept in process memory unless ``VOCABVOYAGE_STATE_BACKEND`` is set to
+``sqlite``. The SQLite backend stores them in ``VOCABVOYAGE_STATE_DATABASE``, so several
+uvicorn workers on one node can serve the same learners. A quiz call that writes the
+state back to the database runs in the thread pool instead of on the event loop.
+
+Nothing is loaded when the module is imported. The lifespan creates the services and
+loads the words in the background; ``/healthz`` reports whether the process is alive and
+``/readyz`` whether the words are loaded, and the quiz endpoints answer 503 until then.
+
+Every finished quiz is recorded in the SQLite database ``VOCABVOYAGE_HISTORY_DATABASE``,
+which keeps per-word and per-day aggregates. ``/stats/words`` and ``/stats/days`` are
+answered from those aggregates.
+
+A quiz can also be run over the ``/ws/quiz`` WebSocket, which answers every message on
+one connection and sends the next word together with the result of an answer.
+
+Every graded answer is appended to the segmented log in ``VOCABVOYAGE_ANSWER_LOG`` by a
+background writer, so answers survive a closed tab or a restart without adding disk
+latency to ``/check/``. On startup the quizzes of the sessions lost with the process are
+rebuilt from the log, and the log is compacted.
+
+Requests are profiled only when ``VOCABVOYAGE_PROFILE_SAMPLE_RATE`` or
+``VOCABVOYAGE_PROFILE_TOKEN`` is set. The last ``VOCABVOYAGE_PROFILE_BUFFER_SIZE``
+profiles are listed at ``/admin/profiles`` for callers sending the token in the
+``X-Profile-Token`` header.
 """
 
+import asyncio
+import hmac
+import json
+import logging
 import os
-import shutil
+import threading
 import uuid
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Union
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import (
+    Depends,
+    FastAPI,
+    HTTPException,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
+from python_multipart.multipart import parse_options_header
 
-from app.domain.models import Word
-from app.interfaces.logger import QuizLogger
-from app.interfaces.repositories import WordRepository
+from app.domain.models import QuizMode, Word
+from app.domain.vocabulary import Vocabulary
+from app.interfaces.answer_log import AnswerLog
+from app.interfaces.history import QuizHistoryStore
+from app.interfaces.ingest import IngestJob, IngestPipeline, MultipartReader
+from app.interfaces.logger import BackgroundQuizLogger
+from app.interfaces.metrics import (
+    ACTIVE_SESSIONS,
+    ANSWER_LOG_QUEUE_DEPTH,
+    CONTENT_TYPE,
+    DECK_WORDS,
+    LOGGER_QUEUE_DEPTH,
+    QUIZ_CHANNELS,
+    REGISTRY,
+    RETIRED_VOCABULARIES,
+    MetricsMiddleware,
+)
+from app.interfaces.profiling import (
+    PROFILE_HEADER,
+    ProfileStore,
+    ProfilingMiddleware,
+    run_in_threadpool,
+)
+from app.interfaces.recorder import RecorderMiddleware, TrafficRecorder
+from app.interfaces.repositories import (
+    DeckRegistry,
+    UnknownDeckError,
+    WordRepository,
+    current_folder,
+)
+from app.interfaces.responses import FastJSONResponse, json_array, render_json
+from app.interfaces.state_backends import (
+    InMemoryStateBackend,
+    QuizStateBackend,
+    SqliteStateBackend,
+)
+from app.use_cases.quiz_channel import QuizChannel, graded
+from app.use_cases.session_registry import SessionRegistry
 from app.use_cases.word_service import WordService
 
-app = FastAPI(title="VocabVoyage", root_path="/api")
+
+DATA_DIRECTORY = "app/data"
+OUTPUT_DIRECTORY = "app/out"
+STATE_BACKEND = os.environ.get("VOCABVOYAGE_STATE_BACKEND", "memory")
+STATE_DATABASE = os.environ.get("VOCABVOYAGE_STATE_DATABASE", "app/state/quiz_state.db")
+HISTORY_DATABASE = os.environ.get(
+    "VOCABVOYAGE_HISTORY_DATABASE", "app/state/history.db"
+)
+ANSWER_LOG_DIRECTORY = os.environ.get("VOCABVOYAGE_ANSWER_LOG", "app/state/answers")
+ANSWER_LOG_RETENTION_DAYS = int(
+    os.environ.get("VOCABVOYAGE_ANSWER_LOG_RETENTION_DAYS", "0")
+)
+DECK_BUDGET_BYTES = int(os.environ.get("VOCABVOYAGE_DECK_BUDGET_MB", "256")) << 20
+# Processes parsing changed word files on a reload; 0 uses one per core
+PARSE_WORKERS = int(os.environ.get("VOCABVOYAGE_PARSE_WORKERS", "1")) or (
+    os.cpu_count() or 1
+)
+
+log = logging.getLogger(__name__)
+
+
+def create_state_backend(kind: str) -> QuizStateBackend:
+    """
+    Creates the backend storing the quiz states.
+
+    Parameters
+    ----------
+    kind : str
+        ``memory`` for a backend private to this process, or ``sqlite`` for a
+        database shared by the worker processes of one node.
+
+    Raises
+    ------
+    ValueError
+        If the kind of backend is unknown.
+
+    Returns
+    -------
+    QuizStateBackend
+        The backend.
+    """
+    if kind == "memory":
+        return InMemoryStateBackend()
+    if kind == "sqlite":
+        return SqliteStateBackend(STATE_DATABASE)
+    raise ValueError(f"Unknown quiz state backend: {kind}")
+
+
+class Services:
+    """
+    The services of a running application, created on startup by the lifespan.
+
+    The services start with an empty word list. ``warm_up`` loads the vocabulary, which
+    may take a while for large decks, and marks the services as ready once the sessions
+    can be served.
+
+    Attributes
+    ----------
+    word_repo : WordRepository
+        The repository loading the word files.
+    deck_registry : DeckRegistry
+        The named decks, loaded on first use.
+    history : QuizHistoryStore
+        The quiz results and their aggregates.
+    quiz_logger : BackgroundQuizLogger
+        The logger writing the quiz results.
+    answer_log : Optional[AnswerLog]
+        The log of every graded answer, or None if it is disabled.
+    session_registry : SessionRegistry
+        The quiz states of the learner sessions.
+    ingest_pipeline : IngestPipeline
+        The jobs processing uploaded word files.
+    ready : threading.Event
+        Set once the vocabulary is loaded.
+    error : Optional[str]
+        Why loading the vocabulary failed, or None.
+    """
+
+    def __init__(
+        self,
+        data_directory: str = DATA_DIRECTORY,
+        output_directory: str = OUTPUT_DIRECTORY,
+        state_backend: str = STATE_BACKEND,
+        history_database: str = HISTORY_DATABASE,
+        answer_log_directory: Optional[str] = ANSWER_LOG_DIRECTORY,
+    ):
+        self.word_repo = WordRepository(data_directory, parse_workers=PARSE_WORKERS)
+        self.deck_registry = DeckRegistry(data_directory, DECK_BUDGET_BYTES)
+        self.history = QuizHistoryStore(history_database)
+        self.quiz_logger = BackgroundQuizLogger(output_directory, history=self.history)
+        self.answer_log = (
+            AnswerLog(answer_log_directory) if answer_log_directory else None
+        )
+        self.session_registry = SessionRegistry(
+            Vocabulary([], []),
+            self.quiz_logger,
+            backend=create_state_backend(state_backend),
+            decks=self.deck_registry,
+            answer_log=self.answer_log,
+        )
+        self.ingest_pipeline = IngestPipeline(
+            data_directory,
+            self.install_uploaded_words,
+            on_deck_complete=self.install_uploaded_deck,
+        )
+        self.ready = threading.Event()
+        self.error: Optional[str] = None
+
+    def warm_up(self):
+        """
+        Loads and warms the vocabulary, hands it to the sessions and marks the services
+        as ready. A failure is recorded in ``error`` and leaves the services not ready.
+
+        Before the services are ready, the sessions lost with the previous process are
+        restored from the answers logged within the session TTL. The answer log is
+        compacted once the services are ready.
+        """
+        try:
+            vocabulary = self.word_repo.load_vocabulary()
+            vocabulary.warm()
+        except Exception as error:
+            log.exception("Could not load the word list")
+            self.error = str(error)
+            return
+        report = self.word_repo.report
+        if report is not None and report.skipped:
+            log.warning(
+                "Skipped %d of %d rows in the word files, first at %s",
+                report.skipped,
+                report.rows,
+                ", ".join(f"{row.file}:{row.line}" for row in report.skipped_rows[:5]),
+            )
+        self.session_registry.update_words(vocabulary)
+        if self.answer_log is not None:
+            since = datetime.now() - timedelta(
+                seconds=self.session_registry.ttl_seconds
+            )
+            try:
+                self.session_registry.restore(self.answer_log.replay(since))
+            except Exception:
+                log.exception("Could not restore the sessions from the answer log")
+        self.ready.set()
+        if self.answer_log is not None:
+            before = None
+            if ANSWER_LOG_RETENTION_DAYS > 0:
+                before = datetime.now() - timedelta(days=ANSWER_LOG_RETENTION_DAYS)
+            try:
+                self.answer_log.compact(before)
+            except OSError:
+                log.exception("Could not compact the answer log")
+
+    def install_uploaded_words(self, vocabulary: Vocabulary):
+        """
+        Compiles the words of a finished upload and swaps them in for new quizzes.
+        Quizzes in progress keep the previous words until they start a new quiz.
+
+        Parameters
+        ----------
+        vocabulary : Vocabulary
+            The words parsed from the uploaded files.
+        """
+        self.session_registry.update_words(self.word_repo.store_vocabulary(vocabulary))
+
+    def install_uploaded_deck(self, deck_id: str, vocabulary: Vocabulary):
+        """
+        Compiles the words of a finished deck upload and swaps them in for new quizzes.
+        The previous version of the deck is retired, so quizzes in progress on it keep
+        their words until they start a new quiz.
+
+        Parameters
+        ----------
+        deck_id : str
+            The id of the uploaded deck.
+        vocabulary : Vocabulary
+            The words parsed from the uploaded files.
+        """
+        previous = self.deck_registry.peek(deck_id)
+        deck = self.deck_registry.store(deck_id, vocabulary)
+        if previous is not None and previous.fingerprint != deck.fingerprint:
+            self.session_registry.retire(previous)
+
+    def status(self) -> dict:
+        """
+        Returns whether the services are ``loading``, ``ready`` or ``failed``.
+
+        Returns
+        -------
+        dict
+            The status, with the number of words once ready or the error once failed.
+        """
+        if self.ready.is_set():
+            return {"status": "ready", "words": len(self.session_registry.vocabulary)}
+        if self.error is not None:
+            return {"status": "failed", "error": self.error}
+        return {"status": "loading"}
+
+    def close(self):
+        """
+        Writes every queued quiz result and answer event, closes the quiz state
+        backend and the history store, and stops the processes parsing word files.
+        """
+        self.quiz_logger.stop()
+        if self.answer_log is not None:
+            self.answer_log.stop()
+        self.session_registry.close()
+        self.history.close()
+        self.word_repo.close()
+
+
+async def release_retired(registry: SessionRegistry):
+    """
+    Releases the retired vocabularies no session uses anymore, every release interval.
+
+    The check may scan every stored session, so it runs in the thread pool instead of
+    on the requests.
+    """
+    while True:
+        await asyncio.sleep(registry.release_interval)
+        if not registry.retired:
+            continue
+        try:
+            await run_in_threadpool(registry.release_unused)
+        except Exception:
+            log.exception("Could not release the retired vocabularies")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Creates the services for the lifetime of the application.
+
+    On startup the writers of the quiz logger and the answer log are started, the
+    vocabulary is loaded in the background, so the application answers the liveness
+    probe at once and the readiness probe once the words are loaded, and the retired
+    vocabularies are released in the background. On shutdown the load is awaited,
+    every queued quiz result and answer is written and the quiz state backend is
+    closed.
+    """
+    services = Services()
+    app.state.services = services
+    services.quiz_logger.start()
+    DECK_WORDS.set_function(lambda: len(services.session_registry.vocabulary))
+    ACTIVE_SESSIONS.set_function(lambda: len(services.session_registry))
+    RETIRED_VOCABULARIES.set_function(lambda: services.session_registry.retired)
+    LOGGER_QUEUE_DEPTH.set_function(lambda: services.quiz_logger.queue_depth)
+    if services.answer_log is not None:
+        services.answer_log.start()
+        ANSWER_LOG_QUEUE_DEPTH.set_function(lambda: services.answer_log.queue_depth)
+    warm_up = asyncio.ensure_future(run_in_threadpool(services.warm_up))
+    release = asyncio.ensure_future(release_retired(services.session_registry))
+    yield
+    release.cancel()
+    try:
+        await release  # Waits for a check running in the thread pool
+    except asyncio.CancelledError:
+        pass
+    await warm_up  # A load in progress cannot be interrupted
+    await run_in_threadpool(services.close)
+    if traffic_recorder is not None:
+        traffic_recorder.close()
+
+
+app = FastAPI(title="VocabVoyage", root_path="/api", lifespan=lifespan)
 
 # CORS middleware to allow frontend communication
 app.add_middleware(
@@ -38,12 +390,147 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+
+PROFILE_SAMPLE_RATE = float(os.environ.get("VOCABVOYAGE_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.environ.get("VOCABVOYAGE_PROFILE_TOKEN") or None
+PROFILE_BUFFER_SIZE = int(os.environ.get("VOCABVOYAGE_PROFILE_BUFFER_SIZE", "20"))
+
+# The profiler is only installed when enabled, so it adds nothing to requests otherwise
+profile_store: Optional[ProfileStore] = None
+if PROFILE_SAMPLE_RATE > 0 or PROFILE_TOKEN:
+    profile_store = ProfileStore(PROFILE_BUFFER_SIZE)
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        sample_rate=PROFILE_SAMPLE_RATE,
+        token=PROFILE_TOKEN,
+    )
+
+RECORD_TRAFFIC_DIRECTORY = os.environ.get("VOCABVOYAGE_RECORD_TRAFFIC") or None
+
+# Traffic is only recorded when a trace folder is set, for replaying it in load tests
+traffic_recorder: Optional[TrafficRecorder] = None
+if RECORD_TRAFFIC_DIRECTORY:
+    traffic_recorder = TrafficRecorder(RECORD_TRAFFIC_DIRECTORY)
+    app.add_middleware(RecorderMiddleware, recorder=traffic_recorder)
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+SESSION_HEADER = "X-Session-Id"
+SESSION_COOKIE = "vocabvoyage_session"
+MAX_SESSION_ID_LENGTH = 128
+MAX_BATCH_SIZE = 100
+
+
+def get_services(request: Request) -> Services:
+    """Returns the services created by the lifespan."""
+    return request.app.state.services
+
 
-# Load words at startup
-word_repo = WordRepository()
-words = word_repo.load_words()
-quiz_logger = QuizLogger()
-word_service = WordService(words, quiz_logger)
+def get_ready_services(services: Services = Depends(get_services)) -> Services:
+    """
+    Returns the services once the vocabulary is loaded.
+
+    Raises
+    ------
+    HTTPException
+        503 while the vocabulary is loading or if loading it failed.
+    """
+    if not services.ready.is_set():
+        raise HTTPException(
+            status_code=503,
+            detail="The word list is not loaded yet",
+            headers={"Retry-After": "1"},
+        )
+    return services
+
+
+def get_session_id(request: Request, response: Response) -> str:
+    """
+    Resolves the session id of the calling learner.
+
+    The session id is read from the ``X-Session-Id`` header, then from the session
+    cookie. A new session id is issued when neither is present, and the cookie is
+    refreshed on every response so that browsers keep their session.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    response : Response
+        The outgoing response, used to set the session cookie.
+
+    Raises
+    ------
+    HTTPException
+        If the session id is too long.
+
+    Returns
+    -------
+    str
+        The session id.
+    """
+    session_id = request.headers.get(SESSION_HEADER) or request.cookies.get(
+        SESSION_COOKIE
+    )
+    if not session_id:
+        session_id = uuid.uuid4().hex
+    elif len(session_id) > MAX_SESSION_ID_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid session id")
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+    return session_id
+
+
+def get_word_service(
+    session_id: str = Depends(get_session_id),
+    services: Services = Depends(get_ready_services),
+) -> WordService:
+    """
+    Resolves the quiz state of the calling learner.
+
+    Parameters
+    ----------
+    session_id : str
+        The session id of the learner.
+    services : Services
+        The services of the application.
+
+    Raises
+    ------
+    HTTPException
+        If the vocabulary is not loaded yet.
+
+    Returns
+    -------
+    WordService
+        The WordService holding the quiz state of the session.
+    """
+    return services.session_registry.get(session_id)
+
+
+def fast_json(content, response: Response) -> FastJSONResponse:
+    """
+    Returns content as a FastJSONResponse with the headers set on the response of the
+    request, such as the session cookie, which FastAPI only adds to the responses it
+    creates itself.
+    """
+    fast = FastJSONResponse(content)
+    fast.headers.raw.extend(response.headers.raw)
+    return fast
+
+
+async def in_session(word_service: WordService, function, *args):
+    """
+    Calls a method of a WordService that changes the quiz state.
+
+    A state kept in process memory is changed in place, so the call runs on the event
+    loop. A state written back to a shared backend is saved by the call, which may wait
+    for the database, so the call runs in the thread pool.
+    """
+    if word_service.on_change is None:
+        return function(*args)
+    return await run_in_threadpool(function, *args)
 
 
 class AnswerRequest(BaseModel):
@@ -52,30 +539,70 @@ class AnswerRequest(BaseModel):
 
     Attributes
     ----------
-    word : Word
-        The word object of the questioner.
+    word_id : Optional[str]
+        The id of the word that was asked.
+    word : Optional[Word]
+        The word object of the questioner. Deprecated, send ``word_id`` instead. Only
+        used to identify the word; the answer is always graded on the server.
     user_input : str
         The user's input for the word.
     """
 
-    word: Word
+    word_id: Optional[str] = None
+    word: Optional[Word] = None
     user_input: str
 
 
+class BatchAnswerRequest(BaseModel):
+    """
+    Request model for submitting several answers at once.
+
+    Attributes
+    ----------
+    answers : List[AnswerRequest]
+        The answers in the order they were given.
+    """
+
+    answers: List[AnswerRequest]
+
+
+class StartQuizRequest(BaseModel):
+    """
+    Request model for starting a quiz.
+
+    Attributes
+    ----------
+    deck_id : Optional[str]
+        The id of the deck to draw the words from, as listed by ``GET /decks``.
+    """
+
+    deck_id: Optional[str] = None
+
+
 class ModeRequest(BaseModel):
     """
     Request model for setting the quiz mode.
 
     Attributes
     ----------
-        mode (str): The quiz mode, either 'normal' or 'infinite'.
+        mode (str): The quiz mode, either 'normal', 'infinite' or 'spaced'.
+        retry_gap (Optional[int]): In spaced mode, how many other words are asked
+            before a missed word comes back.
+        max_typos (Optional[int]): How many typos a close answer may contain; 0
+            accepts exact answers only.
     """
 
-    mode: str  # 'normal' or 'infinite'
+    mode: str  # 'normal', 'infinite' or 'spaced'
+    retry_gap: Optional[int] = None
+    max_typos: Optional[int] = None
 
 
 @app.post("/set_mode/")
-async def set_mode(request: ModeRequest):
+async def set_mode(
+    request: ModeRequest,
+    response: Response,
+    word_service: WordService = Depends(get_word_service),
+):
     """
     Sets the quiz mode.
 
@@ -83,25 +610,43 @@ async def set_mode(request: ModeRequest):
     ----------
     request : ModeRequest
         The request containing the desired mode.
+    word_service : WordService
+        The quiz state of the calling learner.
 
     Raises
     ------
     HTTPException
-        If the mode is not 'normal' or 'infinite'.
+        If the mode is not 'normal', 'infinite' or 'spaced', the retry gap is
+        smaller than one or the number of typos is negative.
 
     Returns
     -------
     JSONResponse
         A response indicating the mode has been set.
     """
-    if request.mode not in ["normal", "infinite"]:
+    if request.mode not in [mode.value for mode in QuizMode]:
         raise HTTPException(status_code=400, detail="Invalid mode")
-    word_service.set_mode(request.mode)
-    return {"message": f"Quiz mode set to {request.mode}"}
+    if request.retry_gap is not None and request.retry_gap < 1:
+        raise HTTPException(status_code=400, detail="Invalid retry gap")
+    if request.max_typos is not None and request.max_typos < 0:
+        raise HTTPException(status_code=400, detail="Invalid number of typos")
+    await in_session(
+        word_service,
+        word_service.set_mode,
+        request.mode,
+        request.retry_gap,
+        request.max_typos,
+    )
+    return fast_json({"message": f"Quiz mode set to {request.mode}"}, response)
 
 
 @app.post("/start_quiz/")
-async def start_quiz():
+async def start_quiz(
+    response: Response,
+    request: Optional[StartQuizRequest] = None,
+    session_id: str = Depends(get_session_id),
+    services: Services = Depends(get_ready_services),
+):
     """
     Endpoint to start a new quiz session.
 
@@ -109,16 +654,72 @@ async def start_quiz():
     previous quiz data and prepares the system for a new quiz session. This can be
     useful when a user wants to restart the quiz from the beginning.
 
+    Parameters
+    ----------
+    request : Optional[StartQuizRequest]
+        The deck to quiz on. Without a body, or without a deck id, the quiz uses the
+        words of all word files.
+
+    Raises
+    ------
+    HTTPException
+        If the deck is unknown.
+
     Returns
     -------
         JSONResponse: A response indicating that the quiz has started.
     """
-    word_service.reset_quiz()
-    return {"message": "Quiz started"}
+    deck_id = request.deck_id if request is not None else None
+    # Only opening the deck and loading the state run off the event loop
+    try:
+        word_service = await run_in_threadpool(
+            services.session_registry.on_deck, session_id, deck_id
+        )
+    except UnknownDeckError:
+        raise HTTPException(status_code=404, detail="Unknown deck")
+    await in_session(word_service, word_service.start_quiz, deck_id)
+    return fast_json(
+        {
+            "message": "Quiz started",
+            "deck_id": deck_id,
+            "words": len(word_service.vocabulary),
+        },
+        response,
+    )
+
+
+@app.get("/decks")
+async def list_decks(services: Services = Depends(get_ready_services)):
+    """
+    Endpoint to list the decks a quiz can be started on.
+
+    Every word file in the data directory is a deck named after the file, and every
+    deck uploaded with a ``deck_id`` is a deck of its files.
+
+    Returns
+    -------
+    dict
+        The decks with their ids, whether they are loaded and, if so, their number of
+        words.
+    """
+    loaded = services.deck_registry.loaded()
+    deck_ids = await run_in_threadpool(services.deck_registry.deck_ids)
+    return {
+        "decks": [
+            {
+                "id": deck_id,
+                "loaded": deck_id in loaded,
+                "words": loaded.get(deck_id),
+            }
+            for deck_id in deck_ids
+        ]
+    }
 
 
 @app.post("/end_quiz/")
-async def end_quiz():
+async def end_quiz(
+    response: Response, word_service: WordService = Depends(get_word_service)
+):
     """
     Endpoint to end the current quiz session and log the results.
 
@@ -131,107 +732,642 @@ async def end_quiz():
     -------
         JSONResponse: A response indicating that the quiz has ended and results have been logged.
     """
-    word_service.end_quiz()
-    return {"message": "Quiz ended and results logged"}
+    # The result is read on the event loop, where a state kept in memory is changed;
+    # logging waits for the writer when its queue is full, so it runs off the loop
+    result = word_service.quiz_result()
+    await run_in_threadpool(word_service.logger.log_result, result)
+    return fast_json({"message": "Quiz ended and results logged"}, response)
 
 
-@app.get("/words/next", response_model=Optional[Word])
-async def get_next_word():
+@app.get("/words/next", response_model=Union[Optional[Word], List[Word]])
+async def get_next_word(
+    response: Response,
+    count: Optional[int] = None,
+    word_service: WordService = Depends(get_word_service),
+):
     """
     Endpoint to retrieve the next word in the quiz.
 
+    The words are sent as the JSON encoded when the vocabulary was loaded.
+
+    Parameters
+    ----------
+    count : Optional[int]
+        Prefetch up to this many words at once. The words are returned as a list,
+        which is shorter than ``count`` when the quiz ends.
+    word_service : WordService
+        The quiz state of the calling learner.
+
+    Raises
+    ------
+    HTTPException
+        If ``count`` is not between 1 and ``MAX_BATCH_SIZE``.
+
     Returns
     -------
-        Optional[Word]: The next word in the quiz, or None if there are no more words.
+        Union[Optional[Word], List[Word]]: The next word in the quiz, or None if there
+        are no more words. The next words if ``count`` is given.
     """
-    word = word_service.get_next_word()
-    if word is None:
-        return JSONResponse(content=None, status_code=200)
-    return word
+    word_json = word_service.vocabulary.word_json
+    if count is not None:
+        if not 1 <= count <= MAX_BATCH_SIZE:
+            raise HTTPException(status_code=400, detail="Invalid count")
+        indices = await in_session(word_service, word_service.get_next_indices, count)
+        return fast_json(json_array(map(word_json, indices)), response)
+    indices = await in_session(word_service, word_service.get_next_indices, 1)
+    return fast_json(word_json(indices[0]) if indices else b"null", response)
 
 
 @app.post("/check/", response_model=dict)
-async def check_answer(answer: AnswerRequest):
+async def check_answer(
+    answer: AnswerRequest,
+    response: Response,
+    word_service: WordService = Depends(get_word_service),
+):
     """
     Check if the user's answer is correct.
 
     Parameters
     ----------
     answer : AnswerRequest
-        The user's answer request containing the word and user input.
+        The user's answer request containing the word id and user input.
+    word_service : WordService
+        The quiz state of the calling learner.
+
+    Raises
+    ------
+    HTTPException
+        If no word is given (400) or the word is not in the vocabulary (404).
 
     Returns
     -------
     dict
-        A dictionary with a key 'is_correct' indicating whether the user's answer is correct.
+        A dictionary with a key 'is_correct' indicating whether the user's answer is
+        correct, and a key 'match' that is 'exact', 'close' or 'wrong'. A close answer
+        also returns the 'expected' spelling.
     """
-    is_correct = word_service.check_answer(answer.word, answer.user_input)
-    return {"is_correct": is_correct}
+    word = answer.word_id or answer.word
+    if word is None:
+        raise HTTPException(status_code=400, detail="word_id is required")
+    try:
+        match = await in_session(
+            word_service, word_service.grade_answer, word, answer.user_input
+        )
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown word") from None
+    return fast_json(graded(word_service, word, match), response)
+
+
+@app.post("/check/batch", response_model=dict)
+async def check_answers(
+    batch: BatchAnswerRequest,
+    response: Response,
+    word_service: WordService = Depends(get_word_service),
+):
+    """
+    Check several answers in one call.
+
+    The answers are applied to the quiz in the given order. If any word is missing or
+    unknown, no answer is applied.
+
+    Parameters
+    ----------
+    batch : BatchAnswerRequest
+        The answers to check.
+    word_service : WordService
+        The quiz state of the calling learner.
+
+    Raises
+    ------
+    HTTPException
+        If there are more than ``MAX_BATCH_SIZE`` answers or a word is missing (400),
+        or a word is not in the vocabulary (404).
+
+    Returns
+    -------
+    dict
+        A dictionary with a key 'results' holding one result like the one of
+        ``POST /check/`` per answer, and the updated 'correct' and 'incorrect' counts.
+    """
+    if len(batch.answers) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail="Too many answers")
+    answers = []
+    for answer in batch.answers:
+        word = answer.word_id or answer.word
+        if word is None:
+            raise HTTPException(status_code=400, detail="word_id is required")
+        answers.append((word, answer.user_input))
+    try:
+        matches = await in_session(word_service, word_service.grade_answers, answers)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown word") from None
+    return fast_json(
+        {
+            "results": [
+                graded(word_service, word, match)
+                for (word, _), match in zip(answers, matches)
+            ],
+            "correct": word_service.correct,
+            "incorrect": word_service.incorrect,
+        },
+        response,
+    )
 
 
 @app.get("/results/", response_model=dict)
-async def get_results():
+async def get_results(
+    response: Response, word_service: WordService = Depends(get_word_service)
+):
     """
     Endpoint to get current quiz statistics.
     """
-    return {
-        "correct": word_service.correct,
-        "incorrect": word_service.incorrect,
-        "incorrect_words": word_service.incorrect_words,
+    return fast_json(
+        {
+            "correct": word_service.correct,
+            "incorrect": word_service.incorrect,
+            "incorrect_words": word_service.incorrect_words,
+        },
+        response,
+    )
+
+
+@app.websocket("/ws/quiz")
+async def quiz_channel(websocket: WebSocket):
+    """
+    Runs the quiz of the calling learner over one WebSocket connection.
+
+    The session is identified like for the HTTP endpoints, by the ``X-Session-Id``
+    header or the session cookie. A new session id is issued when neither is given.
+    The first message sent is ``{"type": "session", "session_id": ...}``, naming only
+    a session id sent in the header or a new one; the id of the cookie is not echoed.
+    Browsers cannot set headers on a WebSocket, so a client without the cookie sends
+    its session id in a ``session`` message instead of the URL, which is logged.
+
+    Every text message is a JSON object answered by one JSON reply, in order; the
+    message types are described in ``app.use_cases.quiz_channel``. An ``answer`` is
+    answered with its result, the updated counters and the next word. Binary messages
+    get an ``error`` reply. Like for the HTTP endpoints, loading the session, opening a
+    deck and logging results run in the threadpool, and a state kept in memory is
+    changed on the event loop, so HTTP requests and messages never race on it.
+
+    The connection is closed with code 1013 while the word list is loading and with
+    code 1008 if the session id is too long.
+    """
+    services: Services = websocket.app.state.services
+    if not services.ready.is_set():
+        await websocket.close(code=1013)
+        return
+    session_id = websocket.headers.get(SESSION_HEADER)
+    announced = session_id
+    if session_id is None:
+        session_id = websocket.cookies.get(SESSION_COOKIE)
+    if session_id is None:
+        session_id = announced = uuid.uuid4().hex
+    if len(session_id) > MAX_SESSION_ID_LENGTH:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    channel = QuizChannel(
+        services.session_registry,
+        session_id,
+        MAX_BATCH_SIZE,
+        MAX_SESSION_ID_LENGTH,
+        offload=run_in_threadpool,
+    )
+    in_flight = QUIZ_CHANNELS.labels()
+    in_flight.inc()
+    try:
+        first = {"type": "session"}
+        if announced is not None:
+            first["session_id"] = announced
+        await websocket.send_text(json.dumps(first))
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+            message = None
+            if frame.get("text") is not None:
+                try:
+                    message = json.loads(frame["text"])
+                except ValueError:
+                    pass
+            reply = await channel.handle(message)
+            await websocket.send_text(render_json(reply).decode("utf-8"))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        in_flight.dec()
+
+
+@app.get("/stats/words")
+async def get_word_stats(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    limit: int = 20,
+    services: Services = Depends(get_services),
+):
+    """
+    Endpoint to list the most missed words of a period.
+
+    The statistics are read from per-word daily aggregates that are updated as each
+    quiz result is recorded, so the history of quizzes is not scanned. A word counts
+    once per quiz. Results are recorded in the background, so a quiz that just ended
+    may be missing for a moment.
+
+    Parameters
+    ----------
+    since : Optional[date]
+        The first day of the period, for example ``2024-05-01``.
+    until : Optional[date]
+        The last day of the period.
+    limit : int
+        The number of words returned, at most ``MAX_BATCH_SIZE``.
+
+    Raises
+    ------
+    HTTPException
+        If the limit is not between 1 and ``MAX_BATCH_SIZE``.
+
+    Returns
+    -------
+    dict
+        The words with the number of quizzes in which they were missed and answered
+        correctly, most missed first.
+    """
+    if not 1 <= limit <= MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail="Invalid limit")
+    words = await run_in_threadpool(services.history.word_stats, since, until, limit)
+    return {"words": words}
+
+
+@app.get("/stats/days")
+async def get_daily_stats(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    services: Services = Depends(get_services),
+):
+    """
+    Endpoint to list the number of quizzes and answers per day.
+
+    Parameters
+    ----------
+    since : Optional[date]
+        The first day of the period.
+    until : Optional[date]
+        The last day of the period.
+
+    Returns
+    -------
+    dict
+        One entry per day with quizzes, with the number of quizzes and of correct and
+        incorrect answers.
+    """
+    days = await run_in_threadpool(services.history.daily_stats, since, until)
+    return {"days": days}
+
+
+# The form of an upload, described by hand since the body is parsed as a stream
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files"],
+                    "properties": {
+                        "files": {
+                            "type": "array",
+                            "items": {"type": "string", "format": "binary"},
+                        },
+                        "deck_id": {"type": "string"},
+                    },
+                }
+            }
+        },
     }
+}
+MAX_DECK_ID_BYTES = 256
+
+
+def upload_filename(filename: str) -> str:
+    """
+    Returns the name an uploaded file is stored under.
+
+    Raises
+    ------
+    HTTPException
+        If the file is not a CSV file.
+    """
+    # Files without a name get a unique one
+    filename = os.path.basename(filename) if filename else f"{uuid.uuid4()}.csv"
+    if not filename.endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Only .csv files are allowed")
+    return filename
 
 
-@app.post("/upload_words/")
-async def upload_words(files: List[UploadFile] = File(...)):
+@app.post("/upload_words/", status_code=202, openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_words(
+    request: Request, services: Services = Depends(get_ready_services)
+):
     """
     Endpoint to upload new word files.
 
-    This endpoint allows users to upload new word files in CSV format. It clears any
-    existing word files in the data directory and replaces them with the newly uploaded
-    files. The words from the new files are then loaded into the system.
+    This endpoint allows users to upload new word files in CSV format as the ``files``
+    of a ``multipart/form-data`` body. The body is parsed while it is received, and
+    the files are streamed in chunks to a background ingest job, which parses the rows
+    as they arrive, so the upload is never held in memory or in a temporary file.
+    Once every file is parsed, the job replaces the existing word files in the data
+    directory with the uploaded files and updates the word list. A failed upload
+    leaves the existing word files in place.
+
+    The optional form field ``deck_id`` names the deck the files are uploaded to. The
+    files of the deck are replaced and the other word files are kept. Without a deck
+    id the word files of the data directory are replaced.
+
+    Parameters
+    ----------
+    request : Request
+        The upload request.
+    services : Services
+        The services of the application.
+
+    Raises
+    ------
+    HTTPException
+        If the body is not valid multipart data or has no files, any of the uploaded
+        files is not a CSV file, two files have the same name, the deck id is invalid or taken by a word file, or
+        the word list is still loading.
+
+    Returns
+    -------
+    dict
+        A message and the progress of the ingest job, including the ``job_id`` to poll
+        with ``GET /upload_words/{job_id}``.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type"))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+    reader = MultipartReader(options[b"boundary"])
+    job: Optional[IngestJob] = None
+    deck_id = bytearray()
+    file_part = -1
+    filename = ""
+    filenames = set()
+    pending = bytearray()
+
+    async def put():
+        if pending:
+            await run_in_threadpool(job.put, filename, bytes(pending))
+            pending.clear()
+
+    try:
+        async for chunk in request.stream():
+            for part, name, part_filename, data in reader.feed(chunk):
+                if name == "deck_id" and part_filename is None:
+                    deck_id += data
+                    if len(deck_id) > MAX_DECK_ID_BYTES:
+                        raise HTTPException(status_code=400, detail="Invalid deck id")
+                elif name == "files" and part_filename is not None:
+                    if part != file_part:
+                        await put()
+                        file_part = part
+                        filename = upload_filename(part_filename)
+                        # Files are stored under their name, so a repeated name would
+                        # be appended to the first file
+                        if filename in filenames:
+                            raise HTTPException(
+                                status_code=400, detail="Duplicate file name"
+                            )
+                        filenames.add(filename)
+                        if job is None:
+                            job = services.ingest_pipeline.start([])
+                        # Registers the file, so an empty file is uploaded too
+                        await run_in_threadpool(job.put, filename, b"")
+                    pending += data
+                    if len(pending) >= UPLOAD_CHUNK_SIZE:
+                        await put()
+        reader.close()
+        if job is None:
+            raise HTTPException(status_code=400, detail="No files uploaded")
+        await put()
+        if deck_id:
+            job.deck_id = deck_id.decode("utf-8", "replace")
+            if not DeckRegistry.is_valid_id(job.deck_id):
+                raise HTTPException(status_code=400, detail="Invalid deck id")
+            if os.path.isfile(
+                os.path.join(
+                    current_folder(services.deck_registry.data_folder),
+                    f"{job.deck_id}.csv",
+                )
+            ):
+                raise HTTPException(
+                    status_code=400, detail="Deck id is used by a word file"
+                )
+    except Exception as error:
+        if job is not None:
+            reason = (
+                error.detail
+                if isinstance(error, HTTPException)
+                else "Upload interrupted"
+            )
+            await run_in_threadpool(job.abort, reason)
+        if isinstance(error, ValueError):
+            raise HTTPException(
+                status_code=400, detail="Invalid multipart/form-data"
+            ) from None
+        raise
+    await run_in_threadpool(job.finish)
+
+    return {
+        "message": "Word files uploaded, the word list is updated once they are processed",
+        **job.progress(),
+    }
+
+
+@app.post("/reload_words/")
+async def reload_words(services: Services = Depends(get_ready_services)):
+    """
+    Endpoint to reload the word list from the word files in the data directory.
+
+    The compiled deck is reused while the word files are unchanged. Otherwise only
+    files that changed since the previous load are parsed again before the deck is
+    recompiled. Concurrent reloads share a single load, which runs off the event loop.
+
+    Returns
+    -------
+    dict
+        A message, the number of loaded words and the number of parsed files. When the
+        word files were read, ``report`` lists the skipped rows and the duplicate words
+        with their file and line.
+    """
+    vocabulary = await run_in_threadpool(services.word_repo.load_vocabulary)
+    services.session_registry.update_words(vocabulary)
+    result = {
+        "message": "Word list reloaded",
+        "words": len(vocabulary),
+        "files_parsed": services.word_repo.files_parsed,
+    }
+    report = services.word_repo.report
+    if report is not None:
+        result["report"] = report.model_dump()
+    return result
+
+
+@app.get("/upload_words/{job_id}")
+async def get_upload_status(job_id: str, services: Services = Depends(get_services)):
+    """
+    Endpoint to poll the progress of a word file upload.
 
     Parameters
     ----------
-    files : List[UploadFile]
-        A list of uploaded files. Each file must be in CSV format.
+    job_id : str
+        The id returned by ``POST /upload_words/``.
 
     Raises
     ------
     HTTPException
-        If any of the uploaded files is not a CSV file.
+        If the job is unknown.
 
     Returns
     -------
     dict
-        A message indicating that the word files have been uploaded and the word list has been updated.
-    """
-    data_directory = "app/data"
-    # Clear existing files in the data directory
-    for filename in os.listdir(data_directory):
-        file_path = os.path.join(data_directory, filename)
-        if os.path.isfile(file_path):
-            os.remove(file_path)
-
-    # Save the uploaded files
-    for file in files:
-        # Check if filename is not None
-        if not file.filename:
-            # Assign a default unique filename
-            filename = f"{uuid.uuid4()}.csv"
-        else:
-            filename = os.path.basename(file.filename)
-
-        # Ensure the uploaded file is a .csv file
-        if not filename.endswith(".csv"):
-            raise HTTPException(status_code=400, detail="Only .csv files are allowed")
-
-        file_location = os.path.join(data_directory, filename)
-        with open(file_location, "wb+") as file_object:
-            shutil.copyfileobj(file.file, file_object)
-
-    # Reload the words from the new files
-    word_repo = WordRepository()
-    words = word_repo.load_words()
-    word_service.update_words(words)
-
-    return {"message": "Word files uploaded and word list updated"}
+        The status of the job (``pending``, ``done`` or ``failed``), the number of bytes
+        received, rows parsed and words loaded, the ``report`` of the skipped and
+        duplicate rows once every file is parsed, and the error of a failed job.
+    """
+    job = services.ingest_pipeline.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown upload job")
+    return job.progress()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Endpoint to scrape the application metrics in the Prometheus text format.
+
+    The metrics include request latency histograms per route, in-flight requests,
+    checked answers, the deck size, active sessions, word reload durations and the
+    depth of the quiz logger queue. Each worker process reports its own metrics. The
+    metrics are rendered in the thread pool, because reading some of them, such as the
+    sessions of a SQLite state backend, queries a database.
+
+    Returns
+    -------
+    PlainTextResponse
+        The metrics exposition.
+    """
+    # Some values are read when scraped, such as the sessions of a SQLite backend
+    exposition = await run_in_threadpool(REGISTRY.render)
+    return PlainTextResponse(exposition, media_type=CONTENT_TYPE)
+
+
+def require_profile_access(request: Request) -> ProfileStore:
+    """
+    Returns the profile store if profiling is enabled and the caller sent the token.
+
+    Raises
+    ------
+    HTTPException
+        404 if profiling is disabled or no token is configured, 403 if the token in the
+        ``X-Profile-Token`` header is missing or wrong.
+    """
+    if profile_store is None or not PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    token = request.headers.get(PROFILE_HEADER, "")
+    if not hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+    return profile_store
+
+
+@app.get("/admin/profiles")
+async def list_profiles(store: ProfileStore = Depends(require_profile_access)):
+    """
+    Endpoint to list the kept request profiles, newest first.
+
+    A profile covers the coroutine of its request and the work the app passes to the
+    thread pool, but not the sync dependencies FastAPI runs in the thread pool itself,
+    such as loading the session; their time only shows in ``duration_ms``.
+
+    Returns
+    -------
+    dict
+        The id, method, path, status, start time and duration of every profile.
+    """
+    return {"profiles": [record.summary() for record in store.list()]}
+
+
+@app.get("/admin/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    format: str = "pstats",
+    store: ProfileStore = Depends(require_profile_access),
+):
+    """
+    Endpoint to download a request profile.
+
+    Parameters
+    ----------
+    profile_id : str
+        The id listed by ``GET /admin/profiles``.
+    format : str
+        ``pstats`` for a file readable with ``pstats`` or snakeviz, or ``text`` for
+        the functions with the highest cumulative time.
+
+    Raises
+    ------
+    HTTPException
+        If the profile is unknown or was dropped from the buffer, or the format is
+        unknown.
+
+    Returns
+    -------
+    Response
+        The profile.
+    """
+    record = store.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Unknown profile")
+    if format == "text":
+        return PlainTextResponse(await run_in_threadpool(record.to_text))
+    if format != "pstats":
+        raise HTTPException(status_code=400, detail="Format must be pstats or text")
+    return Response(
+        record.to_pstats(),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'},
+    )
+
+
+@app.get("/healthz")
+async def liveness(services: Services = Depends(get_services)):
+    """
+    Liveness probe. Answers while the application runs, also while the words load.
+
+    Returns
+    -------
+    JSONResponse
+        ``alive`` with status 200, or the error with status 503 if loading the words
+        failed, so the container is restarted.
+    """
+    if services.error is not None:
+        return JSONResponse(services.status(), status_code=503)
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readiness(services: Services = Depends(get_services)):
+    """
+    Readiness probe. Answers 200 only once the words are loaded.
+
+    Returns
+    -------
+    JSONResponse
+        ``ready`` and the number of words with status 200, or ``loading`` or
+        ``failed`` with status 503.
+    """
+    status = services.status()
+    if status["status"] != "ready":
+        return JSONResponse(status, status_code=503)
+    return status
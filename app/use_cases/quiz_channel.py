@@ -0,0 +1,288 @@
+# app/use_cases/quiz_channel.py
+"""This module contains the QuizChannel class, which runs the quiz of one session over a persistent connection.
+
+The HTTP API asks a word, checks an answer and reads the results in separate requests.
+A QuizChannel answers the same operations as messages of one long-lived connection,
+such as the ``/ws/quiz`` WebSocket. Every reply that changes the quiz carries the next
+word and the updated counters, so a learner gets the result of an answer together with
+the next question in one message.
+
+Messages are plain dicts decoded from JSON, with a ``type`` and the fields of the
+matching HTTP request. A message may carry an ``id``, which is copied to its reply.
+
+- ``start``: Starts a new quiz, optionally on ``deck_id``, like ``POST /start_quiz/``.
+- ``mode``: Sets ``mode``, ``retry_gap`` and ``max_typos`` like ``POST /set_mode/``.
+- ``next``: Asks the next word, or the next ``count`` words.
+- ``answer``: Checks ``user_input`` for ``word_id`` like ``POST /check/``. The reply
+  carries the next word unless ``next`` is false.
+- ``results``: Returns the statistics of the quiz like ``GET /results/``.
+- ``end``: Ends the quiz and logs the results like ``POST /end_quiz/``.
+- ``session``: Continues the session ``session_id`` on this channel, such as the
+  session of a browser that cannot send it as a header when connecting.
+
+Invalid messages are answered with an ``error`` reply carrying the HTTP status the
+matching endpoint would return; the connection stays usable.
+
+Words are put into the replies as the JSON encoded when the vocabulary was loaded, as
+``bytes`` values that ``render_json`` inserts as they are.
+
+Messages are handled like the HTTP endpoints handle their requests: loading the session,
+opening a deck and logging the results of a quiz may block and are passed to
+``offload``, such as a thread pool. A state kept in process memory is changed in the
+calling thread, on the event loop like by the HTTP endpoints, so the two never change
+the same state at once; a state written back to a shared backend is changed through
+``offload`` too.
+
+Classes
+-------
+QuizChannel
+
+Functions
+---------
+graded
+
+Usage of internal imports
+-------------------------
+- app.domain.models: AnswerMatch, QuizMode, Word
+- app.interfaces.metrics: QUIZ_CHANNEL_MESSAGE_DURATION
+- app.interfaces.responses: json_array
+- app.interfaces.repositories: UnknownDeckError
+- app.use_cases.session_registry: SessionRegistry
+- app.use_cases.word_service: WordService
+"""
+
+import time
+from typing import Any, Awaitable, Callable, Optional, Union
+
+from app.domain.models import AnswerMatch, QuizMode, Word
+from app.interfaces.metrics import QUIZ_CHANNEL_MESSAGE_DURATION
+from app.interfaces.repositories import UnknownDeckError
+from app.interfaces.responses import json_array
+from app.use_cases.session_registry import SessionRegistry
+from app.use_cases.word_service import WordService
+
+MESSAGE_TYPES = ("start", "mode", "next", "answer", "results", "end", "session")
+
+
+class _InvalidMessage(Exception):
+    """A message that is answered with an error reply."""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def graded(
+    word_service: WordService, word: Union[Word, str], match: AnswerMatch
+) -> dict:
+    """Returns the result of a graded answer, with the spelling of a close answer."""
+    result = {"is_correct": match is not AnswerMatch.WRONG, "match": match.value}
+    if match is AnswerMatch.CLOSE:
+        result["expected"] = word_service.expected_answer(word)
+    return result
+
+
+def _next_word(word_service: WordService) -> bytes:
+    indices = word_service.get_next_indices(1)
+    return word_service.vocabulary.word_json(indices[0]) if indices else b"null"
+
+
+async def _call(function, *args):
+    return function(*args)
+
+
+class QuizChannel:
+    """Answers the quiz messages of one learner session."""
+
+    def __init__(
+        self,
+        registry: SessionRegistry,
+        session_id: str,
+        max_count: int,
+        max_session_id_length: int = 128,
+        offload: Callable[..., Awaitable[Any]] = _call,
+    ):
+        """Initializes the QuizChannel.
+
+        Parameters
+        ----------
+        registry : SessionRegistry
+            The registry holding the quiz state of the session.
+        session_id : str
+            The identifier of the learner session.
+        max_count : int
+            The largest number of words a ``next`` message may ask for.
+        max_session_id_length : int
+            The longest session id a ``session`` message may name.
+        offload : Callable[..., Awaitable[Any]]
+            Awaits a call of a function that may block, such as
+            ``run_in_threadpool``. Defaults to calling the function directly.
+        """
+        self.registry = registry
+        self.session_id = session_id
+        self.max_count = max_count
+        self.max_session_id_length = max_session_id_length
+        self.offload = offload
+
+    async def handle(self, message: Any) -> dict:
+        """Handles one message and returns its reply.
+
+        The quiz state is loaded from the registry for every message, so a channel
+        sees the changes made through the HTTP API or by other workers.
+
+        Parameters
+        ----------
+        message : Any
+            The decoded message; anything but a dict with a known ``type`` is answered
+            with an error.
+
+        Returns
+        -------
+        dict
+            The reply, with the ``id`` of the message if it had one, to be encoded
+            with ``render_json``.
+        """
+        start = time.perf_counter()
+        kind = "invalid"
+        try:
+            if (
+                not isinstance(message, dict)
+                or message.get("type") not in MESSAGE_TYPES
+            ):
+                raise _InvalidMessage(400, "Invalid message")
+            kind = message["type"]
+            reply = await getattr(self, f"_{kind}")(message)
+        except _InvalidMessage as error:
+            reply = {"type": "error", "status": error.status, "detail": error.detail}
+        if isinstance(message, dict) and "id" in message:
+            reply["id"] = message["id"]
+        QUIZ_CHANNEL_MESSAGE_DURATION.labels(kind).observe(time.perf_counter() - start)
+        return reply
+
+    async def _service(self) -> WordService:
+        return await self.offload(self.registry.get, self.session_id)
+
+    async def _change(self, word_service: WordService, function, *args):
+        """Calls a function changing the quiz state where the state may be changed."""
+        if word_service.on_change is None:
+            return function(*args)
+        return await self.offload(function, *args)
+
+    @staticmethod
+    def _optional_int(message: dict, key: str) -> Optional[int]:
+        value = message.get(key)
+        if value is not None and type(value) is not int:
+            raise _InvalidMessage(400, f"Invalid {key}")
+        return value
+
+    @staticmethod
+    def _progress(word_service: WordService) -> dict:
+        return {"correct": word_service.correct, "incorrect": word_service.incorrect}
+
+    async def _start(self, message: dict) -> dict:
+        deck_id = message.get("deck_id")
+        if deck_id is not None and not isinstance(deck_id, str):
+            raise _InvalidMessage(400, "Invalid deck_id")
+        try:
+            word_service = await self.offload(
+                self.registry.on_deck, self.session_id, deck_id
+            )
+        except UnknownDeckError:
+            raise _InvalidMessage(404, "Unknown deck") from None
+
+        def start() -> bytes:
+            word_service.start_quiz(deck_id)
+            return _next_word(word_service)
+
+        return {
+            "type": "started",
+            "deck_id": deck_id,
+            "words": len(word_service.vocabulary),
+            "next": await self._change(word_service, start),
+        }
+
+    async def _mode(self, message: dict) -> dict:
+        mode = message.get("mode")
+        if mode not in [quiz_mode.value for quiz_mode in QuizMode]:
+            raise _InvalidMessage(400, "Invalid mode")
+        retry_gap = self._optional_int(message, "retry_gap")
+        max_typos = self._optional_int(message, "max_typos")
+        if retry_gap is not None and retry_gap < 1:
+            raise _InvalidMessage(400, "Invalid retry gap")
+        if max_typos is not None and max_typos < 0:
+            raise _InvalidMessage(400, "Invalid number of typos")
+        word_service = await self._service()
+
+        def set_mode() -> bytes:
+            word_service.set_mode(mode, retry_gap, max_typos)
+            return _next_word(word_service)
+
+        return {
+            "type": "mode",
+            "mode": mode,
+            "next": await self._change(word_service, set_mode),
+        }
+
+    async def _next(self, message: dict) -> dict:
+        count = self._optional_int(message, "count")
+        if count is not None and not 1 <= count <= self.max_count:
+            raise _InvalidMessage(400, "Invalid count")
+        word_service = await self._service()
+        if count is None:
+            return {
+                "type": "word",
+                "next": await self._change(word_service, _next_word, word_service),
+            }
+        indices = await self._change(word_service, word_service.get_next_indices, count)
+        return {
+            "type": "words",
+            "words": json_array(map(word_service.vocabulary.word_json, indices)),
+        }
+
+    async def _answer(self, message: dict) -> dict:
+        word_id = message.get("word_id")
+        user_input = message.get("user_input")
+        if not isinstance(word_id, str) or not word_id:
+            raise _InvalidMessage(400, "word_id is required")
+        if not isinstance(user_input, str):
+            raise _InvalidMessage(400, "user_input is required")
+        word_service = await self._service()
+
+        def answer() -> dict:
+            try:
+                match = word_service.grade_answer(word_id, user_input)
+            except KeyError:
+                raise _InvalidMessage(404, "Unknown word") from None
+            reply = {"type": "result", **graded(word_service, word_id, match)}
+            reply.update(self._progress(word_service))
+            if message.get("next", True):
+                reply["next"] = _next_word(word_service)
+            return reply
+
+        return await self._change(word_service, answer)
+
+    async def _results(self, message: dict) -> dict:
+        word_service = await self._service()
+        return {
+            "type": "results",
+            **self._progress(word_service),
+            "incorrect_words": word_service.incorrect_words,
+        }
+
+    async def _end(self, message: dict) -> dict:
+        word_service = await self._service()
+        # Logging waits for the writer when its queue is full
+        await self.offload(word_service.logger.log_result, word_service.quiz_result())
+        return {"type": "ended"}
+
+    async def _session(self, message: dict) -> dict:
+        session_id = message.get("session_id")
+        if (
+            not isinstance(session_id, str)
+            or not session_id
+            or len(session_id) > self.max_session_id_length
+        ):
+            raise _InvalidMessage(400, "Invalid session_id")
+        self.session_id = session_id
+        return {"type": "session", "session_id": session_id}
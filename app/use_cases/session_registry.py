@@ -0,0 +1,361 @@
+"""This module contains the SessionRegistry class, which keeps one quiz state per learner session.
+
+Every learner gets an own QuizState that holds the counters, the word order and the
+current position of their quiz. The states are kept by a QuizStateBackend: in process
+memory by default, or in a store shared by several worker processes. For every request
+the registry wraps the state of the session in a WordService. All services share the
+same immutable Vocabulary and the same QuizLogger, so a session only costs its own
+bookkeeping.
+
+A quiz can be started on a named deck of a DeckRegistry instead of the shared word list.
+The state remembers the deck id, and the registry opens the deck again for every request
+of the session; a deck that no longer exists puts the session back on the shared list.
+
+When an AnswerLog is given, every graded answer is appended to it with the session id,
+and ``restore`` rebuilds the quizzes of sessions that were lost, for example with the
+process memory on a restart, by replaying the logged answers.
+
+When a backend does not hand out its stored state objects, the service writes the state
+back to the backend after every change.
+
+Vocabularies are immutable versions identified by their fingerprint. Replacing the shared
+word list or a deck swaps in the new version for new quizzes without touching the stored
+sessions: the replaced version is retired and quizzes in progress keep using it until
+they start a new quiz. A retired version is released, and a memory-mapped deck unmapped,
+once no stored session refers to it anymore, which is checked by ``release_unused``
+every ``release_interval`` seconds from a background task of the owner of the registry,
+so a request never waits for the check. A state whose version was already released is
+replaced by a new quiz when it is loaded.
+
+Classes
+-------
+SessionRegistry
+
+Usage of internal imports
+-------------------------
+- app.domain.models: AnswerEvent, QuizState, Word
+- app.domain.vocabulary: Vocabulary
+- app.interfaces.answer_log: AnswerLog
+- app.interfaces.logger: QuizLogger
+- app.interfaces.repositories: DeckRegistry, UnknownDeckError
+- app.interfaces.state_backends: QuizStateBackend, InMemoryStateBackend
+- app.use_cases.word_service: WordService
+"""
+
+import functools
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from app.domain.models import AnswerEvent, QuizState, Word
+from app.domain.vocabulary import Vocabulary
+from app.interfaces.answer_log import AnswerLog
+from app.interfaces.logger import QuizLogger
+from app.interfaces.repositories import DeckRegistry, UnknownDeckError
+from app.interfaces.state_backends import InMemoryStateBackend, QuizStateBackend
+from app.use_cases.word_service import WordService
+
+
+class SessionRegistry:
+    """Keeps one WordService per learner session over a shared vocabulary."""
+
+    def __init__(
+        self,
+        words: Union[Vocabulary, List[Word]],
+        logger: QuizLogger,
+        ttl_seconds: float = 1800.0,
+        max_sessions: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+        backend: Optional[QuizStateBackend] = None,
+        decks: Optional[DeckRegistry] = None,
+        answer_log: Optional[AnswerLog] = None,
+        release_interval: float = 10.0,
+    ):
+        """Initializes the SessionRegistry.
+
+        Parameters
+        ----------
+        words : Union[Vocabulary, List[Word]]
+            The vocabulary shared by all sessions.
+        logger : QuizLogger
+            The logger shared by all sessions for recording quiz results.
+        ttl_seconds : float
+            How long an idle session is kept before it is expired.
+        max_sessions : int
+            Maximum number of sessions kept at once. The least recently used
+            session is evicted when a new session would exceed the limit.
+        clock : Callable[[], float]
+            Monotonic time source in seconds, replaceable in tests.
+        backend : Optional[QuizStateBackend]
+            The backend storing the quiz states. Defaults to an InMemoryStateBackend
+            configured with ``ttl_seconds``, ``max_sessions`` and ``clock``.
+        decks : Optional[DeckRegistry]
+            The named decks quizzes can be started on.
+        answer_log : Optional[AnswerLog]
+            The log every graded answer is appended to.
+        release_interval : float
+            How often, in seconds, the owner of the registry should call
+            ``release_unused`` while vocabularies are retired.
+        """
+        self.vocabulary = Vocabulary.of(words)
+        self.logger = logger
+        if backend is None:
+            backend = InMemoryStateBackend(ttl_seconds, max_sessions, clock)
+        self.backend = backend
+        self.decks = decks
+        self.answer_log = answer_log
+        self.release_interval = release_interval
+        self._retired: Dict[str, Vocabulary] = {}
+        self._retired_lock = threading.Lock()
+
+    @property
+    def ttl_seconds(self) -> float:
+        return self.backend.ttl_seconds
+
+    @property
+    def max_sessions(self) -> int:
+        return self.backend.max_sessions
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self.backend
+
+    def get(self, session_id: str) -> WordService:
+        """Returns the WordService of a session, creating a new session if needed.
+
+        Parameters
+        ----------
+        session_id : str
+            The identifier of the learner session.
+
+        Returns
+        -------
+        WordService
+            A service working on the quiz state of the session.
+        """
+        state = self.backend.load(session_id)
+        vocabulary = None
+        if state is not None:
+            vocabulary = self._retired.get(state.vocabulary)
+        if vocabulary is None:
+            try:
+                vocabulary = self.vocabulary_for(
+                    state.deck if state is not None else None
+                )
+            except UnknownDeckError:
+                state.deck = None  # The deck was removed
+                vocabulary = self.vocabulary
+        return self._service(session_id, vocabulary, state)
+
+    def start(self, session_id: str, deck_id: Optional[str] = None) -> WordService:
+        """Starts a new quiz of a session on a deck, keeping the quiz mode.
+
+        Parameters
+        ----------
+        session_id : str
+            The identifier of the learner session.
+        deck_id : Optional[str]
+            The id of the deck to draw the words from, or None for the shared word list.
+
+        Raises
+        ------
+        UnknownDeckError
+            If there is no deck with the given id.
+
+        Returns
+        -------
+        WordService
+            A service working on the new quiz of the session.
+        """
+        service = self.on_deck(session_id, deck_id)
+        service.start_quiz(deck_id)
+        return service
+
+    def on_deck(self, session_id: str, deck_id: Optional[str] = None) -> WordService:
+        """Returns the WordService of a session on the words of a deck, without starting
+        the new quiz.
+
+        This is the part of ``start`` that may block, opening the deck and loading the
+        state, so a caller can run it off the event loop and then call ``start_quiz``
+        of the service where the state is changed.
+
+        Parameters
+        ----------
+        session_id : str
+            The identifier of the learner session.
+        deck_id : Optional[str]
+            The id of the deck to draw the words from, or None for the shared word list.
+
+        Raises
+        ------
+        UnknownDeckError
+            If there is no deck with the given id.
+
+        Returns
+        -------
+        WordService
+            A service working on the state of the session and the words of the deck.
+        """
+        vocabulary = self.vocabulary_for(deck_id)
+        return self._service(session_id, vocabulary, self.backend.load(session_id))
+
+    def vocabulary_for(self, deck_id: Optional[str]) -> Vocabulary:
+        """Returns the words of a deck, or the shared word list if the id is None.
+
+        Raises
+        ------
+        UnknownDeckError
+            If there is no deck with the given id.
+        """
+        if deck_id is None:
+            return self.vocabulary
+        if self.decks is None:
+            raise UnknownDeckError(deck_id)
+        return self.decks.get(deck_id)
+
+    def _service(
+        self, session_id: str, vocabulary: Vocabulary, state: Optional[QuizState]
+    ) -> WordService:
+        on_change = (
+            None
+            if self.backend.keeps_state_objects
+            else functools.partial(self.backend.save, session_id)
+        )
+        on_answer = (
+            None
+            if self.answer_log is None
+            else functools.partial(self._log_answer, session_id)
+        )
+        service = WordService(vocabulary, self.logger, state, on_change, on_answer)
+        if service.state is not state:
+            self.backend.save(session_id, service.state)
+        return service
+
+    def _log_answer(self, session_id: str, event: AnswerEvent):
+        event.session_id = session_id
+        self.answer_log.append(event)
+
+    def restore(self, events: Iterable[AnswerEvent]) -> int:
+        """Rebuilds the quizzes of unknown sessions from logged answers.
+
+        The last quiz of every session that is not in the backend is started again on
+        its deck, with its mode and start time, and its answers are applied with their
+        recorded grades. The counters and the answered words are restored; the words
+        are asked in a new order. Sessions whose deck no longer exists are skipped, as
+        are answers to words that are no longer in the deck.
+
+        Parameters
+        ----------
+        events : Iterable[AnswerEvent]
+            The logged answers in answer time order, for example from
+            ``AnswerLog.replay``.
+
+        Returns
+        -------
+        int
+            The number of restored sessions.
+        """
+        quizzes: Dict[str, List[AnswerEvent]] = {}
+        for event in events:
+            if event.session_id is None:
+                continue
+            answers = quizzes.get(event.session_id)
+            if answers is None or event.quiz_start > answers[0].quiz_start:
+                quizzes[event.session_id] = [event]
+            elif event.quiz_start == answers[0].quiz_start:
+                answers.append(event)
+        restored = 0
+        for session_id, answers in quizzes.items():
+            if session_id in self.backend:
+                continue
+            first = answers[0]
+            try:
+                vocabulary = self.vocabulary_for(first.deck)
+            except UnknownDeckError:
+                continue
+            service = WordService(vocabulary, self.logger)
+            service.state.deck = first.deck
+            service.state.mode = first.mode
+            service.start_time = first.quiz_start
+            for event in answers:
+                service.replay_answer(event)
+            self.backend.save(session_id, service.state)
+            restored += 1
+        return restored
+
+    def remove(self, session_id: str):
+        """Forgets a session. Unknown session ids are ignored."""
+        self.backend.delete(session_id)
+
+    def expire(self) -> int:
+        """Expires the sessions that have been idle longer than the TTL.
+
+        Returns
+        -------
+        int
+            The number of expired sessions.
+        """
+        return self.backend.expire()
+
+    def update_words(self, new_words: Union[Vocabulary, List[Word]]):
+        """Replaces the shared vocabulary.
+
+        New quizzes use the new vocabulary at once. The previous vocabulary is retired, so
+        quizzes in progress on it continue until they start a new quiz.
+
+        Parameters
+        ----------
+        new_words : Union[Vocabulary, List[Word]]
+            The new vocabulary.
+        """
+        previous = self.vocabulary
+        self.vocabulary = Vocabulary.of(new_words)
+        self._retired.pop(self.vocabulary.fingerprint, None)
+        if previous.fingerprint != self.vocabulary.fingerprint:
+            self.retire(previous)
+
+    def retire(self, vocabulary: Vocabulary):
+        """Keeps a replaced vocabulary for the quizzes in progress on it.
+
+        The vocabulary is released at once if no session refers to it, and otherwise by
+        a later check once the last of those sessions started a new quiz or expired.
+
+        Parameters
+        ----------
+        vocabulary : Vocabulary
+            The replaced version of the shared word list or of a deck.
+        """
+        with self._retired_lock:
+            self._retired[vocabulary.fingerprint] = vocabulary
+        self.release_unused()
+
+    @property
+    def retired(self) -> int:
+        """The number of retired vocabularies still used by quizzes in progress."""
+        return len(self._retired)
+
+    def release_unused(self) -> int:
+        """Releases the retired vocabularies no stored session refers to.
+
+        The check may scan every stored session, so it is not run by requests but by
+        a background task every ``release_interval`` seconds, and by ``retire``.
+
+        Returns
+        -------
+        int
+            The number of released vocabularies.
+        """
+        with self._retired_lock:
+            if not self._retired:
+                return 0
+            in_use = self.backend.vocabularies_in_use()
+            unused = [key for key in self._retired if key not in in_use]
+            for key in unused:
+                del self._retired[key]
+        return len(unused)
+
+    def close(self):
+        """Releases the resources of the backend."""
+        self.backend.close()
@@ -7,15 +7,24 @@ WordService
 
 Usage of internal imports
 -------------------------
-- app.domain.models: QuizMode, QuizResult, Word
+- app.domain.models: AnswerEvent, AnswerMatch, QuizMode, QuizResult, QuizState, Word
+- app.domain.vocabulary: FeistelPermutation, Vocabulary, make_word_id
 - app.interfaces.logger: QuizLogger
+- app.interfaces.metrics: ANSWER_CHECKS, ANSWERS
 
 Attributes
 ----------
-all_words : List[Word]
-    List of all words for the quiz.
+vocabulary : Vocabulary
+    All words for the quiz. The vocabulary is immutable and can be shared by many services.
 logger : QuizLogger
     Logger for recording quiz results.
+state : QuizState
+    The progress of the quiz. The attributes below are read from and written to the
+    state, so the state can be stored by a state backend and handed to a new service.
+on_change : Optional[Callable[[QuizState], None]]
+    Called with the state after every change, used to write it back to a shared backend.
+on_answer : Optional[Callable[[AnswerEvent], None]]
+    Called with an event for every graded answer, used to append it to the answer log.
 correct : int
     Number of correct answers.
 incorrect : int
@@ -28,62 +37,175 @@ start_time : datetime
     Start time of the quiz.
 mode : QuizMode
     Current quiz mode.
-word_queue : List[Word]
-    Queue of words for the quiz.
+word_queue : Sequence[int]
+    Vocabulary indices in quiz order. A fresh quiz uses a lazily evaluated permutation,
+    so starting a quiz costs O(1) regardless of the size of the vocabulary.
 current_word_index : int
     Index of the current word in the queue.
+retry_queue : List[int]
+    Vocabulary indices of the words answered incorrectly during the current pass.
 repeat_incorrect_count : dict
     Counter for how many times each word was answered incorrectly.
 
 Methods
 -------
-__init__(words: List[Word], logger: QuizLogger)
-    Initializes the WordService with a list of words and a logger.
+__init__(words: Union[Vocabulary, List[Word]], logger: QuizLogger, state: Optional[QuizState] = None, on_change=None, on_answer=None)
+    Initializes the WordService with a vocabulary or a list of words, a logger and
+    optionally the stored state of a quiz in progress.
 reset_quiz()
     Resets the quiz state.
-set_mode(mode: str)
-    Sets the quiz mode.
+set_mode(mode: str, retry_gap: Optional[int] = None, max_typos: Optional[int] = None)
+    Sets the quiz mode, the gap before a missed word comes back in spaced mode and the
+    number of typos accepted in an answer.
+start_quiz(deck: Optional[str] = None)
+    Starts a new quiz on a deck, keeping the quiz mode.
 end_quiz()
     Ends the quiz session and logs the results.
+quiz_result() -> QuizResult
+    Returns the result of the quiz so far without logging it.
 get_next_word() -> Optional[Word]
     Returns the next word based on the quiz mode.
-_get_next_word_normal() -> Optional[Word]
+get_next_words(count: int) -> List[Word]
+    Returns up to ``count`` next words at once.
+get_next_indices(count: int) -> List[int]
+    Like ``get_next_words``, but returns the indices of the words in the vocabulary.
+_get_next_word_normal() -> Optional[int]
     Logic for normal mode.
-_get_next_word_infinite() -> Optional[Word]
+_get_next_word_infinite() -> Optional[int]
     Logic for infinite mode.
-check_answer(word: Word, user_input: str) -> bool
-    Checks if the user's input matches the foreign term and updates quiz statistics accordingly.
+_get_next_word_spaced() -> Optional[int]
+    Logic for spaced repetition mode.
+check_answer(word: Union[Word, str], user_input: str) -> bool
+    Checks if the user's input matches the foreign term of the word with the given id and
+    updates quiz statistics accordingly.
+check_answers(answers: Sequence[Tuple[Union[Word, str], str]]) -> List[bool]
+    Checks several answers in order and stores the state once.
+expected_answer(word: Union[Word, str]) -> str
+    Returns the foreign term of a word.
+grade_answer(word: Union[Word, str], user_input: str) -> AnswerMatch
+    Like ``check_answer``, but tells exact answers from close ones.
+grade_answers(answers: Sequence[Tuple[Union[Word, str], str]]) -> List[AnswerMatch]
+    Like ``check_answers``, but tells exact answers from close ones.
 increment_incorrect_repeat(word: Word)
     Increments the counter for how many times the user has written the incorrect term.
-update_words(new_words: List[Word])
+update_words(new_words: Union[Vocabulary, List[Word]])
     Updates the word list with new words.
 """
 
+import heapq
 import random
 from datetime import datetime
-from typing import List, Optional
-
-from app.domain.models import QuizMode, QuizResult, Word
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+from app.domain.models import (
+    AnswerEvent,
+    AnswerMatch,
+    QuizMode,
+    QuizResult,
+    QuizState,
+    Word,
+)
+from app.domain.vocabulary import FeistelPermutation, Vocabulary, make_word_id
 from app.interfaces.logger import QuizLogger
+from app.interfaces.metrics import ANSWER_CHECKS, ANSWERS
+
+_CORRECT_ANSWERS = ANSWERS.labels("correct")
+_INCORRECT_ANSWERS = ANSWERS.labels("incorrect")
+
+
+class _StateAttribute:
+    """Exposes a field of the quiz state as an attribute of the service."""
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, service, owner=None):
+        if service is None:
+            return self
+        return getattr(service.state, self.name)
+
+    def __set__(self, service, value):
+        setattr(service.state, self.name, value)
 
 
 class WordService:
     """Contains the business logic for the VocabVoyage quiz application."""
 
-    def __init__(self, words: List[Word], logger: QuizLogger):
+    mode = _StateAttribute()
+    correct = _StateAttribute()
+    incorrect = _StateAttribute()
+    incorrect_words = _StateAttribute()
+    correct_words = _StateAttribute()
+    start_time = _StateAttribute()
+    current_word_index = _StateAttribute()
+    retry_queue = _StateAttribute()
+    repeat_incorrect_count = _StateAttribute()
+
+    # Review boxes of spaced mode; a word answered correctly in the last box is learned
+    LEITNER_BOXES = 2
+
+    def __init__(
+        self,
+        words: Union[Vocabulary, List[Word]],
+        logger: QuizLogger,
+        state: Optional[QuizState] = None,
+        on_change: Optional[Callable[[QuizState], None]] = None,
+        on_answer: Optional[Callable[[AnswerEvent], None]] = None,
+    ):
         """Initializes the WordService with a list of words and a logger.
 
         Parameters
         ----------
-        words : List[Word]
-            A list of Word objects to be used in the quiz.
+        words : Union[Vocabulary, List[Word]]
+            The words to be used in the quiz. A list of Word objects is converted
+            into a Vocabulary; pass a Vocabulary to share it between services.
         logger : QuizLogger
             A logger instance for logging quiz activities.
+        state : Optional[QuizState]
+            The stored state of a quiz to continue. The state is used in place. A new
+            quiz is started if no state is given or if the state belongs to another
+            vocabulary; the deck and the quiz mode of such a state are kept.
+        on_change : Optional[Callable[[QuizState], None]]
+            Called with the state after every change.
+        on_answer : Optional[Callable[[AnswerEvent], None]]
+            Called with an event for every graded answer.
         """
 
-        self.all_words = words
+        self.vocabulary = Vocabulary.of(words)
         self.logger = logger
-        self.reset_quiz()
+        self.on_change = on_change
+        self.on_answer = on_answer
+        self._permutation: Optional[FeistelPermutation] = None
+        if state is not None and state.vocabulary == self.vocabulary.fingerprint:
+            self.state = state
+        else:
+            self.state = QuizState(
+                vocabulary=self.vocabulary.fingerprint,
+                deck=state.deck if state is not None else None,
+                mode=state.mode if state is not None else QuizMode.NORMAL,
+                start_time=datetime.now(),
+            )
+            self._reset()
+
+    @property
+    def word_queue(self) -> Sequence[int]:
+        """Vocabulary indices in quiz order."""
+        if self.state.queue is not None:
+            return self.state.queue
+        permutation = self._permutation
+        if (
+            permutation is None
+            or permutation.key != self.state.queue_key
+            or permutation.size != len(self.vocabulary)
+        ):
+            permutation = self._permutation = FeistelPermutation(
+                len(self.vocabulary), self.state.queue_key
+            )
+        return permutation
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(self.state)
 
     def reset_quiz(self):
         """Resets the quiz state to its initial configuration.
@@ -94,25 +216,72 @@ class WordService:
         - Clears the list of incorrect words.
         - Clears the list of correct words.
         - Records the current time as the start time of the quiz.
-        - Sets the quiz mode to NORMAL.
-        - Copies all words to the word queue and shuffles them.
+        - Orders the words with a new random permutation of the vocabulary indices.
         - Resets the current word index to -1, which will be incremented when fetching the next word.
+        - Clears the queue of words to repeat in infinite mode.
+        - Clears the review schedule of spaced mode.
         - Initializes a dictionary to track the number of times each word was answered incorrectly.
         """
+        self._reset()
+        self._changed()
+
+    def _reset(self):
         self.correct = 0
         self.incorrect = 0
         self.incorrect_words = []
         self.correct_words = []
         self.start_time = datetime.now()
-        self.mode = QuizMode.NORMAL
-        self.word_queue = self.all_words.copy()
-        random.shuffle(self.word_queue)
+        self.state.queue_key = random.getrandbits(63)
+        self.state.queue = None
         self.current_word_index = -1  # Will be incremented in get_next_word()
+        self.retry_queue: List[int] = []
         self.repeat_incorrect_count = {}  # Track how many times the user wrote incorrect terms
+        self.state.step = 0
+        self.state.schedule = []
+        self.state.boxes = {}
+        self.state.pending = []
+
+    def set_mode(
+        self,
+        mode: str,
+        retry_gap: Optional[int] = None,
+        max_typos: Optional[int] = None,
+    ):
+        """Sets the quiz mode and starts a new quiz.
 
-    def set_mode(self, mode: str):
-        """Sets the quiz mode."""
+        Parameters
+        ----------
+        mode : str
+            The quiz mode.
+        retry_gap : Optional[int]
+            How many other words are asked before a missed word comes back in spaced
+            mode. The previous gap is kept if not given.
+        max_typos : Optional[int]
+            How many typos an answer may contain and still count as correct; 0 accepts
+            exact answers only. Answers that differ only in diacritics are accepted
+            whenever typos are. The previous setting is kept if not given.
+        """
+        if retry_gap is not None and retry_gap < 1:
+            raise ValueError("retry_gap must be at least 1")
+        if max_typos is not None and max_typos < 0:
+            raise ValueError("max_typos must not be negative")
         self.mode = QuizMode(mode)
+        if retry_gap is not None:
+            self.state.retry_gap = retry_gap
+        if max_typos is not None:
+            self.state.max_typos = max_typos
+        self.reset_quiz()
+
+    def start_quiz(self, deck: Optional[str] = None):
+        """Starts a new quiz on a deck, keeping the quiz mode.
+
+        Parameters
+        ----------
+        deck : Optional[str]
+            The id of the deck the vocabulary of the service was opened from, or None
+            for the shared word list.
+        """
+        self.state.deck = deck
         self.reset_quiz()
 
     def end_quiz(self):
@@ -138,16 +307,25 @@ class WordService:
         logger : Logger
             The logger instance used to log the quiz results.
         """
-        end_time = datetime.now()
-        result = QuizResult(
+        self.logger.log_result(self.quiz_result())
+
+    def quiz_result(self) -> QuizResult:
+        """Returns the result of the quiz so far, ending now, without logging it.
+
+        Returns
+        -------
+        QuizResult
+            The counters, the answered words and the times of the quiz.
+        """
+        return QuizResult(
             correct=self.correct,
             incorrect=self.incorrect,
             correct_words=list(set(self.correct_words)),
             incorrect_words=list(set(self.incorrect_words)),
             start_time=self.start_time,
-            end_time=end_time,
+            end_time=datetime.now(),
+            deck=self.state.deck,
         )
-        self.logger.log_result(result)
 
     def get_next_word(self) -> Optional[Word]:
         """Retrieves the next word based on the current quiz mode.
@@ -162,14 +340,67 @@ class WordService:
         ------
         None
         """
+        words = self.get_next_words(1)
+        return words[0] if words else None
+
+    def get_next_words(self, count: int) -> List[Word]:
+        """Retrieves up to ``count`` next words, as if ``get_next_word`` was called repeatedly.
+
+        In spaced mode the words of the previous call that were not answered yet are
+        scheduled again first, so the words of one call are answered as one batch.
+
+        Parameters
+        ----------
+        count : int
+            The maximum number of words to retrieve.
+
+        Returns
+        -------
+        List[Word]
+            The next words in quiz order. The list is shorter than ``count`` when the
+            quiz ends.
+        """
+        word = self.vocabulary.word
+        return [word(index) for index in self.get_next_indices(count)]
+
+    def get_next_indices(self, count: int) -> List[int]:
+        """Retrieves the vocabulary indices of up to ``count`` next words.
+
+        Works like ``get_next_words``. Used to serve the words as the JSON encoded by
+        the vocabulary, without creating Word objects.
+
+        Parameters
+        ----------
+        count : int
+            The maximum number of words to retrieve.
+
+        Returns
+        -------
+        List[int]
+            The indices of the next words in quiz order. The list is shorter than
+            ``count`` when the quiz ends.
+        """
         if self.mode == QuizMode.NORMAL:
-            return self._get_next_word_normal()
+            next_word = self._get_next_word_normal
         elif self.mode == QuizMode.INFINITE:
-            return self._get_next_word_infinite()
+            next_word = self._get_next_word_infinite
+        elif self.mode == QuizMode.SPACED:
+            self._requeue_unanswered()
+            next_word = self._get_next_word_spaced
         else:
-            return None
-
-    def _get_next_word_normal(self) -> Optional[Word]:
+            return []
+        indices = []
+        for _ in range(count):
+            index = next_word()
+            if index is None:
+                break
+            indices.append(index)
+        if indices:
+            self.state.asked_at = datetime.now()
+        self._changed()
+        return indices
+
+    def _get_next_word_normal(self) -> Optional[int]:
         """Retrieve the next word in the queue for normal mode.
 
         In normal mode, the user is presented with words sequentially.
@@ -177,8 +408,8 @@ class WordService:
 
         Returns
         -------
-        Optional[Word]
-            The next word in the queue if available, otherwise None.
+        Optional[int]
+            The index of the next word in the queue if available, otherwise None.
         """
         self.current_word_index += 1
         if self.current_word_index < len(self.word_queue):
@@ -186,7 +417,7 @@ class WordService:
         else:
             return None  # No more words left
 
-    def _get_next_word_infinite(self) -> Optional[Word]:
+    def _get_next_word_infinite(self) -> Optional[int]:
         """Retrieve the next word in the queue for infinite mode.
 
         In infinite mode, the user is presented with words sequentially.
@@ -194,31 +425,85 @@ class WordService:
 
         Returns
         -------
-        Optional[Word]
-            The next word in the queue if available, otherwise None.
+        Optional[int]
+            The index of the next word in the queue if available, otherwise None.
         """
         if self.current_word_index + 1 < len(self.word_queue):
             self.current_word_index += 1
             return self.word_queue[self.current_word_index]
-        elif self.incorrect_words:
+        elif self.retry_queue:
             # Reset the queue with incorrect words
-            self.word_queue = [
-                Word(foreign_term=word, native_translation="")
-                for word in self.incorrect_words
-            ]
+            self.state.queue = self.retry_queue
+            self.retry_queue = []
             self.incorrect_words = []
             self.current_word_index = 0
             return self.word_queue[self.current_word_index]
         else:
             return None  # All words answered correctly
 
-    def check_answer(self, word: Word, user_input: str) -> bool:
+    def _get_next_word_spaced(self) -> Optional[int]:
+        """Retrieve the next word for spaced repetition mode.
+
+        Every asked word advances a logical clock by one step. A word that is due for a
+        review is asked first, otherwise the next new word of the queue. When all new
+        words were asked, the clock jumps to the next review, so the quiz only ends when
+        every word is learned. Reviews wait in a binary heap ordered by their due step,
+        so picking the next word costs O(log n).
+
+        Returns
+        -------
+        Optional[int]
+            The index of the next word, or None once every word has been learned.
+        """
+        state = self.state
+        state.step += 1
+        if state.schedule and state.schedule[0][0] <= state.step:
+            _, index = heapq.heappop(state.schedule)
+        elif self.current_word_index + 1 < len(self.word_queue):
+            self.current_word_index += 1
+            index = self.word_queue[self.current_word_index]
+        elif state.schedule:
+            state.step, index = heapq.heappop(state.schedule)
+        else:
+            return None  # All words learned
+        state.pending.append(index)
+        return index
+
+    def _requeue_unanswered(self):
+        """Asks the words that were asked but not answered again after ``retry_gap`` other words."""
+        state = self.state
+        for index in state.pending:
+            heapq.heappush(state.schedule, [state.step + state.retry_gap + 1, index])
+        state.pending = []
+
+    def _schedule_review(self, index: int, is_correct: bool):
+        """Moves an answered word between the Leitner boxes of spaced mode.
+
+        New words start in box 1. A correct answer moves the word up one box and a word
+        leaving the last box is learned. A wrong answer moves the word back to box 0.
+        A word in box ``b`` comes back after ``retry_gap * 2 ** b`` other words.
+        """
+        state = self.state
+        state.pending.remove(index)
+        box = state.boxes.pop(index, 1)
+        box = box + 1 if is_correct else 0
+        if box < self.LEITNER_BOXES:
+            state.boxes[index] = box
+            gap = state.retry_gap * 2**box
+            heapq.heappush(state.schedule, [state.step + gap + 1, index])
+
+    def check_answer(self, word: Union[Word, str], user_input: str) -> bool:
         """Check if the user's input matches the foreign term of the given word.
 
+        The answer is graded against the server-side vocabulary, never against the
+        foreign term sent by the client. The word is looked up by its id and the
+        user input is compared with the precomputed normalized foreign term.
+
         Parameters
         ----------
-        word : Word
-            The word object containing the foreign term to be checked.
+        word : Union[Word, str]
+            The id of the word, or a Word object. A Word without an id is identified
+            by the id derived from its foreign term and native translation.
         user_input : str
             The user's input to be compared with the foreign term.
 
@@ -227,6 +512,11 @@ class WordService:
         bool
             True if the user's input matches the foreign term, False otherwise.
 
+        Raises
+        ------
+        KeyError
+            If the word is not part of the vocabulary.
+
         Side Effects
         ------------
         - Increments the correct answer count and appends the foreign term to
@@ -238,17 +528,196 @@ class WordService:
         - Initializes the repeat_incorrect_count for the foreign term to 0 if
           the answer is incorrect.
         """
-        is_correct = word.foreign_term.strip().lower() == user_input.strip().lower()
+        return self.grade_answer(word, user_input) is not AnswerMatch.WRONG
+
+    def grade_answer(self, word: Union[Word, str], user_input: str) -> AnswerMatch:
+        """Checks an answer like ``check_answer`` and tells how well it matched.
+
+        Parameters
+        ----------
+        word : Union[Word, str]
+            The id of the word, or a Word object.
+        user_input : str
+            The user's input to be compared with the foreign term.
+
+        Returns
+        -------
+        AnswerMatch
+            EXACT or CLOSE for a correct answer, WRONG otherwise. Answers are only
+            CLOSE when the quiz accepts typos.
+
+        Raises
+        ------
+        KeyError
+            If the word is not part of the vocabulary.
+        """
+        index = self._index_of(word)
+        match = self._apply_answer(index, user_input)
+        ANSWER_CHECKS.inc()
+        self._answered([(index, user_input, match)])
+        self._changed()
+        return match
+
+    def check_answers(
+        self, answers: Sequence[Tuple[Union[Word, str], str]]
+    ) -> List[bool]:
+        """Checks several answers in order, as if ``check_answer`` was called for each.
+
+        Every word is looked up before any answer is applied, so an unknown word leaves
+        the quiz unchanged.
+
+        Parameters
+        ----------
+        answers : Sequence[Tuple[Union[Word, str], str]]
+            Pairs of a word id or Word object and the user's input.
+
+        Returns
+        -------
+        List[bool]
+            Whether each answer was correct, in the given order.
+
+        Raises
+        ------
+        KeyError
+            If a word is not part of the vocabulary.
+        """
+        return [match is not AnswerMatch.WRONG for match in self.grade_answers(answers)]
+
+    def grade_answers(
+        self, answers: Sequence[Tuple[Union[Word, str], str]]
+    ) -> List[AnswerMatch]:
+        """Checks several answers like ``check_answers`` and tells how well each matched.
+
+        Parameters
+        ----------
+        answers : Sequence[Tuple[Union[Word, str], str]]
+            Pairs of a word id or Word object and the user's input.
+
+        Returns
+        -------
+        List[AnswerMatch]
+            How well each answer matched, in the given order.
+
+        Raises
+        ------
+        KeyError
+            If a word is not part of the vocabulary.
+        """
+        indices = [self._index_of(word) for word, _ in answers]
+        results = [
+            self._apply_answer(index, user_input)
+            for index, (_, user_input) in zip(indices, answers)
+        ]
+        ANSWER_CHECKS.inc(len(answers))
+        self._answered(
+            [
+                (index, user_input, match)
+                for index, (_, user_input), match in zip(indices, answers, results)
+            ]
+        )
+        self._changed()
+        return results
+
+    def replay_answer(self, event: AnswerEvent) -> bool:
+        """Applies an answer read from the answer log, keeping its recorded grade.
+
+        The answer is not graded again, so the quiz settings at the time of the answer
+        decide. No answer event is emitted and the answer metrics are not counted
+        again.
+
+        Parameters
+        ----------
+        event : AnswerEvent
+            The logged answer.
+
+        Returns
+        -------
+        bool
+            False if the word is no longer part of the vocabulary and the answer was
+            skipped, True otherwise.
+        """
+        index = self.vocabulary.index_of(event.word_id)
+        if index is None:
+            return False
+        self._record_answer(index, event.match is not AnswerMatch.WRONG)
+        self._changed()
+        return True
+
+    def expected_answer(self, word: Union[Word, str]) -> str:
+        """Returns the foreign term of a word, the spelling a correct answer has.
+
+        Raises
+        ------
+        KeyError
+            If the word is not part of the vocabulary.
+        """
+        return self.vocabulary.foreign_terms[self._index_of(word)]
+
+    def _index_of(self, word: Union[Word, str]) -> int:
+        if isinstance(word, Word):
+            word_id = word.id or make_word_id(
+                word.foreign_term, word.native_translation
+            )
+        else:
+            word_id = word
+        index = self.vocabulary.index_of(word_id)
+        if index is None:
+            raise KeyError(f"Unknown word id: {word_id}")
+        return index
+
+    def _answered(self, answers: List[Tuple[int, str, AnswerMatch]]):
+        """Emits an answer event for every graded answer."""
+        if self.on_answer is None:
+            return
+        state = self.state
+        answered_at = datetime.now()
+        asked_at = state.asked_at
+        for index, user_input, match in answers:
+            self.on_answer(
+                AnswerEvent(
+                    deck=state.deck,
+                    mode=state.mode,
+                    quiz_start=state.start_time,
+                    word_id=self.vocabulary.ids[index],
+                    foreign_term=self.vocabulary.foreign_terms[index],
+                    answer=user_input,
+                    match=match,
+                    answered_at=answered_at,
+                    response_time=(
+                        (answered_at - asked_at).total_seconds()
+                        if asked_at is not None
+                        else None
+                    ),
+                )
+            )
+            asked_at = answered_at
+        state.asked_at = answered_at
+
+    def _apply_answer(self, index: int, user_input: str) -> AnswerMatch:
+        match = self.vocabulary.match(index, user_input, self.state.max_typos)
+        # Only live answers are counted; replayed answers were counted when graded
+        if match is AnswerMatch.WRONG:
+            _INCORRECT_ANSWERS.inc()
+        else:
+            _CORRECT_ANSWERS.inc()
+        self._record_answer(index, match is not AnswerMatch.WRONG)
+        return match
+
+    def _record_answer(self, index: int, is_correct: bool):
+        foreign_term = self.vocabulary.foreign_terms[index]
         if is_correct:
             self.correct += 1
-            self.correct_words.append(word.foreign_term)
-            if word.foreign_term in self.repeat_incorrect_count:
-                del self.repeat_incorrect_count[word.foreign_term]
+            self.correct_words.append(foreign_term)
+            if foreign_term in self.repeat_incorrect_count:
+                del self.repeat_incorrect_count[foreign_term]
         else:
             self.incorrect += 1
-            self.incorrect_words.append(word.foreign_term)
-            self.repeat_incorrect_count[word.foreign_term] = 0  # Initialize counter
-        return is_correct
+            self.incorrect_words.append(foreign_term)
+            if self.mode != QuizMode.SPACED:
+                self.retry_queue.append(index)
+            self.repeat_incorrect_count[foreign_term] = 0  # Initialize counter
+        if self.mode == QuizMode.SPACED and index in self.state.pending:
+            self._schedule_review(index, is_correct)
 
     def increment_incorrect_repeat(self, word: Word):
         """Increments the counter for the number of times the user has written the incorrect term for a given word.
@@ -266,21 +735,23 @@ class WordService:
         """
         if word.foreign_term in self.repeat_incorrect_count:
             self.repeat_incorrect_count[word.foreign_term] += 1
+            self._changed()
             return self.repeat_incorrect_count[word.foreign_term]
         else:
             return 0  # Should not happen
 
-    def update_words(self, new_words: List[Word]):
+    def update_words(self, new_words: Union[Vocabulary, List[Word]]):
         """Updates the internal word list with a new set of words and resets the quiz.
 
         Parameters
         ----------
-        new_words : List[Word]
-            A list of Word objects to update the internal word list with.
+        new_words : Union[Vocabulary, List[Word]]
+            The words to update the internal word list with.
 
         Returns
         -------
         None
         """
-        self.all_words = new_words
+        self.vocabulary = Vocabulary.of(new_words)
+        self.state.vocabulary = self.vocabulary.fingerprint
         self.reset_quiz()
@@ -15,6 +15,12 @@ import { useEffect, useRef, useState } from "react";
 import { API_URL } from '../config/constants';
 import styles from "../styles/Home.module.css";
 
+// The backend keeps one quiz per learner session, identified by a cookie.
+// Send it on cross-origin requests too, e.g. from the dev server to the API.
+if (axios.defaults) {
+  axios.defaults.withCredentials = true;
+}
+
 /**
  * Home component.
  * @returns {JSX.Element} The rendered Home component.
@@ -111,7 +117,7 @@ export default function Home() {
     const response = await axios.post(
       `${API_URL}/check/`,
       {
-        word: currentWord,
+        word_id: currentWord.id,
         user_input: userInput,
       },
     );
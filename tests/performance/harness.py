@@ -0,0 +1,266 @@
+"""
+Helpers for the benchmark suite.
+
+tests/performance/harness.py
+
+Classes:
+    Measurement: Latency percentiles and peak memory of one benchmark.
+    AsgiClient: Sends requests to an ASGI application in-process and waits for them.
+    Baseline: Stored measurements that new results are compared against.
+
+Functions:
+    make_deck(folder, size): Writes a synthetic word file with the given number of words.
+    measure(fn, iterations, setup): Times a function and records its peak memory.
+    calibrate(rounds): Times a fixed workload to compare the speed of hosts.
+    sample_ids(ids, count): Draws word ids at random.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.loadtest.client import AsgiTransport, percentile
+
+TOLERANCE = float(os.environ.get("VOCABVOYAGE_BENCH_TOLERANCE", "2.0"))
+MEMORY_TOLERANCE = float(os.environ.get("VOCABVOYAGE_BENCH_MEMORY_TOLERANCE", "1.25"))
+# Slowdowns of less than this many milliseconds are treated as noise when comparing
+NOISE_FLOOR_MS = float(os.environ.get("VOCABVOYAGE_BENCH_NOISE_FLOOR_MS", "0.5"))
+
+
+class Measurement:
+    """
+    Latency percentiles and peak memory of one benchmark.
+
+    Attributes:
+        samples (int): The number of timed calls.
+        p50_ms, p95_ms, p99_ms, max_ms (float): Latency percentiles in milliseconds.
+        peak_kib (float): The peak memory allocated by one call in KiB.
+        calibration_ms (Optional[float]): The ``calibrate`` time of the host, taken
+            right after the timed calls.
+    """
+
+    def __init__(
+        self,
+        timings: List[float],
+        peak_bytes: int,
+        calibration_ms: Optional[float] = None,
+    ):
+        timings = sorted(timings)
+        self.samples = len(timings)
+        self.p50_ms = percentile(timings, 50) * 1000
+        self.p95_ms = percentile(timings, 95) * 1000
+        self.p99_ms = percentile(timings, 99) * 1000
+        self.max_ms = timings[-1] * 1000
+        self.peak_kib = peak_bytes / 1024
+        self.calibration_ms = calibration_ms
+
+    def to_dict(self) -> Dict[str, float]:
+        values = {
+            "samples": self.samples,
+            "p50_ms": round(self.p50_ms, 4),
+            "p95_ms": round(self.p95_ms, 4),
+            "p99_ms": round(self.p99_ms, 4),
+            "max_ms": round(self.max_ms, 4),
+            "peak_kib": round(self.peak_kib, 1),
+        }
+        if self.calibration_ms is not None:
+            values["calibration_ms"] = round(self.calibration_ms, 3)
+        return values
+
+
+def make_deck(folder: str, size: int) -> str:
+    """
+    Writes a synthetic word file with the given number of words.
+
+    Every tenth word contains non-ASCII characters, so decoding and normalization
+    are part of the measured work.
+
+    Args:
+        folder (str): The folder to write the file to. It is created if needed.
+        size (int): The number of words.
+
+    Returns:
+        str: The folder.
+    """
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, "words.csv"), "w", encoding="utf-8") as file:
+        for number in range(size):
+            if number % 10 == 0:
+                file.write(f"Päivä{number},Tag {number}\n")
+            else:
+                file.write(f"word{number},sana{number}\n")
+    return folder
+
+
+def measure(
+    fn: Callable[[], object],
+    iterations: int,
+    setup: Optional[Callable[[], object]] = None,
+) -> Measurement:
+    """
+    Times a function and records its peak memory.
+
+    The calls are timed without tracing memory, because tracing slows every
+    allocation down. One more call is then made with ``tracemalloc`` running to
+    record the peak memory allocated by a single call. Finally the host is
+    calibrated, so the timings can be compared with a baseline taken on another
+    host or under another load.
+
+    Args:
+        fn (Callable[[], object]): The function to measure.
+        iterations (int): The number of timed calls.
+        setup (Optional[Callable[[], object]]): Called before every call, untimed.
+
+    Returns:
+        Measurement: The latency percentiles, the peak memory and the calibration.
+    """
+    timings = []
+    for _ in range(iterations):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return Measurement(timings, peak, calibrate())
+
+
+def calibrate(rounds: int = 3) -> float:
+    """
+    Times a fixed workload to compare the speed of the host with the baseline host.
+
+    The workload formats, hashes, sorts and looks up strings like the quiz hot paths
+    do, in about 20 ms. The median of several rounds is returned, so a single slow
+    round does not count.
+
+    Args:
+        rounds (int): The number of timed rounds.
+
+    Returns:
+        float: The median time of one round in milliseconds.
+    """
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        words = [f"word{number},sana{number}" for number in range(20000)]
+        index = {hashlib.blake2b(word.encode()).digest(): word for word in words}
+        sorted(words, key=str.casefold)
+        sum(len(index[key]) for key in index)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+class AsgiClient:
+    """
+    Sends requests to an ASGI application in-process and waits for them.
+
+    Requests go through the AsgiTransport of the load tools on a private event loop, so
+    the measured time covers routing, validation, the endpoint and serialization but
+    no network or HTTP parsing.
+    """
+
+    def __init__(self, app, headers: Optional[Dict[str, str]] = None):
+        self.transport = AsgiTransport(app)
+        self.headers = list((headers or {}).items())
+        self.loop = asyncio.new_event_loop()
+
+    def close(self):
+        self.loop.close()
+
+    def request(
+        self, method: str, path: str, body: Optional[object] = None
+    ) -> Tuple[int, object]:
+        """
+        Sends one request.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The path, optionally with a query string.
+            body (Optional[object]): A JSON body.
+
+        Returns:
+            Tuple[int, object]: The status code and the decoded JSON response.
+        """
+        status, content = self.loop.run_until_complete(
+            self.transport.request(method, path, self.headers, body)
+        )
+        return status, json.loads(content) if content else None
+
+
+class Baseline:
+    """
+    Stored measurements that new results are compared against.
+
+    The baseline latency of a benchmark is first scaled by the ratio of the
+    ``calibrate`` time taken with the measurement to the one stored with the
+    baseline, so a slower or busier host does not fail every benchmark. A result regresses when its 95th percentile
+    latency exceeds the scaled baseline by more than ``TOLERANCE`` times and by more
+    than ``NOISE_FLOOR_MS``, or its peak memory exceeds the baseline by more than
+    ``MEMORY_TOLERANCE`` times. Sub-millisecond benchmarks therefore only regress on
+    large slowdowns. Benchmarks without a baseline are not compared.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, float]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.entries = json.load(file)
+
+    def regressions(self, name: str, measurement: Measurement) -> List[str]:
+        """
+        Returns the reasons why a measurement regressed against the baseline.
+
+        Args:
+            name (str): The name of the benchmark.
+            measurement (Measurement): The new measurement.
+
+        Returns:
+            List[str]: One message per regressed value; empty if there is none.
+        """
+        entry = self.entries.get(name)
+        if entry is None:
+            return []
+        problems = []
+        expected_ms = entry["p95_ms"]
+        if measurement.calibration_ms and entry.get("calibration_ms"):
+            # How many times slower the host is than when the baseline was taken
+            expected_ms *= measurement.calibration_ms / entry["calibration_ms"]
+        allowed_ms = max(expected_ms * TOLERANCE, expected_ms + NOISE_FLOOR_MS)
+        if measurement.p95_ms > allowed_ms:
+            problems.append(
+                f"{name}: p95 {measurement.p95_ms:.3f} ms > {allowed_ms:.3f} ms allowed"
+            )
+        allowed_kib = max(entry["peak_kib"] * MEMORY_TOLERANCE, entry["peak_kib"] + 64)
+        if measurement.peak_kib > allowed_kib:
+            problems.append(
+                f"{name}: peak {measurement.peak_kib:.0f} KiB > {allowed_kib:.0f} KiB allowed"
+            )
+        return problems
+
+    def save(self, results: Dict[str, Measurement]):
+        """Stores the given results as the new baseline, keeping other entries."""
+        for name, measurement in results.items():
+            self.entries[name] = measurement.to_dict()
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(dict(sorted(self.entries.items())), file, indent=2)
+            file.write("\n")
+
+
+def sample_ids(ids, count: int, seed: int = 7) -> List[str]:
+    """Returns ``count`` word ids drawn at random, with repetition, from ``ids``."""
+    generator = random.Random(seed)
+    return [ids[generator.randrange(len(ids))] for _ in range(count)]
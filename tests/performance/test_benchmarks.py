@@ -0,0 +1,329 @@
+"""
+Benchmarks of the quiz hot paths.
+
+tests/performance/test_benchmarks.py
+
+The benchmarks run against synthetic decks. The deck sizes are read from
+``VOCABVOYAGE_BENCH_SIZES`` (comma separated, default ``1000,10000,100000``; add
+``1000000`` for the largest decks). Every result is written to
+``test-artifacts/benchmarks.json`` and compared against ``baseline.json`` next to this
+file, scaled to the speed of the host measured by a calibration run after every
+benchmark. Regressions are
+reported as warnings and in the artifact; set ``VOCABVOYAGE_BENCH_ENFORCE=1`` to fail
+on them, for example on a dedicated benchmark machine. Set
+``VOCABVOYAGE_BENCH_UPDATE=1`` to store the results as the new baseline instead of
+comparing them.
+
+Run with:
+    uv run pytest -m performance tests/performance -o addopts=""
+
+Classes:
+    TestQuizBenchmarks: Times the repository, the quiz service, the logger and the API.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from app.domain.models import QuizResult
+from app.interfaces.logger import QuizLogger
+from app.interfaces.repositories import WordRepository
+from app.use_cases.word_service import WordService
+from tests.performance.harness import (
+    AsgiClient,
+    Baseline,
+    Measurement,
+    make_deck,
+    measure,
+    sample_ids,
+)
+
+DEFAULT_SIZES = "1000,10000,100000"
+SIZES = [
+    int(size)
+    for size in os.environ.get("VOCABVOYAGE_BENCH_SIZES", DEFAULT_SIZES).split(",")
+]
+UPDATE_BASELINE = os.environ.get("VOCABVOYAGE_BENCH_UPDATE") == "1"
+ENFORCE_BASELINE = os.environ.get("VOCABVOYAGE_BENCH_ENFORCE") == "1"
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+ARTIFACTS_DIR = Path(os.environ.get("GITHUB_WORKSPACE", ".")) / "test-artifacts"
+CALLS = 1000
+
+
+class TestQuizBenchmarks(unittest.TestCase):
+    """
+    Times the repository, the quiz service, the logger and the API.
+    Test Cases:
+    - test_load_words: Cold loads of a deck from CSV.
+    - test_load_vocabulary: Opening an already compiled deck.
+    - test_reset_quiz: Starting a quiz.
+    - test_get_next_word: Drawing the next word.
+    - test_check_answer: Grading an answer by word id.
+    - test_check_answer_with_typos: Grading misspelled answers with typo tolerance.
+    - test_log_result: Writing a quiz result file.
+    - test_http_endpoints: The quiz endpoints called through the ASGI app.
+    """
+
+    results: Dict[str, Measurement] = {}
+    regressions: List[str] = []
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Write one synthetic deck per size and load each deck once.
+        """
+
+        cls.tmp = tempfile.mkdtemp(prefix="vocabvoyage-bench-")
+        cls.decks = {
+            size: make_deck(os.path.join(cls.tmp, f"deck-{size}"), size)
+            for size in SIZES
+        }
+        cls.vocabularies = {
+            size: WordRepository(folder).load_vocabulary()
+            for size, folder in cls.decks.items()
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        """
+        Write the results, update the baseline if requested and remove the decks.
+        """
+
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+        if not cls.results:
+            return
+        ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
+        with open(ARTIFACTS_DIR / "benchmarks.json", "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "regressions": cls.regressions,
+                    "results": {
+                        name: result.to_dict() for name, result in cls.results.items()
+                    },
+                },
+                file,
+                indent=2,
+            )
+        if UPDATE_BASELINE:
+            Baseline(str(BASELINE_PATH)).save(cls.results)
+
+    def record(self, name: str, measurement: Measurement):
+        """
+        Stores a result and reports whether it regressed against the baseline, failing
+        only if enforcing the baseline was asked for.
+        """
+        self.results[name] = measurement
+        if UPDATE_BASELINE:
+            return
+        problems = Baseline(str(BASELINE_PATH)).regressions(name, measurement)
+        if not problems:
+            return
+        self.regressions.extend(problems)
+        if ENFORCE_BASELINE:
+            self.fail("\n".join(problems))
+        warnings.warn("\n".join(problems))
+
+    def service(self, size: int) -> WordService:
+        return WordService(self.vocabularies[size], QuizLogger(self.tmp))
+
+    @pytest.mark.performance
+    def test_load_words(self):
+        """
+        Time loading every word of a deck with a new repository, so nothing is cached.
+        """
+
+        for size, folder in self.decks.items():
+            with self.subTest(size=size):
+                self.record(
+                    f"load_words[{size}]",
+                    measure(
+                        lambda: WordRepository(folder).load_words(),
+                        iterations=max(3, min(20, 100_000 // size)),
+                    ),
+                )
+
+    @pytest.mark.performance
+    def test_load_vocabulary(self):
+        """
+        Time opening the compiled deck of unchanged CSV files.
+        """
+
+        for size, folder in self.decks.items():
+            with self.subTest(size=size):
+                self.record(
+                    f"load_vocabulary[{size}]",
+                    measure(
+                        lambda: WordRepository(folder).load_vocabulary(),
+                        iterations=100,
+                    ),
+                )
+
+    @pytest.mark.performance
+    def test_reset_quiz(self):
+        """
+        Time starting a new quiz.
+        """
+
+        for size in self.decks:
+            with self.subTest(size=size):
+                service = self.service(size)
+                self.record(f"reset_quiz[{size}]", measure(service.reset_quiz, CALLS))
+
+    @pytest.mark.performance
+    def test_get_next_word(self):
+        """
+        Time drawing words, restarting the quiz whenever the deck is exhausted.
+        """
+
+        for size in self.decks:
+            with self.subTest(size=size):
+                service = self.service(size)
+
+                def restart_when_done():
+                    if service.current_word_index + 1 >= len(service.vocabulary):
+                        service.reset_quiz()
+
+                self.record(
+                    f"get_next_word[{size}]",
+                    measure(service.get_next_word, CALLS, setup=restart_when_done),
+                )
+
+    @pytest.mark.performance
+    def test_check_answer(self):
+        """
+        Time grading answers by word id, half of them correct.
+        """
+
+        for size in self.decks:
+            with self.subTest(size=size):
+                service = self.service(size)
+                vocabulary = service.vocabulary
+                answers = iter(
+                    [
+                        (
+                            word_id,
+                            vocabulary.foreign_terms[vocabulary.index_of(word_id)],
+                        )
+                        if number % 2
+                        else (word_id, "wrong")
+                        for number, word_id in enumerate(
+                            sample_ids(vocabulary.ids, CALLS + 1)
+                        )
+                    ]
+                )
+                self.record(
+                    f"check_answer[{size}]",
+                    measure(lambda: service.check_answer(*next(answers)), CALLS),
+                )
+
+    @pytest.mark.performance
+    def test_check_answer_with_typos(self):
+        """
+        Time grading answers with one typo each while the quiz accepts typos.
+        """
+
+        for size in self.decks:
+            with self.subTest(size=size):
+                service = self.service(size)
+                service.set_mode("normal", max_typos=2)
+                vocabulary = service.vocabulary
+                answers = iter(
+                    [
+                        (word_id, vocabulary.foreign_terms[index][1:])
+                        for word_id, index in (
+                            (word_id, vocabulary.index_of(word_id))
+                            for word_id in sample_ids(vocabulary.ids, CALLS + 1)
+                        )
+                    ]
+                )
+                self.record(
+                    f"check_answer_typos[{size}]",
+                    measure(lambda: service.check_answer(*next(answers)), CALLS),
+                )
+
+    @pytest.mark.performance
+    def test_log_result(self):
+        """
+        Time writing a quiz result with 100 answered words.
+        """
+
+        logger = QuizLogger(os.path.join(self.tmp, "out"))
+        words = [f"word{number}" for number in range(50)]
+        result = QuizResult(
+            correct=50,
+            incorrect=50,
+            correct_words=words,
+            incorrect_words=words,
+            start_time=datetime.now(),
+            end_time=datetime.now(),
+        )
+        self.record("log_result", measure(lambda: logger.log_result(result), 200))
+
+    @pytest.mark.performance
+    def test_http_endpoints(self):
+        """
+        Time the quiz endpoints through the ASGI app with the deck installed.
+        """
+
+        from app.main import Services, app
+
+        services = Services(
+            output_directory=os.path.join(self.tmp, "out"),
+            state_backend="memory",
+            history_database=os.path.join(self.tmp, "history.db"),
+            answer_log_directory=os.path.join(self.tmp, "answers"),
+        )
+        services.ready.set()
+        app.state.services = services
+        try:
+            for size in self.decks:
+                with self.subTest(size=size):
+                    services.session_registry.update_words(self.vocabularies[size])
+                    self._measure_endpoints(app, size)
+        finally:
+            del app.state.services
+            services.close()
+
+    def _measure_endpoints(self, app, size: int):
+        client = AsgiClient(app, {"X-Session-Id": f"bench-{size}"})
+        try:
+            status, _ = client.request("POST", "/set_mode/", {"mode": "infinite"})
+            self.assertEqual(status, 200)
+            asked: List[str] = []
+
+            def next_word():
+                _, word = client.request("GET", "/words/next")
+                if word is None:  # The small decks run out of words
+                    client.request("POST", "/start_quiz/")
+                    _, word = client.request("GET", "/words/next")
+                asked.append(word["id"])
+
+            def check():
+                client.request(
+                    "POST", "/check/", {"word_id": asked.pop(), "user_input": "wrong"}
+                )
+
+            self.record(f"http_next_word[{size}]", measure(next_word, CALLS))
+            self.record(f"http_check[{size}]", measure(check, len(asked) - 1))
+            self.record(
+                f"http_next_words_50[{size}]",
+                measure(lambda: client.request("GET", "/words/next?count=50"), 100),
+            )
+            self.record(
+                f"http_results[{size}]",
+                measure(lambda: client.request("GET", "/results/"), 100),
+            )
+        finally:
+            client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
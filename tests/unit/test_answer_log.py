@@ -0,0 +1,264 @@
+"""
+Unit tests for the AnswerLog class.
+
+tests/unit/test_answer_log.py
+
+Classes:
+    TestAnswerLog: Contains unit tests for the segmented answer log.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.domain.models import AnswerEvent, AnswerMatch
+from app.interfaces.answer_log import AnswerLog, quiz_results
+
+START = datetime(2024, 5, 1, 9, 0, 0)
+
+
+def event(second: int, term: str = "Dog", match=AnswerMatch.EXACT, session="alice"):
+    """Returns an answer event given the number of seconds after START."""
+    return AnswerEvent(
+        session_id=session,
+        quiz_start=START,
+        word_id=term.encode().hex().rjust(16, "0"),
+        foreign_term=term,
+        answer=term,
+        match=match,
+        answered_at=START + timedelta(seconds=second),
+    )
+
+
+class TestAnswerLog(unittest.TestCase):
+    """
+    Unit tests for the segmented answer log.
+    Test Cases:
+    - test_append_rotate_and_replay: Events are written to rotated segments and replayed in order.
+    - test_late_events_keep_segments_sorted: Events appended out of order are replayed in order.
+    - test_full_queue_drops_events: Appending to a full queue drops instead of waiting.
+    - test_failed_commit_does_not_stop_the_writer: Flush returns after a write fails.
+    - test_abandoned_segment_with_torn_tail: A crashed writer's segment is read and sealed.
+    - test_compaction: Old events are dropped and small segments are merged.
+    - test_interrupted_compaction: A committed compaction is completed without duplicates.
+    - test_quiz_results: Events are folded into the results of their quizzes.
+    """
+
+    def setUp(self):
+        """
+        Create a log folder.
+        """
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self.tmp.name, "answers")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_segment(self, name: str, events, tail: bytes = b""):
+        """Writes a segment file as a writer of another process would."""
+        with open(os.path.join(self.folder, name), "wb") as file:
+            for logged in events:
+                file.write(logged.model_dump_json().encode() + b"\n")
+            file.write(tail)
+
+    @pytest.mark.unit
+    def test_append_rotate_and_replay(self):
+        """
+        Test that appended events are synced to segments that are sealed once they are
+        full or the log stops, and that replaying returns them in answer order.
+        """
+
+        log = AnswerLog(self.folder, segment_bytes=600, batch_size=3)
+        for second in range(10):
+            log.append(event(second))
+        log.flush()
+        self.assertEqual([e.answered_at.second for e in log.replay()], list(range(10)))
+        self.assertTrue(log.segments()[-1].endswith(".jsonl.open"))
+
+        log.stop()
+        segments = log.segments()
+        self.assertGreater(len(segments), 1)
+        self.assertTrue(all(path.endswith(".jsonl") for path in segments))
+        self.assertEqual(len(list(log.replay())), 10)
+
+        self.write_segment("answers-00000000000000000001-1.jsonl", [event(4, "Cat")])
+        replayed = list(log.replay(since=START + timedelta(seconds=4)))
+        self.assertEqual(
+            [e.answered_at.second for e in replayed], [4, 4, 5, 6, 7, 8, 9]
+        )
+
+    @pytest.mark.unit
+    def test_late_events_keep_segments_sorted(self):
+        """
+        Test that events put on the queue out of answer order, as by several threads,
+        are written to segments that are each sorted, so they are replayed in order.
+        """
+
+        seconds = [5, 3, 4, 1, 2, 0, 9, 8, 7, 6]
+        log = AnswerLog(self.folder, batch_size=3, commit_interval=0)
+        for second in seconds:
+            log.append(event(second))
+        log.stop()
+
+        self.assertEqual([e.answered_at.second for e in log.replay()], list(range(10)))
+        written = []
+        for path in log.segments():
+            with open(path, "rb") as file:
+                times = [
+                    AnswerEvent.model_validate_json(line).answered_at for line in file
+                ]
+            self.assertEqual(times, sorted(times))
+            written.extend(times)
+        self.assertEqual(len(written), len(seconds))
+
+    @pytest.mark.unit
+    def test_full_queue_drops_events(self):
+        """
+        Test that appending to a full queue returns at once and counts the dropped
+        event, and that the queued events are still written.
+        """
+
+        log = AnswerLog(self.folder, max_queue_size=2)
+        # A writer that never ran, so the queue fills up
+        log._thread = threading.Thread(target=lambda: None)
+        self.assertEqual(
+            [log.append(event(second)) for second in range(3)], [True, True, False]
+        )
+        self.assertEqual(log.dropped, 1)
+
+        log.start()
+        log.stop()
+        self.assertEqual([e.answered_at.second for e in log.replay()], [0, 1])
+
+    @pytest.mark.unit
+    def test_failed_commit_does_not_stop_the_writer(self):
+        """
+        Test that an unexpected error while writing is logged, that flush still returns
+        and that later events are written.
+        """
+
+        log = AnswerLog(self.folder, commit_interval=0)
+        commit = log._commit
+        failures = [ValueError("Broken event")]
+
+        def fail_once(events):
+            if failures:
+                raise failures.pop()
+            commit(events)
+
+        log._commit = fail_once
+        with self.assertLogs("app.interfaces.answer_log", "ERROR"):
+            log.append(event(0))
+            log.flush()
+        log.append(event(1))
+        log.stop()
+        self.assertEqual([e.answered_at.second for e in log.replay()], [1])
+
+    @pytest.mark.unit
+    def test_abandoned_segment_with_torn_tail(self):
+        """
+        Test that the torn last line of a crashed writer is skipped and that its open
+        segment is sealed by compaction, while the own open segment stays open.
+        """
+
+        log = AnswerLog(self.folder)
+        self.write_segment(
+            "answers-00000000000000000001-1.jsonl.open",
+            [event(0), event(2)],
+            tail=b'{"session_id": "alice", "quiz_st',
+        )
+        log.append(event(1))
+        log.flush()
+
+        with self.assertLogs("app.interfaces.answer_log", "WARNING"):
+            seconds = [e.answered_at.second for e in log.replay()]
+        self.assertEqual(seconds, [0, 1, 2])
+
+        log.compact()
+        self.assertEqual(
+            sorted(name.split(".", 1)[1] for name in os.listdir(self.folder)),
+            ["compaction.lock", "jsonl", "jsonl.open"],
+        )
+        log.stop()
+        with self.assertLogs("app.interfaces.answer_log", "WARNING"):
+            self.assertEqual(len(list(log.replay())), 3)
+
+    @pytest.mark.unit
+    def test_compaction(self):
+        """
+        Test that compaction merges small segments and drops events before the
+        retention cutoff.
+        """
+
+        log = AnswerLog(self.folder)
+        for number in range(3):
+            self.write_segment(
+                f"answers-0000000000000000000{number}-1.jsonl",
+                [event(number), event(number + 10)],
+            )
+
+        self.assertEqual(log.compact(), 3)
+        self.assertEqual(len(log.segments()), 1)
+        self.assertEqual(
+            [e.answered_at.second for e in log.replay()], [0, 1, 2, 10, 11, 12]
+        )
+
+        log.compact(before=START + timedelta(seconds=11))
+        self.assertEqual([e.answered_at.second for e in log.replay()], [11, 12])
+
+    @pytest.mark.unit
+    def test_interrupted_compaction(self):
+        """
+        Test that a compaction interrupted after its journal was written is read from
+        its merged segment and completed by the next compaction.
+        """
+
+        log = AnswerLog(self.folder)
+        sources = []
+        for number in range(2):
+            name = f"answers-0000000000000000000{number}-1.jsonl"
+            self.write_segment(name, [event(number)])
+            sources.append(os.path.join(self.folder, name))
+        output = os.path.join(self.folder, "answers-00000000000000000005-1.jsonl")
+        with open(output + ".tmp", "wb") as file:
+            for second in range(2):
+                file.write(event(second).model_dump_json().encode() + b"\n")
+        with open(os.path.join(self.folder, "compaction.json"), "w") as file:
+            json.dump({"sources": sources, "outputs": [output]}, file)
+
+        self.assertEqual(len(list(log.replay())), 2)
+        log.compact()
+        self.assertEqual(log.segments(), [output])
+        self.assertEqual(len(list(log.replay())), 2)
+
+    @pytest.mark.unit
+    def test_quiz_results(self):
+        """
+        Test that the events of every quiz are folded into one result.
+        """
+
+        results = quiz_results(
+            [
+                event(0, "Dog"),
+                event(1, "Cat", AnswerMatch.WRONG),
+                event(2, "Cat", AnswerMatch.CLOSE),
+                event(3, "Cat", AnswerMatch.WRONG, session="bob"),
+            ]
+        )
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual((results[0].correct, results[0].incorrect), (2, 1))
+        self.assertEqual(results[0].correct_words, ["Dog", "Cat"])
+        self.assertEqual(results[0].incorrect_words, ["Cat"])
+        self.assertEqual(results[0].end_time, START + timedelta(seconds=2))
+        self.assertEqual(results[1].incorrect_words, ["Cat"])
+
+
+if __name__ == "__main__":
+    unittest.main()
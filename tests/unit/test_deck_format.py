@@ -0,0 +1,106 @@
+"""
+Unit tests for the compiled deck format.
+
+tests/unit/test_deck_format.py
+
+Classes:
+    TestDeckFormat: Contains unit tests for compile_deck and MappedVocabulary.
+"""
+
+import os
+import tempfile
+import unittest
+
+import pytest
+
+from app.domain.vocabulary import Vocabulary
+from app.interfaces.deck_format import MappedVocabulary, compile_deck
+from app.interfaces.repositories import WordRepository
+
+
+class TestDeckFormat(unittest.TestCase):
+    """
+    Unit tests for compile_deck and MappedVocabulary.
+    Test Cases:
+    - test_round_trip: A mapped deck holds the same words, ids, answers and JSON as a Vocabulary.
+    - test_rejects_other_files: Files that are not compiled decks are rejected.
+    - test_repository_reuses_compiled_deck: A new repository opens the deck without parsing.
+    """
+
+    @pytest.mark.unit
+    def setUp(self):
+        """
+        Set up a temporary folder and a small vocabulary with non-ASCII words.
+        """
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.vocabulary = Vocabulary(
+            ["Apple", "Käsi", "Café", "Apple"], ["Omena", "Hand", "Kahvila", "Omena"]
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @pytest.mark.unit
+    def test_round_trip(self):
+        """
+        Test that every column and the id index survive compilation.
+        """
+
+        path = os.path.join(self.tmp.name, "deck.vvdeck")
+        compile_deck(
+            path, self.vocabulary.foreign_terms, self.vocabulary.native_translations
+        )
+        deck = MappedVocabulary(path)
+
+        self.assertEqual(len(deck), 4)
+        self.assertEqual(list(deck), list(self.vocabulary))
+        self.assertEqual(list(deck.answers), list(self.vocabulary.answers))
+        self.assertEqual(
+            list(deck.folded_answers), list(self.vocabulary.folded_answers)
+        )
+        for word_id in self.vocabulary.ids:
+            self.assertEqual(deck.index_of(word_id), self.vocabulary.index_of(word_id))
+        self.assertIsNone(deck.index_of("ffffffffffffffff"))
+        self.assertIsNone(deck.index_of("not hex"))
+        self.assertTrue(deck.is_correct(2, "CAFÉ"))
+        self.assertEqual(list(deck.json_words), list(self.vocabulary.json_words))
+        self.assertEqual(deck.word_json(1), deck.word(1).model_dump_json().encode())
+        deck.close()
+
+    @pytest.mark.unit
+    def test_rejects_other_files(self):
+        """
+        Test that opening a file that is not a deck raises ValueError.
+        """
+
+        path = os.path.join(self.tmp.name, "words.csv")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("Apple,Omena\nDog,Koira\n")
+        with self.assertRaises(ValueError):
+            MappedVocabulary(path)
+
+    @pytest.mark.unit
+    def test_repository_reuses_compiled_deck(self):
+        """
+        Test that the compiled deck is reused across repositories while the CSV is unchanged.
+        """
+
+        with open(
+            os.path.join(self.tmp.name, "words.csv"), "w", encoding="utf-8"
+        ) as file:
+            file.write("Apple,Omena\nDog,Koira\n")
+
+        first = WordRepository(self.tmp.name).load_vocabulary()
+        repository = WordRepository(self.tmp.name)
+        second = repository.load_vocabulary()
+
+        self.assertIsInstance(second, MappedVocabulary)
+        self.assertEqual(second.path, first.path)
+        self.assertEqual(repository.files_parsed, 0)
+        self.assertEqual(list(second.foreign_terms), ["Apple", "Dog"])
+        self.assertIs(repository.load_vocabulary(), second)
+
+
+if __name__ == "__main__":
+    unittest.main()
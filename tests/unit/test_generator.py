@@ -0,0 +1,129 @@
+"""
+Unit tests for the load generator.
+
+tests/unit/test_generator.py
+
+Classes:
+    TestGenerator: Contains unit tests for simulated learners against the app in-process.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import pytest
+
+from app.loadtest.client import AsgiTransport
+from app.loadtest.generator import LoadProfile, WordServiceTimer, run_load
+from app.main import Services, app
+from app.use_cases.word_service import WordService
+
+
+class TestGenerator(unittest.TestCase):
+    """
+    Unit tests for simulated learners against the app in-process.
+    Test Cases:
+    - test_learners_run_quizzes_in_both_modes: Learners finish quizzes and the report
+      covers every route and the saturation measurements.
+    - test_timer_counts_calls_from_threads: Calls made from many threads at once are
+      all counted.
+    """
+
+    def setUp(self):
+        """
+        Install ready services on the app with a word file of five words.
+        """
+
+        self.tmp = tempfile.mkdtemp()
+        data = os.path.join(self.tmp, "data")
+        os.makedirs(data)
+        with open(os.path.join(data, "words.csv"), "w", encoding="utf-8") as file:
+            file.writelines(f"word{number},sana{number}\n" for number in range(5))
+        self.services = Services(
+            data,
+            os.path.join(self.tmp, "out"),
+            "memory",
+            history_database=os.path.join(self.tmp, "history.db"),
+            answer_log_directory=os.path.join(self.tmp, "answers"),
+        )
+        self.services.warm_up()
+        app.state.services = self.services
+
+    def tearDown(self):
+        del app.state.services
+        self.services.close()
+        shutil.rmtree(self.tmp)
+
+    @pytest.mark.unit
+    def test_learners_run_quizzes_in_both_modes(self):
+        """
+        Test that learners in normal and infinite mode finish quizzes without errors,
+        that the WordService is timed, and that its methods are restored afterwards.
+        """
+
+        grade_answer = WordService.grade_answer
+        profile = LoadProfile(
+            learners=4,
+            duration=0.3,
+            ramp_up=0.0,
+            infinite_share=0.5,
+            think_ms=0.0,
+            answers_per_quiz=3,
+            seed=1,
+        )
+        report = asyncio.run(run_load(AsgiTransport(app), profile, self.services))
+
+        self.assertEqual(report["errors"], 0)
+        self.assertGreater(report["quizzes"]["normal"], 0)
+        self.assertGreater(report["quizzes"]["infinite"], 0)
+        self.assertEqual(
+            set(report["routes"]),
+            {"/start_quiz/", "/set_mode/", "/words/next", "/check/", "/end_quiz/"},
+        )
+        self.assertEqual(
+            report["word_service"]["methods"]["grade_answer"]["calls"],
+            report["routes"]["/check/"]["requests"],
+        )
+        self.assertIn("/check/", report["server"])
+        self.assertEqual(report["logger"]["quiz_logger"]["capacity"], 1000)
+        self.assertIs(WordService.grade_answer, grade_answer)
+
+    @pytest.mark.unit
+    def test_timer_counts_calls_from_threads(self):
+        """
+        Test that the timer counts every call when the timed methods run in many
+        threads at once, as they do in the thread pool of the application.
+        """
+
+        class SwitchingDict(dict):
+            """A dict that lets other threads run between reading and writing."""
+
+            def __getitem__(self, key):
+                value = super().__getitem__(key)
+                time.sleep(0)
+                return value
+
+        def call(calls: int):
+            for _ in range(calls):
+                WordService.grade_answer(None)
+
+        with mock.patch.object(WordService, "grade_answer", lambda self: None):
+            with WordServiceTimer() as timer:
+                timer.calls = SwitchingDict(timer.calls)
+                threads = [threading.Thread(target=call, args=(500,)) for _ in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+        self.assertEqual(timer.calls["grade_answer"], 4000)
+        self.assertGreater(timer.seconds["grade_answer"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+"""
+Unit tests for the QuizHistoryStore class.
+
+tests/unit/test_history.py
+
+Classes:
+    TestQuizHistoryStore: Contains unit tests for the quiz history and its aggregates.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date, datetime
+
+import pytest
+
+from app.domain.models import QuizResult
+from app.interfaces.history import QuizHistoryStore
+from app.interfaces.logger import BackgroundQuizLogger
+
+
+def result(day: int, correct_words, incorrect_words, deck=None) -> QuizResult:
+    """Returns a quiz result that ended on the given day of May 2024."""
+    return QuizResult(
+        correct=len(correct_words),
+        incorrect=len(incorrect_words),
+        correct_words=correct_words,
+        incorrect_words=incorrect_words,
+        start_time=datetime(2024, 5, day, 9, 0, 0),
+        end_time=datetime(2024, 5, day, 9, 5, 0),
+        deck=deck,
+    )
+
+
+class TestQuizHistoryStore(unittest.TestCase):
+    """
+    Unit tests for the quiz history and its aggregates.
+    Test Cases:
+    - test_most_missed_words: Words are ranked by the quizzes in which they were missed.
+    - test_daily_stats: The quizzes and answers are summed per day.
+    - test_logger_records_results: The background logger records every queued result.
+    - test_failed_record_is_rolled_back: A failing aggregate leaves no stored result.
+    """
+
+    def setUp(self):
+        """
+        Create a history store in a temporary folder.
+        """
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "state", "history.db")
+        self.store = QuizHistoryStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    @pytest.mark.unit
+    def test_most_missed_words(self):
+        """
+        Test that the most missed words are ranked over the requested days, that a
+        word counts once per quiz and that stored results survive a reopen.
+        """
+
+        self.store.record(
+            [
+                result(1, ["Dog"], ["Cat", "Cat", "Bird"]),
+                result(2, ["Bird"], ["Cat"], deck="animals"),
+                result(3, ["Cat"], ["Dog", "Bird"]),
+            ]
+        )
+        self.store.close()
+        self.store = QuizHistoryStore(self.path)
+
+        self.assertEqual(
+            self.store.word_stats(),
+            [
+                {"word": "Bird", "incorrect": 2, "correct": 1},
+                {"word": "Cat", "incorrect": 2, "correct": 1},
+                {"word": "Dog", "incorrect": 1, "correct": 1},
+            ],
+        )
+        self.assertEqual(
+            self.store.word_stats(since=date(2024, 5, 2), until=date(2024, 5, 2)),
+            [{"word": "Cat", "incorrect": 1, "correct": 0}],
+        )
+        self.assertEqual(len(self.store.word_stats(limit=1)), 1)
+
+    @pytest.mark.unit
+    def test_daily_stats(self):
+        """
+        Test that the number of quizzes and answers is aggregated per day.
+        """
+
+        self.store.record([result(1, ["Dog"], ["Cat"])])
+        self.store.record([result(1, ["Cat", "Dog"], []), result(4, [], ["Dog"])])
+
+        self.assertEqual(
+            self.store.daily_stats(),
+            [
+                {"day": "2024-05-01", "quizzes": 2, "correct": 3, "incorrect": 1},
+                {"day": "2024-05-04", "quizzes": 1, "correct": 0, "incorrect": 1},
+            ],
+        )
+        self.assertEqual(
+            [entry["day"] for entry in self.store.daily_stats(since=date(2024, 5, 2))],
+            ["2024-05-04"],
+        )
+
+    @pytest.mark.unit
+    def test_failed_record_is_rolled_back(self):
+        """
+        Test that a result whose aggregate update fails is not stored at all, so the
+        aggregates never disagree with the stored results.
+        """
+
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            "CREATE TRIGGER fail_word_stats BEFORE INSERT ON word_daily_stats"
+            " BEGIN SELECT RAISE(ABORT, 'disk full'); END"
+        )
+        connection.commit()
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.store.record([result(1, ["Cat"], ["Dog"])])
+
+        for table in ("quiz_result", "quiz_result_word", "daily_stats"):
+            with self.subTest(table=table):
+                count = connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+                self.assertEqual(count, (0,))
+        connection.close()
+
+    @pytest.mark.unit
+    def test_logger_records_results(self):
+        """
+        Test that the background logger writes the files and records the results.
+        """
+
+        logger = BackgroundQuizLogger(
+            os.path.join(self.tmp.name, "out"), batch_size=2, history=self.store
+        )
+        for day in range(1, 6):
+            logger.log_result(result(day, ["Dog"], ["Cat"]))
+        logger.stop()
+
+        self.assertEqual(len(os.listdir(logger.output_folder)), 5)
+        self.assertEqual(len(self.store.daily_stats()), 5)
+        self.assertEqual(
+            self.store.word_stats(), [{"word": "Cat", "incorrect": 5, "correct": 0}]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,352 @@
+"""
+Unit tests for the streaming ingest pipeline.
+
+tests/unit/test_ingest.py
+
+Classes:
+    TestMultipartReader: Contains unit tests for the MultipartReader class.
+    TestIngestPipeline: Contains unit tests for the IngestPipeline class.
+    TestUploadWords: Contains unit tests for the upload endpoint.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import pytest
+
+from app.interfaces.ingest import IngestPipeline, IngestStatus, MultipartReader
+from app.interfaces.repositories import DeckRegistry, WordRepository, current_folder
+from app.main import Services, app
+
+
+BODY = (
+    b"--b0undary\r\n"
+    b'Content-Disposition: form-data; name="deck_id"\r\n\r\n'
+    b"french\r\n"
+    b"--b0undary\r\n"
+    b'Content-Disposition: form-data; name="files"; filename="a.csv"\r\n'
+    b"Content-Type: text/csv\r\n\r\n"
+    b"Chat,Kissa\r\nChien,Koira\r\n\r\n"
+    b"--b0undary\r\n"
+    b'Content-Disposition: form-data; name="files"; filename="empty.csv"\r\n\r\n'
+    b"\r\n--b0undary--\r\n"
+)
+
+
+class TestMultipartReader(unittest.TestCase):
+    """
+    Unit tests for the MultipartReader class.
+    Test Cases:
+    - test_parts_split_across_chunks: Parts are found whatever the chunk boundaries.
+    - test_truncated_body: A body without the closing boundary is rejected.
+    """
+
+    @pytest.mark.unit
+    def test_parts_split_across_chunks(self):
+        """
+        Test that feeding a body one byte at a time gives every part with its name,
+        file name and bytes, including an empty file.
+        """
+
+        reader = MultipartReader(b"b0undary")
+        parts = {}
+        for byte in BODY:
+            for part, name, filename, data in reader.feed(bytes([byte])):
+                parts.setdefault(part, [name, filename, b""])[2] += data
+        reader.close()
+
+        self.assertEqual(
+            parts,
+            {
+                0: ["deck_id", None, b"french"],
+                1: ["files", "a.csv", b"Chat,Kissa\r\nChien,Koira\r\n"],
+                2: ["files", "empty.csv", b""],
+            },
+        )
+
+    @pytest.mark.unit
+    def test_truncated_body(self):
+        """
+        Test that closing a reader before the closing boundary raises ValueError.
+        """
+
+        reader = MultipartReader(b"b0undary")
+        reader.feed(BODY[:120])
+        with self.assertRaises(ValueError):
+            reader.close()
+
+
+class TestIngestPipeline(unittest.TestCase):
+    """
+    Unit tests for the IngestPipeline class.
+    Test Cases:
+    - test_upload_replaces_words: A finished job publishes the CSV files and the words.
+    - test_upload_matches_a_load: The words and report are those of a load of the files.
+    - test_uploads_publish_versions: Every upload is a new version; old ones are removed.
+    - test_failed_upload_keeps_words: A broken upload leaves the data folder untouched.
+    - test_failed_callback_fails_the_job: An error of the callback is recorded.
+    - test_upload_to_deck: An upload to a deck only replaces the files of the deck.
+    """
+
+    @pytest.mark.unit
+    def setUp(self):
+        """
+        Set up a pipeline over a temporary data folder with one existing file.
+        """
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_folder = self.tmp.name
+        with open(os.path.join(self.data_folder, "old.csv"), "w") as file:
+            file.write("Old,Vanha\n")
+        self.vocabularies = []
+        self.pipeline = IngestPipeline(
+            self.data_folder, self.vocabularies.append, max_pending_chunks=2
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @pytest.mark.unit
+    def test_upload_replaces_words(self):
+        """
+        Test that a finished job swaps in the new files and hands over the words.
+        """
+
+        job = self.pipeline.start(["new.csv"])
+        for chunk in (b"Cat,Kis", b"sa\nDog,Koira\nbroken\n"):
+            job.put("new.csv", chunk)
+        job.finish()
+
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.status, IngestStatus.DONE)
+        self.assertEqual(job.rows_parsed, 3)
+        self.assertEqual(job.words_loaded, 2)
+        self.assertEqual(os.listdir(current_folder(self.data_folder)), ["new.csv"])
+        self.assertEqual(self.vocabularies[0].foreign_terms, ("Cat", "Dog"))
+        self.assertIs(self.pipeline.get(job.id), job)
+
+    @pytest.mark.unit
+    def test_upload_matches_a_load(self):
+        """
+        Test that the words of an upload are in file name order rather than upload
+        order, and that the words and the report in the progress of the job are the
+        ones a load of the published files returns.
+        """
+
+        job = self.pipeline.start(["b.csv", "a.csv"])
+        job.put("b.csv", b'Dog,Koira\n"Two\nlines",Kaksi\nCat')
+        job.put("a.csv", b"Cat,Kissa\nshort\n")
+        job.finish()
+
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.status, IngestStatus.DONE)
+        vocabulary, report = WordRepository(self.data_folder).bulk_load()
+        self.assertEqual(self.vocabularies[0].ids, vocabulary.ids)
+        self.assertEqual(
+            self.vocabularies[0].foreign_terms, ("Cat", "Dog", "Two\nlines")
+        )
+        progress = job.progress()
+        self.assertEqual(progress["report"], report.model_dump())
+        self.assertEqual(progress["report"]["duplicates"], 0)
+        self.assertEqual(
+            [(row["file"], row["line"]) for row in progress["report"]["skipped_rows"]],
+            [("a.csv", 2), ("b.csv", 4)],
+        )
+        self.assertEqual((job.rows_parsed, job.words_loaded), (5, 3))
+
+    @pytest.mark.unit
+    def test_failed_upload_keeps_words(self):
+        """
+        Test that invalid UTF-8 fails the job without touching the data folder.
+        """
+
+        job = self.pipeline.start(["new.csv"])
+        job.put("new.csv", b"Cat,\xff\xfe\n")
+        job.finish()
+
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.status, IngestStatus.FAILED)
+        self.assertIn("new.csv", job.error)
+        self.assertEqual(sorted(os.listdir(self.data_folder)), ["old.csv"])
+        self.assertEqual(current_folder(self.data_folder), self.data_folder)
+        self.assertEqual(self.vocabularies, [])
+
+    @pytest.mark.unit
+    def test_failed_callback_fails_the_job(self):
+        """
+        Test that an unexpected error of the completion callback fails the job with
+        its message instead of leaving it without an error.
+        """
+
+        def install(vocabulary):
+            raise RuntimeError("Could not compile the deck")
+
+        self.pipeline.on_complete = install
+        job = self.pipeline.start(["new.csv"])
+        job.put("new.csv", b"Cat,Kissa\n")
+        job.finish()
+
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.status, IngestStatus.FAILED)
+        self.assertEqual(job.error, "Could not compile the deck")
+
+    @pytest.mark.unit
+    def test_upload_to_deck(self):
+        """
+        Test that an upload to a deck writes the files to the deck's folder, keeps the
+        other word files and hands the words to the deck callback.
+        """
+
+        decks = []
+        self.pipeline.on_deck_complete = lambda deck_id, words: decks.append(
+            (deck_id, words)
+        )
+        job = self.pipeline.start(["new.csv"], deck_id="french")
+        job.put("new.csv", b"Chat,Kissa\n")
+        job.finish()
+
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.status, IngestStatus.DONE)
+        self.assertEqual(sorted(os.listdir(self.data_folder)), ["french", "old.csv"])
+        self.assertEqual(
+            os.listdir(current_folder(os.path.join(self.data_folder, "french"))),
+            ["new.csv"],
+        )
+        self.assertEqual(decks[0][0], "french")
+        self.assertEqual(decks[0][1].foreign_terms, ("Chat",))
+        self.assertEqual(self.vocabularies, [])
+
+    @pytest.mark.unit
+    def test_uploads_publish_versions(self):
+        """
+        Test that every upload publishes a new version by swapping the link, that the
+        files shipped in the data folder are shadowed but kept, and that only the
+        current and the previous versions are kept, and that the repositories read the
+        current version.
+        """
+
+        published = []
+        for number in range(3):
+            job = self.pipeline.start([f"words{number}.csv"])
+            job.put(f"words{number}.csv", b"Cat,Kissa\n")
+            job.finish()
+            self.assertTrue(job.wait(5))
+            self.assertEqual(job.status, IngestStatus.DONE)
+            published.append(current_folder(self.data_folder))
+            self.assertEqual(os.listdir(published[-1]), [f"words{number}.csv"])
+
+        self.assertEqual(len(set(published)), 3)
+        self.assertEqual(
+            sorted(os.listdir(self.data_folder)), [".current", ".versions", "old.csv"]
+        )
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.data_folder, ".versions"))),
+            sorted(os.path.basename(folder) for folder in published[1:]),
+        )
+        words = WordRepository(self.data_folder).load_words()
+        self.assertEqual([word.foreign_term for word in words], ["Cat"])
+        self.assertEqual(DeckRegistry(self.data_folder).deck_ids(), ["words2"])
+
+
+async def post(application, path, content_type, body):
+    """Posts a raw body to an ASGI application and returns the status and the body."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"content-type", content_type),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("test", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    response = {"body": b""}
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await application(scope, receive, send)
+    return response["status"], json.loads(response["body"])
+
+
+class TestUploadWords(unittest.TestCase):
+    """
+    Unit tests for the upload endpoint.
+    Test Cases:
+    - test_repeated_file_name_is_rejected: Two files of one name fail the upload.
+    """
+
+    def setUp(self):
+        """
+        Install ready services over a data folder with one word file on the app.
+        """
+
+        self.tmp = tempfile.mkdtemp()
+        self.data_folder = os.path.join(self.tmp, "data")
+        os.makedirs(self.data_folder)
+        with open(os.path.join(self.data_folder, "old.csv"), "w") as file:
+            file.write("Old,Vanha\n")
+        self.services = Services(
+            self.data_folder,
+            os.path.join(self.tmp, "out"),
+            "memory",
+            history_database=os.path.join(self.tmp, "history.db"),
+            answer_log_directory=os.path.join(self.tmp, "answers"),
+        )
+        self.services.warm_up()
+        app.state.services = self.services
+
+    def tearDown(self):
+        del app.state.services
+        self.services.close()
+        shutil.rmtree(self.tmp)
+
+    @pytest.mark.unit
+    def test_repeated_file_name_is_rejected(self):
+        """
+        Test that an upload with two files of the same name is rejected instead of
+        appending the second file to the first, and that the word files are kept.
+        """
+
+        body = (
+            b"--b0undary\r\n"
+            b'Content-Disposition: form-data; name="files"; filename="a.csv"\r\n\r\n'
+            b"a,b\r\n"
+            b"--b0undary\r\n"
+            b'Content-Disposition: form-data; name="files"; filename="dir/a.csv"\r\n\r\n'
+            b"c,d\r\n--b0undary--\r\n"
+        )
+
+        status, response = asyncio.run(
+            post(app, "/upload_words/", b"multipart/form-data; boundary=b0undary", body)
+        )
+
+        self.assertEqual(status, 400)
+        self.assertEqual(response["detail"], "Duplicate file name")
+        self.assertEqual(current_folder(self.data_folder), self.data_folder)
+        self.assertEqual(
+            [word.foreign_term for word in self.services.word_repo.load_words()],
+            ["Old"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Unit tests for the QuizLogger and BackgroundQuizLogger classes.
+
+tests/unit/test_logger.py
+
+Classes:
+    TestQuizLogger: Contains unit tests for the quiz result loggers.
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+import pytest
+
+from app.domain.models import QuizResult
+from app.interfaces.logger import BackgroundQuizLogger, QuizLogger
+
+
+class TestQuizLogger(unittest.TestCase):
+    """
+    Unit tests for the quiz result loggers.
+    Test Cases:
+    - test_same_start_time_does_not_overwrite: Quizzes started at the same time get own files.
+    - test_background_logger_flushes_on_stop: Every queued result is written by stop.
+    """
+
+    @pytest.mark.unit
+    def setUp(self):
+        """
+        Set up a temporary output folder and a quiz result.
+        """
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.result = QuizResult(
+            correct=1,
+            incorrect=1,
+            correct_words=["Hello"],
+            incorrect_words=["World"],
+            start_time=datetime(2024, 1, 2, 3, 4, 5),
+            end_time=datetime(2024, 1, 2, 3, 10, 0),
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @pytest.mark.unit
+    def test_same_start_time_does_not_overwrite(self):
+        """
+        Test that two results with the same start time are written to two files.
+        """
+
+        logger = QuizLogger(self.tmp.name)
+        logger.log_result(self.result)
+        logger.log_result(self.result)
+
+        files = sorted(os.listdir(self.tmp.name))
+        self.assertEqual(
+            files,
+            ["quiz_20240102_030405_000000.md", "quiz_20240102_030405_000000_1.md"],
+        )
+        with open(os.path.join(self.tmp.name, files[0]), encoding="utf-8") as file:
+            content = file.read()
+        self.assertIn("**Correct Answers:** 1", content)
+        self.assertIn("- World\n", content)
+
+    @pytest.mark.unit
+    def test_background_logger_flushes_on_stop(self):
+        """
+        Test that stop writes every queued result.
+        """
+
+        logger = BackgroundQuizLogger(self.tmp.name, max_queue_size=10, batch_size=3)
+        logger.start()
+        for _ in range(7):
+            logger.log_result(self.result)
+        logger.stop(timeout=5)
+
+        self.assertEqual(len(os.listdir(self.tmp.name)), 7)
+        self.assertEqual(logger.queue_depth, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Unit tests for the answer matching functions.
+
+tests/unit/test_matching.py
+
+Classes:
+    TestMatching: Contains unit tests for folding answers and the edit distance.
+"""
+
+import random
+import unittest
+
+import pytest
+
+from app.domain.matching import allowed_typos, edit_distance, fold_answer
+
+
+def reference_distance(first: str, second: str) -> int:
+    """The Levenshtein distance computed with the textbook dynamic program."""
+    previous = list(range(len(second) + 1))
+    for row, first_char in enumerate(first, 1):
+        current = [row]
+        for column, second_char in enumerate(second, 1):
+            current.append(
+                min(
+                    previous[column] + 1,
+                    current[column - 1] + 1,
+                    previous[column - 1] + (first_char != second_char),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+class TestMatching(unittest.TestCase):
+    """
+    Unit tests for folding answers and the edit distance.
+    Test Cases:
+    - test_fold_answer: Case and diacritics are removed.
+    - test_edit_distance_matches_reference: The bit-parallel distance is exact.
+    - test_edit_distance_limit: Clearly different lengths return early.
+    - test_allowed_typos: Short words allow fewer typos.
+    """
+
+    @pytest.mark.unit
+    def test_fold_answer(self):
+        """
+        Test that folding strips whitespace, case folds and drops diacritics.
+        """
+
+        self.assertEqual(fold_answer("  Päivä "), "paiva")
+        self.assertEqual(fold_answer("Café"), "cafe")
+        self.assertEqual(fold_answer("Straße"), "strasse")
+
+    @pytest.mark.unit
+    def test_edit_distance_matches_reference(self):
+        """
+        Test the bit-parallel distance against the dynamic program on random strings,
+        including expected answers longer than a machine word.
+        """
+
+        generator = random.Random(3)
+        for _ in range(2000):
+            first = "".join(generator.choices("abcd", k=generator.randrange(12)))
+            second = "".join(generator.choices("abcd", k=generator.randrange(12)))
+            self.assertEqual(
+                edit_distance(first, second), reference_distance(first, second)
+            )
+        long_word = "ab" * 50
+        typo = long_word[:30] + "x" + long_word[31:70] + long_word[71:]
+        self.assertEqual(edit_distance(long_word, typo), 2)
+
+    @pytest.mark.unit
+    def test_edit_distance_limit(self):
+        """
+        Test that lengths further apart than the limit are reported above the limit.
+        """
+
+        self.assertEqual(edit_distance("apple", "apple pie", limit=1), 2)
+        self.assertEqual(edit_distance("apple", "aple", limit=1), 1)
+
+    @pytest.mark.unit
+    def test_allowed_typos(self):
+        """
+        Test that one typo is allowed per four characters, up to the maximum.
+        """
+
+        self.assertEqual(allowed_typos("cat", 2), 0)
+        self.assertEqual(allowed_typos("apple", 2), 1)
+        self.assertEqual(allowed_typos("elephants", 2), 2)
+        self.assertEqual(allowed_typos("elephants", 1), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
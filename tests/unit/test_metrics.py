@@ -0,0 +1,164 @@
+"""
+Unit tests for the metrics module.
+
+tests/unit/test_metrics.py
+
+Classes:
+    TestMetrics: Contains unit tests for the metric types and the metrics middleware.
+"""
+
+import asyncio
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from app.interfaces.metrics import (
+    ACTIVE_SESSIONS,
+    HTTP_REQUESTS,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsMiddleware,
+    MetricsRegistry,
+)
+from app.loadtest.client import AsgiTransport
+from app.main import app as application
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Unit tests for the metric types and the metrics middleware.
+    Test Cases:
+    - test_render: Counters, gauges and histograms render in the Prometheus text format.
+    - test_middleware_labels_route_templates: Requests are labelled with their route and method.
+    - test_requests_in_flight_by_route: Requests being handled are counted by route.
+    - test_metrics_are_rendered_off_the_event_loop: Scrapes do not block the loop.
+    """
+
+    @pytest.mark.unit
+    def test_render(self):
+        """
+        Test the exposition of labelled counters, function gauges and histograms.
+        """
+
+        registry = MetricsRegistry()
+        answers = Counter("answers_total", "Answers.", ("result",), registry=registry)
+        words = Gauge("deck_words", "Words.", registry=registry)
+        latency = Histogram(
+            "latency_seconds", "Latency.", buckets=(0.1, 1.0), registry=registry
+        )
+        answers.labels("correct").inc()
+        answers.labels("correct").inc(2)
+        answers.labels('say "hi"').inc()
+        words.set_function(lambda: 42)
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.observe(value)
+
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE answers_total counter", lines)
+        self.assertIn('answers_total{result="correct"} 3', lines)
+        self.assertIn('answers_total{result="say \\"hi\\""} 1', lines)
+        self.assertIn("deck_words 42", lines)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{le="1"} 3', lines)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', lines)
+        self.assertIn("latency_seconds_sum 3.65", lines)
+        self.assertIn("latency_seconds_count 4", lines)
+
+    @pytest.mark.unit
+    def test_middleware_labels_route_templates(self):
+        """
+        Test that the middleware labels requests with the matched route template
+        and the status code, and labels unmatched requests and unknown methods as such.
+        """
+
+        async def app(scope, receive, send):
+            if scope["path"].startswith("/jobs/"):
+                scope["route"] = SimpleNamespace(path="/jobs/{job_id}")
+                status = 200
+            else:
+                status = 404
+            await send({"type": "http.response.start", "status": status})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def send(message):
+            pass
+
+        middleware = MetricsMiddleware(app)
+        for method, path in (
+            ("GET", "/jobs/1"),
+            ("GET", "/jobs/2"),
+            ("GET", "/missing"),
+            ("BREW", "/jobs/3"),
+        ):
+            scope = {"type": "http", "method": method, "path": path}
+            asyncio.run(middleware(scope, None, send))
+
+        exposition = REGISTRY.render()
+        self.assertEqual(HTTP_REQUESTS.labels("GET", "/jobs/{job_id}", "200").get(), 2)
+        self.assertIn('route="unmatched",status="404"', exposition)
+        self.assertNotIn("/jobs/1", exposition)
+        self.assertEqual(
+            HTTP_REQUESTS.labels("other", "/jobs/{job_id}", "200").get(), 1
+        )
+        self.assertNotIn("BREW", exposition)
+
+    @pytest.mark.unit
+    def test_requests_in_flight_by_route(self):
+        """
+        Test that a request being handled is counted under its route once it was
+        routed, and is no longer counted when it finished.
+        """
+
+        expositions = []
+
+        async def app(scope, receive, send):
+            expositions.append(REGISTRY.render())
+            scope["route"] = SimpleNamespace(path="/slow/{id}")
+            expositions.append(REGISTRY.render())
+            await send({"type": "http.response.start", "status": 200})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def send(message):
+            pass
+
+        scope = {"type": "http", "method": "GET", "path": "/slow/1"}
+        asyncio.run(MetricsMiddleware(app)(scope, None, send))
+
+        sample = 'vocabvoyage_http_requests_in_flight{route="%s"} 1'
+        self.assertIn(sample % "unmatched", expositions[0].splitlines())
+        self.assertIn(sample % "/slow/{id}", expositions[1].splitlines())
+        self.assertNotIn(sample % "/slow/{id}", REGISTRY.render().splitlines())
+
+    @pytest.mark.unit
+    def test_metrics_are_rendered_off_the_event_loop(self):
+        """
+        Test that /metrics reads the gauges in the thread pool, so a gauge querying
+        the state backend does not block the event loop.
+        """
+
+        threads = []
+
+        def sessions():
+            threads.append(threading.current_thread())
+            return 3
+
+        async def scrape():
+            threads.append(threading.current_thread())
+            return await AsgiTransport(application).request("GET", "/metrics")
+
+        with patch.object(ACTIVE_SESSIONS.labels(), "_function", sessions):
+            status, body = asyncio.run(scrape())
+
+        self.assertEqual(status, 200)
+        self.assertIn("vocabvoyage_active_sessions 3", body.decode().splitlines())
+        self.assertEqual(len(threads), 2)
+        self.assertIsNot(threads[1], threads[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Unit tests for the parallel parsing of word files.
+
+tests/unit/test_parallel_csv.py
+
+Classes:
+    TestParallelCsv: Contains unit tests for split_rows and parse_files.
+    TestRowParser: Contains unit tests for the RowParser class.
+"""
+
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from app.interfaces.parallel_csv import RowParser, parse_files, parse_rows, split_rows
+
+
+class TestParallelCsv(unittest.TestCase):
+    """
+    Unit tests for split_rows and parse_files.
+    Test Cases:
+    - test_ranges_end_outside_quoted_fields: Chunks never split a quoted field.
+    - test_parallel_parse_matches_serial_parse: Workers return the rows of one worker.
+    """
+
+    def setUp(self):
+        """
+        Set up CSV content with blank lines, a short row and quoted newlines, and a
+        temporary folder for files.
+        """
+
+        rows = []
+        for number in range(200):
+            rows.append(f"Term{number},Sana{number}\n")
+            if number % 7 == 0:
+                rows.append(f'"Two\nlines {number}","Kaksi\r\nriviä"\n')
+            if number % 11 == 0:
+                rows.append("\nshort\n")
+        self.content = "".join(rows).encode("utf-8")
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @pytest.mark.unit
+    def test_ranges_end_outside_quoted_fields(self):
+        """
+        Test that the ranges cover the content and end after a newline outside of a
+        quoted field, and that content with an odd number of quotes is not split.
+        """
+
+        ranges = split_rows(io.BytesIO(self.content), 64)
+        self.assertGreater(len(ranges), 10)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], len(self.content))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(self.content[end - 1 : end], b"\n")
+            self.assertEqual(self.content.count(b'"', 0, end) % 2, 0)
+
+        self.assertEqual(
+            split_rows(io.BytesIO(self.content), 64, block_bytes=7), ranges
+        )
+        self.assertEqual(split_rows(io.BytesIO(b'a"b,c\n' * 51), 64), [(0, 306)])
+
+    @pytest.mark.unit
+    def test_parallel_parse_matches_serial_parse(self):
+        """
+        Test that parsing in worker processes, with one file split into chunks,
+        returns the same rows and line numbers as parsing in the calling thread, also
+        when the files are read in small blocks.
+        """
+
+        paths = []
+        for number, content in enumerate([self.content, b"Cat,Kissa\n", b""]):
+            paths.append(os.path.join(self.tmp.name, f"words{number}.csv"))
+            with open(paths[-1], "wb") as file:
+                file.write(content)
+        serial = parse_files(paths)
+        parallel = parse_files(paths, workers=2, chunk_bytes=256)
+        with patch("app.interfaces.parallel_csv.READ_BLOCK_BYTES", 7):
+            streamed = parse_files(paths)
+
+        self.assertEqual(parallel, serial)
+        self.assertEqual(streamed, serial)
+        self.assertEqual(serial[0], parse_rows(self.content))
+        self.assertEqual(serial[0].skipped[0], (6, "fewer than two columns"))
+        self.assertEqual(serial[0].lines[:3].tolist(), [1, 2, 7])
+
+
+class TestRowParser(unittest.TestCase):
+    """
+    Unit tests for the RowParser class.
+    Test Cases:
+    - test_rows_split_across_chunks: Rows, characters and quoted fields may span chunks.
+    """
+
+    @pytest.mark.unit
+    def test_rows_split_across_chunks(self):
+        """
+        Test that feeding content one byte at a time gives the rows and lines of
+        parse_rows, also when a quote inside a quoted field leaves an even number of
+        quotes at the end of a line whose record is still open.
+        """
+
+        content = (
+            'Apple,Omena\r\n"Multi\nline",Monirivinen\nshort\n\n'
+            'Käsi,"Hand, arm"\n"a"b",c\n"d\nLast,Viimeinen'
+        ).encode("utf-8")
+        parser = RowParser()
+        for byte in content:
+            parser.feed(bytes([byte]))
+        self.assertEqual(parser.rows, 5)  # The last record is still open
+        parsed = parser.close()
+
+        self.assertEqual(parsed, parse_rows(content))
+        self.assertEqual(parsed.foreign_terms, ["Apple", "Multi\nline", "Käsi", 'ab"'])
+        self.assertEqual(parsed.lines.tolist(), [1, 2, 6, 7])
+        self.assertEqual(
+            parsed.skipped,
+            [(4, "fewer than two columns"), (8, "fewer than two columns")],
+        )
+        self.assertEqual(parsed.line_count, 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
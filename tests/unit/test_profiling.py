@@ -0,0 +1,157 @@
+"""
+Unit tests for the profiling module.
+
+tests/unit/test_profiling.py
+
+Classes:
+    TestProfiling: Contains unit tests for the profile store and the profiling middleware.
+"""
+
+import asyncio
+import marshal
+import unittest
+
+import pytest
+
+from app.interfaces.profiling import (
+    ProfileRecord,
+    ProfileStore,
+    ProfilingMiddleware,
+    run_in_threadpool,
+)
+
+
+def slow_endpoint_work():
+    return sum(range(1000))
+
+
+def threaded_work():
+    return sum(range(1000))
+
+
+def other_request_work():
+    return sum(range(1000))
+
+
+async def threaded_endpoint(scope, receive, send):
+    await run_in_threadpool(threaded_work)
+    await asyncio.sleep(0.01)
+    await send({"type": "http.response.start", "status": 200})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def other_request():
+    for _ in range(5):
+        other_request_work()
+        await asyncio.sleep(0.002)
+
+
+async def endpoint(scope, receive, send):
+    slow_endpoint_work()
+    await send({"type": "http.response.start", "status": 201})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def call(middleware, path="/check/", headers=()):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "POST", "path": path, "headers": list(headers)}
+    asyncio.run(middleware(scope, receive, send))
+
+
+class TestProfiling(unittest.TestCase):
+    """
+    Unit tests for the profile store and the profiling middleware.
+    Test Cases:
+    - test_store_keeps_the_latest_profiles: The ring buffer drops the oldest profile.
+    - test_requests_with_the_token_are_profiled: Only requests with the token are profiled.
+    - test_sampled_requests_are_profiled: A sample rate of 1 profiles every request.
+    - test_profile_covers_only_its_request: Thread pool work is included, other requests are not.
+    """
+
+    @pytest.mark.unit
+    def test_store_keeps_the_latest_profiles(self):
+        """
+        Test that a full store drops its oldest profile and lists the newest first.
+        """
+
+        store = ProfileStore(capacity=2)
+        records = [ProfileRecord("GET", f"/{n}", 200, 0.0, 0.1, {}) for n in range(3)]
+        for record in records:
+            store.add(record)
+
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.list(), [records[2], records[1]])
+        self.assertIsNone(store.get(records[0].id))
+        self.assertIs(store.get(records[1].id), records[1])
+
+    @pytest.mark.unit
+    def test_requests_with_the_token_are_profiled(self):
+        """
+        Test that requests are profiled only when they carry the right token, and that
+        the profile can be exported as pstats data and as text.
+        """
+
+        store = ProfileStore()
+        middleware = ProfilingMiddleware(endpoint, store, token="secret")
+
+        call(middleware)
+        call(middleware, headers=[(b"x-profile-token", b"wrong")])
+        self.assertEqual(len(store), 0)
+
+        call(middleware, headers=[(b"x-profile-token", b"secret")])
+        (record,) = store.list()
+        self.assertEqual(record.summary()["path"], "/check/")
+        self.assertEqual(record.status, 201)
+        functions = {name for _, _, name in marshal.loads(record.to_pstats())}
+        self.assertIn("slow_endpoint_work", functions)
+        self.assertIn("slow_endpoint_work", record.to_text())
+
+    @pytest.mark.unit
+    def test_sampled_requests_are_profiled(self):
+        """
+        Test that every request is profiled at a sample rate of 1, except the admin
+        endpoints.
+        """
+
+        store = ProfileStore(capacity=3)
+        middleware = ProfilingMiddleware(endpoint, store, sample_rate=1.0)
+
+        for _ in range(5):
+            call(middleware)
+        call(middleware, path="/admin/profiles")
+
+        self.assertEqual(len(store), 3)
+        self.assertTrue(all(record.path == "/check/" for record in store.list()))
+
+    @pytest.mark.unit
+    def test_profile_covers_only_its_request(self):
+        """
+        Test that the work a request runs in the thread pool is profiled, and that a
+        request served at the same time is not.
+        """
+
+        store = ProfileStore()
+        middleware = ProfilingMiddleware(threaded_endpoint, store, sample_rate=1.0)
+
+        async def requests():
+            scope = {"type": "http", "method": "GET", "path": "/words/next"}
+            await asyncio.gather(middleware(scope, None, self.ignore), other_request())
+
+        asyncio.run(requests())
+        (record,) = store.list()
+        functions = {name for _, _, name in marshal.loads(record.to_pstats())}
+        self.assertIn("threaded_work", functions)
+        self.assertNotIn("other_request_work", functions)
+
+    @staticmethod
+    async def ignore(message):
+        pass
+
+
+if __name__ == "__main__":
+    unittest.main()
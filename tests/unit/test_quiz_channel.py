@@ -0,0 +1,304 @@
+"""
+Unit tests for the QuizChannel class.
+
+tests/unit/test_quiz_channel.py
+
+Classes:
+    TestQuizChannel: Contains unit tests for the quiz messages of one session.
+    TestQuizChannelWithHttp: Contains unit tests for a session used over the WebSocket
+        and the HTTP API at once.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.domain.models import Word
+from app.interfaces.logger import QuizLogger
+from app.interfaces.responses import render_json
+from app.interfaces.state_backends import SqliteStateBackend
+from app.loadtest.client import AsgiTransport
+from app.main import Services, app
+from app.use_cases.quiz_channel import QuizChannel
+from app.use_cases.session_registry import SessionRegistry
+
+
+async def websocket_session(application, path, headers, messages):
+    """Sends messages over a WebSocket of an ASGI application, one per reply."""
+    pending = list(messages)
+    incoming: "asyncio.Queue[dict]" = asyncio.Queue()
+    replies = []
+    await incoming.put({"type": "websocket.connect"})
+
+    async def send(message):
+        if message["type"] != "websocket.send":
+            return
+        replies.append(json.loads(message["text"]))
+        if pending:
+            text = json.dumps(pending.pop(0))
+            await incoming.put({"type": "websocket.receive", "text": text})
+        else:
+            await incoming.put({"type": "websocket.disconnect", "code": 1000})
+
+    scope = {
+        "type": "websocket",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers],
+        "client": ("127.0.0.1", 50000),
+        "server": ("test", 80),
+        "subprotocols": [],
+    }
+    await application(scope, incoming.get, send)
+    return replies
+
+
+class TestQuizChannel(unittest.TestCase):
+    """
+    Unit tests for the quiz messages of one session.
+    Test Cases:
+    - test_answer_returns_result_and_next_word: An answer is answered with its result and the next word.
+    - test_invalid_messages: Invalid messages get error replies with the HTTP status.
+    - test_channel_shares_the_session: The channel works on the quiz state of the HTTP API.
+    - test_memory_state_is_changed_in_the_calling_thread: Only blocking work is offloaded.
+    - test_session_message_switches_the_session: A session message continues another session.
+    """
+
+    def setUp(self):
+        """
+        Set up a registry with two words and a channel of the session alice.
+        """
+
+        self.words = [
+            Word(foreign_term="Hello", native_translation="Hei"),
+            Word(foreign_term="World", native_translation="Maailma"),
+        ]
+        self.logger = MagicMock(spec=QuizLogger)
+        self.registry = SessionRegistry(self.words, self.logger)
+        self.channel = QuizChannel(self.registry, "alice", max_count=10)
+
+    def send(self, message):
+        """Handles a message and decodes the reply like a client would."""
+        return json.loads(render_json(asyncio.run(self.channel.handle(message))))
+
+    @staticmethod
+    def offloaded_calls(channel, messages):
+        """Handles messages and returns the names of the functions offloaded."""
+        calls = []
+
+        async def offload(function, *args):
+            calls.append(getattr(function, "__name__", None) or function._mock_name)
+            return function(*args)
+
+        channel.offload = offload
+        for message in messages:
+            asyncio.run(channel.handle(message))
+        return calls
+
+    @pytest.mark.unit
+    def test_answer_returns_result_and_next_word(self):
+        """
+        Test that starting a quiz returns the first word, that every answer returns
+        the updated counters with the next word, and that ending logs the quiz.
+        """
+
+        reply = self.send({"type": "start", "id": 7})
+        self.assertEqual(
+            (reply["type"], reply["words"], reply["id"]), ("started", 2, 7)
+        )
+        first = reply["next"]
+
+        reply = self.send(
+            {"type": "answer", "word_id": first["id"], "user_input": "wrong"}
+        )
+        self.assertEqual(reply["type"], "result")
+        self.assertFalse(reply["is_correct"])
+        self.assertEqual((reply["correct"], reply["incorrect"]), (0, 1))
+        second = reply["next"]
+        self.assertNotEqual(second["id"], first["id"])
+
+        reply = self.send(
+            {
+                "type": "answer",
+                "word_id": second["id"],
+                "user_input": second["foreign_term"],
+                "next": False,
+            }
+        )
+        self.assertEqual(reply["match"], "exact")
+        self.assertNotIn("next", reply)
+        self.assertEqual(
+            self.send({"type": "results"})["incorrect_words"],
+            [first["foreign_term"]],
+        )
+        self.assertEqual(self.send({"type": "end"}), {"type": "ended"})
+        self.logger.log_result.assert_called_once()
+
+    @pytest.mark.unit
+    def test_invalid_messages(self):
+        """
+        Test that invalid messages are answered with the status of the matching HTTP
+        endpoint and leave the quiz unchanged.
+        """
+
+        cases = [
+            (None, 400),
+            ({"type": "unknown"}, 400),
+            ({"type": "answer", "user_input": "Hello"}, 400),
+            ({"type": "answer", "word_id": "missing", "user_input": "Hello"}, 404),
+            ({"type": "start", "deck_id": "animals"}, 404),
+            ({"type": "mode", "mode": "spaced", "retry_gap": 0}, 400),
+            ({"type": "mode", "mode": "infinite", "max_typos": "2"}, 400),
+            ({"type": "next", "count": 11}, 400),
+            ({"type": "session", "session_id": ""}, 400),
+            ({"type": "session", "session_id": "x" * 129}, 400),
+        ]
+        for message, status in cases:
+            with self.subTest(message=message):
+                reply = self.send(message)
+                self.assertEqual((reply["type"], reply["status"]), ("error", status))
+        self.assertEqual(self.registry.get("alice").incorrect, 0)
+
+    @pytest.mark.unit
+    def test_channel_shares_the_session(self):
+        """
+        Test that the channel and the HTTP endpoints see the same quiz of a session.
+        """
+
+        reply = self.send({"type": "mode", "mode": "spaced", "retry_gap": 5})
+        self.assertEqual(reply["mode"], "spaced")
+        self.assertEqual(self.registry.get("alice").mode, "spaced")
+
+        self.registry.get("alice").check_answer(reply["next"]["id"], "wrong")
+        reply = self.send({"type": "next", "count": 3})
+        self.assertEqual(len(reply["words"]), 2)
+        self.assertEqual(self.send({"type": "results"})["incorrect"], 1)
+
+    @pytest.mark.unit
+    def test_session_message_switches_the_session(self):
+        """
+        Test that a session message names the session of the following messages.
+        """
+
+        self.registry.get("bob").set_mode("infinite")
+        reply = self.send({"type": "session", "session_id": "bob", "id": 1})
+        self.assertEqual(reply, {"type": "session", "session_id": "bob", "id": 1})
+        self.assertEqual(self.channel.session_id, "bob")
+        self.assertEqual(
+            self.send({"type": "mode", "mode": "normal"})["mode"], "normal"
+        )
+        self.assertEqual(self.registry.get("bob").mode, "normal")
+
+    @pytest.mark.unit
+    def test_memory_state_is_changed_in_the_calling_thread(self):
+        """
+        Test that loading the session, opening the deck and logging the results are
+        offloaded, and that a state kept in memory is changed in the calling thread
+        while a state saved to a shared backend is changed through the offload too.
+        """
+
+        messages = [
+            {"type": "start"},
+            {"type": "mode", "mode": "infinite"},
+            {"type": "next"},
+            {"type": "answer", "word_id": "missing", "user_input": "x"},
+            {"type": "end"},
+        ]
+        self.assertEqual(
+            self.offloaded_calls(self.channel, messages),
+            ["on_deck", "get", "get", "get", "get", "log_result"],
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = SqliteStateBackend(os.path.join(tmp, "state.db"))
+            registry = SessionRegistry(self.words, self.logger, backend=backend)
+            channel = QuizChannel(registry, "alice", max_count=10)
+            calls = self.offloaded_calls(channel, messages)
+            backend.close()
+        self.assertEqual(
+            calls,
+            ["on_deck", "start", "get", "set_mode", "get", "_next_word", "get"]
+            + ["answer", "get", "log_result"],
+        )
+
+
+class TestQuizChannelWithHttp(unittest.TestCase):
+    """
+    Unit tests for a session used over the WebSocket and the HTTP API at once.
+    Test Cases:
+    - test_answers_over_both_are_all_counted: Concurrent answers of one session all count.
+    """
+
+    def setUp(self):
+        """
+        Install ready services with an in-memory state backend on the app.
+        """
+
+        self.tmp = tempfile.mkdtemp()
+        data = os.path.join(self.tmp, "data")
+        os.makedirs(data)
+        with open(os.path.join(data, "words.csv"), "w", encoding="utf-8") as file:
+            file.writelines(f"word{number},sana{number}\n" for number in range(20))
+        self.services = Services(
+            data,
+            os.path.join(self.tmp, "out"),
+            "memory",
+            history_database=os.path.join(self.tmp, "history.db"),
+            answer_log_directory=os.path.join(self.tmp, "answers"),
+        )
+        self.services.warm_up()
+        app.state.services = self.services
+
+    def tearDown(self):
+        del app.state.services
+        self.services.close()
+        shutil.rmtree(self.tmp)
+
+    @pytest.mark.unit
+    def test_answers_over_both_are_all_counted(self):
+        """
+        Test that answers sent over the WebSocket and to /check/ for the same session
+        at the same time are all counted, in the counters and in the missed words.
+        """
+
+        headers = [("X-Session-Id", "shared")]
+        transport = AsgiTransport(app)
+        rounds = 30
+
+        async def run():
+            await transport.request("POST", "/start_quiz/", headers)
+            _, body = await transport.request("GET", "/words/next?count=5", headers)
+            word_ids = [word["id"] for word in json.loads(body)]
+
+            async def over_http():
+                for number in range(rounds):
+                    answer = {"word_id": word_ids[number % 5], "user_input": "wrong"}
+                    await transport.request("POST", "/check/", headers, answer)
+
+            messages = [
+                {"type": "answer", "word_id": word_ids[number % 5], "user_input": "x"}
+                for number in range(rounds)
+            ]
+            replies, _ = await asyncio.gather(
+                websocket_session(app, "/ws/quiz", headers, messages), over_http()
+            )
+            _, body = await transport.request("GET", "/results/", headers)
+            return replies, json.loads(body)
+
+        replies, results = asyncio.run(run())
+        self.assertEqual(replies[0], {"type": "session", "session_id": "shared"})
+        self.assertEqual([reply["type"] for reply in replies[1:]], ["result"] * rounds)
+        self.assertEqual((results["correct"], results["incorrect"]), (0, 2 * rounds))
+        self.assertEqual(len(results["incorrect_words"]), 2 * rounds)
+
+
+if __name__ == "__main__":
+    unittest.main()
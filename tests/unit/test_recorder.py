@@ -0,0 +1,159 @@
+"""
+Unit tests for the traffic recorder and the replay tool.
+
+tests/unit/test_recorder.py
+
+Classes:
+    TestRecorder: Contains unit tests for the recorder middleware and the replay.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import pytest
+
+from app.interfaces.recorder import RecorderMiddleware, TrafficRecorder
+from app.loadtest.client import AsgiTransport
+from app.loadtest.replay import read_traces, replay
+
+WORD = {"id": "w1", "foreign_term": "Hello", "native_translation": "Hei"}
+
+
+async def endpoint(scope, receive, send):
+    """Answers like the quiz routes, with the route set like the router does."""
+    await receive()
+    route = scope["path"]
+    scope["route"] = SimpleNamespace(path=route)
+    headers = []
+    if route == "/start_quiz/":
+        headers.append((b"set-cookie", b"vocabvoyage_session=new; HttpOnly; Path=/"))
+    body = {"/words/next": WORD, "/check/": {"is_correct": True, "match": "exact"}}
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    await send(
+        {"type": "http.response.body", "body": json.dumps(body.get(route)).encode()}
+    )
+
+
+class FakeTransport:
+    """Records the replayed requests and answers with the endpoint responses."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def request(self, method, path, headers=(), body=None):
+        self.requests.append((method, path, dict(headers), body))
+        if path.startswith("/words/next"):
+            return 200, json.dumps(WORD).encode()
+        return 200, b"{}"
+
+
+class TestRecorder(unittest.TestCase):
+    """
+    Unit tests for the recorder middleware and the replay.
+    Test Cases:
+    - test_quiz_calls_are_recorded: Calls are written as compact lines without answers.
+    - test_replay_rebuilds_the_answers: The replay answers the words it is given.
+    - test_session_numbers_are_bounded: Only the most recent sessions keep their number.
+    """
+
+    def setUp(self):
+        """
+        Set up a recorder writing to a temporary folder.
+        """
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.recorder = TrafficRecorder(self.tmp.name)
+
+    def tearDown(self):
+        self.recorder.close()
+        self.tmp.cleanup()
+
+    def record_session(self):
+        """Sends the calls of a quiz through the recorder middleware."""
+        transport = AsgiTransport(RecorderMiddleware(endpoint, self.recorder))
+        cookie = [("Cookie", "other=1; vocabvoyage_session=new")]
+
+        async def calls():
+            await transport.request("POST", "/start_quiz/", body={"deck_id": None})
+            await transport.request("GET", "/words/next?count=1", cookie)
+            await transport.request(
+                "POST", "/check/", cookie, {"word_id": "w1", "user_input": "Hello"}
+            )
+            await transport.request("GET", "/results/", cookie)
+            await transport.request("POST", "/end_quiz/", [("X-Session-Id", "other")])
+
+        asyncio.run(calls())
+        self.recorder.close()
+
+    @pytest.mark.unit
+    def test_quiz_calls_are_recorded(self):
+        """
+        Test that the quiz routes are recorded with numbered sessions, the query, the
+        request body and the answer match instead of the answer, and other routes not.
+        """
+
+        self.record_session()
+        with open(self.recorder.path, encoding="utf-8") as file:
+            header = json.loads(file.readline())
+            lines = [json.loads(line) for line in file]
+
+        self.assertEqual(header["version"], 1)
+        self.assertEqual(
+            [line[1:5] for line in lines],
+            [
+                [1, "/start_quiz/", {"deck_id": None}, 200],
+                [1, "/words/next", "count=1", 200],
+                [1, "/check/", "exact", 200],
+                [2, "/end_quiz/", None, 200],
+            ],
+        )
+        self.assertNotIn("Hello", json.dumps(lines))
+
+    @pytest.mark.unit
+    def test_replay_rebuilds_the_answers(self):
+        """
+        Test that a replay sends the calls of every session with a new session id and
+        answers the words it was given as recorded.
+        """
+
+        self.record_session()
+        calls = read_traces([self.recorder.path])
+        transport = FakeTransport()
+        report = asyncio.run(replay(transport, calls, speed=0))
+
+        self.assertEqual(report["requests"], 4)
+        self.assertEqual((report["sessions"], report["skipped"]), (2, 0))
+        self.assertEqual(report["routes"]["/check/"]["requests"], 1)
+        sessions = {request[2]["X-Session-Id"] for request in transport.requests}
+        self.assertEqual(len(sessions), 2)
+        self.assertIn(
+            ("POST", "/check/", {"word_id": "w1", "user_input": "Hello"}),
+            [(method, path, body) for method, path, _, body in transport.requests],
+        )
+        self.assertTrue(os.path.basename(self.recorder.path).startswith("traffic-"))
+
+    @pytest.mark.unit
+    def test_session_numbers_are_bounded(self):
+        """
+        Test that only the numbers of the most recently seen sessions are kept, and
+        that a dropped session gets a new number.
+        """
+
+        recorder = TrafficRecorder(os.path.join(self.tmp.name, "bounded"), 2)
+        for session_id in ["a", "b", "a", "c", "b", "a"]:
+            recorder.record(0.0, session_id, "/words/next", None, 200, 1.0)
+        recorder.close()
+        with open(recorder.path, encoding="utf-8") as file:
+            file.readline()
+            sessions = [json.loads(line)[1] for line in file]
+
+        self.assertEqual(sessions, [1, 2, 1, 3, 4, 5])
+        self.assertEqual(len(recorder._sessions), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
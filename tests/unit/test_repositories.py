@@ -0,0 +1,346 @@
+"""
+Unit tests for the WordRepository and DeckRegistry classes.
+
+tests/unit/test_repositories.py
+
+Classes:
+    TestWordRepository: Contains unit tests for the WordRepository class.
+    TestDeckRegistry: Contains unit tests for the DeckRegistry class.
+"""
+
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from unittest.mock import patch
+
+import pytest
+
+from app.interfaces import repositories
+from app.interfaces.repositories import DeckRegistry, UnknownDeckError, WordRepository
+
+
+class TestWordRepository(unittest.TestCase):
+    """
+    Unit tests for the WordRepository class.
+    Test Cases:
+    - test_reload_parses_only_changed_files: Unchanged files are served from the cache.
+    - test_removed_files_are_dropped: Words of deleted files disappear on reload.
+    - test_concurrent_loads_are_collapsed: Concurrent callers share one load.
+    - test_bulk_load_reports_skipped_and_duplicate_rows: The report locates bad rows.
+    - test_parse_processes_are_kept_until_close: Reloads share one pool of processes.
+    """
+
+    @pytest.mark.unit
+    def setUp(self):
+        """
+        Set up a temporary data folder with two CSV files.
+        """
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.write("a.csv", "Cat,Kissa\n")
+        self.write("b.csv", "Dog,Koira\nshort\n")
+        self.repository = WordRepository(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, filename: str, content: str):
+        with open(os.path.join(self.tmp.name, filename), "w", encoding="utf-8") as file:
+            file.write(content)
+
+    def terms(self):
+        return [word.foreign_term for word in self.repository.load_words()]
+
+    @pytest.mark.unit
+    def test_reload_parses_only_changed_files(self):
+        """
+        Test that only new or changed files are parsed on reload.
+        """
+
+        self.assertEqual(self.terms(), ["Cat", "Dog"])
+        self.assertEqual(self.repository.files_parsed, 2)
+
+        self.assertEqual(self.terms(), ["Cat", "Dog"])
+        self.assertEqual(self.repository.files_parsed, 0)
+
+        self.write("b.csv", "Dog,Koira\nBird,Lintu\n")
+        self.assertEqual(self.terms(), ["Cat", "Dog", "Bird"])
+        self.assertEqual(self.repository.files_parsed, 1)
+
+        # Rewriting the same content changes the metadata but not the hash
+        self.write("a.csv", "Cat,Kissa\n")
+        os.utime(os.path.join(self.tmp.name, "a.csv"), ns=(1, 1))
+        self.assertEqual(self.terms(), ["Cat", "Dog", "Bird"])
+        self.assertEqual(self.repository.files_parsed, 0)
+
+    @pytest.mark.unit
+    def test_parse_processes_are_kept_until_close(self):
+        """
+        Test that reloads parsing files in processes start the pool only once, and
+        that closing the repository shuts it down.
+        """
+
+        repository = WordRepository(self.tmp.name, parse_workers=2)
+        pools = []
+        original = repositories.start_pool
+
+        def start_pool(workers):
+            pools.append(original(workers))
+            return pools[-1]
+
+        with patch.object(repositories, "start_pool", start_pool):
+            self.assertEqual(len(repository.load_words()), 2)
+            self.write("a.csv", "Cat,Kissa\nBird,Lintu\n")
+            self.write("b.csv", "Dog,Koira\n")
+            self.assertEqual(len(repository.load_words()), 3)
+            self.assertEqual(repository.files_parsed, 2)
+        self.assertEqual(len(pools), 1)
+        pool = pools[0]
+
+        repository.close()
+        with self.assertRaises(RuntimeError):
+            pool.submit(len, "")
+
+    @pytest.mark.unit
+    def test_removed_files_are_dropped(self):
+        """
+        Test that the words of a deleted file are no longer returned.
+        """
+
+        self.terms()
+        os.remove(os.path.join(self.tmp.name, "a.csv"))
+        self.assertEqual(self.terms(), ["Dog"])
+
+    @pytest.mark.unit
+    def test_concurrent_loads_are_collapsed(self):
+        """
+        Test that callers arriving during a load wait for it instead of loading again.
+        """
+
+        started = threading.Event()
+        joined = threading.Event()
+        release = threading.Event()
+        original_load = self.repository._load
+        calls = []
+
+        def slow_load():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return original_load()
+
+        class ObservedFuture(Future):
+            def result(self, timeout=None):
+                joined.set()
+                return super().result(timeout)
+
+        results = []
+        with (
+            patch.object(self.repository, "_load", side_effect=slow_load),
+            patch("app.interfaces.repositories.Future", ObservedFuture),
+        ):
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(self.repository.load_words())
+                )
+                for _ in range(2)
+            ]
+            threads[0].start()
+            started.wait(5)
+            threads[1].start()
+            joined.wait(5)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0], results[1])
+
+    @pytest.mark.unit
+    def test_bulk_load_reports_skipped_and_duplicate_rows(self):
+        """
+        Test that the report gives the file and line of skipped rows and of words
+        repeating an earlier word, and that duplicates are loaded nonetheless.
+        """
+
+        self.write("b.csv", 'Dog,Koira\n\nshort\n"Two\nlines",Kaksi\nCat,Kissa\n')
+        vocabulary, report = self.repository.bulk_load()
+
+        self.assertEqual(
+            [vocabulary.word(index).foreign_term for index in range(len(vocabulary))],
+            ["Cat", "Dog", "Two\nlines", "Cat"],
+        )
+        self.assertEqual(
+            (report.files, report.rows, report.words, report.skipped),
+            (2, 5, 4, 1),
+        )
+        self.assertEqual(
+            [(row.file, row.line) for row in report.skipped_rows], [("b.csv", 3)]
+        )
+        self.assertEqual(report.duplicates, 1)
+        duplicate = report.duplicate_rows[0]
+        self.assertEqual(
+            (
+                duplicate.file,
+                duplicate.line,
+                duplicate.first_file,
+                duplicate.first_line,
+            ),
+            ("b.csv", 6, "a.csv", 1),
+        )
+        self.assertIs(self.repository.report, report)
+
+
+class TestDeckRegistry(unittest.TestCase):
+    """
+    Unit tests for the DeckRegistry class.
+    Test Cases:
+    - test_files_and_bundles_are_decks: Files and subfolders are separate decks.
+    - test_changed_deck_is_compiled_again: A deck follows changes of its files.
+    - test_later_and_unfinished_decks_are_kept: Only earlier compiled decks are removed.
+    - test_least_recently_used_deck_is_dropped: Open decks stay within the budget.
+    - test_deck_ids_are_checked: Only valid ids and names of existing decks are served.
+    - test_replaced_files_are_resolved_again: A deck read during an upload is read again.
+    """
+
+    def setUp(self):
+        """
+        Set up a data folder with two word files and a bundle of two files.
+        """
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.write("animals.csv", "Cat,Kissa\nDog,Koira\n")
+        self.write("colors.csv", "Red,Punainen\n")
+        os.makedirs(os.path.join(self.tmp.name, "french"))
+        self.write(os.path.join("french", "a.csv"), "Chat,Kissa\n")
+        self.write(os.path.join("french", "b.csv"), "Chien,Koira\n")
+        self.registry = DeckRegistry(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, filename: str, content: str):
+        with open(os.path.join(self.tmp.name, filename), "w", encoding="utf-8") as file:
+            file.write(content)
+
+    @pytest.mark.unit
+    def test_files_and_bundles_are_decks(self):
+        """
+        Test that every file and every bundle is a deck that is loaded on first use.
+        """
+
+        self.assertEqual(self.registry.deck_ids(), ["animals", "colors", "french"])
+        self.assertEqual(self.registry.loaded(), {})
+
+        self.assertEqual(
+            tuple(self.registry.get("animals").foreign_terms), ("Cat", "Dog")
+        )
+        self.assertEqual(
+            tuple(self.registry.get("french").foreign_terms), ("Chat", "Chien")
+        )
+        self.assertIs(self.registry.get("animals"), self.registry.get("animals"))
+        self.assertEqual(self.registry.loaded(), {"animals": 2, "french": 2})
+        for deck_id in ("missing", ".compiled", "../animals"):
+            with self.assertRaises(UnknownDeckError):
+                self.registry.get(deck_id)
+
+    @pytest.mark.unit
+    def test_changed_deck_is_compiled_again(self):
+        """
+        Test that a deck whose file changed is compiled again with the new words.
+        """
+
+        first = self.registry.get("colors")
+        self.write("colors.csv", "Blue,Sininen\nGreen,Vihreä\n")
+        os.utime(
+            os.path.join(self.tmp.name, "colors.csv"), ns=(1, 1)
+        )  # A new mtime even on coarse clocks
+
+        second = self.registry.get("colors")
+        self.assertIsNot(first, second)
+        self.assertEqual(tuple(second.foreign_terms), ("Blue", "Green"))
+        compiled = os.listdir(os.path.join(self.tmp.name, ".compiled", "decks"))
+        self.assertEqual(len(compiled), 1)
+
+    @pytest.mark.unit
+    def test_later_and_unfinished_decks_are_kept(self):
+        """
+        Test that opening a deck removes its decks compiled before, but keeps a deck
+        compiled after it by another process and the temporary file of a deck that is
+        still being written.
+        """
+
+        first = self.registry.get("colors")
+        folder = os.path.dirname(first.path)
+        prefix = os.path.basename(first.path).split("-")[0]
+        later = os.path.join(folder, f"{prefix}-later.vvdeck")
+        unfinished = os.path.join(folder, f"{prefix}-other.vvdeck.tmp-1")
+        for path in (later, unfinished):
+            with open(path, "wb"):
+                pass
+            os.utime(path, ns=(1 << 62, 1 << 62))
+        os.utime(unfinished, ns=(1, 1))
+        self.write("colors.csv", "Blue,Sininen\n")
+
+        second = self.registry.get("colors")
+        self.assertEqual(
+            sorted(os.listdir(folder)),
+            sorted(os.path.basename(path) for path in (second.path, later, unfinished)),
+        )
+        self.assertEqual(tuple(first.foreign_terms), ("Red",))
+
+    @pytest.mark.unit
+    def test_least_recently_used_deck_is_dropped(self):
+        """
+        Test that the least recently used deck is dropped once the open decks exceed
+        the budget, and is opened again on its next use.
+        """
+
+        sizes = {
+            deck_id: DeckRegistry(self.tmp.name).get(deck_id).nbytes
+            for deck_id in self.registry.deck_ids()
+        }
+        self.registry.budget_bytes = sizes["animals"] + sizes["french"]
+        self.registry.get("colors")
+        self.registry.get("animals")  # Makes colors the least recently used deck
+        self.registry.get("french")
+
+        self.assertEqual(set(self.registry.loaded()), {"animals", "french"})
+        self.assertLessEqual(self.registry.loaded_bytes, self.registry.budget_bytes)
+        self.assertEqual(tuple(self.registry.get("colors").foreign_terms), ("Red",))
+
+    @pytest.mark.unit
+    def test_deck_ids_are_checked(self):
+        """
+        Test that ids outside the deck id pattern are only served if they name an
+        existing deck, so the data folder itself is never a deck.
+        """
+
+        self.write("my words.csv", "Sun,Aurinko\n")
+        self.assertEqual(tuple(self.registry.get("my words").foreign_terms), ("Sun",))
+        for deck_id in ("", ".", "..", ".versions", "french/a", "my words/.."):
+            with self.subTest(deck_id=deck_id):
+                with self.assertRaises(UnknownDeckError):
+                    self.registry.get(deck_id)
+
+    @pytest.mark.unit
+    def test_replaced_files_are_resolved_again(self):
+        """
+        Test that a deck whose files disappear while they are read is resolved again,
+        and that a deck whose files keep disappearing is unknown.
+        """
+
+        sources = self.registry._sources("colors")
+        missing = [os.path.join(self.tmp.name, ".versions", "old", "colors.csv")]
+        with patch.object(self.registry, "_sources", side_effect=[missing, sources]):
+            self.assertEqual(tuple(self.registry.get("colors").foreign_terms), ("Red",))
+        with patch.object(self.registry, "_sources", return_value=missing):
+            with self.assertRaises(UnknownDeckError):
+                self.registry.get("colors")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Unit tests for the JSON responses of the quiz endpoints.
+
+tests/unit/test_responses.py
+
+Classes:
+    TestRenderJson: Contains unit tests for render_json and json_array.
+"""
+
+import json
+import unittest
+
+import pytest
+
+from app.domain.models import Word
+from app.domain.vocabulary import Vocabulary
+from app.interfaces.responses import FastJSONResponse, json_array, render_json
+
+
+class TestRenderJson(unittest.TestCase):
+    """
+    Unit tests for render_json and json_array.
+    Test Cases:
+    - test_word_json_matches_model: The pre-encoded words equal the JSON of the Word model.
+    - test_pre_encoded_values: Pre-encoded values are inserted into dicts and arrays.
+    """
+
+    @pytest.mark.unit
+    def test_word_json_matches_model(self):
+        """
+        Test that the JSON encoded by the vocabulary equals the JSON pydantic writes for
+        the word, including quotes, backslashes and non-ASCII letters.
+        """
+
+        vocabulary = Vocabulary(['Say "hi"', "C:\\Käsi"], ["Sano hei", "Hand\n"])
+        for index in range(len(vocabulary)):
+            self.assertEqual(
+                vocabulary.word_json(index),
+                vocabulary.word(index).model_dump_json().encode(),
+            )
+
+    @pytest.mark.unit
+    def test_pre_encoded_values(self):
+        """
+        Test that bytes values are inserted as they are and everything else is encoded.
+        """
+
+        word = Word(foreign_term="Käsi", native_translation="Hand", id="1" * 16)
+        encoded = word.model_dump_json().encode()
+        reply = {"type": "result", "correct": 1, "next": encoded, "after": b"null"}
+
+        self.assertEqual(
+            json.loads(render_json(reply)),
+            {"type": "result", "correct": 1, "next": word.model_dump(), "after": None},
+        )
+        self.assertEqual(
+            json.loads(render_json({"next": encoded})), {"next": word.model_dump()}
+        )
+        self.assertEqual(
+            json.loads(json_array([encoded, encoded])), [word.model_dump()] * 2
+        )
+        self.assertEqual(json.loads(json_array([])), [])
+        self.assertEqual(render_json(encoded), encoded)
+        self.assertEqual(FastJSONResponse({"ä": [1]}).body, '{"ä":[1]}'.encode())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,234 @@
+"""
+Unit tests for the SessionRegistry class.
+
+tests/unit/test_session_registry.py
+
+Classes:
+    TestSessionRegistry: Contains unit tests for the SessionRegistry class.
+"""
+
+import unittest
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.domain.models import Word
+from app.domain.vocabulary import Vocabulary
+from app.interfaces.logger import QuizLogger
+from app.interfaces.metrics import ANSWERS
+from app.interfaces.repositories import UnknownDeckError
+from app.use_cases.session_registry import SessionRegistry
+
+
+class FakeClock:
+    """A manually advanced clock for driving session expiry."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeDecks:
+    """Serves decks from a dict, like a DeckRegistry."""
+
+    def __init__(self, decks):
+        self.decks = decks
+
+    def get(self, deck_id: str) -> Vocabulary:
+        if deck_id not in self.decks:
+            raise UnknownDeckError(deck_id)
+        return self.decks[deck_id]
+
+
+class TestSessionRegistry(unittest.TestCase):
+    """
+    Unit tests for the SessionRegistry class.
+    Test Cases:
+    - test_sessions_are_isolated: Answers in one session do not affect another session.
+    - test_idle_sessions_expire: Sessions idle longer than the TTL are expired.
+    - test_used_sessions_are_kept: Sessions used within the TTL survive expiry.
+    - test_least_recently_used_session_is_evicted: The registry keeps at most max_sessions.
+    - test_update_words_swaps_versions: Quizzes in progress keep the words they started on.
+    - test_quiz_on_deck: A quiz started on a deck keeps drawing from that deck.
+    - test_restore_from_answer_log: Logged answers rebuild the quizzes of lost sessions.
+    """
+
+    @pytest.mark.unit
+    def setUp(self):
+        """
+        Set up a registry with two words, a mock logger and a fake clock.
+        """
+
+        self.words = [
+            Word(foreign_term="Hello", native_translation="Hei"),
+            Word(foreign_term="World", native_translation="Maailma"),
+        ]
+        self.clock = FakeClock()
+        self.registry = SessionRegistry(
+            self.words,
+            MagicMock(spec=QuizLogger),
+            ttl_seconds=60,
+            max_sessions=3,
+            clock=self.clock,
+        )
+
+    @pytest.mark.unit
+    def test_sessions_are_isolated(self):
+        """
+        Test that two sessions keep separate counters and queues.
+        """
+
+        alice = self.registry.get("alice")
+        bob = self.registry.get("bob")
+        word = alice.get_next_word()
+        alice.check_answer(word, word.foreign_term)
+
+        self.assertIsNot(alice, bob)
+        self.assertIs(self.registry.get("alice").state, alice.state)
+        self.assertEqual(alice.correct, 1)
+        self.assertEqual(bob.correct, 0)
+        self.assertEqual(bob.current_word_index, -1)
+
+    @pytest.mark.unit
+    def test_idle_sessions_expire(self):
+        """
+        Test that a session idle for longer than the TTL is removed.
+        """
+
+        self.registry.get("alice")
+        self.clock.now = 61
+        self.assertEqual(self.registry.expire(), 1)
+        self.assertNotIn("alice", self.registry)
+        self.assertEqual(len(self.registry), 0)
+
+    @pytest.mark.unit
+    def test_used_sessions_are_kept(self):
+        """
+        Test that using a session pushes its expiry forward.
+        """
+
+        self.registry.get("alice")
+        self.clock.now = 50
+        self.registry.get("alice")
+        self.clock.now = 100
+        self.assertEqual(self.registry.expire(), 0)
+        self.assertIn("alice", self.registry)
+        self.clock.now = 111
+        self.assertEqual(self.registry.expire(), 1)
+
+    @pytest.mark.unit
+    def test_least_recently_used_session_is_evicted(self):
+        """
+        Test that the least recently used session is evicted when the registry is full.
+        """
+
+        for session_id in ("a", "b", "c"):
+            self.registry.get(session_id)
+        self.registry.get("a")
+        self.registry.get("d")
+
+        self.assertEqual(len(self.registry), 3)
+        self.assertNotIn("b", self.registry)
+        self.assertIn("a", self.registry)
+
+    @pytest.mark.unit
+    def test_update_words_swaps_versions(self):
+        """
+        Test that update_words reaches new sessions and new quizzes at once, that a quiz in
+        progress keeps the previous words, and that they are released once unused by the
+        check, which requests do not run.
+        """
+
+        alice = self.registry.get("alice")
+        alice.set_mode("infinite")
+        word = alice.get_next_word()
+        new_words = [Word(foreign_term="Cat", native_translation="Kissa")]
+        self.registry.update_words(new_words)
+
+        self.assertEqual(self.registry.retired, 1)
+        alice = self.registry.get("alice")
+        self.assertIn(alice.get_next_word().foreign_term, ("Hello", "World"))
+        self.assertTrue(alice.check_answer(word, word.foreign_term))
+        self.assertEqual(self.registry.get("bob").get_next_word().foreign_term, "Cat")
+
+        self.registry.release_unused()
+        self.assertEqual(self.registry.retired, 1)
+        alice = self.registry.start("alice")
+        self.assertEqual(alice.mode, "infinite")
+        self.assertEqual(alice.get_next_word().foreign_term, "Cat")
+        self.registry.get("bob")
+        self.assertEqual(self.registry.retired, 1)
+        self.assertEqual(self.registry.release_unused(), 1)
+        self.assertEqual(self.registry.retired, 0)
+
+    @pytest.mark.unit
+    def test_quiz_on_deck(self):
+        """
+        Test that a quiz started on a deck keeps its deck and mode, is unaffected by
+        update_words, and returns to the shared words once the deck is removed, and
+        that on_deck leaves the quiz unchanged until it is started.
+        """
+
+        decks = {"animals": Vocabulary(["Cat"], ["Kissa"])}
+        self.registry.decks = FakeDecks(decks)
+        self.registry.get("alice").set_mode("infinite")
+        with self.assertRaises(UnknownDeckError):
+            self.registry.start("alice", "missing")
+        self.registry.get("alice").check_answer(self.words[0], "wrong")
+        self.assertEqual(self.registry.on_deck("alice").incorrect, 1)
+
+        self.registry.start("alice", "animals")
+        self.registry.update_words(
+            [Word(foreign_term="Sun", native_translation="Aurinko")]
+        )
+        alice = self.registry.get("alice")
+        self.assertEqual(alice.state.deck, "animals")
+        self.assertEqual(alice.mode, "infinite")
+        self.assertEqual(alice.get_next_word().foreign_term, "Cat")
+
+        del decks["animals"]
+        alice = self.registry.get("alice")
+        self.assertIsNone(alice.state.deck)
+        self.assertEqual(alice.get_next_word().foreign_term, "Sun")
+
+    @pytest.mark.unit
+    def test_restore_from_answer_log(self):
+        """
+        Test that graded answers are logged with their session and that replaying them
+        into a new registry restores the counters, mode and answered words of the last
+        quiz of every lost session without counting the answers in the metrics again.
+        """
+
+        events = []
+        self.registry.answer_log = events
+        self.registry.get("alice").set_mode("infinite")
+        alice = self.registry.start("alice")
+        words = alice.get_next_words(2)
+        alice.check_answers([(words[0], words[0].foreign_term), (words[1], "wrong")])
+        self.registry.get("bob").check_answer(words[0], words[0].foreign_term)
+
+        self.assertEqual(
+            [event.session_id for event in events], ["alice"] * 2 + ["bob"]
+        )
+        self.assertEqual([event.match for event in events], ["exact", "wrong", "exact"])
+        self.assertIsNotNone(events[0].response_time)
+
+        restored = SessionRegistry(self.words, MagicMock(spec=QuizLogger))
+        restored.get("bob")
+        counted = [ANSWERS.labels(grade).get() for grade in ("correct", "incorrect")]
+        self.assertEqual(restored.restore(events), 1)
+        self.assertEqual(
+            [ANSWERS.labels(grade).get() for grade in ("correct", "incorrect")], counted
+        )
+        alice = restored.get("alice")
+        self.assertEqual((alice.correct, alice.incorrect), (1, 1))
+        self.assertEqual(alice.incorrect_words, [words[1].foreign_term])
+        self.assertEqual(alice.mode, "infinite")
+        self.assertEqual(alice.start_time, events[0].quiz_start)
+        self.assertEqual(restored.get("bob").correct, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Unit tests for the application startup.
+
+tests/unit/test_startup.py
+
+Classes:
+    TestStartup: Contains unit tests for the services warm-up and the health probes.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import pytest
+from fastapi import HTTPException
+
+from app.main import Services, get_ready_services, liveness, readiness
+
+
+class TestStartup(unittest.TestCase):
+    """
+    Unit tests for the services warm-up and the health probes.
+    Test Cases:
+    - test_warm_up_makes_the_services_ready: The probes follow the warm-up.
+    - test_failed_warm_up: A failed load is reported by both probes.
+    """
+
+    def setUp(self):
+        """
+        Create a data folder with one word file.
+        """
+
+        self.tmp = tempfile.mkdtemp()
+        self.data = os.path.join(self.tmp, "data")
+        os.makedirs(self.data)
+        with open(os.path.join(self.data, "words.csv"), "w", encoding="utf-8") as file:
+            file.write("Apple,Omena\nDog,Koira\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def services(self, data_directory: str) -> Services:
+        services = Services(
+            data_directory,
+            os.path.join(self.tmp, "out"),
+            "memory",
+            history_database=os.path.join(self.tmp, "history.db"),
+            answer_log_directory=os.path.join(self.tmp, "answers"),
+        )
+        self.addCleanup(services.close)
+        return services
+
+    def probe(self, endpoint, services: Services):
+        """Calls a probe endpoint and returns its status code and body."""
+        response = asyncio.run(endpoint(services))
+        if isinstance(response, dict):
+            return 200, response
+        return response.status_code, json.loads(response.body)
+
+    @pytest.mark.unit
+    def test_warm_up_makes_the_services_ready(self):
+        """
+        Test that the services are alive but not ready until the words are loaded.
+        """
+
+        services = self.services(self.data)
+        self.assertEqual(len(services.session_registry.vocabulary), 0)
+        self.assertEqual(self.probe(liveness, services)[0], 200)
+        self.assertEqual(self.probe(readiness, services), (503, {"status": "loading"}))
+        with self.assertRaises(HTTPException) as raised:
+            get_ready_services(services)
+        self.assertEqual(raised.exception.status_code, 503)
+
+        services.warm_up()
+
+        self.assertEqual(
+            self.probe(readiness, services), (200, {"status": "ready", "words": 2})
+        )
+        self.assertIs(get_ready_services(services), services)
+        word = services.session_registry.get("alice").get_next_word()
+        self.assertIn(word.foreign_term, ("Apple", "Dog"))
+
+    @pytest.mark.unit
+    def test_failed_warm_up(self):
+        """
+        Test that a failed load leaves the services not ready and fails the liveness
+        probe, so the container is restarted.
+        """
+
+        services = self.services(os.path.join(self.tmp, "missing"))
+        with self.assertLogs("app.main", "ERROR"):
+            services.warm_up()
+
+        status, body = self.probe(readiness, services)
+        self.assertEqual((status, body["status"]), (503, "failed"))
+        self.assertEqual(self.probe(liveness, services)[0], 503)
+
+
+if __name__ == "__main__":
+    unittest.main()
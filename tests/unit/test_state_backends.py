@@ -0,0 +1,217 @@
+"""
+Unit tests for the quiz state backends.
+
+tests/unit/test_state_backends.py
+
+Classes:
+    TestSqliteStateBackend: Contains unit tests for the SqliteStateBackend class.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.domain.models import Word
+from app.interfaces.logger import QuizLogger
+from app.interfaces.state_backends import SqliteStateBackend
+from app.use_cases.session_registry import SessionRegistry
+
+
+class FakeClock:
+    """A manually advanced clock for driving session expiry."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestSqliteStateBackend(unittest.TestCase):
+    """
+    Unit tests for the SqliteStateBackend class.
+    Test Cases:
+    - test_quiz_continues_in_other_worker: Two registries on one database share a quiz.
+    - test_idle_sessions_expire: Sessions idle longer than the TTL are deleted.
+    - test_surplus_sessions_are_evicted: The sweep keeps at most max_sessions sessions.
+    - test_vocabularies_in_use: The vocabularies of the live sessions are reported.
+    - test_answered_words_are_appended: A save only stores the newly answered words.
+    """
+
+    @pytest.mark.unit
+    def setUp(self):
+        """
+        Set up a temporary database path, three words and a fake clock.
+        """
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "state", "quiz_state.db")
+        self.words = [
+            Word(foreign_term="Hello", native_translation="Hei"),
+            Word(foreign_term="World", native_translation="Maailma"),
+            Word(foreign_term="Cat", native_translation="Kissa"),
+        ]
+        self.clock = FakeClock()
+        self.backends = []
+
+    def tearDown(self):
+        for backend in self.backends:
+            backend.close()
+        self.tmp.cleanup()
+
+    def backend(self, **kwargs) -> SqliteStateBackend:
+        backend = SqliteStateBackend(self.path, clock=self.clock, **kwargs)
+        self.backends.append(backend)
+        return backend
+
+    @pytest.mark.unit
+    def test_quiz_continues_in_other_worker(self):
+        """
+        Test that a quiz started through one backend continues through another one.
+        """
+
+        logger = MagicMock(spec=QuizLogger)
+        first = SessionRegistry(self.words, logger, backend=self.backend())
+        second = SessionRegistry(self.words, logger, backend=self.backend())
+
+        service = first.get("alice")
+        service.set_mode("infinite")
+        asked = [service.get_next_word()]
+        service.check_answer(asked[0].id, "Wrong")
+
+        service = second.get("alice")
+        self.assertEqual(service.mode, "infinite")
+        self.assertEqual(service.incorrect, 1)
+        asked.append(service.get_next_word())
+
+        service = first.get("alice")
+        asked.append(service.get_next_word())
+        self.assertEqual(
+            sorted(word.foreign_term for word in asked), ["Cat", "Hello", "World"]
+        )
+        self.assertEqual(service.get_next_word().foreign_term, asked[0].foreign_term)
+        self.assertEqual(len(second), 1)
+
+    @pytest.mark.unit
+    def test_idle_sessions_expire(self):
+        """
+        Test that a session idle for longer than the TTL is neither loaded nor kept.
+        """
+
+        backend = self.backend(ttl_seconds=60)
+        registry = SessionRegistry(
+            self.words, MagicMock(spec=QuizLogger), backend=backend
+        )
+        registry.get("alice").get_next_word()
+        self.clock.now += 50
+        self.assertEqual(registry.get("alice").current_word_index, 0)
+        self.clock.now += 61
+        self.assertNotIn("alice", registry)
+        self.assertEqual(registry.expire(), 1)
+        self.assertEqual(len(registry), 0)
+        self.assertIsNone(backend.load("alice"))
+
+    @pytest.mark.unit
+    def test_surplus_sessions_are_evicted(self):
+        """
+        Test that the sweep deletes the least recently used sessions beyond the limit.
+        """
+
+        registry = SessionRegistry(
+            self.words,
+            MagicMock(spec=QuizLogger),
+            backend=self.backend(max_sessions=2),
+        )
+        for session_id in ("a", "b", "c"):
+            registry.get(session_id)
+            self.clock.now += 1
+        registry.get("a")
+
+        self.assertEqual(registry.expire(), 1)
+        self.assertNotIn("b", registry)
+        self.assertIn("a", registry)
+        self.assertIn("c", registry)
+
+    @pytest.mark.unit
+    def test_vocabularies_in_use(self):
+        """
+        Test that the fingerprints of the vocabularies of live sessions are reported,
+        so a replaced vocabulary is released once its last session expired.
+        """
+
+        backend = self.backend(ttl_seconds=60)
+        registry = SessionRegistry(
+            self.words, MagicMock(spec=QuizLogger), backend=backend
+        )
+        old = registry.vocabulary.fingerprint
+        registry.get("alice").get_next_word()
+        registry.update_words(self.words[:1])
+        self.clock.now += 30
+        registry.get("bob")
+
+        self.assertEqual(
+            backend.vocabularies_in_use(), {old, registry.vocabulary.fingerprint}
+        )
+        self.assertEqual(registry.release_unused(), 0)
+        self.clock.now += 31
+        self.assertEqual(
+            backend.vocabularies_in_use(), {registry.vocabulary.fingerprint}
+        )
+        self.assertEqual(registry.release_unused(), 1)
+        self.assertEqual(registry.retired, 0)
+
+    @pytest.mark.unit
+    def test_answered_words_are_appended(self):
+        """
+        Test that the answered words are stored as rows that a save appends to, that a
+        new quiz and an expired session drop them, and that they are loaded in order.
+        """
+
+        backend = self.backend(ttl_seconds=60)
+        registry = SessionRegistry(
+            self.words, MagicMock(spec=QuizLogger), backend=backend
+        )
+        database = sqlite3.connect(self.path)
+        self.addCleanup(database.close)
+
+        def rows():
+            return database.execute(
+                "SELECT correct, seq, term FROM quiz_answer ORDER BY correct, seq"
+            ).fetchall()
+
+        service = registry.get("alice")
+        words = service.get_next_words(3)
+        service.check_answer(words[0].id, words[0].foreign_term)
+        service.check_answers([(words[1].id, "Wrong"), (words[2].id, "Wrong")])
+        self.assertEqual(
+            rows(),
+            [
+                (0, 0, words[1].foreign_term),
+                (0, 1, words[2].foreign_term),
+                (1, 0, words[0].foreign_term),
+            ],
+        )
+        (state,) = database.execute("SELECT state FROM quiz_state").fetchone()
+        self.assertNotIn("correct_words", state)
+
+        service = registry.get("alice")
+        self.assertEqual(service.correct_words, [words[0].foreign_term])
+        self.assertEqual(
+            service.incorrect_words, [words[1].foreign_term, words[2].foreign_term]
+        )
+        self.clock.now += 1
+        registry.start("alice")
+        self.assertEqual(rows(), [])
+
+        registry.get("alice").check_answer(words[0].id, "Wrong")
+        self.clock.now += 61
+        self.assertEqual(registry.expire(), 1)
+        self.assertEqual(rows(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
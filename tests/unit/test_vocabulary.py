@@ -0,0 +1,139 @@
+"""
+Unit tests for the Vocabulary and FeistelPermutation classes.
+
+tests/unit/test_vocabulary.py
+
+Classes:
+    TestFeistelPermutation: Contains unit tests for the FeistelPermutation class.
+    TestVocabulary: Contains unit tests for the Vocabulary class.
+"""
+
+import unittest
+
+import pytest
+
+from app.domain.models import Word
+from app.domain.vocabulary import (
+    FeistelPermutation,
+    Vocabulary,
+    make_word_id,
+    normalize_answer,
+)
+
+
+class TestFeistelPermutation(unittest.TestCase):
+    """
+    Unit tests for the FeistelPermutation class.
+    Test Cases:
+    - test_is_permutation: Every index appears exactly once for various sizes.
+    - test_key_selects_order: Equal keys give equal orders and different keys differ.
+    - test_out_of_range: Positions outside the permutation raise IndexError.
+    """
+
+    @pytest.mark.unit
+    def test_is_permutation(self):
+        """
+        Test that the permutation covers range(size) exactly once.
+        """
+
+        for size in (0, 1, 2, 3, 17, 1000, 4097):
+            permutation = FeistelPermutation(size, key=12345)
+            self.assertEqual(sorted(permutation), list(range(size)))
+
+    @pytest.mark.unit
+    def test_key_selects_order(self):
+        """
+        Test that the key determines the order.
+        """
+
+        first = list(FeistelPermutation(500, key=1))
+        self.assertEqual(first, list(FeistelPermutation(500, key=1)))
+        self.assertNotEqual(first, list(FeistelPermutation(500, key=2)))
+
+    @pytest.mark.unit
+    def test_out_of_range(self):
+        """
+        Test that positions outside the permutation raise IndexError.
+        """
+
+        permutation = FeistelPermutation(3, key=7)
+        with self.assertRaises(IndexError):
+            permutation[3]
+        with self.assertRaises(IndexError):
+            permutation[-1]
+
+
+class TestVocabulary(unittest.TestCase):
+    """
+    Unit tests for the Vocabulary class.
+    Test Cases:
+    - test_round_trip: Words stored in a vocabulary come back unchanged.
+    - test_strings_are_interned: Equal strings are stored once.
+    - test_index_of: Word ids are looked up by their index.
+    - test_is_correct: Answers are compared in normalized form.
+    """
+
+    @pytest.mark.unit
+    def setUp(self):
+        """
+        Set up a vocabulary with a repeated translation.
+        """
+
+        self.words = [
+            Word(foreign_term="Hello", native_translation="Hei"),
+            Word(foreign_term="Hi", native_translation="Hei"),
+            Word(foreign_term="Hello", native_translation="Terve"),
+        ]
+        self.vocabulary = Vocabulary.from_words(self.words)
+
+    @pytest.mark.unit
+    def test_round_trip(self):
+        """
+        Test that the stored words are returned in order.
+        """
+
+        self.assertEqual(len(self.vocabulary), 3)
+        self.assertEqual(
+            [(word.foreign_term, word.native_translation) for word in self.vocabulary],
+            [(word.foreign_term, word.native_translation) for word in self.words],
+        )
+        self.assertIs(Vocabulary.of(self.vocabulary), self.vocabulary)
+
+    @pytest.mark.unit
+    def test_strings_are_interned(self):
+        """
+        Test that equal strings share one object.
+        """
+
+        translations = self.vocabulary.native_translations
+        self.assertIs(translations[0], translations[1])
+
+    @pytest.mark.unit
+    def test_index_of(self):
+        """
+        Test that index_of returns the index of a word id or None.
+        """
+
+        for index, word in enumerate(self.vocabulary):
+            self.assertEqual(
+                word.id, make_word_id(word.foreign_term, word.native_translation)
+            )
+            self.assertEqual(self.vocabulary.index_of(word.id), index)
+        self.assertNotEqual(self.vocabulary.ids[0], self.vocabulary.ids[2])
+        self.assertIsNone(self.vocabulary.index_of("unknown"))
+
+    @pytest.mark.unit
+    def test_is_correct(self):
+        """
+        Test that answers are case folded, stripped and NFC normalized.
+        """
+
+        vocabulary = Vocabulary(["Straße", "Café"], ["Katu", "Kahvila"])
+        self.assertTrue(vocabulary.is_correct(0, " STRASSE "))
+        self.assertTrue(vocabulary.is_correct(1, "cafe\u0301"))
+        self.assertFalse(vocabulary.is_correct(1, "cafe"))
+        self.assertEqual(normalize_answer(" Hello "), "hello")
+
+
+if __name__ == "__main__":
+    unittest.main()
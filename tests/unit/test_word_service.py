@@ -10,9 +10,12 @@ TestWordService Methods:
     setUp: Initializes the test case with sample data and mocks.
     test_get_next_word_normal: Tests the get_next_word method in normal mode.
     test_get_next_word_infinite: Tests the get_next_word method in infinite mode.
+    test_infinite_mode_repeats_full_words: Tests that repeated words keep their translation.
     test_check_answer_correct: Tests the check_answer method with a correct answer.
     test_check_answer_incorrect: Tests the check_answer method with an incorrect answer.
     test_increment_incorrect_repeat: Tests the increment_incorrect_repeat method.
+    test_check_answer_by_id: Tests that answers are graded by word id on the server.
+    test_typo_tolerant_answers: Tests that close answers count once typos are accepted.
 """
 
 import unittest
@@ -20,8 +23,9 @@ from unittest.mock import MagicMock
 
 import pytest
 
-from app.domain.models import Word
+from app.domain.models import AnswerMatch, Word
 from app.interfaces.logger import QuizLogger
+from app.interfaces.metrics import ANSWER_CHECKS
 from app.use_cases.word_service import WordService
 
 
@@ -31,9 +35,14 @@ class TestWordService(unittest.TestCase):
     Test Cases:
     - test_get_next_word_normal: Tests the normal mode where each word is asked once and all answers are correct.
     - test_get_next_word_infinite: Tests the infinite mode where words are asked repeatedly and all answers are incorrect.
+    - test_spaced_mode_repeats_missed_word_after_gap: Tests that a missed word comes back after the retry gap.
+    - test_spaced_mode_ends_when_all_words_are_learned: Tests that spaced mode ends once every word is learned.
+    - test_batch_prefetch_and_check: Tests fetching and grading several words per call.
     - test_check_answer_correct: Tests the check_answer method with a correct answer.
     - test_check_answer_incorrect: Tests the check_answer method with an incorrect answer.
     - test_increment_incorrect_repeat: Tests the increment_incorrect_repeat method to ensure it correctly counts repeated incorrect answers.
+    - test_typo_tolerant_answers: Tests exact, close and wrong answers with typo tolerance.
+    - test_quiz_result_is_logged_by_end_quiz: Tests that only end_quiz logs the result.
     Attributes:
     - words: A list of Word objects used for testing.
     - mock_logger: A mock object for the QuizLogger.
@@ -113,6 +122,96 @@ class TestWordService(unittest.TestCase):
         self.assertEqual(self.service.correct, 0)
         self.assertEqual(self.service.incorrect, len(words_asked))
 
+    @pytest.mark.unit
+    def test_infinite_mode_repeats_full_words(self):
+        """
+        Test that words repeated in infinite mode are the original words.
+        After one pass with every answer wrong, the next pass repeats the same
+        words including their native translations.
+        """
+
+        self.service.set_mode("infinite")
+        for _ in self.words:
+            word = self.service.get_next_word()
+            self.service.check_answer(word, "Wrong")
+
+        repeated = [self.service.get_next_word() for _ in self.words]
+        self.assertCountEqual(
+            [(word.foreign_term, word.native_translation) for word in repeated],
+            [(word.foreign_term, word.native_translation) for word in self.words],
+        )
+
+    @pytest.mark.unit
+    def test_spaced_mode_repeats_missed_word_after_gap(self):
+        """
+        Test that in spaced mode a missed word comes back after exactly `retry_gap`
+        other words, while the remaining new words are still being asked.
+        """
+
+        words = [
+            Word(foreign_term=f"Word{number}", native_translation=f"Sana{number}")
+            for number in range(10)
+        ]
+        service = WordService(words, self.mock_logger)
+        service.set_mode("spaced", retry_gap=3)
+
+        missed = service.get_next_word()
+        service.check_answer(missed.id, "Wrong")
+        asked = []
+        for _ in range(4):
+            word = service.get_next_word()
+            asked.append((word.foreign_term, word.native_translation))
+            service.check_answer(word.id, word.foreign_term)
+
+        missed = (missed.foreign_term, missed.native_translation)
+        self.assertNotIn(missed, asked[:3])
+        self.assertEqual(asked[3], missed)
+
+    @pytest.mark.unit
+    def test_spaced_mode_ends_when_all_words_are_learned(self):
+        """
+        Test that spaced mode keeps asking a missed word until it is answered correctly
+        twice in a row, and then ends.
+        """
+
+        self.service.set_mode("spaced", retry_gap=1)
+        first = self.service.get_next_word()
+        self.service.check_answer(first.id, "Wrong")
+        asked = []
+        while (word := self.service.get_next_word()) is not None:
+            asked.append(word.foreign_term)
+            self.service.check_answer(word.id, word.foreign_term)
+            self.assertLess(len(asked), 10)
+
+        self.assertEqual(asked.count(first.foreign_term), 2)
+        self.assertEqual(len(asked), 3)
+        self.assertEqual(self.service.incorrect, 1)
+
+    @pytest.mark.unit
+    def test_batch_prefetch_and_check(self):
+        """
+        Test that get_next_words returns the remaining words and that check_answers
+        applies the answers in order, or none of them if a word is unknown, and
+        counts every answer of the batch as checked.
+        """
+
+        words = self.service.get_next_words(5)
+        self.assertCountEqual([word.foreign_term for word in words], ["Hello", "World"])
+        self.assertEqual(self.service.get_next_words(5), [])
+
+        with self.assertRaises(KeyError):
+            self.service.check_answers([(words[0].id, "Wrong"), ("unknown", "Hello")])
+        self.assertEqual(self.service.incorrect, 0)
+
+        checks = ANSWER_CHECKS.labels().get()
+        results = self.service.check_answers(
+            [(words[0].id, "Wrong"), (words[1].id, words[1].foreign_term)]
+        )
+        self.assertEqual(results, [False, True])
+        self.assertEqual(ANSWER_CHECKS.labels().get(), checks + 2)
+        self.assertEqual(self.service.incorrect_words, [words[0].foreign_term])
+        self.assertEqual(self.service.correct, 1)
+
     @pytest.mark.unit
     def test_check_answer_correct(self):
         """
@@ -155,6 +254,23 @@ class TestWordService(unittest.TestCase):
         self.assertEqual(self.service.incorrect, 1)
         self.assertIn("Hello", self.service.incorrect_words)
 
+    @pytest.mark.unit
+    def test_quiz_result_is_logged_by_end_quiz(self):
+        """
+        Test that quiz_result returns the result without logging it, and that end_quiz
+        logs the same result.
+        """
+
+        self.service.check_answer(self.words[0], "Hi")
+        result = self.service.quiz_result()
+        self.assertEqual((result.correct, result.incorrect), (0, 1))
+        self.assertEqual(result.incorrect_words, ["Hello"])
+        self.mock_logger.log_result.assert_not_called()
+
+        self.service.end_quiz()
+        (logged,), _ = self.mock_logger.log_result.call_args
+        self.assertEqual(logged.incorrect_words, ["Hello"])
+
     @pytest.mark.unit
     def test_increment_incorrect_repeat(self):
         """
@@ -176,6 +292,53 @@ class TestWordService(unittest.TestCase):
         count = self.service.increment_incorrect_repeat(word)
         self.assertEqual(count, 2)
 
+    @pytest.mark.unit
+    def test_check_answer_by_id(self):
+        """
+        Test that check_answer grades by word id against the vocabulary.
+        The served word carries its id, the answer is compared case-insensitively,
+        a forged foreign term is ignored and unknown ids are rejected.
+        """
+
+        word = self.service.get_next_word()
+        self.assertIsNotNone(word.id)
+        self.assertTrue(
+            self.service.check_answer(word.id, f"  {word.foreign_term.upper()} ")
+        )
+        forged = word.model_copy(update={"foreign_term": "Wrong"})
+        self.assertFalse(self.service.check_answer(forged, "Wrong"))
+        with self.assertRaises(KeyError):
+            self.service.check_answer("unknown", "Hello")
+
+    @pytest.mark.unit
+    def test_typo_tolerant_answers(self):
+        """
+        Test that answers with a typo or missing diacritics are close, and count as
+        correct, only once the quiz accepts typos.
+        """
+
+        service = WordService(
+            [
+                Word(foreign_term="Apple", native_translation="Omena"),
+                Word(foreign_term="Päivä", native_translation="Day"),
+                Word(foreign_term="Cat", native_translation="Kissa"),
+            ],
+            self.mock_logger,
+        )
+        apple, day, cat = service.vocabulary.ids
+        self.assertEqual(service.grade_answer(apple, "Aple"), AnswerMatch.WRONG)
+
+        service.set_mode("normal", max_typos=1)
+        self.assertEqual(service.grade_answer(apple, "apple"), AnswerMatch.EXACT)
+        self.assertEqual(service.grade_answer(apple, "Aple"), AnswerMatch.CLOSE)
+        self.assertEqual(service.grade_answer(apple, "Appel"), AnswerMatch.WRONG)
+        self.assertEqual(service.grade_answer(day, "paiva"), AnswerMatch.CLOSE)
+        self.assertEqual(service.grade_answer(cat, "Car"), AnswerMatch.WRONG)
+        self.assertEqual((service.correct, service.incorrect), (3, 2))
+        self.assertEqual(service.expected_answer(day), "Päivä")
+        with self.assertRaises(ValueError):
+            service.set_mode("normal", max_typos=-1)
+
 
 if __name__ == "__main__":
     unittest.main()